@@ -1,6 +1,10 @@
 import pandas as pd
 import time
-from botocore.exceptions import ClientError
+from datetime import datetime
+
+from cost_accounting import InstrumentedLLM, UsageLedger, call_context, usage_summary
+from judge_parsing import RUBRIC, JudgeParser
+from resilience import invoke_with_retry, is_failure
 
 print("\n" + "="*60)
 print("AUTOMATED LLM-AS-A-JUDGE EVALUATION - CLAUDE 4.5")
@@ -8,40 +12,16 @@ print("SAC-RAG (Claude 4.5) vs Generic Claude (Same Rubric: 1-5)")
 print("="*60 + "\n")
 
 # ============================================================
-# Helper: Retry Logic
+# Usage Accounting (tokens, latency, retries, cost per judge call)
 # ============================================================
-def invoke_with_retry(llm, prompt, max_retries=5):
-    """Invoke LLM with exponential backoff retry"""
-    for attempt in range(max_retries):
-        try:
-            response = llm.invoke(prompt)
-            # Extract content from AIMessage
-            if hasattr(response, 'content'):
-                return response.content
-            return str(response)
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ThrottlingException':
-                if attempt < max_retries - 1:
-                    wait_time = 5 * (2 ** attempt)  # 5s, 10s, 20s, 40s, 80s
-                    print(f"      ⚠️ Throttled. Waiting {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"      ❌ Failed after {max_retries} retries")
-                    return None
-            else:
-                raise
-        except Exception as e:
-            print(f"      ❌ Error: {str(e)[:100]}")
-            if attempt < max_retries - 1:
-                time.sleep(5)
-            else:
-                return None
-    return None
+ledger = UsageLedger(run_id=datetime.now().strftime('judge-rubric-claude45-%Y%m%d-%H%M%S'))
+judge_llm = InstrumentedLLM(llm_generate, ledger, kind='judge')
+judge_parser = JudgeParser(run_id=ledger.run_id)   # range-checked parsing, batched re-ask of failures
 
 # ============================================================
 # LLM-as-a-Judge Scoring Function (1-5 Scale)
 # ============================================================
-def score_answer_rubric(question, answer, ground_truth, llm):
+def score_answer_rubric(question, answer, ground_truth, llm, key=None):
     """
     Score answer using same 1-5 rubric as manual evaluation:
     5 = Excellent (Kenyan law + specific sections)
@@ -72,18 +52,8 @@ def score_answer_rubric(question, answer, ground_truth, llm):
 
     response_text = invoke_with_retry(llm, prompt)
     
-    if response_text:
-        try:
-            # Extract first number found
-            import re
-            match = re.search(r'[1-5]', response_text.strip())
-            if match:
-                score = int(match.group())
-                return score
-        except:
-            pass
-    
-    return 0  # Default if parsing failed
+    # FAILED_SCORE (NaN) if the call or parse failed - excluded from averages, never a fake 0
+    return judge_parser.parse(response_text, RUBRIC, 'rubric', key=key)
 
 # ============================================================
 # Load Data and Evaluate
@@ -103,35 +73,49 @@ for i, row in df_manual.iterrows():
     
     # Score SAC-RAG (Claude 4.5)
     print(f"    Scoring SAC-RAG (Claude 4.5)...", end=" ")
-    sac_score = score_answer_rubric(
-        row['Question'],
-        row['SAC_RAG_Answer'],
-        row['Ground_Truth'],
-        llm_generate
-    )
+    with call_context(pipeline='SAC-RAG', question_id=f"Q{i+1}", stage='rubric'):
+        sac_score = score_answer_rubric(
+            row['Question'],
+            row['SAC_RAG_Answer'],
+            row['Ground_Truth'],
+            judge_llm,
+            key=('SAC-RAG', len(sac_scores))
+        )
     sac_scores.append(sac_score)
     print(f"Score: {sac_score}/5")
     time.sleep(3)
     
     # Score Generic Claude
     print(f"    Scoring Generic Claude...", end=" ")
-    generic_score = score_answer_rubric(
-        row['Question'],
-        row['Generic_Claude_Answer'],
-        row['Ground_Truth'],
-        llm_generate
-    )
+    with call_context(pipeline='Generic Claude', question_id=f"Q{i+1}", stage='rubric'):
+        generic_score = score_answer_rubric(
+            row['Question'],
+            row['Generic_Claude_Answer'],
+            row['Ground_Truth'],
+            judge_llm,
+            key=('Generic Claude', len(generic_scores))
+        )
     generic_scores.append(generic_score)
     print(f"Score: {generic_score}/5")
     time.sleep(3)
     
     print()
 
+# Unparseable verdicts: one batched follow-up asks the judge to restate them as JSON
+if judge_parser.pending:
+    print(f"🔁 Re-asking {len(judge_parser.pending)} unparseable verdict(s)...")
+    for (pipeline, i), score in judge_parser.reask(judge_llm).items():
+        (sac_scores if pipeline == 'SAC-RAG' else generic_scores)[i] = score
+
 # ============================================================
 # Calculate Results
 # ============================================================
-sac_avg = sum(sac_scores) / len(sac_scores)
-generic_avg = sum(generic_scores) / len(generic_scores)
+# Failed judge calls are NaN: excluded from averages and reported separately
+sac_avg = pd.Series(sac_scores, dtype=float).mean()
+generic_avg = pd.Series(generic_scores, dtype=float).mean()
+failed = sum(is_failure(s) for s in sac_scores + generic_scores)
+if failed:
+    print(f"⚠️ {failed} judge call(s) failed and are excluded from the averages")
 
 # Count wins
 sac_wins = sum(1 for s, g in zip(sac_scores, generic_scores) if s > g)
@@ -161,7 +145,8 @@ detailed_df = pd.DataFrame({
     'Question': df_manual['Question'],
     'SAC_RAG_Score': sac_scores,
     'Generic_Claude_Score': generic_scores,
-    'Winner': ['SAC-RAG' if s > g else ('Generic Claude' if g > s else 'Tie') 
+    'Winner': ['Failed' if is_failure(s) or is_failure(g) else
+               ('SAC-RAG' if s > g else ('Generic Claude' if g > s else 'Tie'))
                for s, g in zip(sac_scores, generic_scores)]
 })
 detailed_df.to_csv("automated_llm_judge_detailed_claude45.csv", index=False)
@@ -197,4 +182,12 @@ print("\n🎯 KEY FINDING:")
 print("  Upgrading SAC-RAG from Claude 3.5 to 4.5 improved performance by +30.6%")
 print("  (from 3.60 to 4.70), nearly closing the gap with Generic Claude!")
 
+# Judge usage for this run
+ledger.flush()
+print("\n🧩 Judge response parsing (per template):")
+judge_parser.print_summary()
+judge_parser.flush()
+print("\n💰 Judge usage (tokens, retries, cost) - run_id=" + ledger.run_id)
+print(usage_summary(ledger.run_id).to_string(index=False))
+
 print("\n✅ Automated evaluation complete! 🎓")
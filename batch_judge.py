@@ -0,0 +1,612 @@
+"""
+Batch Judge: Offline Bedrock Batch Inference for Judge Runs
+Instead of one synchronous llm.invoke (plus sleeps) per score, every judge
+prompt for a run is serialized to one JSONL job file (one
+{"recordId", "modelInput"} object per line, the Bedrock batch-inference
+format), submitted as a single batch job, and the .jsonl.out results file is
+parsed back into the judge_scores table and llm_calls usage records.
+recordIds are opaque 11-character tokens ("R0000000042"); the
+(pipeline, question, metric) behind each one is kept next to the job file in
+<job file>.ids.json, which ingest reads.
+
+The same code talks to Bedrock (boto3 'bedrock' client + S3) or to
+LocalBatchService, a file-based stand-in that answers records with any
+.invoke-able LLM (the stubs by default) and writes Bedrock-shaped output.
+
+Bedrock rejects batch jobs below a minimum record count (100 by default,
+--min-records): `run` and the re-ask follow-up pad their job files with
+1-token filler records ("P<n>", skipped on ingest), and `submit` refuses
+a smaller file. A job that ends Failed, Stopped or Expired aborts the run
+instead of reading whatever output exists.
+
+Usage:
+    python batch_judge.py run --suite rubric                 # local stand-in, end to end
+    python batch_judge.py prepare --suite quality -o judge_batch.jsonl
+    python batch_judge.py submit judge_batch.jsonl --service bedrock \\
+        --s3-input s3://bucket/in/ --s3-output s3://bucket/out/ --role-arn arn:aws:iam::...
+    python batch_judge.py ingest batch_jobs/<job-id>/judge_batch.jsonl.out --suite quality   # + judge_batch.jsonl.ids.json
+"""
+
+import argparse
+import json
+import shutil
+import threading
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import results_store
+from cost_accounting import UsageLedger, call_context, estimate_tokens
+from judge_parsing import RUBRIC, UNIT, JudgeParser
+from tracing import span
+
+ANTHROPIC_VERSION = 'bedrock-2023-05-31'
+JUDGE_MODEL_ID = 'us.anthropic.claude-sonnet-4-5-20250929-v1:0'
+LOCAL_JOB_ROOT = 'batch_jobs'
+MIN_BATCH_RECORDS = 100                                    # Bedrock's default minimum records per batch job
+PAD_PREFIX = 'P'
+JUDGE_PREFIX = 'R'
+REASK_PREFIX = 'Q'
+FAILED_JOB_STATUSES = ('Failed', 'Stopped', 'Expired')
+
+
+class BatchJobError(RuntimeError):
+    """A batch job that cannot be submitted or did not finish"""
+
+# ============================================================
+# Judge Prompts (same wording as the synchronous judge scripts)
+# ============================================================
+RUBRIC_PROMPT = """You are an expert evaluator of Kenyan legal Q&A systems.
+
+**Question:** {question}
+
+**Correct Answer (Ground Truth):** {ground_truth}
+
+**Answer to Evaluate:**
+{answer}
+
+**Task:** Rate this answer using this rubric (1-5 scale):
+
+**5 (Excellent)**: Accurate Kenyan law + cites specific sections/cases + clear reasoning + no hallucinations
+**4 (Good)**: Accurate Kenyan law + correct reasoning, but lacks specific citations or slightly vague
+**3 (Acceptable)**: Generally correct but misses nuance OR refers to general common law instead of Kenyan statutes
+**2 (Poor)**: Vague OR applies non-Kenyan law (UK/US) to Kenyan context OR omits critical details
+**1 (Dangerous)**: Factually incorrect OR hallucinations (fake statutes/cases) OR harmful advice
+
+**CRITICAL:** Respond with ONLY a single number (1, 2, 3, 4, or 5). No explanations, no text."""
+
+ANSWER_RELEVANCE_PROMPT = """You are evaluating whether an answer addresses the user's question.
+
+**User Question:**
+{question}
+
+**Answer Provided:**
+{answer}
+
+**Task:** Rate how well this answer addresses the user's specific question.
+- 1.0 = Perfectly addresses the question
+- 0.75 = Mostly addresses the question
+- 0.5 = Partially addresses the question
+- 0.25 = Barely addresses the question
+- 0.0 = Completely irrelevant
+
+**CRITICAL:** Respond with ONLY a decimal number between 0.0 and 1.0. No explanations."""
+
+SPECIFICITY_PROMPT = """You are evaluating the specificity of a Kenyan legal answer.
+
+**Answer:**
+{answer}
+
+**Task:** Rate how specific this answer is in citing Kenyan law.
+- 1.0 = Cites specific sections AND case names with citations (e.g., "Section 40(3)" AND "Dina Management v AG [2017]")
+- 0.75 = Cites specific sections OR case names (but not both)
+- 0.5 = References Kenyan law generally without specific citations
+- 0.25 = Vague legal references
+- 0.0 = No specific legal references
+
+**CRITICAL:** Respond with ONLY a decimal number between 0.0 and 1.0. No explanations."""
+
+GROUNDEDNESS_PROXY_PROMPT = """You are evaluating whether a legal answer appears well-grounded.
+
+**Answer:**
+{answer}
+
+**Task:** Rate how well-grounded this answer appears (does it make specific, verifiable claims?)
+- 1.0 = Makes specific, verifiable legal claims with precise citations
+- 0.75 = Makes mostly specific claims
+- 0.5 = Mix of specific and vague claims
+- 0.25 = Mostly vague or general statements
+- 0.0 = Appears to contain unsupported or fabricated claims
+
+**CRITICAL:** Respond with ONLY a decimal number between 0.0 and 1.0. No explanations."""
+
+
+# suite -> [(metric, prompt template, score scale)]; responses go through judge_parsing
+JUDGE_SUITES = {
+    'rubric': [('rubric', RUBRIC_PROMPT, RUBRIC)],
+    'quality': [
+        ('answer_relevance', ANSWER_RELEVANCE_PROMPT, UNIT),
+        ('specificity', SPECIFICITY_PROMPT, UNIT),
+        ('groundedness', GROUNDEDNESS_PROXY_PROMPT, UNIT),
+    ],
+}
+
+PIPELINE_COLUMNS = {'SAC-RAG': 'SAC_RAG_Answer', 'Generic Claude': 'Generic_Claude_Answer'}
+
+
+# ============================================================
+# Job File
+# ============================================================
+def load_answers(path='manual_evaluation_template.csv'):
+    """One item per (pipeline, question) from the side-by-side evaluation template"""
+    import pandas as pd
+    df = pd.read_csv(path)
+    items = []
+    for _, row in df.iterrows():
+        for pipeline, column in PIPELINE_COLUMNS.items():
+            items.append({
+                'pipeline': pipeline,
+                'question_id': row['Question_ID'],
+                'question': row['Question'],
+                'ground_truth': row['Ground_Truth'],
+                'answer': row[column],
+            })
+    return items
+
+
+def record_id(pipeline, question_id, metric):
+    """Readable key for one verdict (judge parser and queue keys; never sent to Bedrock)"""
+    return f"{pipeline}::{question_id}::{metric}"
+
+
+def split_record_id(rid):
+    pipeline, question_id, metric = rid.split('::')
+    return pipeline, question_id, metric
+
+
+def batch_record_id(prefix, n):
+    """Bedrock-safe recordId: a one-letter prefix and ten digits"""
+    return f"{prefix}{n:010d}"
+
+
+def ids_path(job_file):
+    """Where the recordId -> [pipeline, question_id, metric] mapping for a job file lives"""
+    return Path(f"{job_file}.ids.json")
+
+
+def load_ids(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def model_input(prompt, max_tokens=16):
+    """Anthropic Messages body, as Bedrock batch expects it in modelInput"""
+    return {
+        'anthropic_version': ANTHROPIC_VERSION,
+        'max_tokens': max_tokens,
+        'messages': [{'role': 'user', 'content': [{'type': 'text', 'text': prompt}]}],
+    }
+
+
+def build_records(suite, items):
+    """(records, {recordId: [pipeline, question_id, metric]})"""
+    records, ids = [], {}
+    for item in items:
+        for metric, template, _ in JUDGE_SUITES[suite]:
+            rid = batch_record_id(JUDGE_PREFIX, len(records))
+            ids[rid] = [item['pipeline'], str(item['question_id']), metric]
+            records.append({'recordId': rid, 'modelInput': model_input(template.format(**item))})
+    return records, ids
+
+
+def padding_records(count):
+    """Cheapest records that satisfy the batch minimum: a 1-token reply each, ignored on ingest"""
+    return [{'recordId': batch_record_id(PAD_PREFIX, n), 'modelInput': model_input("Reply with 1.", max_tokens=1)}
+            for n in range(count)]
+
+
+def is_padding(rid):
+    return rid.startswith(PAD_PREFIX)
+
+
+def write_job_file(records, path, pad_to=0, ids=None):
+    """One JSON record per line, padded with filler records up to `pad_to`; `ids` goes to ids_path(path)"""
+    records = list(records) + padding_records(max(0, pad_to - len(records)))
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    if ids is not None:
+        ids_path(path).write_text(json.dumps(ids, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def prompt_text(model_input_body):
+    return ''.join(part['text'] for message in model_input_body['messages']
+                   for part in message['content'] if part.get('type') == 'text')
+
+
+# ============================================================
+# Batch Services
+# ============================================================
+class LocalBatchService:
+    """
+    File-based stand-in for the Bedrock batch API. Mirrors the boto3 'bedrock'
+    client calls used here; S3 URIs are plain directories. Output follows
+    Bedrock's layout: <output dir>/<job id>/<input name>.out + manifest.json.out.
+    """
+
+    def __init__(self, llm=None, root=LOCAL_JOB_ROOT):
+        if llm is None:
+            from stub_backends import StubLLM
+            llm = StubLLM(responder=_stub_judge, model_id='stub.claude-sonnet', time_scale=0.01)
+        self.llm = llm
+        self.root = Path(root)
+        self._jobs = {}
+
+    def create_model_invocation_job(self, jobName, modelId, inputDataConfig, outputDataConfig,
+                                    roleArn=None, **kwargs):
+        job_id = f"{jobName}-{uuid.uuid4().hex[:8]}"
+        input_path = Path(inputDataConfig['s3InputDataConfig']['s3Uri'])
+        output_dir = Path(outputDataConfig['s3OutputDataConfig']['s3Uri']) / job_id
+        output_dir.mkdir(parents=True, exist_ok=True)
+        job = {'jobArn': job_id, 'jobName': jobName, 'modelId': modelId, 'status': 'InProgress',
+               'outputDataConfig': outputDataConfig}
+        self._jobs[job_id] = job
+        threading.Thread(target=self._process, args=(job, input_path, output_dir), daemon=True).start()
+        return {'jobArn': job_id}
+
+    def get_model_invocation_job(self, jobIdentifier):
+        return dict(self._jobs[jobIdentifier])
+
+    def _process(self, job, input_path, output_dir):
+        try:
+            self._answer(input_path, output_dir)
+        except Exception as e:
+            # like Bedrock, a job whose input or output cannot be handled ends Failed, not stuck InProgress
+            job['message'] = f"{type(e).__name__}: {e}"
+            job['status'] = 'Failed'
+        else:
+            job['status'] = 'Completed'
+
+    def _answer(self, input_path, output_dir):
+        ok = failed = 0
+        with open(output_dir / (input_path.name + '.out'), 'w', encoding='utf-8') as out:
+            for record in read_jsonl(input_path):
+                result = {'recordId': record['recordId'], 'modelInput': record['modelInput']}
+                prompt = prompt_text(record['modelInput'])
+                try:
+                    response = self.llm.invoke(prompt)
+                except Exception as e:
+                    result['error'] = {'errorCode': type(e).__name__, 'errorMessage': str(e)}
+                    failed += 1
+                else:
+                    text = getattr(response, 'content', str(response))
+                    usage = getattr(response, 'usage_metadata', None) or {}
+                    result['modelOutput'] = {
+                        'type': 'message', 'role': 'assistant',
+                        'content': [{'type': 'text', 'text': text}],
+                        'usage': {'input_tokens': usage.get('input_tokens') or estimate_tokens(prompt),
+                                  'output_tokens': usage.get('output_tokens') or estimate_tokens(text)},
+                    }
+                    ok += 1
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+        (output_dir / 'manifest.json.out').write_text(json.dumps(
+            {'totalRecordCount': ok + failed, 'processedRecordCount': ok + failed,
+             'successRecordCount': ok, 'errorRecordCount': failed}))
+
+
+def _stub_judge(prompt):
+    """Deterministic stand-in judge: a rubric digit or a 0-1 score from the prompt hash"""
+    h = sum(prompt.encode('utf-8')) % 1000
+    return str(1 + h % 5) if '1-5 scale' in prompt else f"{(h % 5) / 4:.2f}"
+
+
+def bedrock_client(region='us-east-1'):
+    import boto3
+    return boto3.client('bedrock', region_name=region)
+
+
+def _upload(path, uri):
+    """Copy the job file to S3 (s3://...) or a local directory; returns the input URI"""
+    name = Path(path).name
+    if uri.startswith('s3://'):
+        import boto3
+        bucket, _, prefix = uri[5:].partition('/')
+        key = prefix.rstrip('/') + '/' + name if prefix else name
+        boto3.client('s3').upload_file(str(path), bucket, key)
+        return f"s3://{bucket}/{key}"
+    Path(uri).mkdir(parents=True, exist_ok=True)
+    target = Path(uri) / name
+    if Path(path).resolve() != target.resolve():
+        shutil.copy(path, target)
+    return str(target)
+
+
+def _download(uri, local_dir):
+    """Fetch an output file from S3 (or return the local path)"""
+    if not uri.startswith('s3://'):
+        return Path(uri)
+    import boto3
+    bucket, _, key = uri[5:].partition('/')
+    target = Path(local_dir) / Path(key).name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    boto3.client('s3').download_file(bucket, key, str(target))
+    return target
+
+
+def submit_job(client, job_file, input_uri, output_uri, model_id=JUDGE_MODEL_ID, role_arn=None,
+               job_name=None, min_records=0):
+    """Upload the job file and start one batch job; returns the job id/ARN"""
+    count = len(read_jsonl(job_file))
+    if count < min_records:
+        raise BatchJobError(f"{job_file} has {count} records; Bedrock batch jobs need at least {min_records} "
+                            f"(write it with prepare --pad-to {min_records}, or judge synchronously)")
+    job_name = job_name or datetime.now().strftime('judge-batch-%Y%m%d-%H%M%S')
+    with span('batch.submit', job_name=job_name, model_id=model_id):
+        s3_input = _upload(job_file, input_uri)
+        kwargs = {'roleArn': role_arn} if role_arn else {}
+        response = client.create_model_invocation_job(
+            jobName=job_name, modelId=model_id,
+            inputDataConfig={'s3InputDataConfig': {'s3Uri': s3_input}},
+            outputDataConfig={'s3OutputDataConfig': {'s3Uri': output_uri}},
+            **kwargs)
+    return response['jobArn']
+
+
+def wait_for_job(client, job_arn, poll_seconds=60, timeout=24 * 3600):
+    """
+    Poll until the job reaches a terminal state; returns the final job
+    description, or raises BatchJobError if it ended Failed/Stopped/Expired
+    """
+    deadline = time.monotonic() + timeout
+    with span('batch.wait', job=job_arn):
+        while True:
+            job = client.get_model_invocation_job(jobIdentifier=job_arn)
+            if job['status'] in FAILED_JOB_STATUSES:
+                raise BatchJobError(f"Batch job {job_arn} {job['status']}: {job.get('message') or 'no message'}")
+            if job['status'] in ('Completed', 'PartiallyCompleted'):
+                return job
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Batch job {job_arn} still {job['status']} after {timeout}s")
+            time.sleep(poll_seconds)
+
+
+def output_file_uri(job, job_file):
+    """Where Bedrock writes results: <output uri>/<job id>/<input file name>.out"""
+    output_uri = job['outputDataConfig']['s3OutputDataConfig']['s3Uri'].rstrip('/')
+    job_id = job['jobArn'].rsplit('/', 1)[-1]
+    return f"{output_uri}/{job_id}/{Path(job_file).name}.out"
+
+
+# ============================================================
+# Ingest
+# ============================================================
+def _output_text(result):
+    output = result.get('modelOutput')
+    return None if output is None else ''.join(part.get('text', '') for part in output.get('content', []))
+
+
+def ingest_results(output_path, suite, ids, run_id=None, model_id=JUDGE_MODEL_ID, db_path=None, judge_parser=None,
+                   backend='bedrock'):
+    """
+    Parse a .jsonl.out results file into judge_scores (one row per record) and
+    llm_calls (tokens/cost under kind='judge'); `ids` maps each recordId to its
+    [pipeline, question_id, metric] (load_ids). Errored or unparseable records
+    score FAILED_SCORE (NaN); unparseable ones stay queued on `judge_parser`
+    for reask_failures(). Returns the scores as a DataFrame. Usage from the
+    local stand-in is recorded with backend='stub'.
+    """
+    import pandas as pd
+    run_id = run_id or datetime.now().strftime(f'judge-batch-{suite}-%Y%m%d-%H%M%S')
+    scales = {metric: scale for metric, _, scale in JUDGE_SUITES[suite]}
+    own_parser = judge_parser is None
+    judge_parser = judge_parser or JudgeParser(run_id)
+    ledger = UsageLedger(run_id=run_id, db_path=db_path, flush_every=500, backend=backend)
+    rows = []
+    with span('batch.ingest', suite=suite, run_id=run_id):
+        for result in read_jsonl(output_path):
+            output = result.get('modelOutput')
+            if is_padding(result['recordId']):
+                usage = (output or {}).get('usage', {})
+                with call_context(stage='batch_padding'):
+                    ledger.record('judge', model_id, usage.get('input_tokens', 0), usage.get('output_tokens', 0),
+                                  status='ok' if output else 'error')
+                continue
+            pipeline, question_id, metric = ids[result['recordId']]
+            text = _output_text(result)
+            score = judge_parser.parse(text, scales[metric], metric, key=record_id(pipeline, question_id, metric))
+            with call_context(pipeline=pipeline, question_id=question_id, stage=metric):
+                if output is None:
+                    ledger.record('judge', model_id, status='error')
+                else:
+                    usage = output.get('usage', {})
+                    ledger.record('judge', model_id, usage.get('input_tokens', 0), usage.get('output_tokens', 0))
+            rows.append({'run_id': run_id, 'suite': suite, 'pipeline': pipeline, 'question_id': question_id,
+                         'metric': metric, 'score': score, 'raw_response': text, 'source': 'batch'})
+    ledger.flush()
+    if own_parser:
+        judge_parser.flush(db_path)
+    conn = results_store.connect(db_path)
+    try:
+        results_store.insert_rows(conn, 'judge_scores', rows)
+    finally:
+        conn.close()
+    return pd.DataFrame(rows)
+
+
+def reask_failures(judge_parser, client, input_uri, output_uri, run_id, job_root=LOCAL_JOB_ROOT,
+                   model_id=JUDGE_MODEL_ID, role_arn=None, poll_seconds=60, db_path=None, backend='bedrock',
+                   min_records=0):
+    """
+    Re-ask the unparseable verdicts queued on `judge_parser` as one small
+    follow-up batch job (one record per re-ask batch) and patch the repaired
+    scores in judge_scores. Returns {record id: score}.
+    """
+    batches = judge_parser.reask_batches()
+    if not batches:
+        return {}
+    job_file = Path(job_root) / f'judge_reask_{run_id}.jsonl'
+    job_file.parent.mkdir(parents=True, exist_ok=True)
+    write_job_file([{'recordId': batch_record_id(REASK_PREFIX, n), 'modelInput': model_input(prompt, max_tokens=256)}
+                    for n, (_, prompt) in enumerate(batches)], job_file, pad_to=min_records)
+    job_arn = submit_job(client, job_file, input_uri, output_uri, model_id, role_arn,
+                         job_name=datetime.now().strftime('judge-reask-%Y%m%d-%H%M%S'), min_records=min_records)
+    job = wait_for_job(client, job_arn, poll_seconds=poll_seconds)
+    output_file = _download(output_file_uri(job, job_file), job_root)
+
+    ledger = UsageLedger(run_id=run_id, db_path=db_path, backend=backend)
+    fixed = {}
+    for result in read_jsonl(output_file):
+        padding = is_padding(result['recordId'])
+        if not padding:
+            keys = batches[int(result['recordId'][len(REASK_PREFIX):])][0]
+            fixed.update(judge_parser.apply_reask(keys, _output_text(result)))
+        usage = (result.get('modelOutput') or {}).get('usage', {})
+        with call_context(stage='batch_padding' if padding else 'reask'):
+            ledger.record('judge', model_id, usage.get('input_tokens', 0), usage.get('output_tokens', 0),
+                          status='ok' if result.get('modelOutput') else 'error')
+    ledger.flush()
+    conn = results_store.connect(db_path)
+    try:
+        with conn:
+            conn.executemany("""UPDATE judge_scores SET score = ? WHERE run_id = ? AND pipeline = ?
+                                AND question_id = ? AND metric = ?""",
+                             [(score, run_id, *split_record_id(rid)) for rid, score in fixed.items()])
+    finally:
+        conn.close()
+    return fixed
+
+
+# ============================================================
+# CLI
+# ============================================================
+def _service(args):
+    if args.service == 'bedrock':
+        return bedrock_client(args.region), args.s3_input, args.s3_output
+    root = Path(args.job_root)
+    return LocalBatchService(root=root), str(root / 'input'), str(root / 'output')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline batch judge runs (Bedrock batch inference)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def service_args(p):
+        p.add_argument('--service', choices=['local', 'bedrock'], default='local')
+        p.add_argument('--model-id', default=JUDGE_MODEL_ID)
+        p.add_argument('--region', default='us-east-1')
+        p.add_argument('--s3-input', help="s3://bucket/prefix/ for the job file (bedrock)")
+        p.add_argument('--s3-output', help="s3://bucket/prefix/ for results (bedrock)")
+        p.add_argument('--role-arn', help="IAM service role Bedrock assumes to read/write S3")
+        p.add_argument('--job-root', default=LOCAL_JOB_ROOT, help="Directory used by the local stand-in")
+        p.add_argument('--poll', type=float, default=60.0, help="Seconds between status checks")
+        p.add_argument('--min-records', type=int, default=MIN_BATCH_RECORDS,
+                       help="Bedrock's minimum records per job: run pads up to it, submit refuses fewer (bedrock)")
+
+    p = sub.add_parser('prepare', help="Write the judge prompts as a batch job file")
+    p.add_argument('--suite', choices=sorted(JUDGE_SUITES), default='rubric')
+    p.add_argument('--answers', default='manual_evaluation_template.csv')
+    p.add_argument('-o', '--output', default='judge_batch.jsonl')
+    p.add_argument('--pad-to', type=int, default=0,
+                   help=f"Pad with 1-token filler records up to this many (Bedrock needs {MIN_BATCH_RECORDS})")
+
+    p = sub.add_parser('submit', help="Submit a job file and wait for it")
+    p.add_argument('job_file')
+    service_args(p)
+
+    p = sub.add_parser('ingest', help="Load a .jsonl.out results file into the results store")
+    p.add_argument('output_file')
+    p.add_argument('--ids', help="recordId mapping written by prepare (default: <job file>.ids.json in the "
+                                 "current directory, named after the results file)")
+    p.add_argument('--suite', choices=sorted(JUDGE_SUITES), default='rubric')
+    p.add_argument('--service', choices=['local', 'bedrock'], default='bedrock',
+                   help="Which service produced the file (local usage is recorded as backend 'stub')")
+    p.add_argument('--run-id')
+    p.add_argument('--model-id', default=JUDGE_MODEL_ID)
+
+    p = sub.add_parser('run', help="prepare + submit + ingest")
+    p.add_argument('--suite', choices=sorted(JUDGE_SUITES), default='rubric')
+    p.add_argument('--answers', default='manual_evaluation_template.csv')
+    p.add_argument('--run-id')
+    p.add_argument('--no-reask', action='store_true',
+                   help="Do not re-ask unparseable verdicts in a follow-up batch job")
+    service_args(p)
+    args = parser.parse_args(argv)
+
+    min_records = getattr(args, 'min_records', 0) if getattr(args, 'service', 'local') == 'bedrock' else 0
+    if args.command in ('prepare', 'run'):
+        records, ids = build_records(args.suite, load_answers(args.answers))
+        job_file = args.output if args.command == 'prepare' else str(
+            Path(getattr(args, 'job_root', LOCAL_JOB_ROOT)) / f'judge_batch_{args.suite}.jsonl')
+        Path(job_file).parent.mkdir(parents=True, exist_ok=True)
+        pad_to = args.pad_to if args.command == 'prepare' else min_records
+        write_job_file(records, job_file, pad_to, ids)
+        padding = max(0, pad_to - len(records))
+        print(f"📝 {len(records)} judge prompts written to {job_file}"
+              + (f" (+{padding} filler records for the batch minimum)" if padding else '')
+              + f"; recordId mapping in {ids_path(job_file)}")
+        if args.command == 'prepare':
+            return
+    else:
+        job_file = getattr(args, 'job_file', None)
+
+    if args.command in ('submit', 'run'):
+        client, input_uri, output_uri = _service(args)
+        poll = args.poll if args.service == 'bedrock' else 0.05
+        try:
+            job_arn = submit_job(client, job_file, input_uri, output_uri, args.model_id, args.role_arn,
+                                 min_records=min_records)
+            print(f"🚀 Submitted batch job {job_arn}")
+            job = wait_for_job(client, job_arn, poll_seconds=poll)
+        except BatchJobError as exc:
+            print(f"❌ {exc}")
+            return 1
+        print(f"   Status: {job['status']}")
+        output_file = _download(output_file_uri(job, job_file), args.job_root)
+        print(f"   Results: {output_file}")
+        if args.command == 'submit':
+            return
+    else:
+        output_file = args.output_file
+        ids_file = Path(args.ids) if args.ids else ids_path(Path(output_file).name.removesuffix('.out'))
+        if not ids_file.exists():
+            parser.error(f"no recordId mapping at {ids_file}; pass the one prepare wrote with --ids")
+        ids = load_ids(ids_file)
+
+    run_id = args.run_id or datetime.now().strftime(f'judge-batch-{args.suite}-%Y%m%d-%H%M%S')
+    judge_parser = JudgeParser(run_id)
+    backend = 'stub' if getattr(args, 'service', 'bedrock') == 'local' else 'bedrock'
+    scores = ingest_results(output_file, args.suite, ids, run_id, args.model_id, judge_parser=judge_parser,
+                            backend=backend)
+    print(f"\n✅ Ingested {len(scores)} scores into judge_scores (run_id={run_id})")
+    if judge_parser.pending and args.command == 'run' and not args.no_reask:
+        print(f"🔁 Re-asking {len(judge_parser.pending)} unparseable verdict(s) in a follow-up batch job")
+        try:
+            fixed = reask_failures(judge_parser, client, input_uri, output_uri, run_id, args.job_root,
+                                   args.model_id, args.role_arn, poll, backend=backend, min_records=min_records)
+        except BatchJobError as exc:
+            print(f"❌ Re-ask job: {exc}; the unparseable verdicts stay NaN")
+            fixed = {}
+        print(f"   Repaired {len(fixed)}")
+        for rid, score in fixed.items():
+            pipeline, question_id, metric = split_record_id(rid)
+            scores.loc[(scores['pipeline'] == pipeline) & (scores['question_id'] == question_id)
+                       & (scores['metric'] == metric), 'score'] = score
+    failed = int(scores['score'].isna().sum())
+    if failed:
+        print(f"⚠️ {failed} record(s) failed and are stored as NaN")
+    print("🧩 Parse outcomes:")
+    judge_parser.print_summary()
+    judge_parser.flush()
+    print(scores.groupby(['pipeline', 'metric'])['score'].mean().unstack().round(3).to_string())
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
@@ -0,0 +1,244 @@
+"""
+Blind Evaluation Generator
+Builds blind scoring sheets for any number of systems, questions and raters.
+
+- Answer order is drawn from a seeded numpy Generator, so the same seed and
+  inputs always reproduce the same sheets and answer key.
+- Positions are balanced per rater: questions are taken in blocks of
+  k (= number of systems), and within a block each system appears in each
+  position exactly once (cyclic shifts of a random base order).
+- Questions can be spread over several raters with a chosen overlap (every
+  question scored by `overlap` raters), one scoring sheet per rater.
+- Sheets and the answer key are streamed to CSV in chunks; xlsx output is
+  kept for small single-rater runs.
+
+Usage:
+    python blind_evaluation.py --input manual_evaluation_template.csv
+    python blind_evaluation.py --input answers.csv --systems A=Answer_A B=Answer_B C=Answer_C \\
+        --raters 6 --overlap 2 --seed 7 --output-dir blind_campaign
+"""
+
+import argparse
+import csv
+import json
+import string
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_SYSTEMS = {'SAC-RAG_Claude4.5': 'SAC_RAG_Answer', 'Generic_Claude': 'Generic_Claude_Answer'}
+SCORING_SHEET = 'blind_evaluation_scoring_sheet'
+ANSWER_KEY = 'blind_evaluation_answer_key'
+CHUNK_ROWS = 1000
+
+
+def position_labels(k):
+    if k > len(string.ascii_uppercase):
+        raise ValueError(f"At most {len(string.ascii_uppercase)} systems per sheet (got {k})")
+    return list(string.ascii_uppercase[:k])
+
+
+# ============================================================
+# Assignment (vectorized)
+# ============================================================
+def assign_raters(n_questions, raters=1, overlap=1):
+    """(n_questions, overlap) array of rater indices; loads differ by at most one question"""
+    if not 1 <= overlap <= raters:
+        raise ValueError(f"overlap must be between 1 and raters ({raters}), got {overlap}")
+    stride = raters // overlap
+    return (np.arange(n_questions)[:, None] + stride * np.arange(overlap)[None, :]) % raters
+
+
+def balanced_orders(n_rows, k, rng):
+    """
+    (n_rows, k) array: row i lists system indices in position order.
+    Within each block of k rows every system takes every position once.
+    """
+    n_blocks = -(-n_rows // k)
+    base = rng.permuted(np.tile(np.arange(k), (n_blocks, 1)), axis=1)       # random order per block
+    shifts = rng.permuted(np.tile(np.arange(k), (n_blocks, 1)), axis=1)     # each shift once per block
+    idx = (np.arange(k)[None, None, :] + shifts[:, :, None]) % k            # (blocks, k rows, k positions)
+    orders = np.take_along_axis(base[:, None, :].repeat(k, axis=1), idx, axis=2)
+    return orders.reshape(n_blocks * k, k)[:n_rows]
+
+
+def build_assignments(n_questions, k, raters=1, overlap=1, seed=42):
+    """{rater: (question indices, (len, k) position orders)}, shuffled question order per rater"""
+    rng = np.random.default_rng(seed)
+    rater_ids = assign_raters(n_questions, raters, overlap)
+    assignments = {}
+    for rater in range(raters):
+        questions = np.flatnonzero((rater_ids == rater).any(axis=1))
+        questions = rng.permutation(questions)
+        assignments[rater] = (questions, balanced_orders(len(questions), k, rng))
+    return assignments
+
+
+# ============================================================
+# Output
+# ============================================================
+def _sheet_name(prefix, rater, raters, ext):
+    return f"{prefix}.{ext}" if raters == 1 else f"{prefix}_rater{rater + 1}.{ext}"
+
+
+def _write_chunks(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= CHUNK_ROWS:
+                writer.writerows(chunk)
+                chunk.clear()
+        writer.writerows(chunk)
+
+
+def generate(df, systems=None, raters=1, overlap=1, seed=42, output_dir='.', fmt='csv'):
+    """
+    Write one scoring sheet per rater plus a single answer key.
+    `df` needs Question_ID, Question, Ground_Truth and one answer column per
+    system ({system name: column}). Returns the list of files written.
+    """
+    systems = systems or DEFAULT_SYSTEMS
+    names = list(systems)
+    labels = position_labels(len(names))
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    question_ids = df['Question_ID'].astype(str).to_numpy()
+    questions = df['Question'].to_numpy()
+    ground_truth = df['Ground_Truth'].fillna('').to_numpy() if 'Ground_Truth' in df else np.full(len(df), '')
+    answers = df[[systems[name] for name in names]].fillna('').to_numpy()     # (n, k)
+    system_names = np.array(names)
+
+    sheet_header = (['Question_ID', 'Question', 'Ground_Truth'] + [f'Answer_{p}' for p in labels]
+                    + [f'Score_{p}' for p in labels] + ['Winner', 'Notes'])
+    key_header = ['Rater', 'Question_ID'] + [f'Answer_{p}_System' for p in labels]
+    blanks = [''] * (len(labels) + 2)
+
+    assignments = build_assignments(len(df), len(names), raters, overlap, seed)
+    written, key_rows = [], []
+    for rater, (q_idx, orders) in assignments.items():
+        shown = np.take_along_axis(answers[q_idx], orders, axis=1)
+        shown_systems = system_names[orders]
+        rows = ([question_ids[q], questions[q], ground_truth[q], *shown[i], *blanks]
+                for i, q in enumerate(q_idx))
+        key_rows.append(np.column_stack([np.full(len(q_idx), rater + 1), question_ids[q_idx], shown_systems]))
+        path = output_dir / _sheet_name(SCORING_SHEET, rater, raters, fmt)
+        if fmt == 'xlsx':
+            import pandas as pd
+            pd.DataFrame(list(rows), columns=sheet_header).to_excel(path, index=False)
+        else:
+            _write_chunks(path, sheet_header, rows)
+        written.append(path)
+
+    key_path = output_dir / f"{ANSWER_KEY}.{fmt}"
+    key = np.concatenate(key_rows) if key_rows else np.empty((0, len(key_header)))
+    if fmt == 'xlsx':
+        import pandas as pd
+        pd.DataFrame(key, columns=key_header).to_excel(key_path, index=False)
+    else:
+        _write_chunks(key_path, key_header, key.tolist())
+    written.append(key_path)
+
+    manifest = {'seed': seed, 'systems': systems, 'raters': raters, 'overlap': overlap,
+                'questions': len(df), 'format': fmt, 'files': [p.name for p in written]}
+    (output_dir / 'blind_evaluation_manifest.json').write_text(json.dumps(manifest, indent=2))
+    return written
+
+
+# ============================================================
+# Unblinding
+# ============================================================
+def melt_key(key, labels):
+    """Answer key -> long (Rater, Question_ID, position, system)"""
+    long = key.melt(id_vars=['Rater', 'Question_ID'], value_vars=[f'Answer_{p}_System' for p in labels],
+                    var_name='position', value_name='system')
+    long['position'] = long['position'].str[len('Answer_'):-len('_System')]
+    return long
+
+
+def unblind(sheet, long_key, rater):
+    """
+    Vectorized un-blinding of one rater's filled-in sheet: melt the Score_*
+    columns and join them to that rater's key rows. Returns long
+    (rater, Question_ID, position, system, score), NaN for blank scores.
+    """
+    import pandas as pd
+    score_columns = [c for c in sheet.columns if c.startswith('Score_')]
+    scores = sheet.melt(id_vars=['Question_ID'], value_vars=score_columns, var_name='position', value_name='score')
+    scores['position'] = scores['position'].str[len('Score_'):]
+    scores['score'] = pd.to_numeric(scores['score'], errors='coerce')
+    scores['Question_ID'] = scores['Question_ID'].astype(str)
+    rater_key = long_key[long_key['Rater'] == rater][['Question_ID', 'position', 'system']]
+    merged = scores.merge(rater_key, on=['Question_ID', 'position'], how='inner')
+    merged.insert(0, 'rater', rater)
+    return merged[['rater', 'Question_ID', 'position', 'system', 'score']]
+
+
+def read_table(path, **kwargs):
+    import pandas as pd
+    path = str(path)
+    return pd.read_excel(path, **kwargs) if path.endswith('.xlsx') else pd.read_csv(path, **kwargs)
+
+
+def load_campaign(output_dir='.'):
+    """(manifest, long answer key, {rater: sheet path}) for a generated campaign"""
+    output_dir = Path(output_dir)
+    manifest = json.loads((output_dir / 'blind_evaluation_manifest.json').read_text())
+    fmt, raters = manifest['format'], manifest['raters']
+    key = read_table(output_dir / f"{ANSWER_KEY}.{fmt}", dtype={'Question_ID': str})
+    long_key = melt_key(key, position_labels(len(manifest['systems'])))
+    sheets = {rater + 1: output_dir / _sheet_name(SCORING_SHEET, rater, raters, fmt) for rater in range(raters)}
+    return manifest, long_key, sheets
+
+
+def load_scores(output_dir='.'):
+    """
+    Join filled-in scoring sheets with the answer key. Returns a long
+    DataFrame: rater, Question_ID, position, system, score (NaN if blank).
+    """
+    import pandas as pd
+    _, long_key, sheets = load_campaign(output_dir)
+    return pd.concat([unblind(read_table(path, dtype={'Question_ID': str}), long_key, rater)
+                      for rater, path in sheets.items()], ignore_index=True)
+
+
+# ============================================================
+# CLI
+# ============================================================
+def _parse_systems(pairs):
+    systems = {}
+    for pair in pairs:
+        name, _, column = pair.partition('=')
+        systems[name] = column or name
+    return systems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate blind scoring sheets for N systems and R raters")
+    parser.add_argument('--input', default='manual_evaluation_template.csv',
+                        help="CSV or xlsx with Question_ID, Question, Ground_Truth and one answer column per system")
+    parser.add_argument('--systems', nargs='+', metavar='NAME=COLUMN',
+                        help="Systems to compare (default: SAC-RAG_Claude4.5 and Generic_Claude)")
+    parser.add_argument('--raters', type=int, default=1)
+    parser.add_argument('--overlap', type=int, default=1, help="Raters per question")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+    args = parser.parse_args(argv)
+
+    df = read_table(args.input)
+    systems = _parse_systems(args.systems) if args.systems else DEFAULT_SYSTEMS
+    print(f"Creating blind evaluation: {len(df)} questions x {len(systems)} systems, "
+          f"{args.raters} rater(s), overlap {args.overlap}, seed {args.seed}\n")
+    written = generate(df, systems, args.raters, args.overlap, args.seed, args.output_dir, args.format)
+    print("✅ Created:")
+    for path in written:
+        print(f"   - {path}")
+    print("\nReady for blind evaluation!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,573 @@
+"""
+Chart Pipeline: Data-Driven, Parallel Thesis Visualizations
+Every score on the thesis charts is read from the results store
+(rag_results.db, judge_scores table) instead of being typed into the plotting
+code. The per-question result CSVs in the repo are synced into the store
+first, so the charts always reflect the latest evaluation run.
+
+Figures render in a process pool. Each figure's inputs (plus its renderer's
+source) are hashed into thesis_visualizations/chart_manifest.json, and only
+figures whose hash changed are re-rendered.
+
+Usage:
+    python chart_pipeline.py                         # render what changed
+    python chart_pipeline.py --force                 # render everything
+    python chart_pipeline.py --only 07_cost_benefit
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import results_store
+
+OUTPUT_DIR = Path('thesis_visualizations')
+MANIFEST = 'chart_manifest.json'
+DPI = 300
+
+MODELS = {'claude35': 'Claude 3.5', 'claude45': 'Claude 4.5'}
+
+# ============================================================
+# Score Sources (per-question CSVs -> judge_scores)
+# ============================================================
+# run_id -> (csv path, {pipeline: {metric: column}})
+JUDGE_METRICS = {'accuracy': 'accuracy', 'completeness': 'completeness',
+                 'clarity': 'clarity', 'average': 'average'}
+SCORE_SOURCES = {
+    'llm-judge-claude35': [
+        ('results_claude_3.5/base_rag_golden_detailed_CLAUDE35.csv', 'Base RAG', JUDGE_METRICS),
+        ('results_claude_3.5/sac_rag_golden_detailed_CLAUDE35.csv', 'SAC-RAG', JUDGE_METRICS),
+    ],
+    'llm-judge-claude45': [
+        ('base_rag_golden_detailed.csv', 'Base RAG', JUDGE_METRICS),
+        ('sac_rag_golden_detailed.csv', 'SAC-RAG', JUDGE_METRICS),
+    ],
+    'rubric-judge-claude35': [
+        ('results_claude_3.5/automated_llm_judge_detailed_CLAUDE35.csv', 'SAC-RAG', {'rubric': 'SAC_RAG_Score'}),
+        ('results_claude_3.5/automated_llm_judge_detailed_CLAUDE35.csv', 'Generic Claude',
+         {'rubric': 'Generic_Claude_Score'}),
+    ],
+    'rubric-judge-claude45': [
+        ('automated_llm_judge_detailed_claude45.csv', 'SAC-RAG', {'rubric': 'SAC_RAG_Score'}),
+        ('automated_llm_judge_detailed_claude45.csv', 'Generic Claude', {'rubric': 'Generic_Claude_Score'}),
+    ],
+}
+
+# Manual blind-evaluation averages (/5). The per-question scoring sheets are
+# not in the repo; rows under run_id 'manual-blind-<model>' override these.
+MANUAL_DEFAULTS = {
+    'claude35': {'SAC-RAG': 3.60, 'Generic Claude': 4.90},
+    'claude45': {'SAC-RAG': 4.70, 'Generic Claude': 4.80},
+}
+
+# Pre-measurement cost estimates (USD) and README latencies (s)
+COST_DEFAULTS = {
+    'Generic Claude': {'setup_cost': 0.0, 'per_query_cost': 0.0},
+    'Base RAG': {'setup_cost': 5.0, 'per_query_cost': 0.012},
+    'SAC-RAG': {'setup_cost': 5.0, 'per_query_cost': 0.012},
+}
+LATENCY_DEFAULTS = {'Generic Claude': 3.0, 'Base RAG': 5.0, 'SAC-RAG': 5.0}
+
+# Measured cost/latency come only from Bedrock runs named '<prefix>-*' (the
+# default run id of `eval_queue.py publish generate`), like the score prefixes
+USAGE_RUN_PREFIX = 'generate-queue'
+
+
+def sync_scores(db_path=None):
+    """Replace the CSV-sourced runs in judge_scores with the current CSV contents"""
+    import pandas as pd
+    conn = results_store.connect(db_path)
+    try:
+        for run_id, sources in SCORE_SOURCES.items():
+            rows = []
+            for path, pipeline, columns in sources:
+                if not os.path.exists(path):
+                    continue
+                df = pd.read_csv(path)
+                for i, row in df.iterrows():
+                    question_id = row['Question_ID'] if 'Question_ID' in df else f'Q{i + 1}'
+                    for metric, column in columns.items():
+                        rows.append({'run_id': run_id, 'suite': 'csv', 'pipeline': pipeline,
+                                     'question_id': question_id, 'metric': metric,
+                                     'score': float(row[column]), 'source': 'csv'})
+            if rows:
+                with conn:
+                    conn.execute("DELETE FROM judge_scores WHERE run_id = ? AND source = 'csv'", (run_id,))
+                results_store.insert_rows(conn, 'judge_scores', rows)
+    finally:
+        conn.close()
+
+
+def _mean_scores(db_path, run_prefix):
+    """{model key: {pipeline: {metric: mean}}} for runs named '<prefix>-<model>'"""
+    df = results_store.query("""
+        SELECT run_id, pipeline, metric, AVG(score) AS score
+        FROM judge_scores
+        WHERE run_id LIKE ? AND score IS NOT NULL
+        GROUP BY run_id, pipeline, metric""", (f'{run_prefix}-%',), db_path)
+    scores = {}
+    for row in df.itertuples():
+        model = row.run_id[len(run_prefix) + 1:]
+        scores.setdefault(model, {}).setdefault(row.pipeline, {})[row.metric] = row.score
+    return scores
+
+
+def load_chart_data(db_path=None):
+    """Everything the figures plot, read from the results store (with documented fallbacks)"""
+    from cost_accounting import measured_cost_benefit, measured_latency
+    from rag_benchmark import load_benchmark_summary, pipeline_latency
+
+    llm_judge = _mean_scores(db_path, 'llm-judge')
+    rubric = _mean_scores(db_path, 'rubric-judge')
+    manual = {model: dict(scores) for model, scores in MANUAL_DEFAULTS.items()}
+    for model, by_pipeline in _mean_scores(db_path, 'manual-blind').items():
+        for pipeline, metrics in by_pipeline.items():
+            manual.setdefault(model, {})[pipeline] = metrics.get('rubric', metrics.get('average'))
+
+    costs = {p: dict(c) for p, c in COST_DEFAULTS.items()}
+    for pipeline, measured in (measured_cost_benefit(db_path=db_path, run_prefix=USAGE_RUN_PREFIX) or {}).items():
+        if pipeline in costs:
+            costs[pipeline].update({k: measured[k] for k in ('setup_cost', 'per_query_cost')
+                                    if measured[k] is not None})
+
+    # latency: Bedrock generation p50 > stub latency model (unscaled benchmark) > README estimate
+    latency = dict(LATENCY_DEFAULTS)
+    latency_source = {pipeline: 'estimate' for pipeline in latency}
+    benchmark = load_benchmark_summary()
+    measured_p50 = measured_latency(run_prefix=USAGE_RUN_PREFIX, db_path=db_path) or {}
+    for pipeline in latency:
+        if pipeline in measured_p50:
+            latency[pipeline], latency_source[pipeline] = round(measured_p50[pipeline], 3), 'measured'
+        elif benchmark:
+            modelled = pipeline_latency(benchmark, pipeline)
+            if modelled is not None:
+                latency[pipeline], latency_source[pipeline] = round(modelled, 3), 'stub model'
+
+    return {
+        'llm_judge': llm_judge,
+        'rubric_judge': {m: {p: s['rubric'] for p, s in v.items()} for m, v in rubric.items()},
+        'manual': manual,
+        'costs': costs,
+        'latency_p50': latency,
+        'latency_source': latency_source,
+    }
+
+
+def pct_change(new, old):
+    return (new - old) / old * 100
+
+
+def three_way_scores(data):
+    """Normalized /10 scores: Base RAG (LLM judge), SAC-RAG and Generic (manual x2)"""
+    return [data['llm_judge']['claude45']['Base RAG']['average'],
+            data['manual']['claude45']['SAC-RAG'] * 2,
+            data['manual']['claude45']['Generic Claude'] * 2]
+
+
+# ============================================================
+# Figures
+# ============================================================
+def _bar_labels(ax, bars, fmt='{:.2f}', **kwargs):
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height, fmt.format(height),
+                ha='center', va='bottom', fontweight='bold', **kwargs)
+
+
+def fig_base_vs_sac(data, path):
+    import matplotlib.pyplot as plt
+    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+    for ax, model, baseline in zip(axes, ('claude35', 'claude45'), (8.5, 8.0)):
+        scores = [data['llm_judge'][model][p]['average'] for p in ('Base RAG', 'SAC-RAG')]
+        sac_wins = scores[1] > scores[0]
+        colors = ['#3498db', '#2ecc71'] if sac_wins else ['#2ecc71', '#e74c3c']
+        bars = ax.bar(['Base RAG', 'SAC-RAG'], scores, color=colors, alpha=0.7, edgecolor='black', linewidth=1.5)
+        winner = 'SAC-RAG' if sac_wins else 'Base RAG'
+        ax.set_ylabel('Average Score (/10)', fontweight='bold')
+        ax.set_title(f'{MODELS[model]} Sonnet: {winner} Wins (+{abs(pct_change(scores[1], scores[0])):.2f}%)',
+                     fontweight='bold', fontsize=13)
+        ax.set_ylim(0, 10)
+        ax.axhline(y=baseline, color='gray', linestyle='--', alpha=0.3, label='Baseline')
+        ax.grid(axis='y', alpha=0.3)
+        _bar_labels(ax, bars, fontsize=11)
+    plt.suptitle('Model-Dependent Performance: Base RAG vs SAC-RAG', fontsize=16, fontweight='bold', y=1.02)
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+def fig_ablation(data, path):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sac_scores = [data['manual'][m]['SAC-RAG'] for m in ('claude35', 'claude45')]
+    generic_scores = [data['manual'][m]['Generic Claude'] for m in ('claude35', 'claude45')]
+    x = np.arange(2)
+    width = 0.35
+    bars1 = ax.bar(x - width/2, sac_scores, width, label='SAC-RAG',
+                   color='#3498db', alpha=0.8, edgecolor='black', linewidth=1.5)
+    bars2 = ax.bar(x + width/2, generic_scores, width, label='Generic Claude',
+                   color='#e67e22', alpha=0.8, edgecolor='black', linewidth=1.5)
+    ax.set_ylabel('Average Score (/5)', fontweight='bold')
+    ax.set_title('Ablation Study: Model Upgrade Impact on SAC-RAG\n(Manual Blind Evaluation)',
+                 fontweight='bold', fontsize=14)
+    ax.set_xticks(x)
+    ax.set_xticklabels(['Claude 3.5\nSonnet', 'Claude 4.5\nSonnet'])
+    ax.set_ylim(0, 5.5)
+    ax.legend(frameon=True, shadow=True)
+    ax.grid(axis='y', alpha=0.3)
+    _bar_labels(ax, bars1)
+    _bar_labels(ax, bars2)
+    # Arrow connects the SAC-RAG bars (3.5 -> 4.5)
+    ax.annotate('', xy=(1 - width/2, sac_scores[1]), xytext=(0 - width/2, sac_scores[0]),
+                arrowprops=dict(arrowstyle='->', color='green', lw=2.5))
+    ax.text(0.5, (sac_scores[0] + sac_scores[1]) / 2 + 0.15,
+            f'{pct_change(sac_scores[1], sac_scores[0]):+.1f}%\nModel Upgrade', fontsize=11,
+            color='green', fontweight='bold', ha='center',
+            bbox=dict(boxstyle='round,pad=0.5', facecolor='white', edgecolor='green', alpha=0.8))
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+def fig_metric_breakdown(data, path):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    fig, ax = plt.subplots(figsize=(12, 7))
+    metrics = ['accuracy', 'completeness', 'clarity']
+    base = [data['llm_judge']['claude45']['Base RAG'][m] for m in metrics]
+    sac = [data['llm_judge']['claude45']['SAC-RAG'][m] for m in metrics]
+    x = np.arange(len(metrics))
+    width = 0.35
+    bars1 = ax.bar(x - width/2, base, width, label='Base RAG (Winner)',
+                   color='#2ecc71', alpha=0.8, edgecolor='black', linewidth=1.5)
+    bars2 = ax.bar(x + width/2, sac, width, label='SAC-RAG',
+                   color='#e74c3c', alpha=0.8, edgecolor='black', linewidth=1.5)
+    ax.set_ylabel('Score (/10)', fontweight='bold')
+    ax.set_title('Metric Breakdown: Base RAG vs SAC-RAG (Claude 4.5)\nLLM-as-a-Judge Evaluation',
+                 fontweight='bold', fontsize=14)
+    ax.set_xticks(x)
+    ax.set_xticklabels([m.title() for m in metrics])
+    ax.set_ylim(0, 10.5)
+    ax.legend(frameon=True, shadow=True)
+    ax.grid(axis='y', alpha=0.3)
+    _bar_labels(ax, bars1, '{:.1f}')
+    _bar_labels(ax, bars2, '{:.1f}')
+    for i, (b, s) in enumerate(zip(base, sac)):
+        ax.text(i, 10, f'{pct_change(s, b):+.2f}%', ha='center', fontsize=10, color='red', fontweight='bold')
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+def fig_three_way(data, path):
+    """All four LLM-judge configurations with per-metric bars"""
+    import matplotlib.pyplot as plt
+    import numpy as np
+    configs = [('claude35', 'SAC-RAG'), ('claude35', 'Base RAG'), ('claude45', 'SAC-RAG'), ('claude45', 'Base RAG')]
+    systems = [f'{p}\n{MODELS[m]}' for m, p in configs]
+    series = [('accuracy', 'Accuracy', '#3498db'), ('completeness', 'Completeness', '#e74c3c'),
+              ('clarity', 'Clarity', '#2ecc71'), ('average', 'Overall Average', '#f39c12')]
+    fig, ax = plt.subplots(figsize=(14, 8))
+    x = np.arange(len(systems))
+    width = 0.18
+    for offset, (metric, label, color) in zip((-1.5, -0.5, 0.5, 1.5), series):
+        values = [data['llm_judge'][m][p][metric] for m, p in configs]
+        overall = metric == 'average'
+        bars = ax.bar(x + offset*width, values, width, label=label, color=color, alpha=0.9,
+                      **({'edgecolor': 'black', 'linewidth': 2} if overall else {}))
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                    f'{height:.2f}' if overall else f'{height:.1f}',
+                    ha='center', va='bottom', fontsize=9 if overall else 8, fontweight='bold')
+    ax.set_xlabel('System Configuration', fontsize=13, fontweight='bold', labelpad=10)
+    ax.set_ylabel('Score (out of 10)', fontsize=13, fontweight='bold')
+    ax.set_title('SAC-RAG vs Base RAG Performance: Claude 3.5 Sonnet vs Claude 4.5 Sonnet\n'
+                 '(LLM-as-Judge Evaluation on Golden Question Set)', fontsize=14, fontweight='bold', pad=20)
+    ax.set_xticks(x)
+    ax.set_xticklabels(systems, fontsize=11, fontweight='bold')
+    ax.set_ylim(0, 11.5)
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+    ax.axvline(x=1.5, color='gray', linestyle='--', linewidth=2, alpha=0.6)
+    ax.text(0.5, 11.0, 'Claude 3.5 Sonnet', ha='center', fontsize=12, fontweight='bold',
+            bbox=dict(boxstyle='round,pad=0.6', facecolor='#E3F2FD', alpha=0.9, edgecolor='blue', linewidth=1.5))
+    ax.text(2.5, 11.0, 'Claude 4.5 Sonnet', ha='center', fontsize=12, fontweight='bold',
+            bbox=dict(boxstyle='round,pad=0.6', facecolor='#FFEBEE', alpha=0.9, edgecolor='red', linewidth=1.5))
+    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.08), fontsize=10, framealpha=0.95, ncol=4,
+              fancybox=True, shadow=True)
+    for center, model in ((0.5, 'claude35'), (2.5, 'claude45')):
+        base = data['llm_judge'][model]['Base RAG']['average']
+        sac = data['llm_judge'][model]['SAC-RAG']['average']
+        winner, color = ('SAC-RAG', 'lightgreen') if sac > base else ('Base RAG', 'lightcoral')
+        ax.text(center, 0.8, f'Winner: {winner} (+{abs(pct_change(sac, base)):.2f}%)', ha='center', fontsize=9,
+                fontweight='bold', bbox=dict(boxstyle='round,pad=0.4', facecolor=color, alpha=0.8))
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+def fig_impact(data, path):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    model_upgrade = pct_change(data['manual']['claude45']['SAC-RAG'], data['manual']['claude35']['SAC-RAG'])
+    retrieval = pct_change(data['llm_judge']['claude35']['SAC-RAG']['average'],
+                           data['llm_judge']['claude35']['Base RAG']['average'])
+    ratio = model_upgrade / retrieval if retrieval else float('inf')
+    factors = ['Model Upgrade\n(Claude 3.5→4.5)', 'Retrieval\nOptimization\n(SAC-RAG vs Base)']
+    bars = ax.bar(factors, [model_upgrade, retrieval], color=['#2ecc71', '#3498db'], alpha=0.8,
+                  edgecolor='black', linewidth=2)
+    ax.set_ylabel('Performance Improvement (%)', fontweight='bold')
+    ax.set_title(f'Impact Comparison: Model Quality vs Retrieval Optimization\n{ratio:.0f}x Difference',
+                 fontweight='bold', fontsize=14)
+    ax.set_ylim(0, max(35, model_upgrade * 1.15))
+    ax.grid(axis='y', alpha=0.3)
+    _bar_labels(ax, bars, '{:.2f}%', fontsize=13)
+    ax.annotate(f'{ratio:.0f}x larger\nimpact', xy=(0.5, model_upgrade / 2 + 0.7), xytext=(1.3, model_upgrade * 0.65),
+                arrowprops=dict(arrowstyle='->', color='red', lw=2),
+                fontsize=12, color='red', fontweight='bold',
+                bbox=dict(boxstyle='round,pad=0.5', facecolor='yellow', alpha=0.3))
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+def fig_inter_rater(data, path):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    configs = [(m, p) for m in ('claude35', 'claude45') for p in ('SAC-RAG', 'Generic Claude')]
+    manual = [data['manual'][m][p] for m, p in configs]
+    automated = [data['rubric_judge'][m][p] for m, p in configs]
+    variance = np.mean([abs(pct_change(a, h)) for h, a in zip(manual, automated)])
+    fig, ax = plt.subplots(figsize=(12, 6))
+    x = np.arange(len(configs))
+    width = 0.35
+    bars1 = ax.bar(x - width/2, manual, width, label='Manual (Human)',
+                   color='#e74c3c', alpha=0.8, edgecolor='black', linewidth=1.5)
+    bars2 = ax.bar(x + width/2, automated, width, label='Automated (LLM-as-a-Judge)',
+                   color='#3498db', alpha=0.8, edgecolor='black', linewidth=1.5)
+    ax.set_ylabel('Average Score (/5)', fontweight='bold')
+    ax.set_title(f'Inter-Rater Reliability: Manual vs Automated Evaluation\n±{variance:.0f}% average variance',
+                 fontweight='bold', fontsize=14)
+    ax.set_xticks(x)
+    ax.set_xticklabels([f'{p}\n({MODELS[m]})' for m, p in configs])
+    ax.set_ylim(0, 5.5)
+    ax.legend(frameon=True, shadow=True)
+    ax.grid(axis='y', alpha=0.3)
+    _bar_labels(ax, bars1, fontsize=10)
+    _bar_labels(ax, bars2, fontsize=10)
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+def fig_cost_benefit(data, path):
+    """Performance vs total cost for 100 queries, with measured latency when available"""
+    import matplotlib.pyplot as plt
+    order = ['Generic Claude', 'SAC-RAG', 'Base RAG']
+    systems = ['Generic\nClaude 4.5', 'SAC-RAG\nClaude 4.5', 'Base RAG\nClaude 4.5']
+    base, sac, generic = three_way_scores(data)
+    performance = [generic, sac, base]
+    total_cost_100 = [data['costs'][p]['setup_cost'] + data['costs'][p]['per_query_cost'] * 100 for p in order]
+    latency = [data['latency_p50'][p] for p in order]
+    latency_source = [data['latency_source'][p] for p in order]
+    colors = ['#e67e22', '#9b59b6', '#3498db']
+    fig, ax = plt.subplots(figsize=(12, 8))
+    ax.scatter(total_cost_100, performance, s=[300, 400, 400], alpha=0.7, c=colors, edgecolors='black', linewidth=2.5)
+    for i, system in enumerate(systems):
+        ax.annotate(system, (total_cost_100[i], performance[i]),
+                    xytext=(0.3 if i == 0 else 0.5, -0.15 if i == 2 else 0.15), textcoords='offset points',
+                    fontweight='bold', fontsize=12,
+                    bbox=dict(boxstyle='round,pad=0.6', facecolor=colors[i], alpha=0.3, edgecolor='black', linewidth=1.5))
+        ax.text(total_cost_100[i], performance[i] - 0.05,
+                f'{performance[i]:.2f}/10\n${total_cost_100[i]:.2f}\n~{latency[i]:.1f}s p50 ({latency_source[i]})',
+                ha='center', va='top', fontsize=9, fontweight='bold')
+    ax.set_xlabel('Total Cost for 100 Queries (USD)', fontsize=13, fontweight='bold')
+    ax.set_ylabel('Performance Score (/10)', fontsize=13, fontweight='bold')
+    ax.set_title('Cost-Benefit Analysis: Performance vs Total Cost (100 Queries)\nLLM-as-Judge Evaluation',
+                 fontsize=14, fontweight='bold', pad=20)
+    ax.set_xlim(-0.5, max(7.5, max(total_cost_100) * 1.2))
+    ax.set_ylim(min(8.2, min(performance) - 0.4), max(9.9, max(performance) + 0.3))
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.axhline(y=9.0, color='green', linestyle='--', alpha=0.4, linewidth=1.5, label='High Performance (9.0+)')
+    ax.axvline(x=2.0, color='orange', linestyle='--', alpha=0.4, linewidth=1.5, label='Low Cost (<$2)')
+    insight_text = ('Best Value: SAC-RAG\n'
+                    f'• {performance[1] / performance[0]:.0%} of Generic Claude performance\n'
+                    f'• Only ${total_cost_100[1]:.2f} for 100 queries\n'
+                    '• Domain-specific knowledge')
+    ax.text(0.98, 0.05, insight_text, transform=ax.transAxes, fontsize=10,
+            verticalalignment='bottom', horizontalalignment='right',
+            bbox=dict(boxstyle='round,pad=0.8', facecolor='lightgreen', alpha=0.7, edgecolor='green', linewidth=2))
+    ax.legend(loc='lower left', fontsize=10, framealpha=0.95)
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+def fig_dashboard(data, path):
+    import matplotlib.pyplot as plt
+    judge = data['llm_judge']
+    model_upgrade = pct_change(data['manual']['claude45']['SAC-RAG'], data['manual']['claude35']['SAC-RAG'])
+    retrieval = pct_change(judge['claude35']['SAC-RAG']['average'], judge['claude35']['Base RAG']['average'])
+    fig = plt.figure(figsize=(16, 10))
+    gs = fig.add_gridspec(3, 3, hspace=0.3, wspace=0.3)
+
+    ax1 = fig.add_subplot(gs[0, :])
+    ax1.text(0.5, 0.5, f'KEY FINDING: Model Quality Dominates ({model_upgrade / retrieval:.0f}x Impact)\n' +
+             f'Model Upgrade: {model_upgrade:+.1f}%  |  Retrieval Optimization: {retrieval:+.2f}%',
+             ha='center', va='center', fontsize=18, fontweight='bold',
+             bbox=dict(boxstyle='round,pad=1', facecolor='lightblue', alpha=0.8))
+    ax1.axis('off')
+
+    for col, model in enumerate(('claude35', 'claude45')):
+        ax = fig.add_subplot(gs[1, col])
+        base, sac = judge[model]['Base RAG']['average'], judge[model]['SAC-RAG']['average']
+        sac_wins = sac > base
+        ax.bar(['Base', 'SAC'], [base, sac], color=['#3498db', '#2ecc71'] if sac_wins else ['#2ecc71', '#e74c3c'],
+               alpha=0.7)
+        ax.set_title(f"{MODELS[model]}:\n{'SAC' if sac_wins else 'Base'} Wins (+{abs(pct_change(sac, base)):.2f}%)",
+                     fontsize=11, fontweight='bold')
+        ax.set_ylabel('Score (/10)')
+        ax.set_ylim(0, 10)
+        ax.grid(axis='y', alpha=0.3)
+
+    ax4 = fig.add_subplot(gs[1, 2])
+    ax4.bar(['3.5', '4.5'], [data['manual'][m]['SAC-RAG'] for m in ('claude35', 'claude45')],
+            color=['#e74c3c', '#2ecc71'], alpha=0.7)
+    ax4.set_title(f'SAC-RAG Upgrade:\n{model_upgrade:+.1f}%', fontsize=11, fontweight='bold')
+    ax4.set_ylabel('Score (/5)')
+    ax4.set_ylim(0, 5)
+    ax4.grid(axis='y', alpha=0.3)
+
+    ax5 = fig.add_subplot(gs[2, :])
+    bars = ax5.bar(['Base RAG\n(Claude 4.5)', 'SAC-RAG\n(Claude 4.5)', 'Generic Claude\n(4.5)'], three_way_scores(data),
+                   color=['#3498db', '#9b59b6', '#e67e22'], alpha=0.7, edgecolor='black', linewidth=2)
+    ax5.set_title('Final System Comparison (Normalized Scores)', fontsize=13, fontweight='bold')
+    ax5.set_ylabel('Performance (/10)', fontweight='bold')
+    ax5.set_ylim(0, 10.5)
+    ax5.grid(axis='y', alpha=0.3)
+    ax5.axhline(y=9.0, color='green', linestyle='--', alpha=0.5, linewidth=1.5)
+    _bar_labels(ax5, bars, fontsize=12)
+
+    plt.suptitle('RAG Systems Evaluation Summary Dashboard', fontsize=20, fontweight='bold', y=0.98)
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+
+# name -> (renderer, data keys it reads, description)
+FIGURES = {
+    '01_base_vs_sac_comparison': (fig_base_vs_sac, ('llm_judge',), "Base RAG vs SAC-RAG comparison (model-dependent)"),
+    '02_ablation_study': (fig_ablation, ('manual',), "Ablation study (model upgrade impact)"),
+    '03_metric_breakdown': (fig_metric_breakdown, ('llm_judge',), "Metric breakdown (accuracy, completeness, clarity)"),
+    '04_three_way_comparison': (fig_three_way, ('llm_judge',), "Four-configuration LLM-judge comparison"),
+    '05_impact_comparison': (fig_impact, ('manual', 'llm_judge'), "Impact comparison (model vs retrieval)"),
+    '06_inter_rater_reliability': (fig_inter_rater, ('manual', 'rubric_judge'), "Inter-rater reliability"),
+    '07_cost_benefit': (fig_cost_benefit, ('manual', 'llm_judge', 'costs', 'latency_p50', 'latency_source'),
+                        "Cost-benefit analysis"),
+    '08_summary_dashboard': (fig_dashboard, ('manual', 'llm_judge'), "Summary dashboard"),
+}
+
+
+# ============================================================
+# Incremental, Parallel Rendering
+# ============================================================
+def figure_hash(name, data):
+    """Hash of a figure's inputs and its renderer's source code"""
+    import inspect
+    renderer, keys, _ = FIGURES[name]
+    payload = json.dumps({k: data[k] for k in keys}, sort_keys=True, default=str)
+    source = inspect.getsource(renderer)
+    return hashlib.sha256((payload + source + str(DPI)).encode('utf-8')).hexdigest()[:16]
+
+
+def _apply_style():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    plt.style.use('seaborn-v0_8-darkgrid')
+    sns.set_palette("husl")
+    plt.rcParams['figure.figsize'] = (12, 8)
+    plt.rcParams['font.size'] = 11
+    plt.rcParams['axes.labelsize'] = 12
+    plt.rcParams['axes.titlesize'] = 14
+    plt.rcParams['xtick.labelsize'] = 10
+    plt.rcParams['ytick.labelsize'] = 10
+    plt.rcParams['legend.fontsize'] = 10
+
+
+def _render(name, data, path):
+    """Process-pool worker: render one figure, return (name, seconds)"""
+    start = time.perf_counter()
+    _apply_style()
+    FIGURES[name][0](data, path)
+    return name, time.perf_counter() - start
+
+
+def render_charts(names=None, output_dir=OUTPUT_DIR, force=False, workers=None, db_path=None, sync=True):
+    """
+    Render the requested figures (all by default), skipping those whose input
+    hash matches the manifest and whose PNG exists. Returns
+    {name: 'rendered' | 'unchanged'}.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+    if sync:
+        sync_scores(db_path)
+    data = load_chart_data(db_path)
+    manifest_path = output_dir / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+    status, pending = {}, {}
+    for name in names or FIGURES:
+        digest = figure_hash(name, data)
+        path = output_dir / f'{name}.png'
+        if not force and manifest.get(name) == digest and path.exists():
+            status[name] = 'unchanged'
+        else:
+            pending[name] = digest
+
+    if pending:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(_render, name, data, str(output_dir / f'{name}.png')) for name in pending]
+            for future in futures:
+                name, seconds = future.result()
+                manifest[name] = pending[name]
+                status[name] = 'rendered'
+                print(f"   ✓ {name}.png ({seconds:.1f}s)")
+        manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return status
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render thesis charts from the results store")
+    parser.add_argument('--only', nargs='+', choices=sorted(FIGURES), help="Render just these figures")
+    parser.add_argument('--force', action='store_true', help="Re-render even if inputs are unchanged")
+    parser.add_argument('--workers', type=int, help="Process pool size (default: one per figure, up to CPU count)")
+    parser.add_argument('--output-dir', default=str(OUTPUT_DIR))
+    parser.add_argument('--no-sync', action='store_true', help="Don't re-import the result CSVs first")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("GENERATING THESIS VISUALIZATIONS")
+    print("=" * 80 + "\n")
+    start = time.perf_counter()
+    status = render_charts(args.only, args.output_dir, args.force, args.workers, sync=not args.no_sync)
+    rendered = [n for n, s in status.items() if s == 'rendered']
+    unchanged = [n for n, s in status.items() if s == 'unchanged']
+    if unchanged:
+        print(f"   · {len(unchanged)} unchanged: {', '.join(unchanged)}")
+    print(f"\n✓ {len(rendered)} rendered, {len(unchanged)} up to date in {time.perf_counter() - start:.1f}s")
+    print(f"✓ Location: {Path(args.output_dir).absolute()}")
+    return status
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,5 @@
-import pandas as pd
+"""Print the SAC-RAG results columns and first row (same as `python rag_eval.py columns`)"""
 
-# Check both files
-sac = pd.read_csv('sac_rag_golden_detailed.csv')
-print("SAC-RAG columns:", sac.columns.tolist())
-print("\nSample row:")
-for col in sac.columns:
-    print(f"  {col}: {sac.iloc[0][col]}")
+from rag_eval import cmd_columns
+
+cmd_columns(['sac_rag_golden_detailed.csv'])
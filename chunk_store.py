@@ -0,0 +1,358 @@
+"""
+Shared Chunk Text Store
+One read-only file holding every chunk text (Base and SAC chunks, the latter
+with their document summaries already prepended) keyed by chunk id, which
+every retrieval and evaluation process memory-maps instead of keeping its
+own copy. Result files reference chunks by id (`context_ids`) rather than
+repeating the text in a `contexts` column.
+
+File layout (little-endian):
+
+    header   b'RAGCHNK\\0', u32 version, u32 codec, u64 count, u32 id width,
+             u32 frame count
+    ids      count x S<width>, sorted (binary-searched in place)
+    entries  count x (u32 frame, u32 start, u32 length), aligned with ids
+    frames   (frame count + 1) x u64 byte offsets into the blob
+    blob     UTF-8 text; codec 'none' = one frame, 'zstd'/'zlib' = ~64 KB
+             frames compressed independently
+
+Uncompressed stores are read straight out of the mapping. Compressed stores
+decompress one frame per lookup, keeping the last few frames in a small LRU
+so a top-k read that lands in the same frames decompresses each one once.
+
+Only final_rag_metrics_evaluation.py reads contexts through the store so far;
+the other evaluation scripts still expect a `contexts` column. The saved
+*_golden_detailed.csv files carry no contexts, so `build --csv` takes result
+files that do (pipeline output with a `contexts` column).
+
+Usage:
+    python chunk_store.py build --index base sac --output chunks.store
+    python chunk_store.py build --index base sac --csv sac_results.csv --codec zstd --output chunks.store
+    python chunk_store.py info chunks.store
+    python chunk_store.py get chunks.store 3f9a1c2b7e004d11
+    python chunk_store.py compact sac_results.csv --store chunks.store --in-place
+    python chunk_store.py expand sac_results.csv --store chunks.store --output with_contexts.csv
+"""
+
+import argparse
+import ast
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from tracing import span
+
+MAGIC = b'RAGCHNK\x00'
+STORE_VERSION = 1
+CODECS = {'none': 0, 'zlib': 1, 'zstd': 2}
+FRAME_BYTES = 64 * 1024
+FRAME_CACHE = 8
+_HEADER = struct.Struct('<8sIIQII')
+_ENTRY_DTYPE = [('frame', '<u4'), ('start', '<u4'), ('length', '<u4')]
+
+
+def chunk_id(text):
+    """Content-addressed chunk id (same key as retrieval_eval's embedding cache)"""
+    from retrieval_eval import chunk_key
+    return chunk_key(text)
+
+
+def _compressor(codec):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=9).compress
+    if codec == 'zlib':
+        return lambda data: zlib.compress(data, 9)
+    return bytes
+
+
+def _decompressor(codec):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress
+    if codec == 'zlib':
+        return zlib.decompress
+    return bytes
+
+
+# ============================================================
+# Writer
+# ============================================================
+def write_store(path, chunks, codec='none', frame_bytes=FRAME_BYTES):
+    """
+    Write {chunk_id: text} (or an iterable of texts, keyed by content) to
+    `path`; returns (count, blob bytes). Texts are laid out in id order.
+    """
+    import numpy as np
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}; choose from {sorted(CODECS)}")
+    if not isinstance(chunks, dict):
+        chunks = {chunk_id(text): text for text in chunks}
+    ids = sorted(chunks)
+    width = max((len(i.encode('utf-8')) for i in ids), default=1)
+    entries = np.zeros(len(ids), dtype=_ENTRY_DTYPE)
+    compress = _compressor(codec)
+    frames, frame, frame_offsets = [], bytearray(), [0]
+
+    def flush():
+        if frame:
+            frames.append(compress(bytes(frame)))
+            frame_offsets.append(frame_offsets[-1] + len(frames[-1]))
+            frame.clear()
+
+    for row, key in enumerate(ids):
+        data = chunks[key].encode('utf-8')
+        if codec != 'none' and frame and len(frame) + len(data) > frame_bytes:
+            flush()
+        entries[row] = (len(frames), len(frame), len(data))
+        frame.extend(data)
+    flush()
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, STORE_VERSION, CODECS[codec], len(ids), width, len(frames)))
+        f.write(np.array(ids, dtype=f'S{width}').tobytes())
+        f.write(entries.tobytes())
+        f.write(np.array(frame_offsets, dtype='<u8').tobytes())
+        for data in frames:
+            f.write(data)
+    os.replace(tmp_path, path)
+    return len(ids), frame_offsets[-1]
+
+
+# ============================================================
+# Reader
+# ============================================================
+class ChunkStore:
+    """Read-only memory-mapped chunk id -> text lookup"""
+
+    def __init__(self, path):
+        import numpy as np
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, codec, count, width, n_frames = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a chunk store")
+        if version != STORE_VERSION:
+            raise ValueError(f"{path} is chunk store format v{version}; this reader supports v{STORE_VERSION}")
+        self.codec = {v: k for k, v in CODECS.items()}[codec]
+        self.count = count
+        offset = _HEADER.size
+        self._ids = np.frombuffer(self._mm, dtype=f'S{width}', count=count, offset=offset)
+        offset += count * width
+        self._entries = np.frombuffer(self._mm, dtype=_ENTRY_DTYPE, count=count, offset=offset)
+        offset += self._entries.nbytes
+        self._frame_offsets = np.frombuffer(self._mm, dtype='<u8', count=n_frames + 1, offset=offset)
+        self._blob = offset + self._frame_offsets.nbytes
+        self._decompress = _decompressor(self.codec)
+        self._frames = OrderedDict()
+
+    def __len__(self):
+        return self.count
+
+    def _row(self, key):
+        import numpy as np
+        encoded = key.encode('utf-8')
+        row = int(np.searchsorted(self._ids, encoded))
+        if row < self.count and self._ids[row] == encoded:
+            return row
+        return None
+
+    def __contains__(self, key):
+        return self._row(key) is not None
+
+    def _frame(self, index):
+        start = self._blob + int(self._frame_offsets[index])
+        end = self._blob + int(self._frame_offsets[index + 1])
+        if self.codec == 'none':
+            return memoryview(self._mm)[start:end]
+        if index in self._frames:
+            self._frames.move_to_end(index)
+        else:
+            self._frames[index] = self._decompress(self._mm[start:end])
+            if len(self._frames) > FRAME_CACHE:
+                self._frames.popitem(last=False)
+        return self._frames[index]
+
+    def get(self, key, default=None):
+        row = self._row(key)
+        if row is None:
+            return default
+        frame, start, length = self._entries[row].tolist()
+        return bytes(self._frame(frame)[start:start + length]).decode('utf-8')
+
+    def __getitem__(self, key):
+        text = self.get(key)
+        if text is None:
+            raise KeyError(key)
+        return text
+
+    def texts(self, keys):
+        """Texts for a list of chunk ids, in order (KeyError on an unknown id)"""
+        return [self[key] for key in keys]
+
+    def ids(self):
+        return [i.decode('utf-8') for i in self._ids]
+
+    def stats(self):
+        frame_sizes = self._frame_offsets[-1]
+        raw = int(self._entries['length'].sum())
+        return {'chunks': self.count, 'codec': self.codec, 'text_bytes': raw, 'stored_bytes': int(frame_sizes),
+                'file_bytes': os.path.getsize(self.path), 'frames': len(self._frame_offsets) - 1}
+
+    def close(self):
+        self._frames.clear()
+        self._ids = self._entries = self._frame_offsets = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass                                                   # a caller still holds a view; unmapped when freed
+
+
+# ============================================================
+# Result Files
+# ============================================================
+def parse_contexts(value):
+    """A `contexts` cell as written by pandas (repr of a list) -> list of texts"""
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return []
+    return ast.literal_eval(value)
+
+
+def row_contexts(row, store=None):
+    """
+    Context texts for one result row, whether it carries `contexts` or
+    `context_ids`; a row with neither column is an error, not "no contexts"
+    """
+    if 'context_ids' not in row and 'contexts' not in row:
+        raise ValueError("Result row has neither a 'contexts' nor a 'context_ids' column; "
+                         "use a result file written with its retrieved contexts")
+    if 'context_ids' in row and isinstance(row['context_ids'], str):
+        if store is None:
+            raise ValueError("Result file references chunks by id; pass the chunk store")
+        return store.texts(json.loads(row['context_ids']))
+    return parse_contexts(row.get('contexts'))
+
+
+def compact(df, store):
+    """Replace the `contexts` column with JSON `context_ids`; every context must already be in the store"""
+    ids, missing = [], 0
+    for value in df['contexts']:
+        keys = [chunk_id(text) for text in parse_contexts(value)]
+        missing += sum(key not in store for key in keys)
+        ids.append(json.dumps(keys))
+    if missing:
+        raise ValueError(f"{missing} contexts are not in {store.path}; rebuild it with --csv")
+    out = df.drop(columns=['contexts'])
+    out.insert(list(df.columns).index('contexts'), 'context_ids', ids)
+    return out
+
+
+def expand(df, store):
+    """Inverse of compact()"""
+    out = df.drop(columns=['context_ids'])
+    texts = [repr(store.texts(json.loads(value))) for value in df['context_ids']]
+    out.insert(list(df.columns).index('context_ids'), 'contexts', texts)
+    return out
+
+
+def collect_chunks(index_names=(), csv_paths=()):
+    """{chunk_id: text} from the stub/Chroma indexes and from result CSVs' `contexts` columns"""
+    import pandas as pd
+    chunks = {}
+    if index_names:
+        from retrieval_eval import EmbeddingCache, build_embeddings, load_index
+        embeddings, model_id = build_embeddings()
+        cache = EmbeddingCache(embeddings, model_id)
+        for name in index_names:
+            index = load_index(name, 'stub', cache)
+            chunks.update((chunk_id(text), text) for text in index.texts)
+    for path in csv_paths:
+        df = pd.read_csv(path)
+        if 'contexts' not in df:
+            raise ValueError(f"{path} has no contexts column (columns: {', '.join(df.columns)}); "
+                             f"use pipeline results that kept their retrieved contexts")
+        for value in df['contexts']:
+            chunks.update((chunk_id(text), text) for text in parse_contexts(value))
+    return chunks
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory-mapped shared chunk text store")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help="Write a store from indexes and/or result CSVs")
+    p.add_argument('--index', nargs='*', default=[], help="Stub corpus indexes (base, sac)")
+    p.add_argument('--csv', nargs='*', default=[], help="Result files with a contexts column")
+    p.add_argument('--codec', choices=sorted(CODECS), default='none')
+    p.add_argument('--output', default='chunks.store')
+    p = sub.add_parser('info', help="Counts and sizes")
+    p.add_argument('store')
+    p = sub.add_parser('get', help="Print chunk texts by id")
+    p.add_argument('store')
+    p.add_argument('ids', nargs='+')
+    for command, help_text in (('compact', "Replace a CSV's contexts column with chunk ids"),
+                               ('expand', "Restore a contexts column from chunk ids")):
+        p = sub.add_parser(command, help=help_text)
+        p.add_argument('csv')
+        p.add_argument('--store', default='chunks.store')
+        target = p.add_mutually_exclusive_group(required=True)
+        target.add_argument('--output', help="Write the result here")
+        target.add_argument('--in-place', action='store_true', help="Overwrite the input CSV")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        if not args.index and not args.csv:
+            parser.error("build needs --index and/or --csv")
+        with span('chunk_store.build', codec=args.codec):
+            try:
+                chunks = collect_chunks(args.index, args.csv)
+            except ValueError as exc:
+                parser.error(str(exc))
+            count, stored = write_store(args.output, chunks, args.codec)
+        raw = sum(len(t.encode('utf-8')) for t in chunks.values())
+        print(f"✅ {count} chunks -> {args.output} ({raw / 1024:.1f} KB text, {stored / 1024:.1f} KB stored, {args.codec})")
+        return 0
+
+    if args.command == 'info':
+        stats = ChunkStore(args.store).stats()
+        print(f"{args.store}: {stats['chunks']} chunks, codec={stats['codec']}, {stats['frames']} frames, "
+              f"{stats['text_bytes'] / 1024:.1f} KB text -> {stats['file_bytes'] / 1024:.1f} KB file")
+        return 0
+
+    store = ChunkStore(args.store)
+    if args.command == 'get':
+        for key in args.ids:
+            print(f"--- {key}\n{store.get(key, '(not in store)')}")
+        return 0
+
+    import pandas as pd
+    df = pd.read_csv(args.csv)
+    output = args.csv if args.in_place else args.output
+    before = Path(args.csv).stat().st_size
+    if args.command == 'compact':
+        if 'contexts' not in df:
+            print(f"{args.csv} has no contexts column; nothing to do")
+            return 0
+        df = compact(df, store)
+    else:
+        if 'context_ids' not in df:
+            print(f"{args.csv} has no context_ids column; nothing to do")
+            return 0
+        df = expand(df, store)
+    df.to_csv(output, index=False)
+    print(f"✅ {args.csv} ({before / 1024:.1f} KB) -> {output} ({Path(output).stat().st_size / 1024:.1f} KB)")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
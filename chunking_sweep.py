@@ -0,0 +1,263 @@
+"""
+Chunking-Strategy Sweep
+Builds many chunking variants of the corpus and scores each with the offline
+retrieval metrics, so the chunking choice can be tuned per model instead of
+fixing 1000/200 + summary prefix.
+
+A variant is chunk size x overlap x summary mode x splitter:
+- summary 'none'      plain chunks
+- summary 'prefix'    document summary prepended to every chunk (SAC-RAG)
+- summary 'metadata'  summary kept beside the chunk: the chunk vector is mixed
+                      with the document-summary vector (weight --summary-weight)
+                      instead of changing the chunk text
+- splitter 'window'   fixed character windows (RecursiveCharacterTextSplitter setup)
+- splitter 'section'  cuts at headings / numbered paragraphs first, then windows
+- splitter 'legal'    legal_chunker: one unit per statute section / Article /
+                      judgment paragraph run (chunk size = maximum unit size)
+
+Variants are chunked in parallel worker processes. Every distinct text across
+all variants is embedded once through the shared embedding cache (identical
+chunks - e.g. every 'none' and 'metadata' variant of the same split - cost
+nothing extra, and nothing is re-embedded on the next sweep).
+
+Relevance is citation-derived for every variant (retrieval_eval.draft_labels):
+a chunk is gold when its own text quotes a citation from the question or
+reference answers, so variants with different chunk ids are judged by the
+same rule. Labels look at the chunk body only; a 'prefix' summary changes
+what is embedded but cannot make a chunk gold.
+
+--corpus sweeps the real legal documents (legal_chunker.load_corpus). Without
+it the golden answers stand in for the corpus, and since the gold citations
+come from those same answers, that sweep only checks the machinery.
+
+Usage:
+    python chunking_sweep.py --corpus corpus/
+    python chunking_sweep.py                        # stand-in corpus (circular, smoke test only)
+    python chunking_sweep.py --sizes 500 1000 2000 --overlaps 0 200 --summary none prefix metadata \\
+        --splitter window section --k 5 --output chunking_sweep.csv
+"""
+
+import argparse
+import os
+import re
+from datetime import datetime
+
+from tracing import span
+
+SUMMARY_MODES = ('none', 'prefix', 'metadata')
+SPLITTERS = ('window', 'section', 'legal')
+
+# Headings and numbered paragraphs a section-aware split may cut at
+SECTION_BOUNDARY = re.compile(
+    r"(?m)^(?=[ \t]*(?:#{1,6}\s|PART\b|Part\s+[IVXLC\d]+|SECTION\b|Section\s+\d|Article\s+\d|SCHEDULE\b|\d{1,3}\.\s))")
+
+
+class ChunkConfig:
+    """One chunking variant"""
+
+    def __init__(self, chunk_size=1000, overlap=200, summary='none', splitter='window'):
+        if summary not in SUMMARY_MODES:
+            raise ValueError(f"summary must be one of {SUMMARY_MODES}, got {summary!r}")
+        if splitter not in SPLITTERS:
+            raise ValueError(f"splitter must be one of {SPLITTERS}, got {splitter!r}")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.summary = summary
+        self.splitter = splitter
+
+    @property
+    def name(self):
+        return f"{self.splitter}-{self.chunk_size}/{self.overlap}-{self.summary}"
+
+    def __repr__(self):
+        return f"ChunkConfig({self.chunk_size}, {self.overlap}, {self.summary!r}, {self.splitter!r})"
+
+
+def config_grid(sizes, overlaps, summaries=SUMMARY_MODES, splitters=SPLITTERS):
+    """Every valid combination (overlap must be smaller than the chunk size)"""
+    return [ChunkConfig(size, overlap, summary, splitter)
+            for splitter in splitters for size in sizes for overlap in overlaps
+            for summary in summaries if overlap < size]
+
+
+# ============================================================
+# Splitting
+# ============================================================
+def section_chunks(text, chunk_size=1000, chunk_overlap=200):
+    """
+    Cut at headings and numbered paragraphs, pack consecutive pieces up to
+    chunk_size, and window any piece that is still too long.
+    """
+    from stub_backends import chunk_text
+    pieces = [p for p in SECTION_BOUNDARY.split(str(text)) if p.strip()]
+    chunks, current = [], ''
+    for piece in pieces:
+        if current and len(current) + len(piece) > chunk_size:
+            chunks.append(current)
+            current = ''
+        if len(piece) > chunk_size:
+            chunks += chunk_text(piece, chunk_size, chunk_overlap)
+        else:
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+_corpus = {}
+
+
+def _init_worker(documents, summaries):
+    _corpus['documents'] = documents
+    _corpus['summaries'] = summaries
+
+
+def build_variant(config):
+    """(embedded chunk texts, chunk bodies without any summary prefix, document index per chunk) for one variant"""
+    from legal_chunker import legal_chunks
+    from stub_backends import chunk_text
+    split = {'window': chunk_text, 'section': section_chunks, 'legal': legal_chunks}[config.splitter]
+    texts, bodies, doc_ids = [], [], []
+    for doc_id, (doc, summary) in enumerate(zip(_corpus['documents'], _corpus['summaries'])):
+        for chunk in split(doc, config.chunk_size, config.overlap):
+            texts.append(summary + "\n\n" + chunk if config.summary == 'prefix' else chunk)
+            bodies.append(chunk)
+            doc_ids.append(doc_id)
+    return texts, bodies, doc_ids
+
+
+def build_variants(configs, documents, summaries, workers=None):
+    """{config name: (texts, bodies, doc ids)}, chunked in parallel processes"""
+    workers = workers or min(len(configs), os.cpu_count() or 1)
+    with span('sweep.chunk', variants=len(configs), workers=workers):
+        if workers <= 1:
+            _init_worker(documents, summaries)
+            return {c.name: build_variant(c) for c in configs}
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(documents, summaries)) as pool:
+            return {c.name: result for c, result in zip(configs, pool.map(build_variant, configs))}
+
+
+# ============================================================
+# Sweep
+# ============================================================
+def run_sweep(configs, documents, summaries, cache, ks=(5,), summary_weight=0.3, workers=None):
+    """
+    Chunk, embed (deduplicated, cached) and score every variant. Returns
+    (summary DataFrame: variant, k, metric, mean, count; cost dict).
+    """
+    import numpy as np
+    import pandas as pd
+    from retrieval_eval import RetrievalIndex, chunk_key, draft_labels, evaluate, summarise
+
+    variants = build_variants(configs, documents, summaries, workers)
+    all_texts = [t for texts, _, _ in variants.values() for t in texts]
+    unique = list(dict.fromkeys(all_texts))
+    misses_before = cache.misses
+    with span('sweep.embed', texts=len(all_texts), unique=len(unique)):
+        vectors = cache.embed(unique)
+        summary_vectors = cache.embed(summaries) if any(c.summary == 'metadata' for c in configs) else None
+    row = {text: i for i, text in enumerate(unique)}
+
+    results = []
+    for config in configs:
+        texts, bodies, doc_ids = variants[config.name]
+        matrix = vectors[[row[t] for t in texts]]
+        if config.summary == 'metadata':
+            matrix = (1 - summary_weight) * matrix + summary_weight * summary_vectors[np.asarray(doc_ids)]
+        # search the embedded texts, but label and score citations on the bodies
+        index = RetrievalIndex(config.name, [chunk_key(t) for t in texts], bodies, matrix)
+        with span('sweep.evaluate', variant=config.name, chunks=len(texts)):
+            gold, citations = draft_labels([index])
+            questions = gold.drop_duplicates('Question_ID').set_index('Question_ID')['Question']
+            per_question, _ = evaluate(index, questions.index, cache.embed(questions.tolist()), gold, citations, ks)
+        summary = summarise(per_question)
+        summary['chunks'] = len(texts)
+        results.append(summary)
+
+    cost = {
+        'variants': len(configs),
+        'chunks_total': len(all_texts),
+        'chunks_unique': len(unique),
+        'embedded_this_run': cache.misses - misses_before,
+        'largest_variant': max(len(texts) for texts, _, _ in variants.values()) if variants else 0,
+    }
+    table = pd.concat(results, ignore_index=True).rename(columns={'index': 'variant'}) if results else pd.DataFrame()
+    return table, cost
+
+
+def load_documents(corpus=None):
+    """(documents, summaries): the legal corpus under `corpus`, or the golden-answer stand-in"""
+    if not corpus:
+        from rag_benchmark import build_stub_corpus
+        documents, summaries, _, _ = build_stub_corpus()
+        return documents, summaries
+    from legal_chunker import load_corpus
+    documents = [text for _, text in load_corpus(corpus)]
+    if not documents:
+        raise ValueError(f"No .txt/.md/.pdf documents under {', '.join(corpus)}")
+    # same lead-of-document stand-in summaries as build_stub_corpus
+    return documents, ["Document Summary: " + str(doc)[:300].replace('\n', ' ') for doc in documents]
+
+
+# ============================================================
+# CLI
+# ============================================================
+def print_sweep(table, cost, k, sort_by='ndcg'):
+    wide = (table[table['k'] == k].pivot_table(index=['variant', 'chunks'], columns='metric', values='mean')
+            .sort_values(sort_by, ascending=False))
+    columns = [c for c in ('recall', 'mrr', 'ndcg', 'citation_hit', 'citation_recall') if c in wide]
+    print(f"\n📊 Chunking sweep @k={k} (sorted by {sort_by})")
+    print(f"{'variant':<30}{'chunks':>8}" + ''.join(f"{c:>17}" for c in columns))
+    print("-" * (38 + 17 * len(columns)))
+    for (variant, chunks), row in wide[columns].iterrows():
+        print(f"{variant:<30}{chunks:>8}" + ''.join(f"{row[c]:>17.3f}" for c in columns))
+    print(f"\nEmbedding cost: {cost['embedded_this_run']} texts embedded this run; "
+          f"{cost['chunks_unique']} unique of {cost['chunks_total']} chunks across {cost['variants']} variants "
+          f"(one build of the largest variant = {cost['largest_variant']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep chunking variants and score retrieval offline")
+    parser.add_argument('--corpus', nargs='+', metavar='PATH',
+                        help="Legal corpus files or directories (default: the golden answers, which is circular)")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[500, 1000, 2000])
+    parser.add_argument('--overlaps', nargs='+', type=int, default=[0, 200])
+    parser.add_argument('--summary', nargs='+', choices=SUMMARY_MODES, default=list(SUMMARY_MODES))
+    parser.add_argument('--splitter', nargs='+', choices=SPLITTERS, default=list(SPLITTERS))
+    parser.add_argument('--summary-weight', type=float, default=0.3,
+                        help="Weight of the document-summary vector in 'metadata' mode")
+    parser.add_argument('--k', nargs='+', type=int, default=[5])
+    parser.add_argument('--sort-by', default='ndcg')
+    parser.add_argument('--embeddings', choices=['local', 'bedrock', 'onnx'], default='local')
+    parser.add_argument('--onnx-model', help="Model directory for --embeddings onnx")
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--run-id')
+    parser.add_argument('--output', help="Long CSV: variant, k, metric, mean, count, chunks")
+    parser.add_argument('--db')
+    args = parser.parse_args(argv)
+
+    from retrieval_eval import EmbeddingCache, build_embeddings, store_summary
+    documents, summaries = load_documents(args.corpus)
+    if not args.corpus:
+        print("⚠️  No --corpus: chunking the golden answers that the gold citations come from, "
+              "so scores only check the sweep itself")
+    embeddings, model_id = build_embeddings(args.embeddings, args.region, onnx_model=args.onnx_model)
+    cache = EmbeddingCache(embeddings, model_id, args.db)
+    configs = config_grid(args.sizes, args.overlaps, args.summary, args.splitter)
+    table, cost = run_sweep(configs, documents, summaries, cache, args.k, args.summary_weight, args.workers)
+
+    run_id = args.run_id or datetime.now().strftime('chunk-sweep-%Y%m%d-%H%M%S')
+    store_summary(table.rename(columns={'variant': 'index'}), run_id, args.db)
+    if args.output:
+        table.to_csv(args.output, index=False)
+    for k in args.k:
+        print_sweep(table, cost, k, args.sort_by)
+    print(f"run_id={run_id} (retrieval_metrics.index_name = variant)")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+"""
+Token & Cost Accounting
+Wraps every LLM (generation, summarization, judge) and embedding call so that
+input/output tokens, latency, retries and estimated cost are recorded per run,
+per question and per pipeline stage in the results store (llm_calls table).
+
+Usage:
+    ledger = UsageLedger(run_id='judge-claude45')
+    judge_llm = InstrumentedLLM(llm_generate, ledger, kind='judge')
+    with call_context(pipeline='SAC-RAG', question_id='Q1', stage='groundedness'):
+        judge_llm.invoke(prompt)
+
+    usage_summary(run_id='judge-claude45')   # DataFrame grouped by pipeline/stage
+
+Calls served by the stub backends are recorded with backend='stub' (priced
+as the model they stand in for, so a run's usage_summary still shows what it
+would cost); cross-run readers skip them unless given a run_id.
+"""
+
+import atexit
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from datetime import datetime
+
+import results_store
+from tracing import span
+
+# ============================================================
+# Bedrock On-Demand Pricing (USD per 1K tokens, us-east-1)
+# ============================================================
+# Matched by substring against the model id; first match wins.
+PRICING = [
+    ('claude-sonnet-4-5', 0.003, 0.015),
+    ('claude-3-5-sonnet', 0.003, 0.015),
+    ('claude-3-7-sonnet', 0.003, 0.015),
+    ('claude-sonnet-4', 0.003, 0.015),
+    ('claude-3-5-haiku', 0.0008, 0.004),
+    ('claude-3-haiku', 0.00025, 0.00125),
+    ('titan-embed-text-v2', 0.00002, 0.0),
+    ('titan-embed', 0.0001, 0.0),
+    ('stub', 0.0, 0.0),
+]
+
+# Stages that belong to building the index rather than answering a query
+SETUP_STAGES = ('ingest',)
+
+
+def model_price(model_id):
+    """(input, output) USD per 1K tokens for a Bedrock model id"""
+    model_id = (model_id or '').lower()
+    for key, input_price, output_price in PRICING:
+        if key in model_id:
+            return input_price, output_price
+    return 0.0, 0.0
+
+
+def estimate_cost(model_id, input_tokens, output_tokens=0):
+    input_price, output_price = model_price(model_id)
+    return input_tokens / 1000 * input_price + output_tokens / 1000 * output_price
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English legal text)"""
+    if not text:
+        return 0
+    return max(1, len(str(text)) // 4)
+
+
+def message_text(response):
+    """Extract text content from an AIMessage (or anything else)"""
+    if hasattr(response, 'content'):
+        return response.content
+    return str(response)
+
+
+def message_tokens(response, prompt, text):
+    """Input/output token counts, preferring the provider's usage metadata"""
+    usage = getattr(response, 'usage_metadata', None) or {}
+    input_tokens = usage.get('input_tokens') or estimate_tokens(prompt)
+    output_tokens = usage.get('output_tokens') or estimate_tokens(text)
+    return input_tokens, output_tokens
+
+
+# ============================================================
+# Call Context (which pipeline / question / stage a call belongs to)
+# ============================================================
+_context = contextvars.ContextVar('usage_context', default={})
+_failures = contextvars.ContextVar('failed_attempts', default=None)
+
+
+@contextlib.contextmanager
+def call_context(**fields):
+    """Tag every instrumented call inside the block with pipeline/question_id/stage"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context():
+    return dict(_context.get())
+
+
+@contextlib.contextmanager
+def retry_scope():
+    """
+    One logical call (e.g. resilience.invoke_with_retry): attempts that fail
+    inside the block are the `retries` of the attempt that succeeds. Outside
+    a scope nothing carries over from one call to the next.
+    """
+    token = _failures.set([])     # shared with hedged attempts' copied contexts
+    try:
+        yield
+    finally:
+        _failures.reset(token)
+
+
+def _failed_attempts():
+    return len(_failures.get() or ())
+
+
+def _record_failed_attempt(status):
+    failures = _failures.get()
+    if failures is not None:
+        failures.append(status)
+
+
+def backend_of(client):
+    """'stub' for the offline stand-ins in stub_backends.py, else 'bedrock'"""
+    return 'stub' if type(client).__module__ == 'stub_backends' else 'bedrock'
+
+
+def _error_status(exc):
+    response = getattr(exc, 'response', None)
+    code = response.get('Error', {}).get('Code') if isinstance(response, dict) else None
+    return 'throttled' if code == 'ThrottlingException' else 'error'
+
+
+# ============================================================
+# Ledger
+# ============================================================
+class UsageLedger:
+    """Buffers call records and writes them to the llm_calls table"""
+
+    def __init__(self, run_id=None, db_path=None, flush_every=25, backend='bedrock'):
+        self.run_id = run_id or datetime.now().strftime('run-%Y%m%d-%H%M%S')
+        self.db_path = db_path
+        self.backend = backend
+        self.flush_every = flush_every
+        self._rows = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def record(self, kind, model_id, input_tokens=0, output_tokens=0, latency_s=None,
+               retries=0, status='ok', backend=None):
+        ctx = current_context()
+        row = {
+            'run_id': self.run_id,
+            'pipeline': ctx.get('pipeline'),
+            'question_id': ctx.get('question_id'),
+            'stage': ctx.get('stage', kind),
+            'kind': kind,
+            'model_id': model_id,
+            'input_tokens': int(input_tokens),
+            'output_tokens': int(output_tokens),
+            'latency_s': latency_s,
+            'retries': int(retries),
+            'cost_usd': estimate_cost(model_id, input_tokens, output_tokens) if status == 'ok' else 0.0,
+            'status': status,
+            'backend': backend or self.backend,
+        }
+        with self._lock:
+            self._rows.append(row)
+            pending = len(self._rows) >= self.flush_every
+        if pending:
+            self.flush()
+        return row
+
+    def flush(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return
+        conn = results_store.connect(self.db_path)
+        try:
+            results_store.insert_rows(conn, 'llm_calls', rows)
+        finally:
+            conn.close()
+
+
+class InstrumentedLLM:
+    """
+    Drop-in wrapper for ChatBedrock (or any object with .invoke). Failed
+    attempts are logged with status 'throttled'/'error'; within a retry_scope()
+    the successful attempt carries the number of failed ones before it as
+    `retries`.
+    """
+
+    def __init__(self, llm, ledger, kind='generation', model_id=None):
+        self.llm = llm
+        self.ledger = ledger
+        self.kind = kind
+        self.model_id = model_id or getattr(llm, 'model_id', None) or type(llm).__name__
+        self.backend = backend_of(llm)
+
+    def invoke(self, prompt, *args, **kwargs):
+        with span(f'llm.{self.kind}', model_id=self.model_id, **current_context()) as s:
+            start = time.perf_counter()
+            try:
+                response = self.llm.invoke(prompt, *args, **kwargs)
+            except Exception as e:
+                status = _error_status(e)
+                self.ledger.record(self.kind, self.model_id, latency_s=time.perf_counter() - start,
+                                   status=status, backend=self.backend)
+                _record_failed_attempt(status)
+                raise
+            latency = time.perf_counter() - start
+            text = message_text(response)
+            input_tokens, output_tokens = message_tokens(response, prompt, text)
+            self.ledger.record(self.kind, self.model_id, input_tokens, output_tokens, latency,
+                               retries=_failed_attempts(), backend=self.backend)
+            s.set_attribute('input_tokens', input_tokens)
+            s.set_attribute('output_tokens', output_tokens)
+            return response
+
+    def tagged(self, **fields):
+        """Same LLM, with every call tagged with the given context fields"""
+        return _TaggedLLM(self, fields)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+class _TaggedLLM:
+    def __init__(self, llm, fields):
+        self.llm = llm
+        self.fields = fields
+
+    def invoke(self, prompt, *args, **kwargs):
+        with call_context(**self.fields):
+            return self.llm.invoke(prompt, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+class InstrumentedEmbeddings:
+    """Drop-in wrapper for BedrockEmbeddings (embed_query / embed_documents)"""
+
+    def __init__(self, embeddings, ledger, model_id=None):
+        self.embeddings = embeddings
+        self.ledger = ledger
+        self.model_id = model_id or getattr(embeddings, 'model_id', None) or type(embeddings).__name__
+        self.backend = backend_of(embeddings)
+
+    def _timed(self, fn, texts, arg):
+        tokens = sum(estimate_tokens(t) for t in texts)
+        with span('llm.embedding', model_id=self.model_id, texts=len(texts), input_tokens=tokens):
+            start = time.perf_counter()
+            result = fn(arg)
+            self.ledger.record('embedding', self.model_id, tokens, 0, time.perf_counter() - start,
+                               backend=self.backend)
+        return result
+
+    def embed_query(self, text):
+        return self._timed(self.embeddings.embed_query, [text], text)
+
+    def embed_documents(self, texts):
+        return self._timed(self.embeddings.embed_documents, texts, texts)
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+
+# ============================================================
+# Queries
+# ============================================================
+def _run_filter(run_id=None, run_prefix=None):
+    """SQL condition + params: one run, runs named '<prefix>-*', or every non-stub run"""
+    if run_id:
+        return "run_id = ?", (run_id,)
+    if run_prefix:
+        return "run_id LIKE ? AND backend != 'stub'", (f'{run_prefix}-%',)
+    return "backend != 'stub'", ()
+
+
+def usage_summary(run_id=None, group_by=('pipeline', 'stage'), db_path=None):
+    """Calls, tokens, latency, retries and cost aggregated by the given columns (stub runs only by run_id)"""
+    columns = ', '.join(group_by)
+    condition, params = _run_filter(run_id)
+    where = f'WHERE {condition}'
+    return results_store.query(f"""
+        SELECT {columns},
+               COUNT(*) AS calls,
+               SUM(status != 'ok') AS failed_attempts,
+               SUM(input_tokens) AS input_tokens,
+               SUM(output_tokens) AS output_tokens,
+               AVG(latency_s) AS mean_latency_s,
+               SUM(retries) AS retries,
+               SUM(cost_usd) AS cost_usd
+        FROM llm_calls {where}
+        GROUP BY {columns}
+        ORDER BY {columns}""", params, db_path)
+
+
+def measured_cost_benefit(run_id=None, db_path=None, run_prefix=None):
+    """
+    Setup and per-query cost per pipeline, computed from recorded calls.
+    Setup = ingest-stage cost averaged over runs that ingested (None if no
+    run did); per-query = non-judge query cost divided by distinct (run,
+    question) pairs. Reads one run, runs named '<run_prefix>-*', or every
+    run; stub-backend calls only count when their run_id is given.
+    Returns None when nothing has been recorded yet.
+    """
+    if not os.path.exists(db_path or results_store.DEFAULT_DB):
+        return None
+    condition, params = _run_filter(run_id, run_prefix)
+    df = results_store.query(f"""
+        SELECT run_id, pipeline, question_id, stage, cost_usd
+        FROM llm_calls
+        WHERE kind != 'judge' AND pipeline IS NOT NULL AND {condition}""", params, db_path)
+    if df.empty:
+        return None
+    costs = {}
+    for pipeline, rows in df.groupby('pipeline'):
+        setup = rows[rows['stage'].isin(SETUP_STAGES)]
+        queries = rows[~rows['stage'].isin(SETUP_STAGES)]
+        n_queries = queries[['run_id', 'question_id']].drop_duplicates().shape[0]
+        costs[pipeline] = {
+            'setup_cost': float(setup['cost_usd'].sum()) / setup['run_id'].nunique() if len(setup) else None,
+            'per_query_cost': float(queries['cost_usd'].sum()) / n_queries if n_queries else 0.0,
+            'queries': n_queries,
+        }
+    return costs
+
+
+def measured_latency(run_prefix=None, db_path=None, kind='generation', stat=50):
+    """
+    {pipeline: percentile latency_s of successful `kind` calls} over non-stub
+    runs (optionally only '<run_prefix>-*'), or None when there are none.
+    """
+    import numpy as np
+    if not os.path.exists(db_path or results_store.DEFAULT_DB):
+        return None
+    condition, params = _run_filter(run_prefix=run_prefix)
+    df = results_store.query(f"""
+        SELECT pipeline, latency_s FROM llm_calls
+        WHERE kind = ? AND status = 'ok' AND latency_s IS NOT NULL AND pipeline IS NOT NULL AND {condition}""",
+                             (kind, *params), db_path)
+    if df.empty:
+        return None
+    return {pipeline: float(np.percentile(rows['latency_s'], stat)) for pipeline, rows in df.groupby('pipeline')}
@@ -0,0 +1,699 @@
+"""
+Distributed Evaluation Queue
+Judge and generation jobs are published to a durable queue (the eval_jobs
+table in the results store) and pulled by any number of worker processes,
+each with its own Bedrock credentials and regions:
+
+    publish   one row per (pipeline, question, metric) judge call or
+              (pipeline, model, question) generation; re-publishing the same
+              run is a no-op, so a crashed publisher can simply run again
+    claim     a worker leases a job for `lease` seconds inside one
+              BEGIN IMMEDIATE transaction; a heartbeat keeps the lease alive
+              while the job runs, and a lease that expires (dead worker) puts
+              the job back on the queue
+    complete  the job's result rows (judge_scores / generated_answers, plus
+              any follow-up judge jobs) are written in the same transaction
+              that marks it done, and only if the worker still holds the
+              lease - a job is never recorded twice
+    fail      throttling and transient errors requeue the job after a
+              decorrelated-jitter delay (resilience.RetryPolicy) until
+              max_attempts; fatal errors fail it at once
+
+Every call first takes a token from a per-account, per-model bucket stored in
+the same database (account_rate_limits), so all workers sharing a credential
+stay under its quota together; a throttled call drains the bucket so they
+all back off. Throughput then grows with the number of accounts/regions.
+
+Workers on other hosts need the database file on a shared volume that
+supports SQLite locking (not NFS); timestamps are wall-clock, so hosts
+should be NTP-synced.
+
+Usage:
+    python eval_queue.py publish judge --suite rubric quality --run-id judge-queue-1
+    python eval_queue.py publish generate --models claude35 claude45 --retrieval none sac \\
+        --index sac=sac.snap --judge rubric --run-id grid-queue-1
+    python eval_queue.py work --service bedrock --account default@us-east-1 thesis@us-west-2 --rate 1 --burst 2
+    python eval_queue.py status
+    python eval_queue.py requeue --run-id judge-queue-1
+    python eval_queue.py bench --accounts 1 2 4       # stub workers in subprocesses
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import results_store
+from tracing import span
+
+results_store.register_schema("""
+CREATE TABLE IF NOT EXISTS eval_jobs (
+    job_id TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    account TEXT,
+    last_error TEXT,
+    finished_at REAL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_eval_jobs_ready ON eval_jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS idx_eval_jobs_run ON eval_jobs (run_id, status);
+
+CREATE TABLE IF NOT EXISTS account_rate_limits (
+    bucket TEXT PRIMARY KEY,
+    rate REAL NOT NULL,
+    burst REAL NOT NULL,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS generated_answers (
+    run_id TEXT NOT NULL,
+    pipeline TEXT,
+    model TEXT,
+    question_id TEXT,
+    question TEXT,
+    ground_truth TEXT,
+    answer TEXT,
+    context_ids TEXT,
+    account TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_generated_answers_run ON generated_answers (run_id, pipeline);
+""")
+
+DEFAULT_LEASE_S = 120.0
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_JUDGE_MODEL = 'claude45'
+
+
+# ============================================================
+# Queue
+# ============================================================
+class Job:
+    """One leased job (payload decoded)"""
+
+    def __init__(self, job_id, run_id, kind, payload, attempts, max_attempts):
+        self.job_id = job_id
+        self.run_id = run_id
+        self.kind = kind
+        self.payload = json.loads(payload) if isinstance(payload, str) else payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.account = None
+
+    def __repr__(self):
+        return f"Job({self.job_id!r}, attempts={self.attempts}/{self.max_attempts})"
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue with leases. Safe to share between threads (one
+    connection per thread) and between processes (every state change is one
+    BEGIN IMMEDIATE transaction). Times are wall-clock (time.time) because
+    they are compared across processes.
+    """
+
+    def __init__(self, db_path=None, lease_seconds=DEFAULT_LEASE_S, clock=time.time):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = results_store.connect(self.db_path)
+            conn.isolation_level = None                            # transactions are explicit below
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _insert_jobs(self, conn, run_id, kind, jobs, max_attempts):
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO eval_jobs (job_id, run_id, kind, payload, max_attempts, available_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(f'{run_id}::{kind}::{key}', run_id, kind, json.dumps(payload, ensure_ascii=False, default=str),
+              max_attempts, self.clock()) for key, payload in jobs])
+        return conn.total_changes - before
+
+    def publish(self, run_id, kind, jobs, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """jobs: [(key, payload)]; returns how many were new (job ids are run_id::kind::key)"""
+        with span('queue.publish', run_id=run_id, kind=kind, jobs=len(jobs)), self.transaction() as conn:
+            return self._insert_jobs(conn, run_id, kind, jobs, max_attempts)
+
+    def claim(self, owner, n=1, kinds=None):
+        """Lease up to n ready jobs; expired leases are reclaimed (or failed when out of attempts) first"""
+        now = self.clock()
+        kind_filter = f"AND kind IN ({', '.join('?' for _ in kinds)})" if kinds else ''
+        with span('queue.claim', owner=owner), self.transaction() as conn:
+            conn.execute("""
+                UPDATE eval_jobs
+                SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                    last_error = 'lease expired (' || lease_owner || ')', lease_owner = NULL, available_at = ?,
+                    finished_at = CASE WHEN attempts >= max_attempts THEN ? END
+                WHERE status = 'leased' AND lease_expires < ?""", (now, now, now))
+            rows = conn.execute(f"""
+                SELECT job_id, run_id, kind, payload, attempts + 1, max_attempts FROM eval_jobs
+                WHERE status = 'queued' AND available_at <= ? {kind_filter}
+                ORDER BY available_at LIMIT ?""", (now, *(kinds or ()), n)).fetchall()
+            conn.executemany("""
+                UPDATE eval_jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?
+                WHERE job_id = ?""", [(owner, now + self.lease_seconds, row[0]) for row in rows])
+        return [Job(*row) for row in rows]
+
+    def heartbeat(self, owner):
+        """Extend every lease `owner` holds; returns how many"""
+        with self.transaction() as conn:
+            return conn.execute("UPDATE eval_jobs SET lease_expires = ? WHERE lease_owner = ? AND status = 'leased'",
+                                (self.clock() + self.lease_seconds, owner)).rowcount
+
+    def complete(self, job, owner, account=None, write=None):
+        """
+        Mark the job done and run write(conn) in the same transaction, if the
+        lease is still ours. Returns False when it was lost (the result is
+        discarded; whoever holds the job now will record it).
+        """
+        with self.transaction() as conn:
+            held = conn.execute("""
+                UPDATE eval_jobs SET status = 'done', account = ?, finished_at = ?, last_error = NULL
+                WHERE job_id = ? AND lease_owner = ? AND status = 'leased' AND attempts = ?""",
+                                (account, self.clock(), job.job_id, owner, job.attempts)).rowcount
+            if held and write is not None:
+                write(conn)
+        return bool(held)
+
+    def fail(self, job, owner, error, retry_in=None, account=None):
+        """Requeue after retry_in seconds, or fail for good (retry_in None or out of attempts); returns the status"""
+        now = self.clock()
+        status = 'queued' if retry_in is not None and job.attempts < job.max_attempts else 'failed'
+        with self.transaction() as conn:
+            conn.execute("""
+                UPDATE eval_jobs SET status = ?, available_at = ?, lease_owner = NULL, last_error = ?, account = ?,
+                                     finished_at = ?
+                WHERE job_id = ? AND lease_owner = ? AND status = 'leased' AND attempts = ?""",
+                         (status, now + (retry_in or 0), error, account, now if status == 'failed' else None,
+                          job.job_id, owner, job.attempts))
+        return status
+
+    def release(self, owner):
+        """Give back every lease `owner` holds without using up an attempt (clean shutdown)"""
+        with self.transaction() as conn:
+            return conn.execute("""
+                UPDATE eval_jobs SET status = 'queued', attempts = attempts - 1, lease_owner = NULL,
+                                     available_at = ?
+                WHERE lease_owner = ? AND status = 'leased'""", (self.clock(), owner)).rowcount
+
+    def pending(self, run_id=None):
+        """Jobs not yet done or failed"""
+        sql = "SELECT COUNT(*) FROM eval_jobs WHERE status IN ('queued', 'leased')"
+        params = ()
+        if run_id:
+            sql, params = sql + " AND run_id = ?", (run_id,)
+        return self._conn().execute(sql, params).fetchone()[0]
+
+    def requeue(self, run_id=None):
+        """Put failed jobs back with a fresh attempt budget; returns how many"""
+        sql = "UPDATE eval_jobs SET status = 'queued', attempts = 0, available_at = ?, finished_at = NULL " \
+              "WHERE status = 'failed'"
+        params = (self.clock(),)
+        if run_id:
+            sql, params = sql + " AND run_id = ?", params + (run_id,)
+        with self.transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# ============================================================
+# Per-Account Rate Limits
+# ============================================================
+class AccountRateLimiter:
+    """
+    Token bucket per (account, model), kept in account_rate_limits so every
+    worker process using the same credentials draws from one bucket. The
+    last worker to start sets the bucket's rate/burst.
+    """
+
+    def __init__(self, queue, rate, burst=None):
+        self.queue = queue
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+
+    def try_acquire(self, bucket):
+        """0.0 if a token was taken, else the seconds until one is available"""
+        now = self.queue.clock()
+        with self.queue.transaction() as conn:
+            row = conn.execute("SELECT tokens, updated_at FROM account_rate_limits WHERE bucket = ?",
+                               (bucket,)).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+            conn.execute("""
+                INSERT INTO account_rate_limits (bucket, rate, burst, tokens, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (bucket) DO UPDATE SET rate = excluded.rate, burst = excluded.burst,
+                                                   tokens = excluded.tokens, updated_at = excluded.updated_at""",
+                         (bucket, self.rate, self.burst, tokens - 1 if wait == 0 else tokens, now))
+        return wait
+
+    def penalize(self, bucket, seconds):
+        """The account was throttled anyway: put the bucket `seconds` in debt so all its workers back off"""
+        with self.queue.transaction() as conn:
+            conn.execute("UPDATE account_rate_limits SET tokens = MIN(tokens, ?), updated_at = ? WHERE bucket = ?",
+                         (-seconds * self.rate, self.queue.clock(), bucket))
+
+
+def bucket_name(account, model_id):
+    return f'{account}/{model_id}'
+
+
+# ============================================================
+# Job Handlers
+# ============================================================
+def _label(pipeline, model):
+    return f'{pipeline} / {model}' if model else pipeline
+
+
+def judge_jobs(items, suites, judge_model=DEFAULT_JUDGE_MODEL):
+    """[(key, payload)], one per (item, metric); items as batch_judge.load_answers returns them"""
+    from batch_judge import JUDGE_SUITES, record_id
+    return [(record_id(item['pipeline'], item['question_id'], metric),
+             {**{key: item[key] for key in ('pipeline', 'question_id', 'question', 'ground_truth', 'answer')},
+              'suite': suite, 'metric': metric, 'judge_model': judge_model})
+            for suite in suites for item in items for metric, _, _ in JUDGE_SUITES[suite]]
+
+
+def generation_jobs(items, pipeline, model, judge_suites=(), judge_model=DEFAULT_JUDGE_MODEL):
+    """[(key, payload)], one per question; items are load_question_set / stage_retrieve rows"""
+    return [(f"{_label(pipeline, model)}::{item['question_id']}",
+             {**{key: item[key] for key in ('question_id', 'question', 'ground_truth')},
+              'pipeline': pipeline, 'model': model, 'contexts': item.get('contexts'),
+              'context_ids': item.get('context_ids', []), 'judge_suites': list(judge_suites),
+              'judge_model': judge_model})
+            for item in items]
+
+
+def run_judge(job, llm):
+    """(model, call) -> write(conn); the write inserts the score into judge_scores"""
+    from batch_judge import JUDGE_SUITES
+    from cost_accounting import message_text
+    from judge_parsing import parse_score
+    p = job.payload
+    template, scale = next((t, s) for metric, t, s in JUDGE_SUITES[p['suite']] if metric == p['metric'])
+    text = message_text(llm.invoke(template.format(question=p['question'], answer=p['answer'],
+                                                   ground_truth=p['ground_truth'])))
+    score, _ = parse_score(text, scale)
+
+    def write(conn):
+        conn.execute("INSERT INTO judge_scores (run_id, suite, pipeline, question_id, metric, score, raw_response, "
+                     "source) VALUES (?, ?, ?, ?, ?, ?, ?, 'queue')",
+                     (job.run_id, p['suite'], p['pipeline'], str(p['question_id']), p['metric'], score, text))
+    return write
+
+
+def run_generate(job, llm, queue):
+    """The write inserts the answer into generated_answers and publishes its judge jobs"""
+    from cost_accounting import message_text
+    from rag_pipelines import GENERIC_PROMPT, RAG_PROMPT
+    p = job.payload
+    if p['contexts'] is None:
+        prompt = GENERIC_PROMPT.format(question=p['question'])
+    else:
+        prompt = RAG_PROMPT.format(context="\n\n---\n\n".join(p['contexts']), question=p['question'])
+    answer = message_text(llm.invoke(prompt))
+    label = _label(p['pipeline'], p['model'])
+
+    def write(conn):
+        conn.execute("INSERT INTO generated_answers (run_id, pipeline, model, question_id, question, ground_truth, "
+                     "answer, context_ids, account) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (job.run_id, p['pipeline'], p['model'], str(p['question_id']), p['question'],
+                      p['ground_truth'], answer, json.dumps(p['context_ids']), job.account))
+        if p['judge_suites']:
+            item = {**p, 'pipeline': label, 'answer': answer}
+            queue._insert_jobs(conn, job.run_id, 'judge', judge_jobs([item], p['judge_suites'], p['judge_model']),
+                               job.max_attempts)
+    return write
+
+
+def job_model(job):
+    return job.payload['judge_model'] if job.kind == 'judge' else job.payload['model']
+
+
+def build_account_llm(account, model, kind, service='local', time_scale=1.0, fault_rate=0.0):
+    """
+    LLM for one account: 'profile@region' (profile 'default' = the default
+    credential chain). Locally, a stub LLM, optionally fault-injecting.
+    """
+    from experiment_grid import MODELS
+    if service == 'bedrock':
+        import boto3
+        from langchain_aws import ChatBedrock
+        profile, _, region = account.partition('@')
+        session = boto3.Session(profile_name=None if profile == 'default' else profile,
+                                region_name=region or 'us-east-1')
+        return ChatBedrock(client=session.client('bedrock-runtime'), model_id=MODELS.get(model, model),
+                           model_kwargs={'temperature': 0, 'max_tokens': 16 if kind == 'judge' else 2048})
+    from batch_judge import _stub_judge
+    from stub_backends import FaultInjectingLLM, StubLLM
+    llm = StubLLM(responder=_stub_judge if kind == 'judge' else None, model_id=f'stub.{model}',
+                  time_scale=time_scale)
+    if fault_rate:
+        llm = FaultInjectingLLM(llm, throttle_rate=fault_rate / 2, error_rate=fault_rate / 2)
+    return llm
+
+
+# ============================================================
+# Worker
+# ============================================================
+class Worker:
+    """
+    Pulls jobs with `threads` threads and runs each on whichever of its
+    accounts has a rate-limit token first. Usage (tokens, latency, status)
+    goes to llm_calls under the job's run_id; a heartbeat thread keeps this
+    worker's leases alive.
+    """
+
+    def __init__(self, queue, accounts, limiter, service='local', threads=4, kinds=None, time_scale=1.0,
+                 fault_rate=0.0, policy=None, name=None):
+        from resilience import RetryPolicy
+        self.queue = queue
+        self.accounts = list(accounts)
+        self.limiter = limiter
+        self.service = service
+        self.threads = threads
+        self.kinds = kinds
+        self.time_scale = time_scale
+        self.fault_rate = fault_rate
+        self.policy = policy or RetryPolicy()
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.stats = {account: {'done': 0, 'retried': 0, 'failed': 0, 'lost': 0} for account in self.accounts}
+        self._llms = {}
+        self._ledgers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _llm(self, account, job):
+        from cost_accounting import InstrumentedLLM, UsageLedger
+        key = (account, job.kind, job_model(job))
+        with self._lock:
+            if job.run_id not in self._ledgers:
+                self._ledgers[job.run_id] = UsageLedger(run_id=job.run_id, db_path=self.queue.db_path,
+                                                        flush_every=200)
+            if key not in self._llms:
+                self._llms[key] = build_account_llm(account, job_model(job), job.kind, self.service,
+                                                    self.time_scale, self.fault_rate)
+            kind = 'judge' if job.kind == 'judge' else 'generation'
+            return InstrumentedLLM(self._llms[key], self._ledgers[job.run_id], kind=kind,
+                                   model_id=getattr(self._llms[key], 'model_id', None))
+
+    def _account_for(self, job):
+        """First account (round-robin from a per-job offset) with a token; waits for the soonest one"""
+        model = job_model(job)
+        start = hash(job.job_id) % len(self.accounts)
+        order = self.accounts[start:] + self.accounts[:start]
+        while not self._stop.is_set():
+            waits = []
+            for account in order:
+                wait = self.limiter.try_acquire(bucket_name(account, model))
+                if wait == 0:
+                    return account
+                waits.append(wait)
+            with span('queue.rate_wait', wait_s=min(waits)):
+                time.sleep(min(waits))
+        return None
+
+    def process(self, job):
+        from cost_accounting import call_context
+        from resilience import classify_error, error_code
+        account = self._account_for(job)
+        if account is None:
+            return
+        job.account = account
+        stage = job.payload.get('metric', 'generation')
+        with span('queue.job', kind=job.kind, job_id=job.job_id, account=account), \
+                call_context(pipeline=job.payload['pipeline'], question_id=str(job.payload['question_id']),
+                             stage=stage):
+            try:
+                llm = self._llm(account, job)
+                write = run_judge(job, llm) if job.kind == 'judge' else run_generate(job, llm, self.queue)
+            except Exception as e:
+                kind = classify_error(e)
+                error = f"{error_code(e)}: {str(e)[:200]}"
+                delay = None if kind == 'fatal' else self.policy.next_delay(
+                    self.policy.base_delay * 2 ** (job.attempts - 1))
+                if kind == 'throttled':
+                    self.limiter.penalize(bucket_name(account, job_model(job)), delay)
+                status = self.queue.fail(job, self.name, error, delay, account)
+                with self._lock:
+                    self.stats[account]['retried' if status == 'queued' else 'failed'] += 1
+                if status == 'failed':
+                    print(f"   ❌ {job.job_id} failed after {job.attempts} attempts ({error})")
+                return
+        held = self.queue.complete(job, self.name, account, write)
+        with self._lock:
+            self.stats[account]['done' if held else 'lost'] += 1
+
+    def _loop(self, until_empty, max_idle_s):
+        idle_since = None
+        while not self._stop.is_set():
+            jobs = self.queue.claim(self.name, 1, self.kinds)
+            if jobs:
+                idle_since = None
+                self.process(jobs[0])
+                continue
+            if until_empty and self.queue.pending() == 0:
+                return
+            idle_since = idle_since or time.monotonic()
+            if max_idle_s is not None and time.monotonic() - idle_since > max_idle_s:
+                return
+            time.sleep(0.2)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            self.queue.heartbeat(self.name)
+
+    def run(self, until_empty=True, max_idle_s=None):
+        """Work until the queue is drained (or idle for max_idle_s); returns per-account stats"""
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True, name='queue-heartbeat')
+        heartbeat.start()
+        threads = [threading.Thread(target=self._loop, args=(until_empty, max_idle_s), name=f'queue-worker-{i}')
+                   for i in range(self.threads)]
+        try:
+            for t in threads:
+                t.start()
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.5)
+        except KeyboardInterrupt:
+            print(f"\n⏹️  Stopping; returning leases held by {self.name}")
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join()
+            self.queue.release(self.name)
+            for ledger in self._ledgers.values():
+                ledger.flush()
+        return self.stats
+
+
+# ============================================================
+# Status and Publishing Inputs
+# ============================================================
+def queue_status(run_id=None, db_path=None):
+    """Job counts per run/kind/status, and completed jobs and throughput per account"""
+    where, params = ("WHERE run_id = ?", (run_id,)) if run_id else ('', ())
+    counts = results_store.query(f"""
+        SELECT run_id, kind, status, COUNT(*) AS jobs, SUM(attempts) AS attempts FROM eval_jobs {where}
+        GROUP BY run_id, kind, status ORDER BY run_id, kind, status""", params, db_path)
+    accounts = results_store.query(f"""
+        SELECT account, COUNT(*) AS done, MIN(finished_at) AS first, MAX(finished_at) AS last FROM eval_jobs
+        {where} {'AND' if where else 'WHERE'} status = 'done' GROUP BY account ORDER BY account""", params, db_path)
+    span_s = (accounts['last'] - accounts['first']).where(lambda s: s > 0)
+    accounts['jobs_per_s'] = (accounts['done'] / span_s).round(2)
+    return counts, accounts.drop(columns=['first', 'last'])
+
+
+def retrieved_items(index_path, dataset, k, embeddings, region, db_path=None):
+    """Question rows with top-k contexts from an index_snapshot file (experiment_grid's retrieve stage)"""
+    from experiment_grid import stage_retrieve
+    return stage_retrieve({'dataset': dataset, 'embeddings': embeddings, 'k': k}, [{'path': index_path}],
+                          {'region': region, 'db_path': db_path})
+
+
+def bench(account_counts=(1, 2, 4), jobs=120, rate=10.0, burst=2.0, threads=4, time_scale=0.01):
+    """
+    Judge-job throughput with one stub worker process per account, every
+    account capped at `rate` calls/s (fresh temporary database per round).
+    """
+    rows = []
+    items = [{'pipeline': 'SAC-RAG', 'question_id': f'q{i}', 'question': f'Question {i} on Kenyan land law?',
+              'ground_truth': 'Section 7 of the Land Act.', 'answer': f'Answer {i} citing the Land Act.'}
+             for i in range(jobs)]
+    for n in account_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, 'queue.db')
+            queue = JobQueue(db)
+            queue.publish('bench', 'judge', judge_jobs(items, ['rubric']))
+            start = time.perf_counter()
+            procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), 'work', '--db', db,
+                                       '--account', f'bench{i}@us-east-1', '--rate', str(rate), '--burst', str(burst),
+                                       '--threads', str(threads), '--time-scale', str(time_scale), '--quiet'])
+                     for i in range(n)]
+            for proc in procs:
+                proc.wait()
+            elapsed = time.perf_counter() - start
+            counts, _ = queue_status(db_path=db)
+            queue.close()
+        done = int(counts.loc[counts['status'] == 'done', 'jobs'].sum())
+        rows.append({'accounts': n, 'jobs': done, 'seconds': elapsed, 'jobs_per_s': done / elapsed})
+    return rows
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed judge/generation workers over a SQLite job queue")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    pub = sub.add_parser('publish', help="Enqueue judge or generation jobs")
+    pub_sub = pub.add_subparsers(dest='kind', required=True)
+    p = pub_sub.add_parser('judge', help="Judge the answers in the side-by-side evaluation template")
+    p.add_argument('--suite', nargs='+', default=['rubric'], choices=['rubric', 'quality'])
+    p.add_argument('--answers', default='manual_evaluation_template.csv')
+    p.add_argument('--judge-model', default=DEFAULT_JUDGE_MODEL)
+    p = pub_sub.add_parser('generate', help="Generate answers (and optionally judge them) per model and retrieval")
+    p.add_argument('--models', nargs='+', default=['claude45'])
+    p.add_argument('--retrieval', nargs='+', default=['none'], choices=['none', 'base', 'sac'])
+    p.add_argument('--index', nargs='+', default=[], metavar='RETRIEVAL=SNAPSHOT',
+                   help="index_snapshot file for each of base/sac")
+    p.add_argument('--dataset', default='golden', choices=['golden', 'ragas', 'all'])
+    p.add_argument('--k', type=int, default=5)
+    p.add_argument('--embeddings', choices=['local', 'bedrock', 'onnx'], default='local')
+    p.add_argument('--region', default='us-east-1')
+    p.add_argument('--judge', nargs='*', default=[], choices=['rubric', 'quality'],
+                   help="Judge suites queued for each answer as it is generated")
+    p.add_argument('--judge-model', default=DEFAULT_JUDGE_MODEL)
+    for p in pub_sub.choices.values():
+        p.add_argument('--run-id')
+        p.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+        p.add_argument('--db')
+
+    p = sub.add_parser('work', help="Pull and run jobs until the queue is drained")
+    p.add_argument('--account', nargs='+', default=['default@us-east-1'], metavar='PROFILE@REGION')
+    p.add_argument('--rate', type=float, default=1.0, help="Calls/s per account and model, across all workers")
+    p.add_argument('--burst', type=float)
+    p.add_argument('--threads', type=int, default=4)
+    p.add_argument('--kind', nargs='+', choices=['judge', 'generate'])
+    p.add_argument('--lease', type=float, default=DEFAULT_LEASE_S)
+    p.add_argument('--service', default='local', choices=['local', 'bedrock'])
+    p.add_argument('--time-scale', type=float, default=1.0, help="Multiply stub latencies (local service)")
+    p.add_argument('--fault-rate', type=float, default=0.0, help="Throttle/5xx rate injected into the stubs")
+    p.add_argument('--forever', action='store_true', help="Keep polling after the queue is empty")
+    p.add_argument('--quiet', action='store_true')
+    p.add_argument('--db')
+
+    p = sub.add_parser('status', help="Job counts and per-account throughput")
+    p.add_argument('--run-id')
+    p.add_argument('--db')
+    p = sub.add_parser('requeue', help="Give failed jobs a fresh attempt budget")
+    p.add_argument('--run-id')
+    p.add_argument('--db')
+    p = sub.add_parser('bench', help="Throughput vs number of accounts (stub workers)")
+    p.add_argument('--accounts', nargs='+', type=int, default=[1, 2, 4])
+    p.add_argument('--jobs', type=int, default=120)
+    p.add_argument('--rate', type=float, default=10.0)
+    p.add_argument('--time-scale', type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    if args.command == 'publish':
+        queue = JobQueue(args.db)
+        if args.kind == 'judge':
+            from batch_judge import load_answers
+            run_id = args.run_id or datetime.now().strftime('judge-queue-%Y%m%d-%H%M%S')
+            added = queue.publish(run_id, 'judge', judge_jobs(load_answers(args.answers), args.suite,
+                                                              args.judge_model), args.max_attempts)
+        else:
+            from experiment_grid import PIPELINE_NAMES, load_question_set
+            indexes = dict(spec.split('=', 1) for spec in args.index)
+            missing = [r for r in args.retrieval if r != 'none' and r not in indexes]
+            if missing:
+                parser.error(f"--index {missing[0]}=<snapshot> is required for --retrieval {missing[0]}")
+            run_id = args.run_id or datetime.now().strftime('generate-queue-%Y%m%d-%H%M%S')
+            added = 0
+            for retrieval in args.retrieval:
+                items = load_question_set(args.dataset) if retrieval == 'none' else retrieved_items(
+                    indexes[retrieval], args.dataset, args.k, args.embeddings, args.region, args.db)
+                for model in args.models:
+                    added += queue.publish(run_id, 'generate', generation_jobs(
+                        items, PIPELINE_NAMES[retrieval], model, args.judge, args.judge_model), args.max_attempts)
+        print(f"📬 Published {added} new jobs under run_id={run_id} ({queue.pending(run_id)} pending)")
+        return 0
+
+    if args.command == 'work':
+        queue = JobQueue(args.db, lease_seconds=args.lease)
+        worker = Worker(queue, args.account, AccountRateLimiter(queue, args.rate, args.burst), args.service,
+                        args.threads, args.kind, args.time_scale, args.fault_rate)
+        if not args.quiet:
+            print(f"👷 {worker.name}: {len(args.account)} account(s) at {args.rate:g} calls/s each, "
+                  f"{args.threads} threads")
+        stats = worker.run(until_empty=not args.forever)
+        if not args.quiet:
+            for account, s in stats.items():
+                print(f"   {account:<24} done {s['done']}, retried {s['retried']}, failed {s['failed']}, "
+                      f"lost lease {s['lost']}")
+        return 0
+
+    if args.command == 'status':
+        counts, accounts = queue_status(args.run_id, args.db)
+        if counts.empty:
+            print("Queue is empty")
+            return 0
+        print(counts.to_string(index=False))
+        if not accounts.empty:
+            print()
+            print(accounts.to_string(index=False))
+        return 0
+
+    if args.command == 'requeue':
+        print(f"🔁 Requeued {JobQueue(args.db).requeue(args.run_id)} failed jobs")
+        return 0
+
+    rows = bench(args.accounts, args.jobs, args.rate, time_scale=args.time_scale)
+    print(f"{'accounts':>8} {'jobs':>6} {'seconds':>8} {'jobs/s':>8}")
+    for r in rows:
+        print(f"{r['accounts']:>8} {r['jobs']:>6} {r['seconds']:>8.2f} {r['jobs_per_s']:>8.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
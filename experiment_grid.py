@@ -0,0 +1,620 @@
+"""
+Experiment Grid Scheduler
+Expands an ablation grid (generation model x retrieval x judge suite) into a
+DAG of stages
+
+    parse -> chunk -> [summarize] -> embed -> index -> retrieve -> generate -> judge -> aggregate -> chart
+
+and runs it with independent branches in parallel. Every stage's output is
+a content-addressed artifact: its key hashes the stage name, its parameters,
+the keys of its inputs and the stage function's source (the same scheme
+chart_pipeline.py uses for figures). The parameters include the service
+(local stubs or Bedrock), the resolved LLM, judge and embedding model ids,
+and a digest of the prompt templates, judge suites, chunkers and backend
+builders the stage calls, so changing any of them reruns the stage. Keys are computed before anything runs,
+so a stage whose key already exists in experiment_artifacts/ is reused by
+every run and every grid cell that needs it. Adding a model to the grid
+therefore only runs its generate and judge stages, plus the aggregate and
+chart at the end.
+
+Artifacts are pickles under experiment_artifacts/<stage>/<key>.pkl (indexes
+are index_snapshot files next to them); the experiment_artifacts and
+experiment_runs tables in the results store record what was built, and each
+run's judge scores land in judge_scores (source 'grid') for the charts.
+
+Usage:
+    python experiment_grid.py plan --models claude35 claude45 --retrieval base sac none --judge rubric
+    python experiment_grid.py run --models claude35 claude45 --retrieval base sac none --judge rubric quality
+    python experiment_grid.py run --service bedrock --dataset golden --workers 8
+    python experiment_grid.py run --corpus corpus/ --splitter legal --force generate
+    python experiment_grid.py run --corpus corpus/ --splitter legal --filter   # metadata-filtered retrieval
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+from datetime import datetime
+from pathlib import Path
+
+import results_store
+from tracing import span
+
+ARTIFACT_DIR = Path('experiment_artifacts')
+RESULTS_CSV = 'experiment_grid_results.csv'
+CHART_PATH = 'thesis_visualizations/experiment_grid.png'
+
+MODELS = {
+    'claude35': 'anthropic.claude-3-5-sonnet-20240620-v1:0',
+    'claude45': 'us.anthropic.claude-sonnet-4-5-20250929-v1:0',
+}
+RETRIEVALS = ['base', 'sac', 'none']
+PIPELINE_NAMES = {'base': 'Base RAG', 'sac': 'SAC-RAG', 'none': 'Generic Claude'}
+STAGES = ['parse', 'chunk', 'summarize', 'embed', 'index', 'retrieve', 'generate', 'judge', 'aggregate', 'chart']
+GOLDEN_SOURCES = ('base_rag_golden_detailed.csv', 'sac_rag_golden_detailed.csv')
+
+SUMMARY_PROMPT = """Summarize the following Kenyan legal document in 2-3 sentences, naming the
+statute or case, the court or issuing body, and its main subject.
+
+{document}
+
+**Summary:**"""
+
+results_store.register_schema("""
+CREATE TABLE IF NOT EXISTS experiment_artifacts (
+    key TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    params TEXT,
+    inputs TEXT,
+    path TEXT NOT NULL,
+    seconds REAL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS experiment_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    seconds REAL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_experiment_runs_run ON experiment_runs (run_id);
+""")
+
+
+def file_digest(paths):
+    """sha256 over the contents of files (and files under directories), for source-data params"""
+    digest = hashlib.sha256()
+    for path in map(Path, paths):
+        files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+        for f in files:
+            digest.update(str(f).encode('utf-8'))
+            digest.update(f.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def source_digest(*objects):
+    """sha256 over the source of functions, classes and modules, and the text of templates and constants"""
+    digest = hashlib.sha256()
+    for obj in objects:
+        if inspect.ismodule(obj) or inspect.isclass(obj) or inspect.isfunction(obj):
+            text = inspect.getsource(obj)
+        else:
+            text = obj if isinstance(obj, str) else json.dumps(obj, sort_keys=True, default=str)
+        digest.update(text.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+# ============================================================
+# Stages: fn(params, inputs, ctx) -> artifact
+# ============================================================
+def stage_parse(params, inputs, ctx):
+    """[{doc_id, title, text}] from a legal corpus directory, or the golden answers stand-in corpus"""
+    if params['corpus']:
+        from legal_chunker import load_corpus
+        documents = load_corpus([params['corpus']])
+    else:
+        import pandas as pd
+        documents = [(f'golden-{i}', text) for i, text in enumerate(
+            text for path in GOLDEN_SOURCES for text in pd.read_csv(path)['answer'].dropna().tolist())]
+    return [{'doc_id': i, 'title': title, 'text': text} for i, (title, text) in enumerate(documents)]
+
+
+def stage_chunk(params, inputs, ctx):
+    """[{doc_id, text, metadata}] with the window or legal-structure splitter"""
+    (documents,) = inputs
+    chunks = []
+    for doc in documents:
+        if params['splitter'] == 'legal':
+            from legal_chunker import chunk_document
+            pieces = chunk_document(doc['text'], title=doc['title'], doc_id=doc['doc_id'],
+                                    max_chars=params['chunk_size'], overlap=params['overlap'])
+        else:
+            from stub_backends import chunk_text
+            pieces = [(text, {'doc_id': doc['doc_id']})
+                      for text in chunk_text(doc['text'], params['chunk_size'], params['overlap'])]
+        chunks += [{'doc_id': doc['doc_id'], 'text': text, 'metadata': meta} for text, meta in pieces]
+    return chunks
+
+
+def stage_summarize(params, inputs, ctx):
+    """{doc_id: summary} (SAC document summaries)"""
+    (documents,) = inputs
+    if ctx['service'] != 'bedrock':
+        # same stand-in summaries as rag_benchmark.build_stub_corpus
+        return {doc['doc_id']: "Document Summary: " + str(doc['text'])[:300].replace('\n', ' ') for doc in documents}
+    from resilience import invoke_with_retry, is_failure
+    llm = build_llm(params['model'], ctx)
+
+    def summarize(doc):
+        text = invoke_with_retry(llm, SUMMARY_PROMPT.format(document=doc['text'][:params['max_chars']]))
+        return doc['doc_id'], '' if is_failure(text) else "Document Summary: " + text.strip()
+    return dict(_parallel(summarize, documents, ctx['workers']))
+
+
+def stage_embed(params, inputs, ctx):
+    """{ids, texts, vectors, metadatas}; SAC chunks carry their document summary as a prefix"""
+    from retrieval_eval import EmbeddingCache, build_embeddings, chunk_key
+    chunks = inputs[0]
+    summaries = inputs[1] if len(inputs) > 1 else None
+    texts = [(summaries[c['doc_id']] + "\n\n" + c['text']) if summaries else c['text'] for c in chunks]
+    embeddings, model_id = build_embeddings(params['embeddings'], ctx['region'], onnx_model=params.get('onnx_model'))
+    vectors = EmbeddingCache(embeddings, model_id, ctx['db_path']).embed(texts)
+    return {'ids': [chunk_key(t) for t in texts], 'texts': texts, 'vectors': vectors,
+            'metadatas': [c['metadata'] for c in chunks], 'model_id': model_id}
+
+
+def stage_index(params, inputs, ctx):
+    """An index_snapshot file (exact search, or HNSW when params['hnsw'])"""
+    from index_snapshot import write_snapshot
+    (embedded,) = inputs
+    hnsw = None
+    if params['hnsw']:
+        from filtered_search import build_hnsw
+        hnsw = build_hnsw(embedded['vectors'])
+    path = ctx['file_path'].with_suffix('.snap')
+    write_snapshot(str(path), embedded['ids'], embedded['texts'], embedded['vectors'], embedded['metadatas'], hnsw,
+                   extra={'embedding_model': embedded['model_id']})
+    return {'path': str(path), 'model_id': embedded['model_id']}
+
+
+def stage_retrieve(params, inputs, ctx):
+    """[{question_id, question, ground_truth, contexts, context_ids}] top-k per question"""
+    from index_snapshot import SnapshotIndex
+    from retrieval_eval import EmbeddingCache, build_embeddings
+    index_artifact, questions = inputs[0], load_question_set(params['dataset'])
+    embeddings, model_id = build_embeddings(params['embeddings'], ctx['region'], onnx_model=params.get('onnx_model'))
+    query_vectors = EmbeddingCache(embeddings, model_id, ctx['db_path']).embed([q['question'] for q in questions])
+    index = SnapshotIndex(index_artifact['path'])
+    where_for = None
+    if params.get('filter'):
+        from filtered_search import question_filter
+        where_for = question_filter(index.postings().values('act'))
+    retrieved = []
+    for question, vector in zip(questions, query_vectors):
+        where = where_for(question['question']) if where_for else None
+        if where and index.postings().count(where):
+            rows, _ = index.search(vector, params['k'], where=where)
+        else:
+            # no structural reference, or nothing matches it: search the full index
+            rows, _ = index.search(vector, params['k'])
+        retrieved.append({**question, 'contexts': [index.text(r) for r in rows],
+                          'context_ids': [index.chunk_id(r) for r in rows]})
+    return retrieved
+
+
+def stage_generate(params, inputs, ctx):
+    """[{question_id, question, ground_truth, answer, context_ids}] from one model"""
+    from rag_pipelines import GENERIC_PROMPT, RAG_PROMPT
+    from resilience import invoke_with_retry, is_failure
+    items = inputs[0] if inputs else load_question_set(params['dataset'])
+    llm = build_llm(params['model'], ctx)
+
+    def generate(item):
+        if 'contexts' in item:
+            prompt = RAG_PROMPT.format(context="\n\n---\n\n".join(item['contexts']), question=item['question'])
+        else:
+            prompt = GENERIC_PROMPT.format(question=item['question'])
+        text = invoke_with_retry(llm, prompt)
+        return {**{key: item[key] for key in ('question_id', 'question', 'ground_truth')},
+                'answer': None if is_failure(text) else text, 'context_ids': item.get('context_ids', [])}
+    return _parallel(generate, items, ctx['workers'])
+
+
+def stage_judge(params, inputs, ctx):
+    """[{question_id, metric, score, raw_response}] for one judge suite"""
+    from batch_judge import JUDGE_SUITES
+    from judge_parsing import parse_score
+    from resilience import invoke_with_retry
+    (answers,) = inputs
+    llm = build_judge(params['judge_model'], ctx)
+    jobs = [(item, metric, template, scale) for item in answers if item['answer']
+            for metric, template, scale in JUDGE_SUITES[params['suite']]]
+
+    def judge(job):
+        item, metric, template, scale = job
+        text = invoke_with_retry(llm, template.format(question=item['question'], answer=item['answer'],
+                                                      ground_truth=item['ground_truth']))
+        score, _ = parse_score(text, scale)
+        return {'question_id': item['question_id'], 'metric': metric, 'score': score, 'raw_response': str(text)}
+    return _parallel(judge, jobs, ctx['workers'])
+
+
+def stage_aggregate(params, inputs, ctx):
+    """[{model, retrieval, suite, metric, mean, n}] over every cell's judge scores"""
+    import numpy as np
+    from resilience import is_failure
+    rows = []
+    for cell, scores in zip(params['cells'], inputs):
+        by_metric = {}
+        for s in scores:
+            if not is_failure(s['score']):
+                by_metric.setdefault(s['metric'], []).append(s['score'])
+        rows += [{**cell, 'metric': metric, 'mean': float(np.mean(values)), 'n': len(values)}
+                 for metric, values in sorted(by_metric.items())]
+    return rows
+
+
+def stage_chart(params, inputs, ctx):
+    """Grouped bars (model x retrieval) per judge metric"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    table = pd.DataFrame(inputs[0])
+    path = ctx['file_path'].with_suffix('.png')
+    if table.empty:
+        path.write_bytes(b'')
+        return {'path': str(path)}
+    metrics = sorted(table['metric'].unique())
+    fig, axes = plt.subplots(1, len(metrics), figsize=(6 * len(metrics), 5), squeeze=False)
+    for ax, metric in zip(axes[0], metrics):
+        pivot = table[table['metric'] == metric].pivot_table(index='model', columns='retrieval', values='mean')
+        pivot.plot.bar(ax=ax, rot=0)
+        ax.set_title(metric)
+        ax.set_xlabel('')
+        ax.set_ylabel('mean score')
+    fig.suptitle('Experiment grid: judge scores by model and retrieval')
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+    return {'path': str(path)}
+
+
+STAGE_FUNCTIONS = {
+    'parse': stage_parse, 'chunk': stage_chunk, 'summarize': stage_summarize, 'embed': stage_embed,
+    'index': stage_index, 'retrieve': stage_retrieve, 'generate': stage_generate, 'judge': stage_judge,
+    'aggregate': stage_aggregate, 'chart': stage_chart,
+}
+
+
+# ============================================================
+# Backends and Inputs
+# ============================================================
+def llm_model_id(model, service):
+    """The model id build_llm / build_judge call for a MODELS key or Bedrock id"""
+    return MODELS.get(model, model) if service == 'bedrock' else f'stub.{model}'
+
+
+def embedding_model_id(embeddings, onnx_model=None):
+    """The id build_embeddings reports, without loading the model (ONNX ids also hash the model files)"""
+    from retrieval_eval import EMBEDDING_MODEL_ID, STUB_EMBEDDING_MODEL_ID
+    if embeddings == 'bedrock':
+        return EMBEDDING_MODEL_ID
+    if embeddings == 'onnx':
+        from onnx_embeddings import DEFAULT_ONNX_MODEL
+        model_dir = Path(onnx_model or DEFAULT_ONNX_MODEL)
+        return f"onnx:{model_dir.name}@{file_digest(sorted(model_dir.glob('*.onnx')))}"
+    return STUB_EMBEDDING_MODEL_ID
+
+
+def backend_code(service, *helpers):
+    """Digest of what produces a stage's LLM output: the Bedrock builders, or the stub responders"""
+    if service == 'bedrock':
+        return source_digest(*helpers)
+    from stub_backends import StubLLM
+    return source_digest(*helpers, StubLLM)
+
+
+def build_llm(model, ctx):
+    if ctx['service'] == 'bedrock':
+        from langchain_aws import ChatBedrock
+        return ChatBedrock(model_id=MODELS.get(model, model), region_name=ctx['region'],
+                           model_kwargs={'temperature': 0, 'max_tokens': 2048})
+    from stub_backends import StubLLM
+    return StubLLM(model_id=f'stub.{model}', time_scale=ctx['time_scale'])
+
+
+def build_judge(model, ctx):
+    if ctx['service'] == 'bedrock':
+        from langchain_aws import ChatBedrock
+        return ChatBedrock(model_id=MODELS.get(model, model), region_name=ctx['region'],
+                           model_kwargs={'temperature': 0, 'max_tokens': 16})
+    from batch_judge import _stub_judge
+    from stub_backends import StubLLM
+    return StubLLM(responder=_stub_judge, model_id=f'stub.{model}', time_scale=ctx['time_scale'])
+
+
+def load_question_set(dataset):
+    """[{question_id, question, ground_truth}] for the golden and/or RAGAS questions"""
+    import pandas as pd
+    from rag_pipelines import question_key
+    questions = []
+    if dataset in ('golden', 'all'):
+        golden = pd.read_csv('manual_evaluation_template.csv')
+        questions += [{'question_id': row['Question_ID'], 'question': row['Question'],
+                       'ground_truth': row['Ground_Truth']} for _, row in golden.iterrows()]
+    if dataset in ('ragas', 'all'):
+        questions += [{'question_id': question_key(q), 'question': q, 'ground_truth': 'No ground truth available'}
+                      for q in pd.read_csv('ragas_synthetic_dataset.csv')['question']]
+    return questions
+
+
+def _parallel(fn, items, workers):
+    from concurrent.futures import ThreadPoolExecutor
+    if workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, items))
+
+
+# ============================================================
+# DAG
+# ============================================================
+class Node:
+    """One stage invocation; `key` addresses its artifact"""
+
+    def __init__(self, stage, params, inputs=()):
+        self.stage = stage
+        self.params = params
+        self.inputs = list(inputs)
+        payload = json.dumps({'stage': stage, 'params': params, 'inputs': [n.key for n in self.inputs],
+                              'source': inspect.getsource(STAGE_FUNCTIONS[stage])}, sort_keys=True, default=str)
+        self.key = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def __repr__(self):
+        return f'{self.stage}:{self.key}'
+
+
+def build_grid(models, retrievals, suites, dataset='golden', corpus=None, splitter='window', chunk_size=1000,
+               overlap=200, k=5, embeddings='local', onnx_model=None, judge_model='claude45',
+               summary_model='claude45', hnsw=False, service='local', filter=False):
+    """(nodes in dependency order, cells [{model, retrieval, suite}], aggregate node, chart node)"""
+    import legal_chunker
+    from batch_judge import JUDGE_SUITES, _stub_judge
+    from filtered_search import build_hnsw, question_filter, to_where
+    from index_snapshot import SnapshotIndex, write_snapshot
+    from judge_parsing import parse_score
+    from rag_pipelines import GENERIC_PROMPT, RAG_PROMPT
+    from retrieval_eval import build_embeddings, chunk_key
+    from stub_backends import chunk_text
+    nodes = {}
+
+    def node(stage, params, *inputs):
+        n = Node(stage, params, inputs)
+        return nodes.setdefault(n.key, n)
+
+    source = [corpus] if corpus else list(GOLDEN_SOURCES)
+    questions_digest = file_digest(['manual_evaluation_template.csv', 'ragas_synthetic_dataset.csv'])
+    embed_params = {'embeddings': embeddings, 'onnx_model': onnx_model,
+                    'model_id': embedding_model_id(embeddings, onnx_model),
+                    'code': source_digest(build_embeddings, chunk_key)}
+    parse = node('parse', {'corpus': corpus, 'sources': file_digest(source),
+                           'code': source_digest(legal_chunker.load_corpus) if corpus else ''})
+    chunker = legal_chunker if splitter == 'legal' else chunk_text
+    chunk = node('chunk', {'splitter': splitter, 'chunk_size': chunk_size, 'overlap': overlap,
+                           'code': source_digest(chunker)}, parse)
+
+    retrieved = {}
+    for retrieval in retrievals:
+        if retrieval == 'none':
+            continue
+        if retrieval == 'sac':
+            summaries = node('summarize', {'model': summary_model, 'service': service,
+                                           'model_id': llm_model_id(summary_model, service), 'max_chars': 8000,
+                                           'code': backend_code(service, SUMMARY_PROMPT, build_llm)}, parse)
+            embedded = node('embed', embed_params, chunk, summaries)
+        else:
+            embedded = node('embed', embed_params, chunk)
+        index = node('index', {'hnsw': hnsw, 'code': source_digest(write_snapshot, *([build_hnsw] if hnsw else []))},
+                     embedded)
+        # unfiltered retrieval keeps its original key (and cached artifacts)
+        filter_params = {'filter': True, 'filter_code': source_digest(
+            legal_chunker.query_filters, legal_chunker.act_matches, legal_chunker.canonical_act, question_filter,
+            to_where)} if filter else {}
+        retrieved[retrieval] = node('retrieve', {**embed_params, 'dataset': dataset, 'questions': questions_digest,
+                                                 'k': k, 'search_code': source_digest(SnapshotIndex), **filter_params},
+                                    index)
+
+    cells, judged = [], []
+    generate_code = backend_code(service, RAG_PROMPT, GENERIC_PROMPT, build_llm)
+    for model in models:
+        for retrieval in retrievals:
+            generate_params = {'model': model, 'service': service, 'model_id': llm_model_id(model, service),
+                               'dataset': dataset, 'questions': questions_digest, 'code': generate_code}
+            inputs = [retrieved[retrieval]] if retrieval in retrieved else []
+            generated = node('generate', generate_params, *inputs)
+            for suite in suites:
+                cells.append({'model': model, 'retrieval': retrieval, 'suite': suite})
+                judge_code = backend_code(service, JUDGE_SUITES[suite], parse_score, build_judge,
+                                          *([] if service == 'bedrock' else [_stub_judge]))
+                judged.append(node('judge', {'suite': suite, 'judge_model': judge_model, 'service': service,
+                                             'model_id': llm_model_id(judge_model, service), 'code': judge_code},
+                                   generated))
+    aggregate = node('aggregate', {'cells': cells}, *judged)
+    chart = node('chart', {}, aggregate)
+    return list(nodes.values()), cells, aggregate, chart
+
+
+class ArtifactStore:
+    """Pickled stage outputs under root/<stage>/<key>.pkl"""
+
+    def __init__(self, root=ARTIFACT_DIR):
+        self.root = Path(root)
+
+    def path(self, node):
+        return self.root / node.stage / f'{node.key}.pkl'
+
+    def exists(self, node):
+        return self.path(node).exists()
+
+    def load(self, node):
+        with open(self.path(node), 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, node, artifact):
+        path = self.path(node)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)                                      # a crash never leaves a half-written artifact
+
+
+def plan(nodes, store, force=()):
+    """{node key: 'cached' | 'run'} (a stage reruns if forced, missing, or anything upstream reruns)"""
+    status = {}
+    for n in nodes:                                               # nodes are in dependency order
+        rerun = n.stage in force or not store.exists(n) or any(status[i.key] == 'run' for i in n.inputs)
+        status[n.key] = 'run' if rerun else 'cached'
+    return status
+
+
+def run_dag(nodes, store, ctx, workers=4, force=(), run_id=None, db_path=None):
+    """Run every node that is not cached, in parallel where the DAG allows; returns {key: status}"""
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    status = plan(nodes, store, force)
+    done = {key for key, s in status.items() if s == 'cached'}
+    pending = [n for n in nodes if n.key not in done]
+    log = [{'run_id': run_id, 'stage': n.stage, 'key': n.key, 'status': 'cached', 'seconds': 0.0}
+           for n in nodes if n.key in done]
+
+    def execute(n):
+        start = time.perf_counter()
+        (store.root / n.stage).mkdir(parents=True, exist_ok=True)
+        with span(f'grid.{n.stage}', key=n.key):
+            artifact = STAGE_FUNCTIONS[n.stage](n.params, [store.load(i) for i in n.inputs],
+                                                {**ctx, 'file_path': store.path(n)})
+        store.save(n, artifact)
+        return time.perf_counter() - start
+
+    artifacts = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while pending or running:
+            for n in [n for n in pending if all(i.key in done for i in n.inputs)]:
+                pending.remove(n)
+                running[pool.submit(execute, n)] = n
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                n = running.pop(future)
+                seconds = future.result()
+                done.add(n.key)
+                print(f"   ✓ {n.stage:<10} {n.key} ({seconds:.1f}s)")
+                log.append({'run_id': run_id, 'stage': n.stage, 'key': n.key, 'status': 'ran', 'seconds': seconds})
+                artifacts.append({'key': n.key, 'stage': n.stage, 'params': json.dumps(n.params, default=str),
+                                  'inputs': json.dumps([i.key for i in n.inputs]), 'path': str(store.path(n)),
+                                  'seconds': seconds})
+    conn = results_store.connect(db_path)
+    try:
+        with results_store.transaction(conn):
+            conn.executemany("DELETE FROM experiment_artifacts WHERE key = ?", [(a['key'],) for a in artifacts])
+        results_store.insert_rows(conn, 'experiment_artifacts', artifacts)
+        results_store.insert_rows(conn, 'experiment_runs', log)
+    finally:
+        conn.close()
+    return {entry['key']: entry['status'] for entry in log}
+
+
+def store_scores(run_id, cells, judge_artifacts, db_path=None):
+    """Every cell's judge scores into judge_scores (pipeline 'SAC-RAG / claude45', source 'grid')"""
+    rows = [{'run_id': run_id, 'suite': cell['suite'], 'pipeline': f"{PIPELINE_NAMES[cell['retrieval']]} / {cell['model']}",
+             'question_id': s['question_id'], 'metric': s['metric'], 'score': s['score'],
+             'raw_response': s['raw_response'], 'source': 'grid'}
+            for cell, scores in zip(cells, judge_artifacts) for s in scores]
+    conn = results_store.connect(db_path)
+    try:
+        results_store.insert_rows(conn, 'judge_scores', rows)
+    finally:
+        conn.close()
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Experiment grid scheduler with content-addressed stage artifacts")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('plan', "Show which stages would run and which are reused"),
+                               ('run', "Run the grid")):
+        p = sub.add_parser(command, help=help_text)
+        p.add_argument('--models', nargs='+', default=sorted(MODELS), help="Keys of MODELS or Bedrock model ids")
+        p.add_argument('--retrieval', nargs='+', choices=RETRIEVALS, default=RETRIEVALS)
+        p.add_argument('--judge', nargs='+', choices=['rubric', 'quality'], default=['rubric'])
+        p.add_argument('--judge-model', default='claude45')
+        p.add_argument('--dataset', choices=['golden', 'ragas', 'all'], default='golden')
+        p.add_argument('--corpus', help="Legal corpus directory (default: the golden-answer stand-in corpus)")
+        p.add_argument('--splitter', choices=['window', 'legal'], default='window')
+        p.add_argument('--chunk-size', type=int, default=1000)
+        p.add_argument('--overlap', type=int, default=200)
+        p.add_argument('--k', type=int, default=5)
+        p.add_argument('--embeddings', choices=['local', 'bedrock', 'onnx'], default='local')
+        p.add_argument('--onnx-model')
+        p.add_argument('--hnsw', action='store_true', help="Build HNSW graphs into the index snapshots")
+        p.add_argument('--filter', action='store_true',
+                       help="Pre-filter retrieval on the sections/Acts/courts a question names (legal splitter metadata)")
+        p.add_argument('--force', nargs='+', choices=STAGES, default=[], help="Rerun these stages (and downstream)")
+        p.add_argument('--artifacts', default=str(ARTIFACT_DIR))
+        p.add_argument('--service', choices=['local', 'bedrock'], default='local',
+                       help="Stub backends or Bedrock for summarize/generate/judge (part of every stage key)")
+    p.add_argument('--region', default='us-east-1')
+    p.add_argument('--time-scale', type=float, default=0.0, help="Stub latency multiplier (local service)")
+    p.add_argument('--workers', type=int, default=4, help="Stages in parallel, and calls in parallel per stage")
+    p.add_argument('--run-id')
+    p.add_argument('--output', default=RESULTS_CSV)
+    p.add_argument('--chart', default=CHART_PATH)
+    p.add_argument('--db')
+    args = parser.parse_args(argv)
+
+    nodes, cells, aggregate, chart = build_grid(
+        args.models, args.retrieval, args.judge, args.dataset, args.corpus, args.splitter, args.chunk_size,
+        args.overlap, args.k, args.embeddings, args.onnx_model, args.judge_model, hnsw=args.hnsw,
+        service=args.service, filter=args.filter)
+    store = ArtifactStore(args.artifacts)
+    status = plan(nodes, store, set(args.force))
+    to_run = [n for n in nodes if status[n.key] == 'run']
+    print(f"Grid: {len(args.models)} models x {len(args.retrieval)} retrieval x {len(args.judge)} judge "
+          f"= {len(cells)} cells, {len(nodes)} stages ({len(nodes) - len(to_run)} reused, {len(to_run)} to run)")
+    for stage in STAGES:
+        counts = [status[n.key] for n in nodes if n.stage == stage]
+        if counts:
+            print(f"   {stage:<10} {counts.count('run')} to run, {counts.count('cached')} reused")
+    if args.command == 'plan':
+        return 0
+
+    run_id = args.run_id or datetime.now().strftime('grid-%Y%m%d-%H%M%S')
+    ctx = {'service': args.service, 'region': args.region, 'time_scale': args.time_scale,
+           'workers': args.workers, 'db_path': args.db}
+    start = time.perf_counter()
+    run_dag(nodes, store, ctx, args.workers, set(args.force), run_id, args.db)
+    judge_nodes = aggregate.inputs
+    store_scores(run_id, cells, [store.load(n) for n in judge_nodes], args.db)
+
+    import pandas as pd
+    table = pd.DataFrame(store.load(aggregate))
+    table.to_csv(args.output, index=False)
+    chart_path = Path(store.load(chart)['path'])
+    if chart_path.stat().st_size:
+        Path(args.chart).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.chart).write_bytes(chart_path.read_bytes())
+    print(f"\n✅ run_id={run_id} in {time.perf_counter() - start:.1f}s; {args.output}, {args.chart}")
+    if not table.empty:
+        print(table.pivot_table(index=['model', 'retrieval'], columns='metric', values='mean').round(3).to_string())
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+Metadata Pre-Filtered Vector Search
+Restricts vector search to chunks whose metadata (document type, Act / Cap
+number, court, decision year, section...) match a predicate, before ranking
+instead of after.
+
+- PostingIndex keeps one packed bitmap per (field, value); a Chroma-style
+  `where` ({'court': 'Supreme Court', 'year': {'$gte': 2015}}, $and/$or/$in/
+  $nin/$ne/$gt/$gte/$lt/$lte) is answered with bitwise AND/OR over those
+  bitmaps - no scan of the metadata.
+- FilteredSearcher plans each query from the predicate's selectivity:
+  * few matching chunks  -> exact search over just those rows (posting list)
+                            (no hnswlib and a broad predicate: score all rows,
+                            mask the non-matching ones)
+  * many matching chunks -> HNSW traversal with the bitmap as the filter
+                            callback (hnswlib >= 0.7), so non-matching nodes
+                            are skipped during the walk rather than dropped
+                            from a post-filtered top k
+  Without hnswlib every query is the exact search over the matching rows.
+- to_where() / question_where() turn legal_chunker.query_filters() output
+  into a `where`. Questions name Acts loosely ("Succession Act"), so given
+  the index's act values an 'act' filter becomes $in over every indexed Act
+  it matches (legal_chunker.act_matches) rather than an exact $eq.
+  BaseRAGPipeline(filter_fn=question_filter(acts)) passes it to Chroma
+  (which pre-filters the same way) or to the stub vector store, and
+  `experiment_grid.py run --filter` retrieves through it.
+
+Usage:
+    python filtered_search.py bench --chunks 5000 20000 50000 --selectivity 0.01 0.1 0.5
+"""
+
+import argparse
+import statistics
+import time
+
+from tracing import span
+
+BRUTE_FORCE_BELOW = 5000
+MASKED_ABOVE = 0.3          # exact path: gather matching rows below this match rate, mask scores above
+NUMERIC_OPS = {'$gt', '$gte', '$lt', '$lte'}
+
+
+class PostingIndex:
+    """Packed bitmaps per (field, value) over a list of metadata dicts"""
+
+    def __init__(self, metadatas, fields=None):
+        import numpy as np
+        self.n = len(metadatas)
+        values = {}
+        for row, meta in enumerate(metadatas):
+            for field, value in meta.items():
+                if fields is None or field in fields:
+                    values.setdefault(field, {}).setdefault(value, []).append(row)
+        self._bitmaps = {}
+        for field, postings in values.items():
+            self._bitmaps[field] = {}
+            for value, rows in postings.items():
+                bits = np.zeros(self.n, dtype=bool)
+                bits[rows] = True
+                self._bitmaps[field][value] = np.packbits(bits)
+        self._empty = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+        self._full = np.packbits(np.ones(self.n, dtype=bool))
+
+    @property
+    def fields(self):
+        return sorted(self._bitmaps)
+
+    def values(self, field):
+        return sorted(self._bitmaps.get(field, {}), key=str)
+
+    def _union(self, field, keep):
+        import numpy as np
+        out = self._empty.copy()
+        for value, bits in self._bitmaps.get(field, {}).items():
+            if keep(value):
+                np.bitwise_or(out, bits, out=out)
+        return out
+
+    def _field(self, field, condition):
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        out = self._full.copy()
+        for op, operand in condition.items():
+            if op == '$eq':
+                bits = self._bitmaps.get(field, {}).get(operand, self._empty)
+            elif op == '$ne':
+                bits = ~self._bitmaps.get(field, {}).get(operand, self._empty)
+            elif op == '$in':
+                bits = self._union(field, lambda v: v in operand)
+            elif op == '$nin':
+                bits = ~self._union(field, lambda v: v in operand)
+            elif op in NUMERIC_OPS:
+                compare = {'$gt': lambda v: v > operand, '$gte': lambda v: v >= operand,
+                           '$lt': lambda v: v < operand, '$lte': lambda v: v <= operand}[op]
+                bits = self._union(field, lambda v: isinstance(v, (int, float)) and compare(v))
+            else:
+                raise ValueError(f"Unsupported operator {op!r} on {field!r}")
+            out &= bits
+        return out
+
+    def bitmap(self, where=None):
+        """Packed bitmap of the rows matching `where` (all rows for None/{})"""
+        if not where:
+            return self._full.copy()
+        out = self._full.copy()
+        for key, condition in where.items():
+            if key == '$and':
+                for clause in condition:
+                    out &= self.bitmap(clause)
+            elif key == '$or':
+                union = self._empty.copy()
+                for clause in condition:
+                    union |= self.bitmap(clause)
+                out &= union
+            else:
+                out &= self._field(key, condition)
+        return out
+
+    def mask(self, where=None):
+        """Boolean row mask"""
+        import numpy as np
+        return np.unpackbits(self.bitmap(where), count=self.n).astype(bool)
+
+    def rows(self, where=None):
+        import numpy as np
+        return np.flatnonzero(self.mask(where))
+
+    def count(self, where=None):
+        import numpy as np
+        return int(np.unpackbits(self.bitmap(where), count=self.n).sum())
+
+
+def to_where(filters, acts=None):
+    """
+    legal_chunker.query_filters() dict -> Chroma `where` (None when empty).
+    With `acts` (the indexed act values), an 'act' filter matches every Act
+    whose name contains it, as legal_chunker.matches() does.
+    """
+    from legal_chunker import act_matches
+    clauses = []
+    for field, value in filters.items():
+        if field == 'act' and acts is not None:
+            matching = [act for act in acts if act_matches(value, act)]
+            value = {'$in': matching} if matching else value     # Chroma rejects an empty $in
+        clauses.append({field: value})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def question_where(question, acts=None):
+    """`where` for the structural references in a question"""
+    from legal_chunker import query_filters
+    return to_where(query_filters(question), acts)
+
+
+def question_filter(acts):
+    """Pipeline filter_fn resolving Act names against `acts` (e.g. PostingIndex.values('act'))"""
+    acts = list(acts)
+    return lambda question: question_where(question, acts)
+
+
+# ============================================================
+# Search
+# ============================================================
+def build_hnsw(vectors, M=16, ef_construction=100, ef=64, space='cosine', threads=-1):
+    """hnswlib index over `vectors` (labels = row numbers)"""
+    import hnswlib
+    import numpy as np
+    index = hnswlib.Index(space=space, dim=vectors.shape[1])
+    index.init_index(max_elements=max(len(vectors), 1), M=M, ef_construction=ef_construction)
+    index.add_items(vectors, np.arange(len(vectors)), num_threads=threads)
+    index.set_ef(ef)
+    return index
+
+
+class FilteredSearcher:
+    """
+    Top-k cosine search restricted to a metadata predicate. `hnsw` is an
+    optional hnswlib index over the same rows; queries whose predicate
+    matches fewer than `brute_force_below` rows are answered exactly.
+    """
+
+    def __init__(self, vectors, metadatas, hnsw=None, brute_force_below=BRUTE_FORCE_BELOW):
+        import numpy as np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.where(norms == 0, 1, norms)
+        self.postings = PostingIndex(metadatas)
+        self.hnsw = hnsw
+        self.brute_force_below = brute_force_below
+        self.last_plan = None
+
+    def _exact(self, query, k, rows=None):
+        import numpy as np
+        candidates = self.vectors if rows is None else self.vectors[rows]
+        scores = candidates @ query
+        k = min(k, len(scores))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def search(self, query, k=5, where=None):
+        """(row ids, cosine scores) best first; fewer than k rows only if fewer match"""
+        import numpy as np
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        matching = self.postings.count(where) if where else len(self.vectors)
+        if self.hnsw is not None and matching >= self.brute_force_below:
+            plan = 'hnsw' if not where else 'hnsw+filter'
+            allowed = self.postings.mask(where) if where else None
+            self.hnsw.set_ef(max(self.hnsw.ef, k))
+            labels, distances = self.hnsw.knn_query(
+                query, k=min(k, matching), num_threads=1,
+                filter=(lambda label: bool(allowed[label])) if where else None)
+            rows, scores = labels[0].astype(np.int64), 1 - distances[0]
+        elif where and matching < MASKED_ABOVE * len(self.vectors):
+            plan = 'exact-subset'
+            rows, scores = self._exact(query, k, self.postings.rows(where))
+        elif where:
+            # broad predicate: scoring every row and masking beats gathering most of the matrix
+            plan = 'exact-masked'
+            scores = self.vectors @ query
+            scores[~self.postings.mask(where)] = -np.inf
+            k = min(k, matching)
+            rows = np.argpartition(-scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+            rows = rows[np.argsort(-scores[rows], kind='stable')]
+            scores = scores[rows]
+        else:
+            plan = 'exact'
+            rows, scores = self._exact(query, k)
+        self.last_plan = {'plan': plan, 'matching': matching, 'total': len(self.vectors)}
+        return rows, scores
+
+
+# ============================================================
+# Benchmark
+# ============================================================
+def synthetic_corpus(n, dimensions=256, seed=0):
+    """Clustered vectors (topics, like real embeddings) plus judgment/statute metadata with realistic skew"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 100, 1), dimensions))
+    vectors = (centers[rng.integers(0, len(centers), n)] + 0.6 * rng.standard_normal((n, dimensions))).astype(np.float32)
+    courts = ['High Court', 'Court of Appeal', 'Employment and Labour Relations Court',
+              'Environment and Land Court', 'Supreme Court']
+    court = rng.choice(len(courts), n, p=[0.45, 0.2, 0.15, 0.15, 0.05])
+    is_statute = rng.random(n) < 0.15
+    years = rng.integers(1990, 2025, n)
+    metadatas = [{'doc_type': 'statute', 'cap': str(int(c))} if s else
+                 {'doc_type': 'judgment', 'court': courts[c], 'year': int(y)}
+                 for s, c, y in zip(is_statute, court, years)]
+    return vectors, metadatas
+
+
+def _where_for(postings, selectivity):
+    """A realistic predicate whose match rate is closest to `selectivity`"""
+    candidates = [{'doc_type': 'judgment'}, {'doc_type': 'statute'}]
+    candidates += [{'court': c} for c in postings.values('court')]
+    candidates += [{'$and': [{'court': c}, {'year': {'$gte': y}}]} for c in postings.values('court')
+                   for y in (2000, 2010, 2015, 2020, 2023)]
+    return min(candidates, key=lambda w: abs(postings.count(w) / postings.n - selectivity))
+
+
+def benchmark(sizes, selectivities, k=5, queries=50, dimensions=256, overfetch=4, seed=0):
+    """
+    Latency and recall of pre-filtered search vs post-filtering an unfiltered
+    top (k * overfetch), per corpus size and predicate selectivity.
+    """
+    import numpy as np
+    try:
+        import hnswlib  # noqa: F401
+        have_hnsw = True
+    except ImportError:
+        have_hnsw = False
+    rng = np.random.default_rng(seed + 1)
+    rows = []
+    for n in sizes:
+        vectors, metadatas = synthetic_corpus(n, dimensions, seed)
+        with span('filtered_search.build', chunks=n, hnsw=have_hnsw):
+            hnsw = build_hnsw(vectors) if have_hnsw else None
+        searcher = FilteredSearcher(vectors, metadatas, hnsw)
+        unfiltered = FilteredSearcher(vectors, metadatas, hnsw, brute_force_below=0)
+        qs = vectors[rng.integers(0, n, queries)] + 0.3 * rng.standard_normal((queries, dimensions)).astype(np.float32)
+        for selectivity in selectivities:
+            where = _where_for(searcher.postings, selectivity)
+            allowed = searcher.postings.mask(where)
+            pre_ms, post_ms, pre_recall, post_recall, plans = [], [], [], [], []
+            for q in qs:
+                truth = set(searcher._exact(q / np.linalg.norm(q), k, searcher.postings.rows(where))[0].tolist())
+                start = time.perf_counter()
+                found, _ = searcher.search(q, k, where)
+                pre_ms.append((time.perf_counter() - start) * 1000)
+                plans.append(searcher.last_plan['plan'])
+                start = time.perf_counter()
+                candidates, _ = unfiltered.search(q, k * overfetch)
+                post = [r for r in candidates.tolist() if allowed[r]][:k]
+                post_ms.append((time.perf_counter() - start) * 1000)
+                pre_recall.append(len(truth & set(found.tolist())) / max(len(truth), 1))
+                post_recall.append(len(truth & set(post)) / max(len(truth), 1))
+            rows.append({
+                'chunks': n, 'where': where, 'selectivity': float(allowed.mean()),
+                'plan': max(set(plans), key=plans.count),
+                'pre_filter_ms_p50': statistics.median(pre_ms), 'pre_filter_recall': statistics.mean(pre_recall),
+                'post_filter_ms_p50': statistics.median(post_ms), 'post_filter_recall': statistics.mean(post_recall),
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Metadata pre-filtered vector search")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('bench', help="Pre-filter vs post-filter latency and recall on a synthetic corpus")
+    p.add_argument('--chunks', nargs='+', type=int, default=[5000, 20000, 50000])
+    p.add_argument('--selectivity', nargs='+', type=float, default=[0.01, 0.05, 0.2, 0.85])
+    p.add_argument('--k', type=int, default=5)
+    p.add_argument('--queries', type=int, default=50)
+    p.add_argument('--dimensions', type=int, default=256)
+    p.add_argument('--overfetch', type=int, default=4, help="Post-filter baseline fetches k * overfetch")
+    p.add_argument('--output', help="Write rows as CSV")
+    args = parser.parse_args(argv)
+
+    rows = benchmark(args.chunks, args.selectivity, args.k, args.queries, args.dimensions, args.overfetch)
+    print(f"\n📊 Filtered search, k={args.k}, {args.queries} queries ({args.dimensions}-d)")
+    print(f"{'chunks':>8}{'match':>8}  {'plan':<14}{'pre ms':>8}{'recall':>8}{'post ms':>9}{'recall':>8}  where")
+    for r in rows:
+        print(f"{r['chunks']:>8}{r['selectivity']:>8.1%}  {r['plan']:<14}{r['pre_filter_ms_p50']:>8.2f}"
+              f"{r['pre_filter_recall']:>8.2f}{r['post_filter_ms_p50']:>9.2f}{r['post_filter_recall']:>8.2f}  {r['where']}")
+    if args.output:
+        import pandas as pd
+        pd.DataFrame(rows).to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -10,8 +10,11 @@ Since contexts weren't saved in CSV, we'll evaluate based on the answers themsel
 
 import pandas as pd
 import time
-from botocore.exceptions import ClientError
-import re
+from datetime import datetime
+
+from cost_accounting import InstrumentedLLM, UsageLedger, call_context, usage_summary
+from judge_parsing import UNIT, JudgeParser
+from resilience import invoke_with_retry
 
 print("\n" + "="*70)
 print("FINAL EXPERIMENT: ANSWER QUALITY METRICS EVALUATION")
@@ -19,51 +22,27 @@ print("Testing Answer Relevance, Specificity, and Legal Grounding")
 print("="*70 + "\n")
 
 # ============================================================
-# Helper: Retry Logic
+# Helper: Score Parsing
 # ============================================================
-def invoke_with_retry(llm, prompt, max_retries=5):
-    """Invoke LLM with exponential backoff retry"""
-    for attempt in range(max_retries):
-        try:
-            response = llm.invoke(prompt)
-            if hasattr(response, 'content'):
-                return response.content
-            return str(response)
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ThrottlingException':
-                if attempt < max_retries - 1:
-                    wait_time = 5 * (2 ** attempt)
-                    print(f"      ⚠️ Throttled. Waiting {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"      ❌ Failed after {max_retries} retries")
-                    return None
-            else:
-                raise
-        except Exception as e:
-            print(f"      ❌ Error: {str(e)[:100]}")
-            if attempt < max_retries - 1:
-                time.sleep(5)
-            else:
-                return None
-    return None
-
-def extract_score(response_text, max_score=1.0):
-    """Extract numeric score from LLM response"""
-    if not response_text:
-        return 0.0
-    
-    # Try to find a decimal number between 0 and max_score
-    match = re.search(r'(\d+\.?\d*)', response_text.strip())
-    if match:
-        score = float(match.group(1))
-        return min(max(score, 0.0), max_score)
-    return 0.0
+def extract_score(response_text, template, key=None):
+    """
+    0.0-1.0 score from a judge response (JSON, "0.75 out of 1", "Score: 0.8", ...).
+    FAILED_SCORE if the call failed or the response is unparseable/out of range;
+    unparseable responses are queued under `key` for the batched re-ask.
+    """
+    return judge_parser.parse(response_text, UNIT, template, key=key)
+
+# ============================================================
+# Usage Accounting (tokens, latency, retries, cost per judge call)
+# ============================================================
+ledger = UsageLedger(run_id=datetime.now().strftime('judge-quality-metrics-%Y%m%d-%H%M%S'))
+judge_llm = InstrumentedLLM(llm_generate, ledger, kind='judge')
+judge_parser = JudgeParser(run_id=ledger.run_id)   # range-checked parsing, batched re-ask of failures
 
 # ============================================================
 # Metric 1: Answer Relevance (AR)
 # ============================================================
-def score_answer_relevance(question, answer, llm):
+def score_answer_relevance(question, answer, llm, key=None):
     """
     Does the answer actually address the user's question?
     Score: 0.0 to 1.0
@@ -85,13 +64,14 @@ def score_answer_relevance(question, answer, llm):
 
 **CRITICAL:** Respond with ONLY a decimal number between 0.0 and 1.0. No explanations."""
 
-    response = invoke_with_retry(llm, prompt)
-    return extract_score(response, max_score=1.0)
+    with call_context(stage='answer_relevance'):
+        response = invoke_with_retry(llm, prompt)
+    return extract_score(response, 'answer_relevance', key)
 
 # ============================================================
 # Metric 2: Specificity (Legal Citations)
 # ============================================================
-def score_specificity(answer, llm):
+def score_specificity(answer, llm, key=None):
     """
     Does the answer cite specific Kenyan statutes/cases?
     Score: 0.0 to 1.0
@@ -110,13 +90,14 @@ def score_specificity(answer, llm):
 
 **CRITICAL:** Respond with ONLY a decimal number between 0.0 and 1.0. No explanations."""
 
-    response = invoke_with_retry(llm, prompt)
-    return extract_score(response, max_score=1.0)
+    with call_context(stage='specificity'):
+        response = invoke_with_retry(llm, prompt)
+    return extract_score(response, 'specificity', key)
 
 # ============================================================
 # Metric 3: Groundedness Assessment
 # ============================================================
-def score_groundedness_proxy(answer, llm):
+def score_groundedness_proxy(answer, llm, key=None):
     """
     Does the answer appear to be grounded in legal sources?
     (Proxy metric since we don't have contexts)
@@ -136,8 +117,9 @@ def score_groundedness_proxy(answer, llm):
 
 **CRITICAL:** Respond with ONLY a decimal number between 0.0 and 1.0. No explanations."""
 
-    response = invoke_with_retry(llm, prompt)
-    return extract_score(response, max_score=1.0)
+    with call_context(stage='groundedness'):
+        response = invoke_with_retry(llm, prompt)
+    return extract_score(response, 'groundedness', key)
 
 # ============================================================
 # Load Data and Evaluate
@@ -164,37 +146,40 @@ for i in range(min(len(sac_results), len(manual_template))):
     
     print(f"Q{i+1}/10: {question[:60]}...")
     
+    sac_judge = judge_llm.tagged(pipeline='SAC-RAG', question_id=f'Q{i+1}')
+    generic_judge = judge_llm.tagged(pipeline='Generic Claude', question_id=f'Q{i+1}')
+
     # SAC-RAG Evaluation
     print("  [SAC-RAG (Claude 4.5)]")
     print("    Scoring Answer Relevance...", end=" ")
-    sac_ar = score_answer_relevance(question, sac_answer, llm_generate)
+    sac_ar = score_answer_relevance(question, sac_answer, sac_judge, key=(len(results), 'SAC_RAG_AR'))
     print(f"{sac_ar:.2f}")
     time.sleep(2)
     
     print("    Scoring Specificity...", end=" ")
-    sac_spec = score_specificity(sac_answer, llm_generate)
+    sac_spec = score_specificity(sac_answer, sac_judge, key=(len(results), 'SAC_RAG_Specificity'))
     print(f"{sac_spec:.2f}")
     time.sleep(2)
     
     print("    Scoring Groundedness...", end=" ")
-    sac_ground = score_groundedness_proxy(sac_answer, llm_generate)
+    sac_ground = score_groundedness_proxy(sac_answer, sac_judge, key=(len(results), 'SAC_RAG_Groundedness'))
     print(f"{sac_ground:.2f}")
     time.sleep(2)
     
     # Generic Claude Evaluation
     print("  [Generic Claude]")
     print("    Scoring Answer Relevance...", end=" ")
-    generic_ar = score_answer_relevance(question, generic_answer, llm_generate)
+    generic_ar = score_answer_relevance(question, generic_answer, generic_judge, key=(len(results), 'Generic_AR'))
     print(f"{generic_ar:.2f}")
     time.sleep(2)
     
     print("    Scoring Specificity...", end=" ")
-    generic_spec = score_specificity(generic_answer, llm_generate)
+    generic_spec = score_specificity(generic_answer, generic_judge, key=(len(results), 'Generic_Specificity'))
     print(f"{generic_spec:.2f}")
     time.sleep(2)
     
     print("    Scoring Groundedness...", end=" ")
-    generic_ground = score_groundedness_proxy(generic_answer, llm_generate)
+    generic_ground = score_groundedness_proxy(generic_answer, generic_judge, key=(len(results), 'Generic_Groundedness'))
     print(f"{generic_ground:.2f}")
     time.sleep(2)
     
@@ -213,9 +198,21 @@ for i in range(min(len(sac_results), len(manual_template))):
     
     print()
 
+# Unparseable verdicts: one batched follow-up asks the judge to restate them as JSON
+if judge_parser.pending:
+    print(f"🔁 Re-asking {len(judge_parser.pending)} unparseable verdict(s)...")
+    for (i, column), score in judge_parser.reask(judge_llm).items():
+        results[i][column] = score
+    for row in results:
+        row['SAC_RAG_Avg'] = (row['SAC_RAG_AR'] + row['SAC_RAG_Specificity'] + row['SAC_RAG_Groundedness']) / 3
+        row['Generic_Avg'] = (row['Generic_AR'] + row['Generic_Specificity'] + row['Generic_Groundedness']) / 3
+
 # Convert to DataFrame
 df_results = pd.DataFrame(results)
 
+# Failed judge calls are NaN: pandas means skip them, report how many were dropped
+failed = int(df_results.filter(regex='_(AR|Specificity|Groundedness)$').isna().sum().sum())
+
 # Calculate averages
 sac_ar_avg = df_results['SAC_RAG_AR'].mean()
 sac_spec_avg = df_results['SAC_RAG_Specificity'].mean()
@@ -227,6 +224,9 @@ generic_spec_avg = df_results['Generic_Specificity'].mean()
 generic_ground_avg = df_results['Generic_Groundedness'].mean()
 generic_overall = (generic_ar_avg + generic_spec_avg + generic_ground_avg) / 3
 
+if failed:
+    print(f"\n⚠️ {failed} judge score(s) failed and are excluded from the averages")
+
 print("\n" + "="*70)
 print("📊 ANSWER QUALITY METRICS RESULTS")
 print("="*70 + "\n")
@@ -285,6 +285,14 @@ print("\n✅ Results exported:")
 print("   - final_quality_metrics_evaluation.csv (detailed)")
 print("   - final_quality_metrics_summary.csv (summary table)")
 
+# Judge usage for this run
+ledger.flush()
+print("\n🧩 Judge response parsing (per template):")
+judge_parser.print_summary()
+judge_parser.flush()
+print("\n💰 Judge usage (tokens, retries, cost) - run_id=" + ledger.run_id)
+print(usage_summary(ledger.run_id).to_string(index=False))
+
 print("\n" + "="*70)
 print("✅ Final experiment complete! Ready for thesis report generation.")
 print("="*70 + "\n")
@@ -10,8 +10,13 @@ Note: Generic Claude has no retrieval context, so CR and G will be N/A
 
 import pandas as pd
 import time
-from botocore.exceptions import ClientError
-import re
+from datetime import datetime
+from pathlib import Path
+
+from chunk_store import ChunkStore, row_contexts
+from cost_accounting import InstrumentedLLM, UsageLedger, call_context, usage_summary
+from judge_parsing import UNIT, JudgeParser
+from resilience import invoke_with_retry
 
 print("\n" + "="*70)
 print("FINAL EXPERIMENT: RAG-SPECIFIC METRICS EVALUATION")
@@ -19,51 +24,27 @@ print("Testing Answer Relevance, Context Relevance, Groundedness")
 print("="*70 + "\n")
 
 # ============================================================
-# Helper: Retry Logic
+# Helper: Score Parsing
 # ============================================================
-def invoke_with_retry(llm, prompt, max_retries=5):
-    """Invoke LLM with exponential backoff retry"""
-    for attempt in range(max_retries):
-        try:
-            response = llm.invoke(prompt)
-            if hasattr(response, 'content'):
-                return response.content
-            return str(response)
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ThrottlingException':
-                if attempt < max_retries - 1:
-                    wait_time = 5 * (2 ** attempt)
-                    print(f"      ⚠️ Throttled. Waiting {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"      ❌ Failed after {max_retries} retries")
-                    return None
-            else:
-                raise
-        except Exception as e:
-            print(f"      ❌ Error: {str(e)[:100]}")
-            if attempt < max_retries - 1:
-                time.sleep(5)
-            else:
-                return None
-    return None
-
-def extract_score(response_text, max_score=1.0):
-    """Extract numeric score from LLM response"""
-    if not response_text:
-        return 0.0
-    
-    # Try to find a decimal number between 0 and max_score
-    match = re.search(r'(\d+\.?\d*)', response_text.strip())
-    if match:
-        score = float(match.group(1))
-        return min(max(score, 0.0), max_score)  # Clamp between 0 and max_score
-    return 0.0
+def extract_score(response_text, template, key=None):
+    """
+    0.0-1.0 score from a judge response (JSON, "0.75 out of 1", "Score: 0.8", ...).
+    FAILED_SCORE if the call failed or the response is unparseable/out of range;
+    unparseable responses are queued under `key` for the batched re-ask.
+    """
+    return judge_parser.parse(response_text, UNIT, template, key=key)
+
+# ============================================================
+# Usage Accounting (tokens, latency, retries, cost per judge call)
+# ============================================================
+ledger = UsageLedger(run_id=datetime.now().strftime('judge-rag-metrics-%Y%m%d-%H%M%S'))
+judge_llm = InstrumentedLLM(llm_generate, ledger, kind='judge')
+judge_parser = JudgeParser(run_id=ledger.run_id)   # range-checked parsing, batched re-ask of failures
 
 # ============================================================
 # Metric 1: Answer Relevance (AR)
 # ============================================================
-def score_answer_relevance(question, answer, llm):
+def score_answer_relevance(question, answer, llm, key=None):
     """
     Does the answer actually address the user's question?
     Score: 0.0 (Completely irrelevant) to 1.0 (Perfectly relevant)
@@ -85,13 +66,14 @@ def score_answer_relevance(question, answer, llm):
 
 **CRITICAL:** Respond with ONLY a decimal number between 0.0 and 1.0. No explanations."""
 
-    response = invoke_with_retry(llm, prompt)
-    return extract_score(response, max_score=1.0)
+    with call_context(stage='answer_relevance'):
+        response = invoke_with_retry(llm, prompt)
+    return extract_score(response, 'answer_relevance', key)
 
 # ============================================================
 # Metric 2: Context Relevance (CR)
 # ============================================================
-def score_context_relevance(question, contexts, llm):
+def score_context_relevance(question, contexts, llm, key=None):
     """
     Are the retrieved chunks relevant to the question?
     Score: 0.0 (Irrelevant noise) to 1.0 (Highly relevant)
@@ -118,13 +100,14 @@ def score_context_relevance(question, contexts, llm):
 
 **CRITICAL:** Respond with ONLY a decimal number between 0.0 and 1.0. No explanations."""
 
-    response = invoke_with_retry(llm, prompt)
-    return extract_score(response, max_score=1.0)
+    with call_context(stage='context_relevance'):
+        response = invoke_with_retry(llm, prompt)
+    return extract_score(response, 'context_relevance', key)
 
 # ============================================================
 # Metric 3: Groundedness (G)
 # ============================================================
-def score_groundedness(answer, contexts, llm):
+def score_groundedness(answer, contexts, llm, key=None):
     """
     Is the answer fully supported by the retrieved text?
     Score: 0.0 (Hallucination) to 1.0 (Fully grounded)
@@ -151,8 +134,9 @@ def score_groundedness(answer, contexts, llm):
 
 **CRITICAL:** Respond with ONLY a decimal number between 0.0 and 1.0. No explanations."""
 
-    response = invoke_with_retry(llm, prompt)
-    return extract_score(response, max_score=1.0)
+    with call_context(stage='groundedness'):
+        response = invoke_with_retry(llm, prompt)
+    return extract_score(response, 'groundedness', key)
 
 # ============================================================
 # Load Data and Evaluate
@@ -160,6 +144,8 @@ def score_groundedness(answer, contexts, llm):
 
 # Load results from SAC-RAG evaluation (has contexts)
 sac_results = pd.read_csv('sac_rag_golden_detailed.csv')
+# compacted result files carry context_ids instead of context text (see chunk_store.py)
+chunk_store = ChunkStore('chunks.store') if Path('chunks.store').exists() else None
 
 # Load manual template (has Generic Claude answers)
 manual_template = pd.read_excel('manual_evaluation_template.xlsx')
@@ -175,32 +161,35 @@ for i in range(len(sac_results)):
     
     question = sac_row['question']
     sac_answer = sac_row['answer']
-    sac_contexts = eval(sac_row['contexts'])  # Convert string representation to list
+    sac_contexts = row_contexts(sac_row, chunk_store)
     generic_answer = manual_row['Generic_Claude_Answer']
     
     print(f"Q{i+1}/10: {question[:60]}...")
     
+    sac_judge = judge_llm.tagged(pipeline='SAC-RAG', question_id=f'Q{i+1}')
+    generic_judge = judge_llm.tagged(pipeline='Generic Claude', question_id=f'Q{i+1}')
+
     # SAC-RAG Evaluation
     print("  [SAC-RAG]")
     print("    Scoring Answer Relevance...", end=" ")
-    sac_ar = score_answer_relevance(question, sac_answer, llm_generate)
+    sac_ar = score_answer_relevance(question, sac_answer, sac_judge, key=(len(results), 'SAC_RAG_AR'))
     print(f"{sac_ar:.2f}")
     time.sleep(2)
     
     print("    Scoring Context Relevance...", end=" ")
-    sac_cr = score_context_relevance(question, sac_contexts, llm_generate)
+    sac_cr = score_context_relevance(question, sac_contexts, sac_judge, key=(len(results), 'SAC_RAG_CR'))
     print(f"{sac_cr:.2f}")
     time.sleep(2)
     
     print("    Scoring Groundedness...", end=" ")
-    sac_g = score_groundedness(sac_answer, sac_contexts, llm_generate)
+    sac_g = score_groundedness(sac_answer, sac_contexts, sac_judge, key=(len(results), 'SAC_RAG_G'))
     print(f"{sac_g:.2f}")
     time.sleep(2)
     
     # Generic Claude Evaluation
     print("  [Generic Claude]")
     print("    Scoring Answer Relevance...", end=" ")
-    generic_ar = score_answer_relevance(question, generic_answer, llm_generate)
+    generic_ar = score_answer_relevance(question, generic_answer, generic_judge, key=(len(results), 'Generic_AR'))
     print(f"{generic_ar:.2f}")
     print("    Context Relevance: N/A (no retrieval)")
     print("    Groundedness: N/A (no retrieval)")
@@ -221,9 +210,21 @@ for i in range(len(sac_results)):
     
     print()
 
+# Unparseable verdicts: one batched follow-up asks the judge to restate them as JSON
+if judge_parser.pending:
+    print(f"🔁 Re-asking {len(judge_parser.pending)} unparseable verdict(s)...")
+    for (i, column), score in judge_parser.reask(judge_llm).items():
+        results[i][column] = score
+    for row in results:
+        row['SAC_RAG_Avg'] = (row['SAC_RAG_AR'] + row['SAC_RAG_CR'] + row['SAC_RAG_G']) / 3
+        row['Generic_Avg'] = row['Generic_AR']
+
 # Convert to DataFrame
 df_results = pd.DataFrame(results)
 
+# Failed judge calls are NaN: pandas means skip them, report how many were dropped
+failed = int(df_results[['SAC_RAG_AR', 'SAC_RAG_CR', 'SAC_RAG_G', 'Generic_AR']].isna().sum().sum())
+
 # Calculate averages
 sac_ar_avg = df_results['SAC_RAG_AR'].mean()
 sac_cr_avg = df_results['SAC_RAG_CR'].mean()
@@ -232,6 +233,9 @@ sac_overall = (sac_ar_avg + sac_cr_avg + sac_g_avg) / 3
 
 generic_ar_avg = df_results['Generic_AR'].mean()
 
+if failed:
+    print(f"\n⚠️ {failed} judge score(s) failed and are excluded from the averages")
+
 print("\n" + "="*70)
 print("📊 RAG-SPECIFIC METRICS RESULTS")
 print("="*70 + "\n")
@@ -286,6 +290,15 @@ print(f"   - Combined RAG quality: {((sac_cr_avg + sac_g_avg)/2):.3f}")
 df_results.to_csv('rag_metrics_evaluation.csv', index=False)
 
 print("\n✅ Results exported to: rag_metrics_evaluation.csv")
+
+# Judge usage for this run
+ledger.flush()
+print("\n🧩 Judge response parsing (per template):")
+judge_parser.print_summary()
+judge_parser.flush()
+print("\n💰 Judge usage (tokens, retries, cost) - run_id=" + ledger.run_id)
+print(usage_summary(ledger.run_id).to_string(index=False))
+
 print("\n" + "="*70)
 print("✅ Final experiment complete! Ready for thesis report generation.")
 print("="*70 + "\n")
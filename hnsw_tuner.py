@@ -0,0 +1,339 @@
+"""
+HNSW Parameter Autotuner
+Measures what recall the vector indexes actually deliver and picks HNSW
+parameters (M, ef_construction, ef_search) for a recall target.
+
+- Candidate indexes (M x ef_construction) are built in parallel worker
+  processes from the cached chunk embeddings (retrieval_eval's embedding
+  cache; nothing is re-embedded). ef_search is a query-time knob, so each
+  build is probed at every ef_search value.
+- Ground truth is brute-force top k over the same vectors. Queries are the
+  golden/RAGAS question vectors plus perturbed chunk vectors.
+- Per candidate: recall@k, p50/p95 single-query latency, index memory
+  (size of the saved hnswlib index) and build time.
+- The Pareto frontier (higher recall, lower latency, lower memory) is
+  printed; the chosen point - fastest config meeting --target-recall, with
+  latencies within --latency-tolerance of the fastest counted as ties and
+  broken by memory - is written to hnsw_config.json as Chroma collection
+  metadata (hnsw:M / hnsw:construction_ef / hnsw:search_ef). `--apply` also
+  updates hnsw:search_ef on the persisted collection; M and construction_ef
+  take effect when the collection is rebuilt with that metadata.
+- Tuning the stub corpus (a few dozen vectors, where latency differences are
+  noise) writes under "<index>:stub", which index_snapshot.py never reads;
+  only --backend chroma results become the index's entry.
+
+`current` reads the parameters the persisted Chroma segments were built with
+(hnswlib header.bin).
+
+Usage:
+    python hnsw_tuner.py current
+    python hnsw_tuner.py tune --index base --M 8 16 32 --ef-construction 100 200 --ef-search 10 20 50 100
+    python hnsw_tuner.py tune --backend chroma --index sac --target-recall 0.98 --apply
+"""
+
+import argparse
+import json
+import os
+import statistics
+import struct
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import results_store
+from tracing import span
+
+CONFIG_JSON = 'hnsw_config.json'
+# hnswlib persisted header (chroma-hnswlib adds a leading version int)
+_HEADER = struct.Struct('<i 6Q i I 3Q d Q')
+_HEADER_FIELDS = ('version', 'offset_level0', 'max_elements', 'elements', 'size_data_per_element', 'label_offset',
+                  'offset_data', 'max_level', 'entry_point', 'max_m', 'max_m0', 'M', 'mult', 'ef_construction')
+CHROMA_DEFAULT_SEARCH_EF = 10
+LATENCY_NOISE_MS = 0.05                                    # single-query timer jitter; smaller gaps are ties
+
+results_store.register_schema("""
+CREATE TABLE IF NOT EXISTS hnsw_tuning (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    index_name TEXT NOT NULL,
+    M INTEGER,
+    ef_construction INTEGER,
+    ef_search INTEGER,
+    k INTEGER,
+    recall REAL,
+    latency_ms_p50 REAL,
+    latency_ms_p95 REAL,
+    memory_mb REAL,
+    build_s REAL,
+    pareto INTEGER,
+    chosen INTEGER,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+""")
+
+
+# ============================================================
+# Persisted Parameters
+# ============================================================
+def read_hnsw_header(segment_dir):
+    """Build parameters of a persisted hnswlib/Chroma segment (header.bin)"""
+    raw = (Path(segment_dir) / 'header.bin').read_bytes()
+    header = dict(zip(_HEADER_FIELDS, _HEADER.unpack(raw[:_HEADER.size])))
+    header['dimensions'] = (header['label_offset'] - header['offset_data']) // 4
+    return header
+
+
+def persisted_params(persist_dir):
+    """{segment id: header} for every HNSW segment under a Chroma persist directory"""
+    return {path.parent.name: read_hnsw_header(path.parent) for path in sorted(Path(persist_dir).glob('*/header.bin'))}
+
+
+# ============================================================
+# Benchmark Worker
+# ============================================================
+_data = {}
+
+
+def _init_worker(vectors, queries, truth):
+    _data.update(vectors=vectors, queries=queries, truth=truth)
+
+
+def _measure(M, ef_construction, ef_searches, k):
+    """Build one index and probe it at every ef_search; one row per ef_search"""
+    import numpy as np
+    from filtered_search import build_hnsw
+    vectors, queries, truth = _data['vectors'], _data['queries'], _data['truth']
+    start = time.perf_counter()
+    index = build_hnsw(vectors, M=M, ef_construction=ef_construction, threads=1)
+    build_s = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index.bin')
+        index.save_index(path)
+        memory_mb = os.path.getsize(path) / 2 ** 20
+
+    rows = []
+    for ef in ef_searches:
+        index.set_ef(max(ef, k))
+        latencies, found = [], []
+        for query in queries:
+            start = time.perf_counter()
+            labels, _ = index.knn_query(query, k=k, num_threads=1)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append(labels[0])
+        found = np.vstack(found)
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found.tolist(), truth.tolist())])
+        rows.append({'M': M, 'ef_construction': ef_construction, 'ef_search': ef, 'k': k, 'recall': float(recall),
+                     'latency_ms_p50': statistics.median(latencies),
+                     'latency_ms_p95': float(np.percentile(latencies, 95)),
+                     'memory_mb': memory_mb, 'build_s': build_s})
+    return rows
+
+
+# ============================================================
+# Tuning
+# ============================================================
+def make_queries(vectors, question_vectors=None, samples=200, noise=0.05, seed=0):
+    """Question vectors plus `samples` chunk vectors nudged off the data points"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(0, len(vectors), min(samples, len(vectors)))]
+    nudged = picked + noise * rng.standard_normal(picked.shape).astype(np.float32)
+    parts = [nudged] if question_vectors is None else [question_vectors, nudged]
+    queries = np.vstack(parts).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def ground_truth(vectors, queries, k):
+    """Exact top-k row ids per query (cosine; rows are unit vectors)"""
+    import numpy as np
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, 1), axis=1), 1)
+
+
+def tune(vectors, queries, Ms, ef_constructions, ef_searches, k=5, workers=None):
+    """One row per (M, ef_construction, ef_search); builds run in parallel processes"""
+    from concurrent.futures import ProcessPoolExecutor
+    truth = ground_truth(vectors, queries, k)
+    grid = [(M, efc) for M in Ms for efc in ef_constructions]
+    workers = workers or min(len(grid), os.cpu_count() or 1)
+    rows = []
+    with span('hnsw_tuner.tune', candidates=len(grid), vectors=len(vectors), queries=len(queries), workers=workers):
+        if workers <= 1:
+            _init_worker(vectors, queries, truth)
+            for M, efc in grid:
+                rows += _measure(M, efc, ef_searches, k)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(vectors, queries, truth)) as pool:
+                futures = [pool.submit(_measure, M, efc, ef_searches, k) for M, efc in grid]
+                for future in futures:
+                    rows += future.result()
+    return rows
+
+
+def pareto_front(rows):
+    """Rows no other row beats on recall, latency and memory at once"""
+    def dominates(a, b):
+        better_or_equal = (a['recall'] >= b['recall'] and a['latency_ms_p50'] <= b['latency_ms_p50']
+                           and a['memory_mb'] <= b['memory_mb'])
+        strictly = (a['recall'] > b['recall'] or a['latency_ms_p50'] < b['latency_ms_p50']
+                    or a['memory_mb'] < b['memory_mb'])
+        return better_or_equal and strictly
+    return [r for r in rows if not any(dominates(other, r) for other in rows)]
+
+
+def choose(rows, target_recall=0.95, latency_tolerance=0.1):
+    """
+    Among rows meeting the recall target, the smallest index whose p50
+    latency is within `latency_tolerance` (or LATENCY_NOISE_MS) of the
+    fastest, then the fastest of those; highest recall if none meets the target
+    """
+    meeting = [r for r in rows if r['recall'] >= target_recall]
+    if meeting:
+        fastest = min(r['latency_ms_p50'] for r in meeting)
+        limit = max(fastest * (1 + latency_tolerance), fastest + LATENCY_NOISE_MS)
+        tied = [r for r in meeting if r['latency_ms_p50'] <= limit]
+        return min(tied, key=lambda r: (r['memory_mb'], r['latency_ms_p50']))
+    return max(rows, key=lambda r: (r['recall'], -r['memory_mb'], -r['latency_ms_p50']))
+
+
+def config_key(index_name, backend):
+    """hnsw_config.json entry for a tune: stub-corpus results never replace the index's own entry"""
+    return index_name if backend == 'chroma' else f'{index_name}:{backend}'
+
+
+def collection_metadata(row, space='cosine'):
+    return {'hnsw:space': space, 'hnsw:M': row['M'], 'hnsw:construction_ef': row['ef_construction'],
+            'hnsw:search_ef': row['ef_search']}
+
+
+def write_config(key, chosen, target_recall, current=None, path=CONFIG_JSON, vectors=None):
+    """Merge the chosen parameters under `key` (see config_key) into hnsw_config.json"""
+    config = json.loads(Path(path).read_text()) if Path(path).exists() else {}
+    config[key] = {
+        'collection_metadata': collection_metadata(chosen),
+        'measured': {name: chosen[name] for name in ('k', 'recall', 'latency_ms_p50', 'latency_ms_p95', 'memory_mb')},
+        'target_recall': target_recall,
+        'vectors': vectors,
+        'current': current,
+        'tuned_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    Path(path).write_text(json.dumps(config, indent=2))
+    return config[key]
+
+
+def apply_search_ef(persist_dir, ef_search):
+    """Set hnsw:search_ef on the persisted collection (the only in-place tunable)"""
+    import chromadb
+    client = chromadb.PersistentClient(path=persist_dir)
+    for listed in client.list_collections():
+        collection = client.get_collection(getattr(listed, 'name', listed))
+        metadata = {k: v for k, v in (collection.metadata or {}).items() if k != 'hnsw:space'}
+        collection.modify(metadata={**metadata, 'hnsw:search_ef': ef_search})
+
+
+def store_rows(rows, run_id, index_name, frontier, chosen, db_path=None):
+    keys = {(r['M'], r['ef_construction'], r['ef_search']) for r in frontier}
+    chosen_key = (chosen['M'], chosen['ef_construction'], chosen['ef_search'])
+    records = [{'run_id': run_id, 'index_name': index_name, **r,
+                'pareto': int((r['M'], r['ef_construction'], r['ef_search']) in keys),
+                'chosen': int((r['M'], r['ef_construction'], r['ef_search']) == chosen_key)} for r in rows]
+    conn = results_store.connect(db_path)
+    try:
+        results_store.insert_rows(conn, 'hnsw_tuning', records)
+    finally:
+        conn.close()
+
+
+# ============================================================
+# CLI
+# ============================================================
+def print_current(persist_dirs):
+    print(f"\n{'index':<14}{'segment':<40}{'elements':>9}{'dim':>6}{'M':>5}{'ef_c':>6}")
+    for persist_dir in persist_dirs:
+        for segment, header in persisted_params(persist_dir).items():
+            print(f"{persist_dir:<14}{segment:<40}{header['elements']:>9}{header['dimensions']:>6}"
+                  f"{header['M']:>5}{header['ef_construction']:>6}")
+    print(f"\nsearch_ef is not persisted in the segment; Chroma's default is {CHROMA_DEFAULT_SEARCH_EF} "
+          f"unless hnsw:search_ef is set on the collection.")
+
+
+def print_rows(rows, frontier, chosen):
+    keys = {(r['M'], r['ef_construction'], r['ef_search']) for r in frontier}
+    print(f"\n{'M':>4}{'ef_c':>6}{'ef_s':>6}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}{'MB':>8}{'build s':>9}")
+    for r in sorted(rows, key=lambda r: (r['M'], r['ef_construction'], r['ef_search'])):
+        key = (r['M'], r['ef_construction'], r['ef_search'])
+        mark = ' ⭐' if r is chosen else (' •' if key in keys else '')
+        print(f"{r['M']:>4}{r['ef_construction']:>6}{r['ef_search']:>6}{r['recall']:>9.3f}{r['latency_ms_p50']:>9.3f}"
+              f"{r['latency_ms_p95']:>9.3f}{r['memory_mb']:>8.1f}{r['build_s']:>9.2f}{mark}")
+    print("\n• Pareto frontier (recall / latency / memory)   ⭐ chosen")
+
+
+def main(argv=None):
+    from retrieval_eval import INDEXES
+    parser = argparse.ArgumentParser(description="Tune HNSW parameters against brute-force ground truth")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('current', help="Parameters the persisted Chroma segments were built with")
+    p = sub.add_parser('tune', help="Benchmark candidate parameters and write the chosen ones")
+    p.add_argument('--index', choices=sorted(INDEXES), default='base')
+    p.add_argument('--backend', choices=['stub', 'chroma'], default='stub')
+    p.add_argument('--embeddings', choices=['local', 'bedrock', 'onnx'], default='local')
+    p.add_argument('--onnx-model', help="Model directory for --embeddings onnx")
+    p.add_argument('--M', nargs='+', type=int, default=[8, 16, 32])
+    p.add_argument('--ef-construction', nargs='+', type=int, default=[100, 200])
+    p.add_argument('--ef-search', nargs='+', type=int, default=[10, 20, 50, 100])
+    p.add_argument('--k', type=int, default=5)
+    p.add_argument('--queries', type=int, default=200, help="Perturbed chunk vectors added to the question set")
+    p.add_argument('--target-recall', type=float, default=0.95)
+    p.add_argument('--latency-tolerance', type=float, default=0.1,
+                   help="p50 latencies within this fraction of the fastest are ties, broken by memory")
+    p.add_argument('--workers', type=int)
+    p.add_argument('--config', default=CONFIG_JSON)
+    p.add_argument('--apply', action='store_true', help="Also set hnsw:search_ef on the persisted collection")
+    p.add_argument('--run-id')
+    p.add_argument('--db')
+    args = parser.parse_args(argv)
+
+    if args.command == 'current':
+        print_current([d for d in INDEXES.values() if Path(d).exists()])
+        return 0
+
+    from rag_benchmark import load_questions
+    from retrieval_eval import EmbeddingCache, build_embeddings, load_index
+    embeddings, model_id = build_embeddings(args.embeddings, onnx_model=args.onnx_model)
+    cache = EmbeddingCache(embeddings, model_id, args.db)
+    index = load_index(args.index, args.backend, cache)
+    queries = make_queries(index.vectors, cache.embed(load_questions('all')), args.queries)
+    print(f"Tuning {args.index} ({len(index)} vectors, {len(queries)} queries, k={args.k}) ...")
+    rows = tune(index.vectors, queries, args.M, args.ef_construction, args.ef_search, args.k, args.workers)
+    frontier = pareto_front(rows)
+    chosen = choose(rows, args.target_recall, args.latency_tolerance)
+    print_rows(rows, frontier, chosen)
+
+    persist_dir = INDEXES[args.index]
+    current = next(iter(persisted_params(persist_dir).values()), None) if Path(persist_dir).exists() else None
+    key = config_key(args.index, args.backend)
+    entry = write_config(key, chosen, args.target_recall,
+                         current and {'M': current['M'], 'ef_construction': current['ef_construction'],
+                                      'search_ef': CHROMA_DEFAULT_SEARCH_EF}, args.config, len(index))
+    run_id = args.run_id or datetime.now().strftime(f'hnsw-tune-{args.index}-%Y%m%d-%H%M%S')
+    store_rows(rows, run_id, args.index, frontier, chosen, args.db)
+    if chosen['recall'] < args.target_recall:
+        print(f"\n⚠️  No candidate reached recall {args.target_recall}; chose the most accurate one")
+    print(f"\n✅ {key}: {entry['collection_metadata']} -> {args.config} (run_id={run_id})")
+    if args.backend != 'chroma':
+        print(f"   Tuned on the {args.backend} corpus ({len(index)} vectors): stored under '{key}', "
+              f"not used for '{args.index}' builds; rerun with --backend chroma for those")
+    if args.apply and args.backend != 'chroma':
+        print("⚠️  --apply ignored: stub-corpus parameters are not applied to the persisted collection")
+    elif args.apply:
+        apply_search_ef(persist_dir, chosen['ef_search'])
+        print(f"✅ hnsw:search_ef={chosen['ef_search']} set on {persist_dir}; "
+              f"M/construction_ef apply when the collection is rebuilt with this metadata")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
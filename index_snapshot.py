@@ -0,0 +1,414 @@
+"""
+Ready-to-Serve Index Snapshots
+Packs everything a retrieval worker needs - vectors, the HNSW graph, chunk
+ids and texts, metadata - into one memory-mappable file, so a worker starts
+by mapping the file instead of re-opening Chroma, unpickling
+index_metadata.pickle and warming the graph.
+
+File layout (little-endian, every section 4096-byte aligned):
+
+    magic    8 bytes   b'RAGSNAP\\0'
+    version  u32       SNAPSHOT_VERSION (major; readers refuse other majors)
+    flags    u32       reserved
+    manifest u64 x 2   offset and length of the JSON manifest
+    ...sections...
+    manifest JSON      {sections: {name: {offset, nbytes, dtype, shape, crc32}}, count, dimensions, hnsw, ...}
+
+Sections: vectors (n x d float32, unit rows), graph_level0 (n x maxM0 int32,
+-1 padded), graph_levels (u8 per node), graph_upper_nodes / graph_upper_links
+(per upper level, sorted node rows and n_l x maxM int32 links), ids / texts
+/ metadata (u64 offsets + UTF-8 blob; metadata rows are JSON).
+
+Opening maps the file read-only and wraps sections with np.frombuffer - no
+copies, so every worker process on a machine shares the same page-cache
+pages. Search walks the HNSW graph with numpy over the mapped arrays (no
+hnswlib needed at serve time), or scans the vectors exactly when the
+snapshot was built without a graph.
+
+Usage:
+    python index_snapshot.py build --index base --output base.snap
+    python index_snapshot.py info base.snap --verify
+    python index_snapshot.py bench base.snap --queries 200
+"""
+
+import argparse
+import heapq
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+from tracing import span
+
+MAGIC = b'RAGSNAP\x00'
+SNAPSHOT_VERSION = 1
+ALIGN = 4096
+_PREAMBLE = struct.Struct('<8sIIQQ')
+_HNSW_HEADER = struct.Struct('<6Q i I 3Q d Q')      # hnswlib saveIndex header
+
+
+# ============================================================
+# HNSW Graph Extraction
+# ============================================================
+def extract_graph(hnsw_index):
+    """
+    Decode an hnswlib index's serialized links into label-ordered arrays:
+    (level0 (n, maxM0) int32, levels (n,) u8, {level: (nodes, (n_l, maxM) links)}, entry label, params).
+    """
+    import numpy as np
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index.bin')
+        hnsw_index.save_index(path)
+        raw = Path(path).read_bytes()
+    (_, _, count, size_per_element, label_offset, offset_data, max_level, entry, max_m, max_m0, M, _,
+     ef_construction) = _HNSW_HEADER.unpack_from(raw, 0)
+    base = _HNSW_HEADER.size
+    level0_bytes = np.frombuffer(raw, dtype=np.uint8, count=count * size_per_element, offset=base)
+    level0_bytes = level0_bytes.reshape(count, size_per_element)
+    links0 = level0_bytes[:, :offset_data].copy().view(np.uint32)            # count word + maxM0 ids
+    labels = level0_bytes[:, label_offset:label_offset + 8].copy().view(np.uint64).ravel().astype(np.int64)
+
+    # internal id -> label (row number); graph stored by label
+    n = int(labels.max()) + 1 if count else 0
+    to_label = labels
+    level0 = np.full((n, max_m0), -1, dtype=np.int32)
+    counts0 = links0[:, 0] & 0xFFFF
+    ids0 = links0[:, 1:1 + max_m0].astype(np.int64)
+    mask = np.arange(max_m0)[None, :] < counts0[:, None]
+    level0[to_label] = np.where(mask, to_label[np.minimum(ids0, count - 1)], -1)
+
+    levels = np.zeros(n, dtype=np.uint8)
+    upper = {}
+    link_size = max_m * 4 + 4
+    pos = base + count * size_per_element
+    for internal in range(count):
+        (size,) = struct.unpack_from('<I', raw, pos)
+        pos += 4
+        if size:
+            node_levels = size // link_size
+            levels[to_label[internal]] = node_levels
+            block = np.frombuffer(raw, dtype=np.uint32, count=size // 4, offset=pos).reshape(node_levels, max_m + 1)
+            for level in range(1, node_levels + 1):
+                row = block[level - 1]
+                linked = to_label[row[1:1 + (row[0] & 0xFFFF)].astype(np.int64)]
+                upper.setdefault(level, []).append((to_label[internal], linked))
+            pos += size
+    upper_arrays = {}
+    for level, entries in upper.items():
+        entries.sort(key=lambda e: e[0])
+        nodes = np.array([node for node, _ in entries], dtype=np.int32)
+        links = np.full((len(entries), max_m), -1, dtype=np.int32)
+        for i, (_, linked) in enumerate(entries):
+            links[i, :len(linked)] = linked
+        upper_arrays[level] = (nodes, links)
+    params = {'M': int(M), 'max_m': int(max_m), 'max_m0': int(max_m0), 'ef_construction': int(ef_construction),
+              'max_level': int(max_level), 'entry': int(to_label[entry]) if count else -1}
+    return level0, levels, upper_arrays, params
+
+
+# ============================================================
+# Writer
+# ============================================================
+def _blob(strings):
+    """(u64 offsets of length n+1, UTF-8 blob)"""
+    import numpy as np
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    return offsets, b''.join(encoded)
+
+
+def write_snapshot(path, ids, texts, vectors, metadatas=None, hnsw_index=None, extra=None):
+    """Write a snapshot; returns the manifest"""
+    import numpy as np
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    sections = {'vectors': vectors}
+    for name, strings in (('ids', [str(i) for i in ids]), ('texts', texts),
+                          ('metadata', [json.dumps(m or {}, ensure_ascii=False) for m in (metadatas or [{}] * len(ids))])):
+        offsets, blob = _blob(strings)
+        sections[f'{name}_offsets'] = offsets
+        sections[f'{name}_blob'] = np.frombuffer(blob, dtype=np.uint8)
+    hnsw = None
+    if hnsw_index is not None:
+        with span('snapshot.extract_graph', elements=len(vectors)):
+            level0, levels, upper, hnsw = extract_graph(hnsw_index)
+        sections['graph_level0'] = level0
+        sections['graph_levels'] = levels
+        for level, (nodes, links) in upper.items():
+            sections[f'graph_upper_nodes_{level}'] = nodes
+            sections[f'graph_upper_links_{level}'] = links
+
+    manifest = {'version': SNAPSHOT_VERSION, 'count': len(vectors), 'dimensions': int(vectors.shape[1]) if len(vectors) else 0,
+                'hnsw': hnsw, 'extra': extra or {}, 'sections': {}}
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\x00' * ALIGN)                                   # preamble, patched below
+        for name, array in sections.items():
+            offset = f.tell()
+            data = np.ascontiguousarray(array).tobytes()
+            f.write(data)
+            f.write(b'\x00' * (-f.tell() % ALIGN))
+            manifest['sections'][name] = {'offset': offset, 'nbytes': len(data), 'dtype': array.dtype.str,
+                                          'shape': list(array.shape), 'crc32': zlib.crc32(data)}
+        manifest_offset = f.tell()
+        encoded = json.dumps(manifest).encode('utf-8')
+        f.write(encoded)
+        f.seek(0)
+        f.write(_PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, 0, manifest_offset, len(encoded)))
+    os.replace(tmp_path, path)                                     # readers never see a half-written file
+    return manifest
+
+
+# ============================================================
+# Reader
+# ============================================================
+class SnapshotIndex:
+    """Read-only, zero-copy view of a snapshot file"""
+
+    def __init__(self, path):
+        import numpy as np
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, manifest_offset, manifest_len = _PREAMBLE.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an index snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is snapshot format v{version}; this reader supports v{SNAPSHOT_VERSION}")
+        self.manifest = json.loads(self._mm[manifest_offset:manifest_offset + manifest_len])
+        self.count = self.manifest['count']
+        self.hnsw = self.manifest['hnsw']
+        self._np = np
+        self._arrays = {}
+        self._postings = None
+        self.vectors = self._section('vectors')
+
+    def _section(self, name):
+        """Zero-copy array over one section of the mapping"""
+        if name not in self._arrays:
+            info = self.manifest['sections'][name]
+            dtype = self._np.dtype(info['dtype'])
+            array = self._np.frombuffer(self._mm, dtype=dtype, count=info['nbytes'] // dtype.itemsize,
+                                        offset=info['offset'])
+            self._arrays[name] = array.reshape(info['shape'])
+        return self._arrays[name]
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, name, row):
+        offsets = self._section(f'{name}_offsets')
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        blob = self.manifest['sections'][f'{name}_blob']['offset']
+        return self._mm[blob + start:blob + end].decode('utf-8')
+
+    def chunk_id(self, row):
+        return self._string('ids', row)
+
+    def text(self, row):
+        return self._string('texts', row)
+
+    def metadata(self, row):
+        return json.loads(self._string('metadata', row))
+
+    def postings(self):
+        """filtered_search.PostingIndex over every chunk's metadata (built on first use)"""
+        if self._postings is None:
+            from filtered_search import PostingIndex
+            self._postings = PostingIndex([self.metadata(i) for i in range(self.count)])
+        return self._postings
+
+    def verify(self):
+        """{section: crc ok} - reads every page once"""
+        return {name: zlib.crc32(self._mm[info['offset']:info['offset'] + info['nbytes']]) == info['crc32']
+                for name, info in self.manifest['sections'].items()}
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+    def _upper_neighbors(self, level, node):
+        nodes = self._section(f'graph_upper_nodes_{level}')
+        i = int(self._np.searchsorted(nodes, node))
+        links = self._section(f'graph_upper_links_{level}')[i]
+        return links[links >= 0]
+
+    def search_graph(self, query, k=5, ef=64):
+        """Approximate top k by walking the HNSW graph (greedy upper levels, beam of `ef` on level 0)"""
+        np = self._np
+        vectors = self.vectors
+        entry = self.hnsw['entry']
+        best, best_sim = entry, float(vectors[entry] @ query)
+        for level in range(self.hnsw['max_level'], 0, -1):
+            improved = True
+            while improved:
+                improved = False
+                neighbors = self._upper_neighbors(level, best)
+                if len(neighbors):
+                    sims = vectors[neighbors] @ query
+                    i = int(sims.argmax())
+                    if sims[i] > best_sim:
+                        best, best_sim, improved = int(neighbors[i]), float(sims[i]), True
+
+        level0 = self._section('graph_level0')
+        ef = max(ef, k)
+        visited = {best}
+        candidates = [(-best_sim, best)]                          # max-heap by similarity
+        results = [(best_sim, best)]                              # min-heap of the best ef
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if -neg_sim < results[0][0] and len(results) >= ef:
+                break
+            neighbors = [int(n) for n in level0[node] if n >= 0 and int(n) not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+            sims = vectors[neighbors] @ query
+            for neighbor, sim in zip(neighbors, sims.tolist()):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, neighbor))
+                    heapq.heappush(results, (sim, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        ranked = sorted(results, reverse=True)[:k]
+        return np.array([n for _, n in ranked], dtype=np.int64), np.array([s for s, _ in ranked], dtype=np.float32)
+
+    def search_exact(self, query, k=5, rows=None):
+        np = self._np
+        candidates = self.vectors if rows is None else self.vectors[rows]
+        scores = candidates @ query
+        k = min(k, len(scores))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def search(self, query, k=5, ef=64, where=None):
+        """(rows, scores); graph walk when available, exact scan over matching rows for filtered queries"""
+        np = self._np
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        if where:
+            return self.search_exact(query, k, self.postings().rows(where))
+        if self.hnsw:
+            return self.search_graph(query, k, ef)
+        return self.search_exact(query, k)
+
+    # langchain-style vector store interface (drop-in for the pipelines)
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=5, filter=None):
+        from stub_backends import StubDocument
+        rows, scores = self.search(embedding, k, where=filter)
+        return [(StubDocument(self.text(r), self.metadata(r)), float(s)) for r, s in zip(rows, scores)]
+
+    def similarity_search_by_vector(self, embedding, k=5, filter=None):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+
+    def close(self):
+        self._arrays.clear()
+        self.vectors = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass                                                   # a caller still holds a view; unmapped when freed
+
+
+# ============================================================
+# CLI
+# ============================================================
+def build(index_name, output, backend='stub', M=16, ef_construction=100, graph=True, db_path=None):
+    from retrieval_eval import EmbeddingCache, build_embeddings, load_index
+    embeddings, model_id = build_embeddings()
+    index = load_index(index_name, backend, EmbeddingCache(embeddings, model_id, db_path))
+    hnsw = None
+    if graph:
+        from filtered_search import build_hnsw
+        hnsw = build_hnsw(index.vectors, M=M, ef_construction=ef_construction)
+    with span('snapshot.write', chunks=len(index)):
+        return write_snapshot(output, list(index.ids), index.texts, index.vectors, index.metadatas, hnsw,
+                              extra={'index': index_name, 'backend': backend, 'embedding_model': model_id})
+
+
+def bench(path, queries=200, k=5, ef=64, seed=0):
+    """Open time, first-query time and graph-search recall vs exact"""
+    import numpy as np
+    start = time.perf_counter()
+    snap = SnapshotIndex(path)
+    open_ms = (time.perf_counter() - start) * 1000
+    rng = np.random.default_rng(seed)
+    qs = snap.vectors[rng.integers(0, len(snap), queries)] + 0.05 * rng.standard_normal((queries, snap.vectors.shape[1]))
+    qs = (qs / np.linalg.norm(qs, axis=1, keepdims=True)).astype(np.float32)
+    start = time.perf_counter()
+    snap.search(qs[0], k, ef)
+    first_ms = (time.perf_counter() - start) * 1000
+    latencies, recall = [], []
+    for q in qs:
+        start = time.perf_counter()
+        rows, _ = snap.search(q, k, ef)
+        latencies.append((time.perf_counter() - start) * 1000)
+        truth, _ = snap.search_exact(q, k)
+        recall.append(len(set(rows.tolist()) & set(truth.tolist())) / len(truth))
+    return {'open_ms': open_ms, 'first_query_ms': first_ms, 'p50_ms': float(np.median(latencies)),
+            'recall': float(np.mean(recall)), 'graph': bool(snap.hnsw), 'chunks': len(snap)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory-mappable index snapshots")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help="Write a snapshot of an index")
+    p.add_argument('--index', default='base')
+    p.add_argument('--backend', choices=['stub', 'chroma'], default='stub')
+    p.add_argument('--output')
+    p.add_argument('--M', type=int, help="Default: hnsw_config.json, else 16")
+    p.add_argument('--ef-construction', type=int, help="Default: hnsw_config.json, else 100")
+    p.add_argument('--no-graph', action='store_true', help="Vectors only (exact search)")
+    p.add_argument('--db')
+    p = sub.add_parser('info', help="Header, sections and sizes")
+    p.add_argument('snapshot')
+    p.add_argument('--verify', action='store_true', help="Check every section's CRC32")
+    p = sub.add_parser('bench', help="Cold open time, query latency and graph recall")
+    p.add_argument('snapshot')
+    p.add_argument('--queries', type=int, default=200)
+    p.add_argument('--k', type=int, default=5)
+    p.add_argument('--ef', type=int, default=64)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        from hnsw_tuner import CONFIG_JSON, config_key
+        tuned = {}
+        if Path(CONFIG_JSON).exists():
+            tuned = (json.loads(Path(CONFIG_JSON).read_text()).get(config_key(args.index, args.backend), {})
+                     .get('collection_metadata', {}))
+        M = args.M or tuned.get('hnsw:M', 16)
+        ef_construction = args.ef_construction or tuned.get('hnsw:construction_ef', 100)
+        output = args.output or f'{args.index}.snap'
+        manifest = build(args.index, output, args.backend, M, ef_construction, not args.no_graph, args.db)
+        print(f"✅ {manifest['count']} chunks -> {output} ({os.path.getsize(output) / 2 ** 20:.1f} MB, "
+              f"{'HNSW M=%d' % M if manifest['hnsw'] else 'no graph'})")
+        return 0
+
+    if args.command == 'info':
+        snap = SnapshotIndex(args.snapshot)
+        m = snap.manifest
+        print(f"{args.snapshot}: format v{m['version']}, {m['count']} chunks x {m['dimensions']} dims, "
+              f"hnsw={m['hnsw']}, {m['extra']}")
+        checks = snap.verify() if args.verify else {}
+        for name, info in m['sections'].items():
+            status = '' if not checks else ('  ✅' if checks[name] else '  ❌ CRC mismatch')
+            print(f"   {name:<24}{info['nbytes'] / 1024:>10.1f} KB  {info['dtype']:<5}{str(info['shape']):<16}{status}")
+        return 1 if checks and not all(checks.values()) else 0
+
+    result = bench(args.snapshot, args.queries, args.k, args.ef)
+    print(f"Opened in {result['open_ms']:.2f} ms; first query {result['first_query_ms']:.2f} ms; "
+          f"p50 {result['p50_ms']:.2f} ms; recall@{args.k} vs exact {result['recall']:.3f} "
+          f"({'graph' if result['graph'] else 'exact'} search, {result['chunks']} chunks)")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
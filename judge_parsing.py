@@ -0,0 +1,314 @@
+"""
+Judge Response Parsing
+One parser for every judge score instead of "first number in the text":
+- structured output first: a JSON object ({"score": 4}, optionally inside a
+  ```json fence) wins over anything else in the response
+- then explicit forms: "4/5", "0.75 out of 1", "10/10" (rescaled onto the
+  scale), "Score: 0.75", "75%" on 0-1 scales
+- then a bare number, only when it is unambiguous (the only number, or the
+  response opens with it: "4", "4. The answer...", "1.0 - fully relevant")
+- range validation instead of clamping: "10" on a 0-1 scale is a parse
+  failure, not a silent 1.0
+
+Failures are counted per prompt template and outcome (judge_parse_stats
+table). Unparseable but non-empty responses are queued and re-asked in one
+batched follow-up call per `batch_size` items, asking the judge to restate
+its own verdicts as JSON. Empty responses and failed calls are never
+re-asked, so no judge calls are spent on them.
+
+Usage:
+    parser = JudgeParser(run_id)
+    score = parser.parse(text, RUBRIC, 'rubric', key=('SAC-RAG', 3))
+    fixed = parser.reask(judge_llm)          # {key: score} for repaired items
+    parser.flush()
+
+    python judge_parsing.py check "Score: 0.75 out of 1" --scale unit
+    python judge_parsing.py report
+"""
+
+import argparse
+import json
+import re
+import threading
+from collections import Counter, defaultdict
+
+import results_store
+from resilience import FAILED_SCORE, is_failure
+
+results_store.register_schema("""
+CREATE TABLE IF NOT EXISTS judge_parse_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    template TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_judge_parse_stats ON judge_parse_stats (template, outcome);
+""")
+
+# Outcomes other than 'ok' are failures; 'reask_ok'/'reask_failed' count follow-ups
+OK = 'ok'
+REASKABLE = ('no_score', 'ambiguous', 'out_of_range')
+
+
+class ScoreScale:
+    """Valid score range of a judge template"""
+
+    def __init__(self, name, low, high, integer=False):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.integer = integer
+
+    def describe(self):
+        kind = 'an integer' if self.integer else 'a number'
+        return f"{kind} from {self.low} to {self.high}"
+
+    def __repr__(self):
+        return f"ScoreScale({self.name!r}, {self.low}, {self.high}, integer={self.integer})"
+
+
+RUBRIC = ScoreScale('rubric', 1, 5, integer=True)
+UNIT = ScoreScale('unit', 0.0, 1.0)
+SCALES = {scale.name: scale for scale in (RUBRIC, UNIT)}
+
+
+# ============================================================
+# Parsing
+# ============================================================
+_NUMBER = r'[-+]?(?:\d+(?:\.\d+)?|\.\d+)'
+_FENCE = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+_JSON_OBJECT = re.compile(r'\{.*\}', re.S)
+_FRACTION = re.compile(rf'({_NUMBER})\s*(?:/|out of)\s*({_NUMBER})', re.I)
+_LABELLED = re.compile(rf'\b(?:score|rating|verdict|grade|rated?(?:\s+(?:this|it))?(?:\s+(?:a|as))?)\b\**\s*'
+                       rf'(?:is|of|=|:)?\s*\**\s*({_NUMBER})', re.I)
+_LEADING = re.compile(rf'^[\s*#]*({_NUMBER})[*\s]*(?:$|[\n.,;:()\-–—])')
+_PERCENT = re.compile(rf'({_NUMBER})\s*%')
+_BARE = re.compile(_NUMBER)
+JSON_KEYS = ('score', 'rating', 'value', 'verdict')
+
+
+def _json_score(text):
+    """Score from a JSON object in the response, or None"""
+    fenced = _FENCE.search(text)
+    match = _JSON_OBJECT.search(fenced.group(1) if fenced else text)
+    if not match:
+        return None
+    try:
+        obj = json.loads(match.group())
+    except ValueError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+    for key in JSON_KEYS:
+        if key in obj:
+            value = obj[key]
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return float(value)
+            if isinstance(value, str):
+                value, outcome = _text_score(value)
+                return value if outcome == OK else None
+    return None
+
+
+def _unique(values):
+    values = set(values)
+    return values.pop() if len(values) == 1 else None
+
+
+def _text_score(text, scale=None):
+    """(value, outcome) from free text; value is None unless outcome is 'ok'"""
+    high = scale.high if scale else None
+    fractions = {(float(x), float(d)) for x, d in _FRACTION.findall(text) if float(d) in (high, 1, 5, 10, 100)}
+    if fractions:
+        if len(fractions) > 1:
+            return None, 'ambiguous'
+        x, d = fractions.pop()
+        return (x if high is None or d == high else x / d * high), OK
+    labelled = [float(v) for v in _LABELLED.findall(text)]
+    if labelled:
+        value = _unique(labelled)
+        return (value, OK) if value is not None else (None, 'ambiguous')
+    if scale is not None and scale.high == 1:
+        percents = [float(v) for v in _PERCENT.findall(text)]
+        if percents:
+            value = _unique(percents)
+            return (value / 100, OK) if value is not None else (None, 'ambiguous')
+    numbers = [float(v) for v in _BARE.findall(text)]
+    if not numbers:
+        return None, 'no_score'
+    leading = _LEADING.match(text)
+    if len(set(numbers)) == 1 or leading:
+        return (float(leading.group(1)) if leading else numbers[0]), OK
+    return None, 'ambiguous'
+
+
+def parse_score(text, scale):
+    """
+    (score, outcome) for one judge response. score is FAILED_SCORE unless
+    outcome is 'ok'; outcomes: ok, call_failed, empty, no_score, ambiguous,
+    out_of_range.
+    """
+    if is_failure(text):
+        return FAILED_SCORE, 'call_failed'
+    text = str(text).strip()
+    if not text:
+        return FAILED_SCORE, 'empty'
+    value = _json_score(text)
+    outcome = OK
+    if value is None:
+        value, outcome = _text_score(text, scale)
+    if outcome != OK:
+        return FAILED_SCORE, outcome
+    if not scale.low <= value <= scale.high or (scale.integer and not float(value).is_integer()):
+        return FAILED_SCORE, 'out_of_range'
+    return (int(value) if scale.integer else float(value)), OK
+
+
+# ============================================================
+# Counters and Batched Re-Ask
+# ============================================================
+REASK_PROMPT = """Your earlier evaluations below did not state their score in the required format.
+For each item, restate the score you gave ({scale}). If an item gives no score, use null.
+
+{items}
+
+**CRITICAL:** Respond with ONLY a JSON object mapping item ids to scores, e.g. {example}. No explanations."""
+
+
+class JudgeParser:
+    """
+    Parses judge responses, counts outcomes per template and queues
+    re-askable failures under a caller-chosen key.
+    """
+
+    def __init__(self, run_id=None, batch_size=20):
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.counts = defaultdict(Counter)
+        self.pending = {}                      # key -> (template, scale, response text)
+        self._lock = threading.Lock()
+
+    def parse(self, text, scale, template, key=None):
+        score, outcome = parse_score(text, scale)
+        with self._lock:
+            self.counts[template][outcome] += 1
+            if outcome in REASKABLE and key is not None:
+                self.pending[key] = (template, scale, str(text).strip())
+        return score
+
+    def reask_batches(self):
+        """[(keys, prompt)]: one follow-up prompt per batch of pending items of the same scale"""
+        by_scale = defaultdict(list)
+        for key, (template, scale, text) in self.pending.items():
+            by_scale[scale.name].append((key, scale, text))
+        batches = []
+        for items in by_scale.values():
+            for start in range(0, len(items), self.batch_size):
+                chunk = items[start:start + self.batch_size]
+                scale = chunk[0][1]
+                body = '\n\n'.join(f'Item "{n + 1}":\n<<<\n{text}\n>>>' for n, (_, _, text) in enumerate(chunk))
+                example = json.dumps({str(n + 1): scale.high for n in range(min(len(chunk), 2))})
+                batches.append(([key for key, _, _ in chunk],
+                                REASK_PROMPT.format(scale=scale.describe(), items=body, example=example)))
+        return batches
+
+    def apply_reask(self, keys, text):
+        """Parse one follow-up response; returns {key: score} for the items it repaired"""
+        try:
+            match = _JSON_OBJECT.search(_FENCE.sub(lambda m: m.group(1), str(text or '')))
+            answers = json.loads(match.group()) if match else {}
+        except ValueError:
+            answers = {}
+        if isinstance(answers.get('scores'), dict):
+            answers = answers['scores']
+        fixed = {}
+        with self._lock:
+            for n, key in enumerate(keys):
+                template, scale, _ = self.pending.pop(key)
+                value = answers.get(str(n + 1)) if isinstance(answers, dict) else None
+                score, outcome = parse_score(json.dumps({'score': value}), scale) if value is not None \
+                    else (FAILED_SCORE, 'no_score')
+                self.counts[template]['reask_ok' if outcome == OK else 'reask_failed'] += 1
+                if outcome == OK:
+                    fixed[key] = score
+        return fixed
+
+    def reask(self, llm, **retry_kwargs):
+        """Re-ask every pending item through `llm` (one call per batch); returns {key: score}"""
+        from cost_accounting import call_context
+        from resilience import invoke_with_retry
+        fixed = {}
+        for keys, prompt in self.reask_batches():
+            with call_context(stage='reask'):
+                response = invoke_with_retry(llm, prompt, **retry_kwargs)
+            fixed.update(self.apply_reask(keys, None if is_failure(response) else response))
+        return fixed
+
+    def summary(self):
+        """[(template, parsed, failed, {outcome: count})]"""
+        rows = []
+        for template, counts in sorted(self.counts.items()):
+            failed = sum(n for outcome, n in counts.items() if outcome not in (OK, 'reask_ok', 'reask_failed'))
+            rows.append((template, counts[OK], failed, dict(counts)))
+        return rows
+
+    def print_summary(self):
+        for template, parsed, failed, counts in self.summary():
+            detail = ', '.join(f"{k}={v}" for k, v in sorted(counts.items()) if k != OK)
+            print(f"   {template:<20} parsed {parsed}, failed {failed}" + (f" ({detail})" if detail else ''))
+
+    def flush(self, db_path=None):
+        """Append the counters to judge_parse_stats and reset them"""
+        with self._lock:
+            rows = [{'run_id': self.run_id, 'template': template, 'outcome': outcome, 'count': n}
+                    for template, counts in self.counts.items() for outcome, n in counts.items()]
+            self.counts.clear()
+        if rows:
+            conn = results_store.connect(db_path)
+            try:
+                results_store.insert_rows(conn, 'judge_parse_stats', rows)
+            finally:
+                conn.close()
+
+
+def parse_failure_report(db_path=None):
+    """Per-template parse outcomes accumulated over all runs"""
+    return results_store.query("""
+        SELECT template,
+               SUM(CASE WHEN outcome IN ('ok', 'reask_ok', 'reask_failed') THEN 0 ELSE count END) AS failed,
+               SUM(CASE WHEN outcome NOT IN ('reask_ok', 'reask_failed') THEN count ELSE 0 END) AS responses,
+               SUM(CASE WHEN outcome = 'reask_ok' THEN count ELSE 0 END) AS repaired,
+               GROUP_CONCAT(DISTINCT CASE WHEN outcome != 'ok' THEN outcome END) AS outcomes
+        FROM judge_parse_stats GROUP BY template ORDER BY failed DESC""", db_path=db_path)
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Judge response parsing: check responses, report failure rates")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('check', help="Parse judge responses given on the command line")
+    p.add_argument('responses', nargs='+')
+    p.add_argument('--scale', choices=sorted(SCALES), default='rubric')
+    p = sub.add_parser('report', help="Per-template parse-failure counters from the results store")
+    p.add_argument('--db')
+    args = parser.parse_args(argv)
+
+    if args.command == 'check':
+        for text in args.responses:
+            score, outcome = parse_score(text, SCALES[args.scale])
+            print(f"{outcome:<13}{score!s:<6} {text!r}")
+        return
+    report = parse_failure_report(args.db)
+    if report.empty:
+        print("No parse statistics recorded yet")
+        return
+    report['failure_rate'] = (report['failed'] / report['responses']).round(3)
+    print(report.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
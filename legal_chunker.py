@@ -0,0 +1,435 @@
+"""
+Legal-Structure-Aware Chunker
+Splits Kenyan statutes, the Constitution and judgments along their own
+structure instead of every 1000 characters:
+
+- statutes       one chunk per section (Part / section metadata); schedules
+                 are their own units
+- Constitution   one chunk per Article (Chapter / Part / Article metadata)
+- judgments      runs of numbered paragraphs packed up to the target size
+                 (court, year, paragraph range metadata)
+
+Units longer than `max_chars` are split at subsection markers "(1)", "(2)"...
+and only then windowed, so a chunk never straddles two sections. Each chunk
+starts with a breadcrumb line ("Employment Act (Cap. 226) > Part VI >
+Section 45") so the structure is also in the embedded text.
+
+query_filters() reads the same structure out of a question ("Section 29 of
+Cap 160", "Supreme Court", "2023"), so metadata-filtered search only has to
+scan the matching chunks.
+
+Usage:
+    python legal_chunker.py chunk legal_pdfs/ --output legal_chunks.jsonl
+    python legal_chunker.py stats legal_pdfs/ --questions sac_rag_golden_detailed.csv
+"""
+
+import argparse
+import json
+import re
+from pathlib import Path
+
+from tracing import span
+
+MAX_CHARS = 2000
+TARGET_CHARS = 1000
+
+COURTS = {
+    'KESC': 'Supreme Court',
+    'KECA': 'Court of Appeal',
+    'KEHC': 'High Court',
+    'KEELRC': 'Employment and Labour Relations Court',
+    'KEELC': 'Environment and Land Court',
+}
+ORDINALS = ('FIRST', 'SECOND', 'THIRD', 'FOURTH', 'FIFTH', 'SIXTH', 'SEVENTH', 'EIGHTH', 'NINTH', 'TENTH')
+
+_CONSTITUTION = re.compile(r"\bCONSTITUTION OF KENYA\b", re.I)
+_JUDGMENT = re.compile(r"\b(?:JUDGMENT|RULING)\b|\beKLR\b|\[\d{4}\]\s+KE(?:SC|CA|HC|ELRC|ELC)\b")
+_CAP = re.compile(r"\b(?:CAP(?:TER)?\.?|Chapter)\s+(\d{1,3}[A-Z]?)\b", re.I)
+_ACT_TITLE = re.compile(r"^\s*(?:THE\s+)?([A-Z][A-Z ,()'&-]+?\sACT)(?:,?\s+(\d{4}))?\s*$", re.M)
+_NEUTRAL = re.compile(r"\[(\d{4})\]\s+(KESC|KECA|KEHC|KEELRC|KEELC)\b")
+_COURT_HEADER = re.compile(r"IN THE (SUPREME COURT|COURT OF APPEAL|HIGH COURT|EMPLOYMENT AND LABOUR RELATIONS COURT|"
+                           r"ENVIRONMENT AND LAND COURT)", re.I)
+_YEAR = re.compile(r"\[(\d{4})\]|\b((?:19|20)\d{2})\b")
+
+# headings open a line with an upper-case PART/CHAPTER and never run on into a sentence, so
+# body text such as "Part VI of this Act shall not apply ..." is not taken for one
+_CHAPTER = re.compile(r"^[ \t]*CHAPTER[ \t]+([A-Z]+|\d+)\b[ \t]*[—–-]*[ \t]*((?![a-z]).*)$", re.M)
+_PART = re.compile(r"^[ \t]*PART[ \t]+([IVXLC]+|\d+)\b[ \t]*[—–-]*[ \t]*((?![a-z]).*)$", re.M)
+_SCHEDULE = re.compile(rf"^\s*(?:(?:{'|'.join(ORDINALS)})\s+)?SCHEDULE\b.*$", re.M)
+_SECTION = re.compile(r"^\s*(\d{1,3})([A-Z]{0,2})\.\s+\S", re.M)
+_PARAGRAPH = re.compile(r"^\s*\[?(\d{1,4})[.\])]\s+\S", re.M)
+_SUBSECTION = re.compile(r"(?m)^(?=\s*\(\d{1,2}[A-Z]?\)\s)")
+
+
+# ============================================================
+# Document Classification
+# ============================================================
+def classify(text):
+    """'constitution', 'judgment' or 'statute'"""
+    head = text[:3000]
+    if _CONSTITUTION.search(head) and not _JUDGMENT.search(head):
+        return 'constitution'
+    if _JUDGMENT.search(head) or _COURT_HEADER.search(head):
+        return 'judgment'
+    return 'statute'
+
+
+def document_metadata(text, doc_type=None, title=None):
+    """Document-level metadata: type plus act/cap or court/year"""
+    head = text[:3000]
+    doc_type = doc_type or classify(text)
+    meta = {'doc_type': doc_type}
+    if title:
+        meta['title'] = title
+    if doc_type == 'statute':
+        act = _ACT_TITLE.search(head)
+        if act:
+            meta['act'] = act.group(1).title().replace(' Of ', ' of ').replace(' And ', ' and ')
+            if act.group(2):
+                meta['year'] = int(act.group(2))
+        cap = _CAP.search(head)
+        if cap:
+            meta['cap'] = cap.group(1)
+    elif doc_type == 'constitution':
+        meta['act'] = 'Constitution of Kenya'
+        meta['year'] = 2010
+    else:
+        neutral = _NEUTRAL.search(head)
+        header = _COURT_HEADER.search(head)
+        if neutral:
+            meta['year'] = int(neutral.group(1))
+            meta['court'] = COURTS[neutral.group(2)]
+        elif header:
+            meta['court'] = header.group(1).title().replace(' Of ', ' of ').replace(' And ', ' and ')
+        if 'year' not in meta:
+            year = _YEAR.search(head)
+            if year:
+                meta['year'] = int(year.group(1) or year.group(2))
+    return meta
+
+
+# ============================================================
+# Structural Units
+# ============================================================
+def _sequential(matches, key, max_step=2):
+    """Keep numbered markers that continue the running sequence (drops cross-references and list items)"""
+    kept, last = [], 0
+    for m in matches:
+        n = key(m)
+        if last < n <= last + max_step or (n == last and m.lastindex == 2 and m.group(2)):     # 29 -> 29A
+            kept.append(m)
+            last = n
+    return kept
+
+
+def _headings(pattern, text):
+    return [(m.start(), m.group(1), m.group(2).strip() if m.lastindex >= 2 else '') for m in pattern.finditer(text)]
+
+
+def _context_at(headings, position):
+    """The last heading at or before `position` (None before the first)"""
+    current = None
+    for start, number, name in headings:
+        if start > position:
+            break
+        current = (number, name)
+    return current
+
+
+def statute_units(text, doc_type='statute'):
+    """(start, end, structural metadata) per section/Article and per schedule"""
+    # Statutes open with an arrangement of sections (1. Short title, 2. ...) and
+    # schedules may hold numbered forms: the body is the "1." run spanning most text
+    markers = list(_SECTION.finditer(text))
+    ones = [i for i, m in enumerate(markers) if int(m.group(1)) == 1 and not m.group(2)]
+    body_start, widest = 0, -1
+    for i, stop in zip(ones, ones[1:] + [len(markers)]):
+        run = _sequential(markers[i:stop], lambda m: int(m.group(1)))
+        if run[-1].start() - run[0].start() > widest:
+            body_start, widest = run[0].start(), run[-1].start() - run[0].start()
+    schedules = [m.start() for m in _SCHEDULE.finditer(text, body_start)]
+    body_end = schedules[0] if schedules else len(text)
+    sections = _sequential(list(_SECTION.finditer(text, body_start, body_end)), lambda m: int(m.group(1)))
+    parts = _headings(_PART, text)
+    chapters = _headings(_CHAPTER, text) if doc_type == 'constitution' else []
+    label = 'article' if doc_type == 'constitution' else 'section'
+
+    headings = sorted(start for start, _, _ in parts + chapters)
+
+    def first_heading(lo, hi):
+        """Where a unit running from lo towards hi is cut short by a Part/Chapter heading"""
+        return min([start for start in headings if lo < start < hi] + [hi])
+
+    def structure(position):
+        meta = {}
+        for key, found in (('chapter', chapters), ('part', parts)):
+            context = _context_at(found, position)
+            if context:
+                meta[key] = context[0]
+                if context[1]:
+                    meta[f'{key}_title'] = context[1][:80]
+        return meta
+
+    # a heading between two sections opens the second one, so units stay contiguous and no text is dropped
+    starts = [m.start() if i == 0 else first_heading(sections[i - 1].start(), m.start()) for i, m in enumerate(sections)]
+    units = []
+    if sections and sections[0].start() > 0:
+        units.append((0, sections[0].start(), {'unit': 'preamble'}))
+    for i, m in enumerate(sections):
+        end = starts[i + 1] if i + 1 < len(sections) else first_heading(m.start(), body_end)
+        units.append((starts[i], end, {'unit': label, label: m.group(1) + m.group(2), **structure(m.start())}))
+    if sections:
+        tail = first_heading(sections[-1].start(), body_end)
+        if tail < body_end:                                        # headings after the last numbered section
+            units.append((tail, body_end, {'unit': 'body', **structure(tail)}))
+    if not sections and body_end > 0:
+        units.append((0, body_end, {'unit': 'body'}))
+    for i, start in enumerate(schedules):
+        end = schedules[i + 1] if i + 1 < len(schedules) else len(text)
+        name = text[start:text.find('\n', start) if '\n' in text[start:] else len(text)].strip()
+        units.append((start, end, {'unit': 'schedule', 'schedule': name[:60]}))
+    return units
+
+
+def judgment_units(text, target_chars=TARGET_CHARS):
+    """Runs of consecutive numbered paragraphs packed up to target_chars"""
+    paragraphs = _sequential(list(_PARAGRAPH.finditer(text)), lambda m: int(m.group(1)), max_step=3)
+    if not paragraphs:
+        return [(0, len(text), {'unit': 'body'})]
+    units = []
+    if paragraphs[0].start() > 0:
+        units.append((0, paragraphs[0].start(), {'unit': 'header'}))
+    bounds = [(m.start(), paragraphs[i + 1].start() if i + 1 < len(paragraphs) else len(text), m.group(1))
+              for i, m in enumerate(paragraphs)]
+    run_start, first = bounds[0][0], bounds[0][2]
+    for i, (start, end, number) in enumerate(bounds):
+        last_para = i + 1 == len(bounds)
+        if last_para or end - run_start >= target_chars:
+            label = first if first == number else f"{first}-{number}"
+            units.append((run_start, end, {'unit': 'paragraphs', 'paragraphs': label}))
+            if not last_para:
+                run_start, first = end, bounds[i + 1][2]
+    return units
+
+
+# ============================================================
+# Chunking
+# ============================================================
+def _split_long(text, max_chars, overlap):
+    """Subsection boundaries first, fixed windows only for what is still too long"""
+    from stub_backends import chunk_text
+    if len(text) <= max_chars:
+        return [text]
+    chunks, current = [], ''
+    for piece in (p for p in _SUBSECTION.split(text) if p.strip()):
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ''
+        if len(piece) > max_chars:
+            chunks += chunk_text(piece, max_chars, overlap)
+        else:
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def breadcrumb(meta):
+    parts = []
+    if meta.get('act'):
+        parts.append(meta['act'] + (f" (Cap. {meta['cap']})" if meta.get('cap') else ''))
+    elif meta.get('court'):
+        parts.append(meta['court'] + (f" [{meta['year']}]" if meta.get('year') else ''))
+    elif meta.get('title'):
+        parts.append(meta['title'])
+    for key, label in (('chapter', 'Chapter'), ('part', 'Part'), ('section', 'Section'), ('article', 'Article'),
+                       ('schedule', None), ('paragraphs', 'Paras')):
+        if meta.get(key):
+            parts.append(f"{label} {meta[key]}" if label else meta[key])
+    return ' > '.join(parts)
+
+
+def chunk_document(text, title=None, doc_id=None, max_chars=MAX_CHARS, target_chars=TARGET_CHARS, overlap=200,
+                   with_breadcrumb=True):
+    """[(chunk text, metadata)] following the document's legal structure"""
+    text = str(text)
+    doc_meta = document_metadata(text, title=title)
+    if doc_id is not None:
+        doc_meta['doc_id'] = doc_id
+    if doc_meta['doc_type'] == 'judgment':
+        units = judgment_units(text, target_chars)
+    else:
+        units = statute_units(text, doc_meta['doc_type'])
+    chunks = []
+    for start, end, unit_meta in units:
+        body = text[start:end].strip()
+        if not body:
+            continue
+        meta = {**doc_meta, **unit_meta}
+        pieces = _split_long(body, max_chars, overlap)
+        for i, piece in enumerate(pieces):
+            piece_meta = dict(meta, part_index=i, parts_total=len(pieces)) if len(pieces) > 1 else dict(meta)
+            header = breadcrumb(piece_meta) if with_breadcrumb else ''
+            chunks.append((f"{header}\n{piece}" if header else piece, piece_meta))
+    return chunks
+
+
+def legal_chunks(text, chunk_size=MAX_CHARS, chunk_overlap=200):
+    """chunk_text-compatible signature (texts only), for the chunking sweep"""
+    return [chunk for chunk, _ in chunk_document(text, max_chars=chunk_size, target_chars=chunk_size // 2,
+                                                 overlap=chunk_overlap)]
+
+
+# ============================================================
+# Query Filters
+# ============================================================
+_Q_SECTION = re.compile(r"\b(?:section|s\.)\s*(\d{1,3}[A-Z]{0,2})", re.I)
+_Q_ARTICLE = re.compile(r"\b(?:article|art\.)\s*(\d{1,3}[A-Z]?)", re.I)
+_Q_ACT = re.compile(r"\b((?:[A-Z][\w'-]*\s+)+(?:and\s+(?:[A-Z][\w'-]*\s+)+)?Act)\b")
+_Q_COURT = re.compile(r"\b(Supreme Court|Court of Appeal|High Court|Employment and Labour Relations Court|"
+                      r"Environment and Land Court)\b", re.I)
+
+
+def query_filters(question):
+    """
+    Structural references in a question as metadata filters, e.g.
+    "Section 29 of Cap 160" -> {'cap': '160', 'section': '29'}.
+    """
+    filters = {}
+    for key, pattern in (('section', _Q_SECTION), ('article', _Q_ARTICLE), ('cap', _CAP)):
+        m = pattern.search(question)
+        if m:
+            filters[key] = m.group(1).upper()
+    act = _Q_ACT.search(question)
+    if act and 'cap' not in filters:
+        filters['act'] = re.sub(r'^The\s+', '', act.group(1).strip())
+    court = _Q_COURT.search(question)
+    if court:
+        # a judgment's sections, articles and Acts are citations, not its structure
+        for key in ('section', 'article', 'cap', 'act'):
+            filters.pop(key, None)
+        filters['court'] = court.group(1).title().replace(' Of ', ' of ').replace(' And ', ' and ')
+        filters['doc_type'] = 'judgment'
+    if 'article' in filters and 'section' not in filters and 'doc_type' not in filters:
+        filters['doc_type'] = 'constitution'
+    year = _NEUTRAL.search(question) or re.search(r"\b(?:in|of|from)\s+((?:19|20)\d{2})\b", question)
+    if year and 'court' in filters:
+        filters['year'] = int(year.group(1))
+    return filters
+
+
+def canonical_act(name):
+    """'The Land Registration Act, 2012' -> 'land registration act' (case, 'The' and year dropped)"""
+    name = re.sub(r'\s+', ' ', str(name)).strip().lower()
+    name = re.sub(r'^the ', '', name)
+    return re.sub(r',?\s*(?:no\.\s*\d+\s*of\s*)?\d{4}$', '', name).strip()
+
+
+def act_matches(wanted, act):
+    """Loose Act match: a question names "Succession Act" for the Law of Succession Act"""
+    wanted, act = canonical_act(wanted), canonical_act(act)
+    return bool(wanted) and re.search(r'\b' + re.escape(wanted) + r'\b', act) is not None
+
+
+def matches(meta, filters):
+    """True when a chunk's metadata satisfies every filter (act names match loosely, see act_matches)"""
+    for key, value in filters.items():
+        have = meta.get(key)
+        if key == 'act':
+            if not have or not act_matches(value, have):
+                return False
+        elif have is None or str(have).upper() != str(value).upper():
+            return False
+    return True
+
+
+# ============================================================
+# Corpus I/O
+# ============================================================
+def read_document(path):
+    path = Path(path)
+    if path.suffix.lower() == '.pdf':
+        from pypdf import PdfReader
+        return '\n'.join(page.extract_text() or '' for page in PdfReader(str(path)).pages)
+    return path.read_text(encoding='utf-8', errors='replace')
+
+
+def load_corpus(paths):
+    """[(title, text)] from .txt/.md/.pdf files or directories of them"""
+    documents = []
+    for path in map(Path, paths):
+        files = sorted(p for p in path.rglob('*') if p.suffix.lower() in ('.txt', '.md', '.pdf')) \
+            if path.is_dir() else [path]
+        documents += [(f.stem, read_document(f)) for f in files]
+    return documents
+
+
+def chunk_corpus(documents, **kwargs):
+    """[(chunk text, metadata)] over [(title, text)]"""
+    chunks = []
+    with span('legal_chunker.chunk', documents=len(documents)):
+        for doc_id, (title, text) in enumerate(documents):
+            chunks += chunk_document(text, title=title, doc_id=doc_id, **kwargs)
+    return chunks
+
+
+# ============================================================
+# CLI
+# ============================================================
+def print_stats(chunks, questions=()):
+    import numpy as np
+    sizes = np.array([len(text) for text, _ in chunks])
+    by_type = {}
+    for _, meta in chunks:
+        by_type[meta['doc_type']] = by_type.get(meta['doc_type'], 0) + 1
+    print(f"\n📄 {len(chunks)} chunks ({', '.join(f'{t}: {n}' for t, n in sorted(by_type.items()))})")
+    if len(sizes):
+        print(f"   chars p10/p50/p90/max: {np.percentile(sizes, 10):.0f} / {np.percentile(sizes, 50):.0f} / "
+              f"{np.percentile(sizes, 90):.0f} / {sizes.max()}")
+    filtered = [(q, query_filters(q)) for q in questions]
+    filtered = [(q, f) for q, f in filtered if f]
+    if filtered:
+        # count through the same posting index and `where` that filtered search uses
+        from filtered_search import PostingIndex, to_where
+        postings = PostingIndex([meta for _, meta in chunks])
+        acts = postings.values('act')
+        print(f"\n🔎 {len(filtered)}/{len(questions)} questions carry structural filters:")
+        for question, filters in filtered:
+            scanned = postings.count(to_where(filters, acts))
+            print(f"   {scanned:>6}/{len(chunks)} chunks scanned  {filters}  {question[:60]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunk statutes and judgments along Part/Section/Article/paragraph lines")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('chunk', "Write chunks with hierarchical metadata as JSON lines"),
+                            ('stats', "Chunk size distribution and per-question filter selectivity")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('inputs', nargs='+', help=".txt/.md/.pdf files or directories")
+        p.add_argument('--max-chars', type=int, default=MAX_CHARS)
+        p.add_argument('--target-chars', type=int, default=TARGET_CHARS, help="Judgment paragraph-run size")
+        p.add_argument('--no-breadcrumb', action='store_true')
+    sub.choices['chunk'].add_argument('--output', default='legal_chunks.jsonl')
+    sub.choices['stats'].add_argument('--questions', help="CSV with a question/Question column")
+    args = parser.parse_args(argv)
+
+    documents = load_corpus(args.inputs)
+    chunks = chunk_corpus(documents, max_chars=args.max_chars, target_chars=args.target_chars,
+                          with_breadcrumb=not args.no_breadcrumb)
+    if args.command == 'chunk':
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for text, meta in chunks:
+                f.write(json.dumps({'text': text, 'metadata': meta}, ensure_ascii=False) + '\n')
+        print(f"✅ {len(chunks)} chunks from {len(documents)} documents -> {args.output}")
+        return 0
+    questions = []
+    if args.questions:
+        import pandas as pd
+        df = pd.read_csv(args.questions)
+        questions = df['question' if 'question' in df else 'Question'].dropna().tolist()
+    print_stats(chunks, questions)
+    return 0
+
+
+if __name__ == '__main__':
+    main()
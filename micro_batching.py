@@ -0,0 +1,421 @@
+"""
+Dynamic Micro-Batching for the Query Path
+Concurrent questions each used to make their own embedding call and their
+own vector search. A MicroBatcher collects concurrent requests for up to
+`max_wait_ms` after the first one arrives (or until `max_batch` are
+waiting), runs one batched call, and hands each caller its own result.
+
+    BatchedEmbeddings   embed_query -> one embed_documents call per batch,
+                        for backends with a batch API; Titan v2 embeds one
+                        text per InvokeModel, so there is nothing to batch
+    BatchedVectorStore  similarity_search_by_vector (and the scored variant
+                        the retrieval cache uses) -> one matrix search per
+                        (k, filter) group, when the store has
+                        similarity_search_by_vectors; otherwise concurrent
+                        single searches
+
+Both are drop-in wrappers, so the pipelines in rag_pipelines.py need no
+changes. Every batcher records batch sizes and the queueing delay it adds
+(submit -> dispatch), available from .metrics().
+
+Usage:
+    python micro_batching.py bench --concurrency 1 8 32 --window-ms 0 2 5 --max-batch 32
+    python micro_batching.py bench --embed-batch-api     # an embedding endpoint that takes a list
+    python rag_benchmark.py --micro-batch-ms 5 --max-batch 32 --concurrency 16
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from cost_accounting import call_context, current_context
+from tracing import span
+
+DEFAULT_MAX_BATCH = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_INFLIGHT = 4
+
+
+# ============================================================
+# Batcher
+# ============================================================
+class MicroBatcher:
+    """
+    Collects items submitted from many threads into batches for
+    `handler(items) -> results` (same length and order). A batch is
+    dispatched when `max_batch` items are waiting or `max_wait_ms` has passed
+    since its first item arrived; max_wait_ms=0 dispatches whatever is already
+    queued without waiting. Up to `inflight` batches run at once; while all
+    are busy, new requests keep queueing and join the next batch.
+    """
+
+    def __init__(self, handler, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, name='batch',
+                 inflight=DEFAULT_INFLIGHT):
+        self.handler = handler
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.inflight = max(1, inflight)
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(self.inflight)
+        self._pool = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes = []
+        self._queue_delays = []
+        self._handler_seconds = []
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.inflight, thread_name_prefix=f'{self.name}-batch')
+                    self._thread = threading.Thread(target=self._run, name=f'{self.name}-batcher', daemon=True)
+                    self._thread.start()
+
+    def submit(self, item):
+        """Queue one item; returns a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter(), current_context()))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)                              # finish this batch, then stop
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            self._slots.acquire()                                  # wait for a free in-flight slot first
+            batch = self._collect()
+            if batch is None:
+                self._slots.release()
+                return
+            self._pool.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        try:
+            dispatched = time.perf_counter()
+            items = [entry[0] for entry in batch]
+            # usage records for the batched call keep only the tags every caller shares
+            contexts = [entry[3] for entry in batch]
+            shared = {key: value for key, value in contexts[0].items() if all(c.get(key) == value for c in contexts)}
+            try:
+                with call_context(**shared), span(f'{self.name}.batch', size=len(items)):
+                    results = self.handler(items)
+                if len(results) != len(items):
+                    raise ValueError(f"{self.name} handler returned {len(results)} results for {len(items)} items")
+            except Exception as exc:
+                for entry in batch:
+                    entry[1].set_exception(exc)
+            else:
+                for entry, result in zip(batch, results):
+                    entry[1].set_result(result)
+            with self._metrics_lock:
+                self._batch_sizes.append(len(batch))
+                self._queue_delays.extend(dispatched - entry[2] for entry in batch)
+                self._handler_seconds.append(time.perf_counter() - dispatched)
+        finally:
+            self._slots.release()
+
+    def metrics(self):
+        """Batch-size and queueing-delay statistics since creation (or the last reset)"""
+        import numpy as np
+        with self._metrics_lock:
+            sizes = np.array(self._batch_sizes, dtype=float)
+            delays = np.array(self._queue_delays, dtype=float) * 1000
+            handler = np.array(self._handler_seconds, dtype=float) * 1000
+        if len(sizes) == 0:
+            return {'name': self.name, 'batches': 0, 'items': 0}
+        return {
+            'name': self.name,
+            'batches': len(sizes),
+            'items': int(sizes.sum()),
+            'batch_size_mean': float(sizes.mean()),
+            'batch_size_p50': float(np.percentile(sizes, 50)),
+            'batch_size_max': int(sizes.max()),
+            'queue_delay_ms_p50': float(np.percentile(delays, 50)),
+            'queue_delay_ms_p95': float(np.percentile(delays, 95)),
+            'queue_delay_ms_max': float(delays.max()),
+            'handler_ms_p50': float(np.percentile(handler, 50)),
+        }
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self._batch_sizes, self._queue_delays, self._handler_seconds = [], [], []
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._pool.shutdown(wait=True)
+            self._thread = self._pool = None
+
+
+# ============================================================
+# Drop-in Wrappers
+# ============================================================
+def has_batch_api(embeddings):
+    """True when embed_documents embeds a whole list in one backend call (not Titan v2's one text per call)"""
+    return bool(getattr(embeddings, 'batch_api', False))
+
+
+class _FanOut:
+    """Runs one call per item concurrently, for backends without a batched call"""
+
+    def __init__(self, workers, name):
+        self.workers = max(1, workers)
+        self.name = name
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def map(self, fn, items):
+        if len(items) == 1:
+            return [fn(items[0])]
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'{self.name}-fanout')
+        context = current_context()
+
+        def call(item):
+            with call_context(**context):
+                return fn(item)
+        return list(self._pool.map(call, items))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+class BatchedEmbeddings:
+    """
+    Embeddings wrapper whose embed_query calls are micro-batched into
+    embed_documents. Backends without a batch API (has_batch_api False, e.g.
+    Titan v2) get the batch's embed_query calls fanned out concurrently, so
+    batching them only adds the window; batch_pipeline leaves those unwrapped.
+    """
+
+    def __init__(self, embeddings, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, inflight=DEFAULT_INFLIGHT):
+        self.embeddings = embeddings
+        self._fan_out = None if has_batch_api(embeddings) else _FanOut(max_batch, 'embed_query')
+        handler = embeddings.embed_documents if self._fan_out is None else self._embed_each
+        self.batcher = MicroBatcher(handler, max_batch, max_wait_ms, 'embed_query', inflight)
+
+    def _embed_each(self, texts):
+        return self._fan_out.map(self.embeddings.embed_query, texts)
+
+    def embed_query(self, text):
+        return self.batcher(text)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def close(self):
+        self.batcher.close()
+        if self._fan_out is not None:
+            self._fan_out.close()
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+
+class BatchedVectorStore:
+    """
+    Vector store wrapper whose similarity_search_by_vector and
+    similarity_search_by_vector_with_relevance_scores (used by retrieve()
+    when a retrieval cache is active) calls are micro-batched
+    """
+
+    def __init__(self, vector_store, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, inflight=DEFAULT_INFLIGHT):
+        self.vector_store = vector_store
+        self._fan_out = _FanOut(max_batch, 'vector_search')
+        self.batcher = MicroBatcher(self._search_batch, max_batch, max_wait_ms, 'vector_search', inflight)
+
+    def _search_batch(self, requests):
+        """
+        requests: [(embedding, k, filter, with_scores)]; one batched search per
+        distinct (k, filter, with_scores), or concurrent single searches when
+        the store has no similarity_search_by_vectors
+        """
+        groups = {}
+        for i, (_, k, where, with_scores) in enumerate(requests):
+            groups.setdefault((k, json.dumps(where, sort_keys=True, default=str), with_scores), []).append(i)
+        results = [None] * len(requests)
+        batched = getattr(self.vector_store, 'similarity_search_by_vectors', None)
+        for (k, _, with_scores), rows in groups.items():
+            where = requests[rows[0]][2]
+            vectors = [requests[i][0] for i in rows]
+            if batched is not None:
+                found = batched(vectors, k=k, filter=where, with_scores=with_scores)
+            else:
+                search = (self.vector_store.similarity_search_by_vector_with_relevance_scores if with_scores
+                          else self.vector_store.similarity_search_by_vector)
+                found = self._fan_out.map(lambda vector: search(vector, k=k, filter=where), vectors)
+            for i, docs in zip(rows, found):
+                results[i] = docs
+        return results
+
+    def similarity_search_by_vector(self, embedding, k=5, filter=None):
+        return self.batcher((embedding, k, filter, False))
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=5, filter=None):
+        return self.batcher((embedding, k, filter, True))
+
+    def close(self):
+        self.batcher.close()
+        self._fan_out.close()
+
+    def __getattr__(self, name):
+        return getattr(self.vector_store, name)
+
+
+def batch_pipeline(pipeline, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, batchers=None):
+    """
+    Micro-batch a pipeline's query embedding (when the backend has a batch
+    API) and vector search in place. `batchers` ({id(backend): wrapper}) lets
+    pipelines that share a backend share its batcher too. Returns the pipeline.
+    """
+    batchers = {} if batchers is None else batchers
+    if pipeline.embeddings is not None and has_batch_api(pipeline.embeddings):
+        key = id(pipeline.embeddings)
+        if key not in batchers:
+            batchers[key] = BatchedEmbeddings(pipeline.embeddings, max_batch, max_wait_ms)
+        pipeline.embeddings = batchers[key]
+    if pipeline.vector_store is not None:
+        key = id(pipeline.vector_store)
+        if key not in batchers:
+            batchers[key] = BatchedVectorStore(pipeline.vector_store, max_batch, max_wait_ms)
+        pipeline.vector_store = batchers[key]
+    return pipeline
+
+
+def batching_metrics(wrappers):
+    """metrics() of every BatchedEmbeddings / BatchedVectorStore in `wrappers`"""
+    return [wrapper.batcher.metrics() for wrapper in wrappers]
+
+
+# ============================================================
+# Benchmark
+# ============================================================
+class _Quota:
+    """Caps concurrent calls into a stub backend, like a per-account Bedrock concurrency quota"""
+
+    def __init__(self, backend, slots):
+        self.backend = backend
+        self._slots = threading.Semaphore(slots)
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._slots:
+                return attr(*args, **kwargs)
+        return call
+
+
+def bench(concurrency_levels, windows_ms, max_batch=DEFAULT_MAX_BATCH, requests=256, time_scale=0.1,
+          backend_slots=DEFAULT_INFLIGHT, seed=42, embed_batch_api=False):
+    """
+    Retrieval-only (embed + search) QPS and latency, unbatched vs micro-batched
+    windows, with at most `backend_slots` concurrent calls per backend. The
+    stub embeds one text per call like Titan v2 unless `embed_batch_api`, in
+    which case query embeddings are batched too.
+    """
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+    from rag_benchmark import build_stub_corpus
+    from stub_backends import StubEmbeddings, StubVectorStore
+    _, _, base_chunks, _ = build_stub_corpus()
+    questions = [f"question {i} about land title, succession and employment" for i in range(requests)]
+    rows = []
+    for concurrency in concurrency_levels:
+        for window in [None] + list(windows_ms):
+            embeddings = _Quota(StubEmbeddings(time_scale=time_scale, seed=seed, batch_api=embed_batch_api),
+                                backend_slots)
+            store = _Quota(StubVectorStore(base_chunks, time_scale=time_scale, seed=seed + 1), backend_slots)
+            if window is not None:
+                if embed_batch_api:
+                    embeddings = BatchedEmbeddings(embeddings, max_batch, window, backend_slots)
+                store = BatchedVectorStore(store, max_batch, window, backend_slots)
+
+            def retrieve(question):
+                start = time.perf_counter()
+                store.similarity_search_by_vector(embeddings.embed_query(question), k=5)
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                latencies = np.array(list(pool.map(retrieve, questions))) * 1000
+            wall = time.perf_counter() - start
+            row = {'concurrency': concurrency, 'window_ms': 'off' if window is None else window,
+                   'qps': requests / wall, 'p50_ms': float(np.percentile(latencies, 50)),
+                   'p95_ms': float(np.percentile(latencies, 95))}
+            if window is not None:
+                metrics = store.batcher.metrics()
+                row.update(search_calls=metrics['batches'], batch_mean=metrics['batch_size_mean'],
+                           queue_delay_p50_ms=metrics['queue_delay_ms_p50'])
+                store.close()
+                if embed_batch_api:
+                    row.update(embed_calls=embeddings.batcher.metrics()['batches'])
+                    embeddings.close()
+                else:
+                    row.update(embed_calls=requests)
+            else:
+                row.update(embed_calls=requests, search_calls=requests, batch_mean=1.0, queue_delay_p50_ms=0.0)
+            rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-batched query embedding and vector search")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('bench', help="Unbatched vs micro-batched retrieval on the stub backends")
+    p.add_argument('--concurrency', nargs='+', type=int, default=[1, 8, 32])
+    p.add_argument('--window-ms', nargs='+', type=float, default=[0, 2, 5])
+    p.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    p.add_argument('--requests', type=int, default=256)
+    p.add_argument('--time-scale', type=float, default=0.1, help="Multiply stub latencies")
+    p.add_argument('--backend-slots', type=int, default=DEFAULT_INFLIGHT,
+                   help="Concurrent calls each stub backend accepts (account quota)")
+    p.add_argument('--embed-batch-api', action='store_true',
+                   help="Model an embedding endpoint that takes a list per call (Titan v2 takes one text)")
+    args = parser.parse_args(argv)
+
+    rows = bench(args.concurrency, args.window_ms, args.max_batch, args.requests, args.time_scale, args.backend_slots,
+                 embed_batch_api=args.embed_batch_api)
+    print(f"{'conc':>5} {'window':>7} {'QPS':>8} {'p50 ms':>8} {'p95 ms':>8} {'embed calls':>12} "
+          f"{'search calls':>13} {'batch':>6} {'queue p50':>10}")
+    for r in rows:
+        window = r['window_ms'] if r['window_ms'] == 'off' else f"{r['window_ms']:g}ms"
+        print(f"{r['concurrency']:>5} {window:>7} {r['qps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['embed_calls']:>12} {r['search_calls']:>13} {r['batch_mean']:>6.1f} {r['queue_delay_p50_ms']:>9.2f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
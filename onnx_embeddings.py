@@ -0,0 +1,269 @@
+"""
+Local ONNX Embedding Backend
+A CPU embedder for sentence-transformer style models exported to ONNX
+(e.g. bge-small-en-v1.5, e5-small-v2), with the same embed_query /
+embed_documents interface as BedrockEmbeddings so it plugs into the
+pipelines, the embedding cache and every `--embeddings onnx` CLI.
+
+- int8 dynamic quantization (`quantize`) - model_quantized.onnx is preferred
+  when present
+- texts are sorted by length before batching, so padding stays short
+- ONNX Runtime intra-op threads per batch, plus optional parallel batches
+- mean pooling over the attention mask (or the model's pooled output) and
+  L2 normalisation, so vectors drop into cosine search unchanged
+
+A model directory holds model.onnx and/or model_quantized.onnx plus the
+Hugging Face tokenizer.json. Needs `onnxruntime` and `tokenizers`.
+
+`bench` compares it with Titan Text Embeddings v2 on the golden and RAGAS
+questions: per-query latency, batch throughput, and top-k overlap with
+Titan's rankings (plus gold-label recall when retrieval_gold.csv exists).
+Titan vectors come from the embedding cache, so no Bedrock calls are made
+once `retrieval_eval.py --embeddings bedrock` has run; Titan latency comes
+from recorded llm_calls.
+
+Usage:
+    python onnx_embeddings.py quantize --model-dir models/bge-small-en-v1.5
+    python onnx_embeddings.py bench --model-dir models/bge-small-en-v1.5 --index base --k 5 10
+    python retrieval_eval.py --embeddings onnx --onnx-model models/bge-small-en-v1.5 evaluate
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+from tracing import span
+
+DEFAULT_ONNX_MODEL = 'models/bge-small-en-v1.5'
+QUANTIZED_MODEL = 'model_quantized.onnx'
+FULL_MODEL = 'model.onnx'
+
+
+# ============================================================
+# Embedder
+# ============================================================
+class OnnxEmbeddings:
+    """Sentence embeddings from a local ONNX model (drop-in for BedrockEmbeddings)"""
+
+    batch_api = True                                       # embed_documents runs one batched forward pass
+
+    def __init__(self, model_dir=DEFAULT_ONNX_MODEL, quantized=True, max_length=512, batch_size=32,
+                 threads=None, parallel_batches=1, query_prefix=''):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        model_dir = Path(model_dir)
+        model_file = model_dir / QUANTIZED_MODEL
+        if not quantized or not model_file.exists():
+            model_file = model_dir / FULL_MODEL
+        if not model_file.exists():
+            raise FileNotFoundError(f"No {QUANTIZED_MODEL} or {FULL_MODEL} in {model_dir}")
+        self.model_id = f'onnx:{model_dir.name}/{model_file.stem}'
+        self.batch_size = batch_size
+        self.parallel_batches = max(1, parallel_batches)
+        self.query_prefix = query_prefix
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or max(1, (os.cpu_count() or 1) // self.parallel_batches)
+        self.session = ort.InferenceSession(str(model_file), options, providers=['CPUExecutionProvider'])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+    def _run(self, texts):
+        """(len(texts), d) unit vectors for one batch"""
+        import numpy as np
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        output = self.session.run(None, {name: value for name, value in feeds.items() if name in self._inputs})[0]
+        if output.ndim == 3:                                       # token states -> masked mean
+            mask = feeds['attention_mask'][:, :, None].astype(np.float32)
+            output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return (output / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+    def embed_array(self, texts):
+        """(len(texts), d) float32 array, in input order"""
+        import numpy as np
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        with span('onnx.embed', model_id=self.model_id, texts=len(texts), batches=len(batches)):
+            if self.parallel_batches > 1 and len(batches) > 1:
+                from concurrent.futures import ThreadPoolExecutor
+                with ThreadPoolExecutor(max_workers=self.parallel_batches) as pool:
+                    outputs = list(pool.map(lambda b: self._run([texts[i] for i in b]), batches))
+            else:
+                outputs = [self._run([texts[i] for i in batch]) for batch in batches]
+        if not outputs:
+            return np.zeros((0, 0), dtype=np.float32)
+        result = np.empty((len(texts), outputs[0].shape[1]), dtype=np.float32)
+        for batch, vectors in zip(batches, outputs):
+            result[batch] = vectors
+        return result
+
+    def embed_documents(self, texts):
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([self.query_prefix + text])[0].tolist()
+
+
+def quantize(model_dir=DEFAULT_ONNX_MODEL):
+    """Write model_quantized.onnx (dynamic int8 weights) next to model.onnx; returns its path"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    model_dir = Path(model_dir)
+    output = model_dir / QUANTIZED_MODEL
+    quantize_dynamic(str(model_dir / FULL_MODEL), str(output), weight_type=QuantType.QInt8)
+    return output
+
+
+# ============================================================
+# Benchmark vs Titan
+# ============================================================
+def titan_latency(db_path=None):
+    """
+    p50/p95 seconds of recorded Bedrock Titan embedding calls. Stub-backend
+    rows (rag_benchmark --record-usage) are excluded; raises ValueError when
+    no real Titan calls have been recorded.
+    """
+    import numpy as np
+    import results_store
+    from retrieval_eval import EMBEDDING_MODEL_ID
+    rows = results_store.query(
+        "SELECT latency_s FROM llm_calls WHERE kind = 'embedding' AND model_id = ? AND status = 'ok' "
+        "AND backend != 'stub' AND latency_s IS NOT NULL", (EMBEDDING_MODEL_ID,), db_path=db_path)
+    if rows.empty:
+        raise ValueError(f"No Bedrock {EMBEDDING_MODEL_ID} calls recorded in llm_calls (stub runs don't count); "
+                         "record some with InstrumentedEmbeddings against Bedrock")
+    values = rows['latency_s'].to_numpy()
+    return {'calls': len(values), 'p50': float(np.percentile(values, 50)), 'p95': float(np.percentile(values, 95))}
+
+
+def overlap_at_k(top_a, top_b, k):
+    """Mean fraction of b's top k that a also ranks in its top k"""
+    import numpy as np
+    return float(np.mean([len(set(a[:k]) & set(b[:k])) / k for a, b in zip(top_a, top_b)]))
+
+
+def bench(embedder, index_name='base', backend='stub', dataset='all', ks=(5, 10), latency_queries=50,
+          batch_sizes=(1, 8, 32), titan_service='cache', region='us-east-1', db_path=None):
+    """Latency, throughput and retrieval agreement of `embedder` vs Titan; returns a dict of results"""
+    import numpy as np
+    from rag_benchmark import load_questions
+    from retrieval_eval import EMBEDDING_MODEL_ID, EmbeddingCache, RetrievalIndex, build_embeddings, load_index
+    questions = load_questions(dataset)
+
+    titan = build_embeddings('bedrock', region)[0] if titan_service == 'bedrock' else None
+    titan_cache = EmbeddingCache(titan, EMBEDDING_MODEL_ID, db_path)
+    titan_index = load_index(index_name, backend, titan_cache)
+    titan_queries = titan_cache.embed(questions)
+
+    latencies = []
+    for question in questions[:latency_queries]:
+        start = time.perf_counter()
+        embedder.embed_query(question)
+        latencies.append(time.perf_counter() - start)
+    throughput = {}
+    for batch_size in batch_sizes:
+        embedder.batch_size = batch_size
+        start = time.perf_counter()
+        embedder.embed_documents(titan_index.texts)
+        throughput[batch_size] = len(titan_index.texts) / (time.perf_counter() - start)
+
+    local_cache = EmbeddingCache(embedder, embedder.model_id, db_path)
+    local_index = RetrievalIndex(index_name, titan_index.ids, titan_index.texts, local_cache.embed(titan_index.texts))
+    local_queries = np.vstack([embedder.embed_query(q) for q in questions]).astype(np.float32)
+    max_k = max(ks)
+    top_titan = titan_index.search(titan_queries, max_k)
+    top_local = local_index.search(local_queries, max_k)
+    result = {
+        'model_id': embedder.model_id, 'questions': len(questions), 'chunks': len(titan_index),
+        'query_p50_ms': float(np.percentile(latencies, 50)) * 1000,
+        'query_p95_ms': float(np.percentile(latencies, 95)) * 1000,
+        'throughput': throughput,
+        'overlap': {k: overlap_at_k(top_local, top_titan, k) for k in ks},
+        'titan': _titan_latency_or_error(db_path),
+        'gold_recall': gold_recall([titan_index, local_index], [titan_queries, local_queries], questions, ks),
+    }
+    return result
+
+
+def _titan_latency_or_error(db_path):
+    try:
+        return titan_latency(db_path)
+    except ValueError as e:
+        return {'error': str(e)}
+
+
+def gold_recall(indexes, query_sets, questions, ks):
+    """{k: (titan recall, local recall)} over questions with gold labels, or None without retrieval_gold.csv"""
+    import numpy as np
+    from rag_pipelines import question_key
+    from retrieval_eval import GOLD_CSV, load_gold, ranking_metrics, relevance_matrix
+    if not os.path.exists(GOLD_CSV):
+        return None
+    gold, _ = load_gold()
+    qids = [question_key(q) for q in questions]
+    recalls = {}
+    for index, vectors in zip(indexes, query_sets):
+        relevance, _ = relevance_matrix(gold, index, qids)
+        metrics = ranking_metrics(index.search(vectors, max(ks)), relevance, ks)
+        for k in ks:
+            recalls.setdefault(k, []).append(float(np.nanmean(metrics[k]['recall'])))
+    return {k: tuple(values) for k, values in recalls.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local ONNX embedding backend")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('quantize', help="int8 dynamic quantization of model.onnx")
+    p.add_argument('--model-dir', default=DEFAULT_ONNX_MODEL)
+    p = sub.add_parser('bench', help="Latency, throughput and recall vs cached Titan vectors")
+    p.add_argument('--model-dir', default=DEFAULT_ONNX_MODEL)
+    p.add_argument('--full-precision', action='store_true', help="Use model.onnx even if a quantized model exists")
+    p.add_argument('--threads', type=int, help="ONNX Runtime intra-op threads (default: all cores)")
+    p.add_argument('--parallel-batches', type=int, default=1)
+    p.add_argument('--query-prefix', default='', help="e.g. 'query: ' for e5 models")
+    p.add_argument('--index', choices=['base', 'sac'], default='base')
+    p.add_argument('--backend', choices=['stub', 'chroma'], default='stub')
+    p.add_argument('--dataset', choices=['golden', 'ragas', 'all'], default='all')
+    p.add_argument('--k', nargs='+', type=int, default=[5, 10])
+    p.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    p.add_argument('--titan', choices=['cache', 'bedrock'], default='cache',
+                   help="cache: only cached Titan vectors (error on a miss); bedrock: embed misses")
+    p.add_argument('--region', default='us-east-1')
+    p.add_argument('--db')
+    args = parser.parse_args(argv)
+
+    if args.command == 'quantize':
+        output = quantize(args.model_dir)
+        before = (Path(args.model_dir) / FULL_MODEL).stat().st_size
+        print(f"✅ {output} ({output.stat().st_size / 2 ** 20:.1f} MB, was {before / 2 ** 20:.1f} MB)")
+        return 0
+
+    embedder = OnnxEmbeddings(args.model_dir, not args.full_precision, threads=args.threads,
+                              parallel_batches=args.parallel_batches, query_prefix=args.query_prefix)
+    r = bench(embedder, args.index, args.backend, args.dataset, args.k, batch_sizes=args.batch_sizes,
+              titan_service=args.titan, region=args.region, db_path=args.db)
+    print(f"\n📊 {r['model_id']} vs Titan v2 ({r['questions']} questions, {r['chunks']} {args.index} chunks)")
+    titan = r['titan']
+    titan_text = (f"⚠️ {titan['error']}" if 'error' in titan else
+                  f"p50 {titan['p50'] * 1000:.0f} ms, p95 {titan['p95'] * 1000:.0f} ms ({titan['calls']} recorded calls)")
+    print(f"Query latency    local p50 {r['query_p50_ms']:.1f} ms, p95 {r['query_p95_ms']:.1f} ms | Titan {titan_text}")
+    print("Throughput       " + ', '.join(f"batch {b}: {v:.0f} chunks/s" for b, v in r['throughput'].items()))
+    print("Top-k overlap    " + ', '.join(f"@{k}: {v:.2f}" for k, v in r['overlap'].items()))
+    if r['gold_recall']:
+        print("Gold recall      " + ', '.join(f"@{k}: Titan {t:.2f} / local {l:.2f}"
+                                             for k, (t, l) in r['gold_recall'].items()))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,8 @@ This script:
 """
 
 import pandas as pd
-import random
+
+from blind_evaluation import DEFAULT_SYSTEMS, generate
 
 print("\n" + "="*70)
 print("PHASE 3: PREPARING BLIND EVALUATION FOR CLAUDE 4.5")
@@ -51,44 +52,8 @@ print("   ✅ Saved updated template to 'manual_evaluation_template.xlsx'\n")
 # Step 4: Create randomized blind evaluation files
 print("Step 4: Creating randomized blind evaluation files...")
 
-blind_eval_data = []
-
-for _, row in new_template.iterrows():
-    # Create two answer options (randomize which is A and which is B)
-    answers = [
-        ('SAC-RAG_Claude4.5', row['SAC_RAG_Answer']),
-        ('Generic_Claude', row['Generic_Claude_Answer'])
-    ]
-    
-    # Randomize order
-    random.shuffle(answers)
-    
-    blind_eval_data.append({
-        'Question_ID': row['Question_ID'],
-        'Question': row['Question'],
-        'Ground_Truth': row['Ground_Truth'],
-        'Answer_A': answers[0][1],
-        'Answer_A_System': answers[0][0],  # Hidden - for reveal later
-        'Answer_B': answers[1][1],
-        'Answer_B_System': answers[1][0],  # Hidden - for reveal later
-        'Score_A': '',
-        'Score_B': '',
-        'Winner': '',
-        'Notes': ''
-    })
-
-df_blind = pd.DataFrame(blind_eval_data)
-
-# Create scoring sheet (without system labels visible)
-df_scoring = df_blind[['Question_ID', 'Question', 'Ground_Truth', 'Answer_A', 'Answer_B', 
-                        'Score_A', 'Score_B', 'Winner', 'Notes']].copy()
-
-# Create answer key (for after scoring)
-df_answer_key = df_blind[['Question_ID', 'Answer_A_System', 'Answer_B_System']].copy()
-
-# Export
-df_scoring.to_excel('blind_evaluation_scoring_sheet.xlsx', index=False)
-df_answer_key.to_excel('blind_evaluation_answer_key.xlsx', index=False)
+# Seeded and position-balanced; same files as before (scoring sheet + answer key)
+generate(new_template, DEFAULT_SYSTEMS, seed=42, fmt='xlsx')
 
 print("   ✅ Created blind evaluation files\n")
 
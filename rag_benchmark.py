@@ -0,0 +1,325 @@
+"""
+End-to-End RAG Latency & Throughput Benchmark
+Drives Base RAG, SAC-RAG and Generic Claude over the golden and RAGAS question
+sets at configurable concurrency against the stub backends, and reports
+per-stage p50/p95/p99 latency, QPS and token counts.
+
+Results are written to benchmark_results.json (consumed by the charts) and
+benchmark_results.csv (one row per pipeline x concurrency x stage).
+
+Usage:
+    python rag_benchmark.py --dataset all --concurrency 1 4 16
+    python rag_benchmark.py --time-scale 0.01   # fast smoke run
+    python rag_benchmark.py --micro-batch-ms 5 --max-batch 32   # batched query embedding/search
+    python rag_benchmark.py --retrieval-cache                    # reuse persisted retrieval results
+"""
+
+import argparse
+import contextlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from cost_accounting import (InstrumentedEmbeddings, InstrumentedLLM, UsageLedger,
+                             call_context, estimate_tokens)
+from rag_pipelines import BaseRAGPipeline, GenericPipeline, SACRAGPipeline, STAGES
+import tracing
+from tracing import configure_tracing, load_spans, profile_run, render_flamegraph, span, spans_to_folded
+
+BENCHMARK_JSON = 'benchmark_results.json'
+BENCHMARK_CSV = 'benchmark_results.csv'
+PERCENTILES = (50, 95, 99)
+
+# Stub calls are priced as these models when usage is recorded (rows are
+# tagged backend='stub', so only this run's usage_summary sees them)
+LLM_MODEL_ID = 'us.anthropic.claude-sonnet-4-5-20250929-v1:0'
+EMBEDDING_MODEL_ID = 'amazon.titan-embed-text-v2:0'
+
+# ============================================================
+# Question Sets
+# ============================================================
+def load_questions(dataset='all'):
+    """Golden (10) and/or RAGAS synthetic (40) questions"""
+    import pandas as pd
+    questions = []
+    if dataset in ('golden', 'all'):
+        questions += pd.read_csv('sac_rag_golden_detailed.csv')['question'].tolist()
+    if dataset in ('ragas', 'all'):
+        questions += pd.read_csv('ragas_synthetic_dataset.csv')['question'].tolist()
+    return questions
+
+
+def build_stub_corpus():
+    """
+    Stand-in corpus built from the saved golden answers: Base RAG chunks are
+    plain 1000/200 windows, SAC-RAG chunks carry a document summary prefix.
+    Returns (documents, summaries, base_chunks, sac_chunks).
+    """
+    import pandas as pd
+    from stub_backends import chunk_text
+    documents, summaries, base_chunks, sac_chunks = [], [], [], []
+    with span('ingest.parse'):
+        for path in ('base_rag_golden_detailed.csv', 'sac_rag_golden_detailed.csv'):
+            documents += pd.read_csv(path)['answer'].dropna().tolist()
+    with span('ingest.summarize', documents=len(documents)):
+        summaries = ["Document Summary: " + str(doc)[:300].replace('\n', ' ') for doc in documents]
+    with span('ingest.chunk', chunk_size=1000, chunk_overlap=200):
+        for doc, summary in zip(documents, summaries):
+            for chunk in chunk_text(doc):
+                base_chunks.append(chunk)
+                sac_chunks.append(summary + "\n\n" + chunk)
+    return documents, summaries, base_chunks, sac_chunks
+
+
+def record_ingest_usage(ledger, pipeline, documents, chunks, summaries=None):
+    """Log the one-off ingest cost (chunk embeddings, SAC summaries) for a pipeline"""
+    with call_context(pipeline=pipeline, stage='ingest'):
+        if summaries:
+            for doc, summary in zip(documents, summaries):
+                ledger.record('summarization', LLM_MODEL_ID, estimate_tokens(doc), estimate_tokens(summary))
+        ledger.record('embedding', EMBEDDING_MODEL_ID, sum(estimate_tokens(c) for c in chunks))
+
+
+def build_stub_pipelines(names, time_scale=1.0, seed=42, k=5, ledger=None, retrieval_cache=False):
+    """Instantiate the requested pipelines on top of the stub backends (optionally with persisted retrieval)"""
+    from stub_backends import StubEmbeddings, StubLLM, StubVectorStore
+    documents, summaries, base_chunks, sac_chunks = build_stub_corpus()
+    llm = StubLLM(time_scale=time_scale, seed=seed, model_id=LLM_MODEL_ID)
+    embeddings = StubEmbeddings(time_scale=time_scale, seed=seed + 1)
+    if ledger is not None:
+        llm = InstrumentedLLM(llm, ledger, kind='generation')
+        embeddings = InstrumentedEmbeddings(embeddings, ledger, model_id=EMBEDDING_MODEL_ID)
+        if 'base' in names:
+            record_ingest_usage(ledger, 'Base RAG', documents, base_chunks)
+        if 'sac' in names:
+            record_ingest_usage(ledger, 'SAC-RAG', documents, sac_chunks, summaries)
+    pipelines = {}
+    if 'base' in names:
+        with span('ingest.index', pipeline='Base RAG', chunks=len(base_chunks)):
+            store = StubVectorStore(base_chunks, time_scale=time_scale, seed=seed + 2)
+        pipelines['Base RAG'] = BaseRAGPipeline(llm, embeddings, store, k=k,
+                                                retrieval_cache=_retrieval_cache(store, 'base', retrieval_cache))
+    if 'sac' in names:
+        with span('ingest.index', pipeline='SAC-RAG', chunks=len(sac_chunks)):
+            store = StubVectorStore(sac_chunks, time_scale=time_scale, seed=seed + 3)
+        pipelines['SAC-RAG'] = SACRAGPipeline(llm, embeddings, store, k=k,
+                                              retrieval_cache=_retrieval_cache(store, 'sac', retrieval_cache))
+    if 'generic' in names:
+        pipelines['Generic Claude'] = GenericPipeline(llm)
+    return pipelines
+
+
+def _retrieval_cache(store, index_name, enabled):
+    if not enabled:
+        return None
+    from retrieval_cache import RetrievalCache
+    from retrieval_eval import STUB_EMBEDDING_MODEL_ID
+    return RetrievalCache.for_store(store, STUB_EMBEDDING_MODEL_ID, index_name)
+
+
+# ============================================================
+# Benchmark Core
+# ============================================================
+def run_load(pipeline, questions, concurrency):
+    """Answer every question with `concurrency` workers; returns (records, wall seconds)"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        records = list(pool.map(pipeline.answer, questions))
+    return records, time.perf_counter() - start
+
+
+def summarize(records, wall_seconds):
+    """Per-stage percentiles, QPS and token statistics for one load run"""
+    import numpy as np
+    stages = {}
+    for stage in STAGES + ['total']:
+        values = np.array([r['timings'][stage] for r in records if stage in r['timings']])
+        if len(values) == 0:
+            continue
+        stats = {f'p{p}': float(np.percentile(values, p)) for p in PERCENTILES}
+        stats['mean'] = float(values.mean())
+        stages[stage] = stats
+    input_tokens = np.array([r['input_tokens'] for r in records])
+    output_tokens = np.array([r['output_tokens'] for r in records])
+    return {
+        'requests': len(records),
+        'wall_seconds': wall_seconds,
+        'qps': len(records) / wall_seconds if wall_seconds > 0 else 0.0,
+        'stages': stages,
+        'tokens': {
+            'input_mean': float(input_tokens.mean()),
+            'output_mean': float(output_tokens.mean()),
+            'input_total': int(input_tokens.sum()),
+            'output_total': int(output_tokens.sum()),
+        },
+    }
+
+
+def run_benchmark(pipelines, questions, concurrency_levels, repeat=1):
+    """Run every pipeline at every concurrency level"""
+    results = {}
+    for name, pipeline in pipelines.items():
+        results[name] = {}
+        for concurrency in concurrency_levels:
+            print(f"  {name:<15} concurrency={concurrency:<3}", end=" ", flush=True)
+            records, wall = run_load(pipeline, questions * repeat, concurrency)
+            summary = summarize(records, wall)
+            results[name][str(concurrency)] = summary
+            total = summary['stages']['total']
+            print(f"QPS={summary['qps']:.2f}  p50={total['p50']:.3f}s  "
+                  f"p95={total['p95']:.3f}s  p99={total['p99']:.3f}s")
+    return results
+
+
+def results_to_frame(results):
+    """Flatten nested results into one row per pipeline x concurrency x stage"""
+    import pandas as pd
+    rows = []
+    for name, by_concurrency in results.items():
+        for concurrency, summary in by_concurrency.items():
+            for stage, stats in summary['stages'].items():
+                rows.append({
+                    'pipeline': name,
+                    'concurrency': int(concurrency),
+                    'stage': stage,
+                    **stats,
+                    'qps': summary['qps'],
+                    'input_tokens_mean': summary['tokens']['input_mean'],
+                    'output_tokens_mean': summary['tokens']['output_mean'],
+                })
+    return pd.DataFrame(rows)
+
+
+def write_results(results, config, json_path=BENCHMARK_JSON, csv_path=BENCHMARK_CSV):
+    payload = {'config': config, 'pipelines': results}
+    Path(json_path).write_text(json.dumps(payload, indent=2))
+    results_to_frame(results).to_csv(csv_path, index=False)
+
+
+# ============================================================
+# Chart Helpers
+# ============================================================
+def load_benchmark_summary(path=BENCHMARK_JSON):
+    """Load benchmark_results.json, or None if no benchmark has been run"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def benchmark_caveat(summary):
+    """
+    Why a benchmark's latencies can't stand in for the stub latency profile
+    (scaled stub sleeps, retrieval served from the cache, batching queue
+    delay), or None if they can.
+    """
+    config = summary.get('config', {})
+    if config.get('time_scale', 1.0) != 1.0:
+        return f"stub latencies scaled by {config['time_scale']:g}"
+    if config.get('retrieval_cache'):
+        return "retrieval served from the retrieval cache"
+    if config.get('micro_batch_ms') is not None:
+        return "micro-batched queries"
+    return None
+
+
+def pipeline_latency(summary, pipeline, stage='total', stat='p50', concurrency=None):
+    """
+    Latency (seconds) for one pipeline, at the lowest concurrency unless
+    given. None if the pipeline wasn't run or the run has a benchmark_caveat;
+    the value is the stub latency model's, not a Bedrock measurement.
+    """
+    by_concurrency = summary['pipelines'].get(pipeline)
+    if not by_concurrency or benchmark_caveat(summary):
+        return None
+    if concurrency is None:
+        concurrency = min(by_concurrency, key=int)
+    stages = by_concurrency[str(concurrency)]['stages']
+    return stages.get(stage, {}).get(stat)
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RAG latency/throughput benchmark (stub backends)")
+    parser.add_argument('--dataset', choices=['golden', 'ragas', 'all'], default='all')
+    parser.add_argument('--pipelines', nargs='+', choices=['base', 'sac', 'generic'],
+                        default=['base', 'sac', 'generic'])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16])
+    parser.add_argument('--repeat', type=int, default=1, help="Repeat the question set N times")
+    parser.add_argument('--k', type=int, default=5, help="Chunks retrieved per query")
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help="Multiply stub latencies (e.g. 0.01 for a quick run)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--micro-batch-ms', type=float, metavar='MS',
+                        help="Micro-batch concurrent query embeddings and searches within MS (see micro_batching.py)")
+    parser.add_argument('--max-batch', type=int, default=32, help="Largest micro-batch")
+    parser.add_argument('--retrieval-cache', action='store_true',
+                        help="Read/write retrieval results in the results store (retrieval_cache.py)")
+    parser.add_argument('--record-usage', action='store_true',
+                        help="Record tokens/cost per call in the results store (rag_results.db)")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="Write OTLP/JSON spans to FILE and a span flame graph next to it")
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help="Run the sampling profiler; writes PREFIX.folded and PREFIX.svg")
+    parser.add_argument('--output-json', default=BENCHMARK_JSON)
+    parser.add_argument('--output-csv', default=BENCHMARK_CSV)
+    args = parser.parse_args(argv)
+
+    print("\n" + "="*70)
+    print("RAG LATENCY & THROUGHPUT BENCHMARK (STUB BACKENDS)")
+    print("="*70 + "\n")
+
+    if args.trace:
+        configure_tracing(trace_file=args.trace)
+    profiler = profile_run(args.profile) if args.profile else contextlib.nullcontext()
+
+    with profiler:
+        questions = load_questions(args.dataset)
+        ledger = UsageLedger(run_id=datetime.now().strftime('benchmark-%Y%m%d-%H%M%S'),
+                             backend='stub') if args.record_usage else None
+        pipelines = build_stub_pipelines(args.pipelines, args.time_scale, args.seed, args.k, ledger,
+                                         args.retrieval_cache)
+        batchers = {}
+        if args.micro_batch_ms is not None:
+            from micro_batching import batch_pipeline
+            for pipeline in pipelines.values():
+                batch_pipeline(pipeline, args.max_batch, args.micro_batch_ms, batchers)
+        print(f"📊 {len(questions) * args.repeat} queries x {len(pipelines)} pipelines "
+              f"at concurrency {args.concurrency}\n")
+
+        results = run_benchmark(pipelines, questions, args.concurrency, args.repeat)
+    if batchers:
+        from micro_batching import batching_metrics
+        print()
+        for m in batching_metrics(batchers.values()):
+            print(f"📦 {m['name']:<14} {m['items']} requests in {m['batches']} batches "
+                  f"(mean {m['batch_size_mean']:.1f}, max {m['batch_size_max']}); "
+                  f"queue delay p50 {m['queue_delay_ms_p50']:.2f} ms, p95 {m['queue_delay_ms_p95']:.2f} ms")
+    for name, pipeline in pipelines.items():
+        cache = getattr(pipeline, 'retrieval_cache', None)
+        if cache is not None:
+            print(f"🗄️  {name:<14} retrieval cache: {cache.hits} hits, {cache.misses} misses "
+                  f"(index version {cache.index_version})")
+    config = {k: v for k, v in vars(args).items() if not k.startswith('output')}
+    write_results(results, config, args.output_json, args.output_csv)
+    if ledger is not None:
+        ledger.flush()
+        print(f"\n💰 Usage recorded under run_id={ledger.run_id} in rag_results.db")
+    if args.trace:
+        tracing.flush()
+        flamegraph = str(Path(args.trace).with_suffix('.svg'))
+        render_flamegraph(spans_to_folded(load_spans(args.trace)), flamegraph, title='Benchmark span self-time (µs)')
+        print(f"🔥 Spans: {args.trace}, flame graph: {flamegraph}")
+
+    print(f"\n✅ Results exported to: {args.output_json}, {args.output_csv}")
+    caveat = benchmark_caveat({'config': config})
+    if caveat:
+        print(f"   (charts ignore these latencies: {caveat})")
+
+
+if __name__ == '__main__':
+    main()
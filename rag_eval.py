@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+"""
+rag-eval: Single CLI Entry Point
+One command with subcommands for the benchmark, batch judging, charts,
+tracing and the small inspection utilities. Nothing heavy (pandas,
+matplotlib, scipy, boto3) is imported until a subcommand actually runs, so
+`python rag_eval.py --help` and simple commands start in milliseconds.
+
+Usage:
+    python rag_eval.py --help
+    python rag_eval.py benchmark --time-scale 0.01
+    python rag_eval.py charts --only 07_cost_benefit
+    python rag_eval.py agreement ingest blind_campaign/
+    python rag_eval.py columns sac_rag_golden_detailed.csv
+    python rag_eval.py rag-metrics              # final_rag_metrics_evaluation.py
+    python rag_eval.py import-time              # startup regression check
+"""
+
+import importlib
+import sys
+
+# name -> (module, help); the module's main(argv) receives the remaining arguments
+MODULE_COMMANDS = {
+    'benchmark': ('rag_benchmark', "RAG latency/throughput benchmark (stub backends)"),
+    'judge-batch': ('batch_judge', "Offline batch judge runs (Bedrock batch inference)"),
+    'judge-parse': ('judge_parsing', "Check judge-response parsing; per-template parse-failure report"),
+    'judge-sc': ('self_consistency', "Self-consistency judge sampling with early stopping"),
+    'sequential': ('sequential_eval', "Adaptive A/B evaluation that stops once the winner is clear"),
+    'charts': ('chart_pipeline', "Render thesis charts from the results store"),
+    'trace': ('tracing', "Flame graphs and summaries from trace/profile files"),
+    'blind-eval': ('blind_evaluation', "Blind scoring sheets for N systems and R raters"),
+    'agreement': ('rater_agreement', "Ingest rater sheets; inter-rater and judge-vs-human agreement"),
+    'retrieval': ('retrieval_eval', "Offline retrieval metrics: recall@k, MRR, nDCG, citation hits"),
+    'chunk-sweep': ('chunking_sweep', "Sweep chunking variants (size/overlap/summary/splitter), score retrieval"),
+    'legal-chunk': ('legal_chunker', "Structure-aware chunking of statutes and judgments with hierarchical metadata"),
+    'filtered-search': ('filtered_search', "Metadata pre-filtered vector search; pre- vs post-filter benchmark"),
+    'hnsw-tune': ('hnsw_tuner', "HNSW M/ef tuning against brute-force recall; Pareto frontier, collection config"),
+    'shards': ('sharded_index', "Sharded index: split, serve shards over TCP, scatter-gather benchmark"),
+    'snapshot': ('index_snapshot', "Memory-mappable index snapshots: build, inspect, cold-open benchmark"),
+    'chunk-store': ('chunk_store', "Shared mmap chunk text store; compact/expand result contexts by chunk id"),
+    'micro-batch': ('micro_batching', "Micro-batched query embedding/search; batch size and queueing-delay benchmark"),
+    'onnx-embed': ('onnx_embeddings', "Local ONNX embedder: int8 quantization, latency/throughput/recall vs Titan"),
+    'grid': ('experiment_grid', "Ablation grid as a DAG of content-addressed stages; reruns only what changed"),
+    'retrieval-cache': ('retrieval_cache', "Persisted retrieval results keyed by index version; stats and pruning"),
+    'queue': ('eval_queue', "Distributed judge/generation workers over a SQLite job queue with leases and rate limits"),
+    'retry-demo': ('resilience', "Exercise the retry policy against a fault-injecting stub"),
+}
+
+
+# name -> (script, help); the original experiment scripts have no main() and take no
+# arguments, so they are run as __main__ from this directory only when asked for
+SCRIPT_COMMANDS = {
+    'judge-35': ('automated_evaluation_code.py', "LLM-as-judge run: SAC-RAG vs Generic Claude (Claude 3.5 answers)"),
+    'judge-45': ('automated_evaluation_claude45.py', "LLM-as-judge run: SAC-RAG vs Generic Claude (Claude 4.5 answers)"),
+    'rag-metrics': ('final_rag_metrics_evaluation.py', "Answer relevance, context relevance and groundedness"),
+    'quality-metrics': ('final_quality_metrics_evaluation.py', "Answer-based quality metrics (no saved contexts)"),
+    'correlation': ('calculate_correlation.py', "Manual vs LLM-judge score correlation"),
+    'inspect-ragas': ('inspect_ragas.py', "Print the RAGAS TestsetGenerator.from_langchain signature"),
+    'breakdown-35': ('generate_claude35_metric_breakdown.py', "Per-metric breakdown chart, Claude 3.5"),
+    'breakdown-45': ('generate_claude45_metric_breakdown.py', "Per-metric breakdown chart, Claude 4.5"),
+}
+
+
+def run_script(command, argv):
+    import runpy
+    from pathlib import Path
+    script, help_text = SCRIPT_COMMANDS[command]
+    if argv in (['-h'], ['--help']):
+        print(f"usage: rag-eval {command}\n\n{help_text}. Runs {script}; takes no arguments.")
+        return 0
+    if argv:
+        print(f"rag-eval {command}: {script} takes no arguments (got {' '.join(argv)})", file=sys.stderr)
+        return 2
+    path = Path(__file__).resolve().with_name(script)
+    sys.argv = [str(path)]
+    runpy.run_path(str(path), run_name='__main__')
+    return 0
+
+
+# ============================================================
+# Small Utilities (formerly standalone scripts)
+# ============================================================
+def cmd_columns(argv):
+    """Print a CSV's columns and its first row"""
+    import argparse
+    parser = argparse.ArgumentParser(prog='rag-eval columns', description=cmd_columns.__doc__)
+    parser.add_argument('path', nargs='?', default='sac_rag_golden_detailed.csv')
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    df = pd.read_csv(args.path)
+    print(f"{args.path} columns:", df.columns.tolist())
+    print("\nSample row:")
+    for col in df.columns:
+        print(f"  {col}: {df.iloc[0][col]}")
+
+
+def cmd_manual_scores(argv):
+    """Un-blind the manual scoring sheet and report per-system averages and wins"""
+    import argparse
+    parser = argparse.ArgumentParser(prog='rag-eval manual-scores', description=cmd_manual_scores.__doc__)
+    parser.add_argument('--key', default='blind_evaluation_answer_key.xlsx')
+    parser.add_argument('--scoring', default='blind_evaluation_scoring_sheet.xlsx')
+    parser.add_argument('--system', default='SAC-RAG_Claude4.5', help="System compared against the other answer")
+    parser.add_argument('--name', default='SAC-RAG', help="Label printed for --system")
+    parser.add_argument('--other-name', default='Generic Claude', help="Label printed for the other answer")
+    parser.add_argument('--model', default='Claude 4.5', help="Answering model, printed in the heading")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    merged = pd.merge(pd.read_excel(args.scoring), pd.read_excel(args.key), on='Question_ID')
+    is_a = merged['Answer_A_System'] == args.system
+    system_scores = merged['Score_A'].where(is_a, merged['Score_B']).astype(float)
+    other_scores = merged['Score_B'].where(is_a, merged['Score_A']).astype(float)
+
+    system_avg, other_avg = system_scores.mean(), other_scores.mean()
+    print(f"Manual Blind Evaluation Results ({args.model}):")
+    print("="*60)
+    print(f"{args.name} ({args.model}): {system_avg:.2f}/5")
+    print(f"{args.other_name}: {other_avg:.2f}/5")
+    print(f"Wins: {args.name}={(system_scores > other_scores).sum()}, "
+          f"{args.other_name}={(other_scores > system_scores).sum()}, Ties={(system_scores == other_scores).sum()}")
+    print(f"Improvement: {((system_avg - other_avg) / other_avg * 100):.2f}%")
+
+
+# ============================================================
+# Import-Time Benchmark
+# ============================================================
+# Budget (ms of import time over a bare interpreter) per entry module. The CLI
+# itself must stay near-free; library modules may load stdlib + sqlite only.
+IMPORT_BUDGET_MS = {
+    'rag_eval': 15,
+    'tracing': 60,
+    'results_store': 40,
+    'cost_accounting': 80,
+    'resilience': 100,
+    'rag_pipelines': 100,
+    'rag_benchmark': 120,
+    'batch_judge': 120,
+    'judge_parsing': 100,
+    'self_consistency': 100,
+    'sequential_eval': 100,
+    'chart_pipeline': 100,
+    'rater_agreement': 80,
+    'retrieval_eval': 80,
+    'chunking_sweep': 80,
+    'legal_chunker': 80,
+    'filtered_search': 80,
+    'hnsw_tuner': 80,
+    'sharded_index': 80,
+    'index_snapshot': 80,
+    'chunk_store': 80,
+    'micro_batching': 80,
+    'onnx_embeddings': 80,
+    'experiment_grid': 80,
+    'retrieval_cache': 80,
+    'eval_queue': 80,
+}
+
+# Heavy packages that none of the entry modules may pull in at import time
+HEAVY_MODULES = ('pandas', 'numpy', 'matplotlib', 'seaborn', 'scipy', 'boto3', 'botocore', 'langchain_aws')
+
+
+def _run_python(code, runs):
+    """Median wall time (ms) of a fresh interpreter running `code`"""
+    import statistics
+    import subprocess
+    import time
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _heavy_imports(module):
+    """Heavy top-level packages loaded as a side effect of importing `module`"""
+    import subprocess
+    code = (f"import sys, {module}; "
+            f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    return out.split()
+
+
+def cmd_import_time(argv):
+    """Measure per-module import time and fail if a budget or the heavy-import rule is broken"""
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(prog='rag-eval import-time', description=cmd_import_time.__doc__)
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per module (median is used)")
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help="Allowed multiple of the budget before failing (absorbs machine noise)")
+    parser.add_argument('--output', help="Write the measurements as JSON")
+    args = parser.parse_args(argv)
+
+    interpreter_ms = _run_python('pass', args.runs)
+    print(f"Interpreter startup: {interpreter_ms:.1f} ms (subtracted below)\n")
+    print(f"{'module':<18}{'import ms':>10}{'budget':>9}  heavy imports")
+    results, failures = {}, []
+    for module, budget in IMPORT_BUDGET_MS.items():
+        elapsed = max(_run_python(f'import {module}', args.runs) - interpreter_ms, 0.0)
+        heavy = _heavy_imports(module)
+        results[module] = {'import_ms': round(elapsed, 1), 'budget_ms': budget, 'heavy_imports': heavy}
+        flag = ''
+        if elapsed > budget * args.tolerance:
+            failures.append(f"{module}: {elapsed:.0f} ms > {budget} ms budget")
+            flag = '  ❌'
+        if heavy:
+            failures.append(f"{module}: imports {', '.join(heavy)} at load time")
+            flag = '  ❌'
+        print(f"{module:<18}{elapsed:>10.1f}{budget:>9}  {', '.join(heavy) or '-'}{flag}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'interpreter_ms': round(interpreter_ms, 1), 'modules': results}, f, indent=2)
+    if failures:
+        print("\n❌ Startup regression:")
+        for failure in failures:
+            print(f"   - {failure}")
+        return 1
+    print("\n✅ All modules within their import budgets")
+    return 0
+
+
+UTILITY_COMMANDS = {
+    'columns': (cmd_columns, "Print a CSV's columns and first row"),
+    'manual-scores': (cmd_manual_scores, "Per-system averages from the blind scoring sheet"),
+    'import-time': (cmd_import_time, "Import-time benchmark (startup regression check)"),
+}
+
+
+# ============================================================
+# Dispatch
+# ============================================================
+def usage():
+    lines = ["usage: rag-eval <command> [args...]", "", "commands:"]
+    for name, (_, help_text) in {**MODULE_COMMANDS, **SCRIPT_COMMANDS, **UTILITY_COMMANDS}.items():
+        lines.append(f"  {name:<17}{help_text}")
+    lines += ["", "Run 'rag-eval <command> --help' for command options."]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command in UTILITY_COMMANDS:
+        return UTILITY_COMMANDS[command][0](rest)
+    if command in SCRIPT_COMMANDS:
+        return run_script(command, rest)
+    if command in MODULE_COMMANDS:
+        module = importlib.import_module(MODULE_COMMANDS[command][0])
+        sys.argv[0] = f'rag-eval {command}'
+        result = module.main(rest)
+        return result if isinstance(result, int) else 0
+    print(f"rag-eval: unknown command '{command}'\n\n{usage()}", file=sys.stderr)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main() or 0)
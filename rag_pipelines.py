@@ -0,0 +1,164 @@
+"""
+RAG Pipelines: Base RAG, SAC-RAG and Generic Claude
+Query-time pipelines expressed stage by stage (embed query -> vector search ->
+prompt assembly -> generation) so every stage can be timed. The same classes
+run against the real Bedrock/Chroma objects from the notebook or against the
+local stubs in stub_backends.py.
+"""
+
+import contextlib
+import hashlib
+import time
+
+from chunk_store import chunk_id
+from cost_accounting import call_context, message_text, message_tokens
+from tracing import span
+
+STAGES = ['embed_query', 'vector_search', 'prompt_assembly', 'generation']
+
+RAG_PROMPT = """You are an expert on Kenyan law. Answer the question using the legal context below.
+Cite specific statutes, sections and cases from the context where possible.
+
+**Context:**
+{context}
+
+**Question:** {question}
+
+**Answer:**"""
+
+GENERIC_PROMPT = """You are an expert on Kenyan law. Answer the following question,
+citing specific Kenyan statutes, sections and cases where possible.
+
+**Question:** {question}
+
+**Answer:**"""
+
+
+def question_key(question):
+    """Short stable id for a question (used when no Question_ID is given)"""
+    return hashlib.sha1(question.encode('utf-8')).hexdigest()[:12]
+
+
+class StageTimer:
+    """Collects wall-clock seconds per named stage (and tags usage records / spans with it)"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            with call_context(stage=stage), span(f'rag.{stage}'):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+
+
+# ============================================================
+# Base RAG
+# ============================================================
+class BaseRAGPipeline:
+    """Retrieve top-k chunks from the vector store, then generate"""
+
+    name = 'Base RAG'
+
+    def __init__(self, llm, embeddings, vector_store, k=5, filter_fn=None, retrieval_cache=None):
+        self.llm = llm
+        self.embeddings = embeddings
+        self.vector_store = vector_store
+        self.k = k
+        self.filter_fn = filter_fn
+        self.retrieval_cache = retrieval_cache
+
+    def retrieve(self, question, timer):
+        where = self.filter_fn(question) if self.filter_fn else None
+        if self.retrieval_cache is None:
+            return [doc.page_content for doc in self._search(question, where, timer)]
+        # generation-only reruns read retrieval back (see retrieval_cache.py)
+        with timer.time('retrieval_cache'):
+            cached = self.retrieval_cache.get(question, self.k, where)
+        if cached is not None:
+            return [doc['page_content'] for doc in cached]
+        results = self._search(question, where, timer, with_scores=True)
+        self.retrieval_cache.put(question, self.k, where, results)
+        return [doc.page_content for doc, _ in results]
+
+    def _search(self, question, where, timer, with_scores=False):
+        """Embed the question and search; [doc] or, with_scores, [(doc, score)]"""
+        search = (self.vector_store.similarity_search_by_vector_with_relevance_scores if with_scores
+                  else self.vector_store.similarity_search_by_vector)
+        with timer.time('embed_query'):
+            query_vector = self.embeddings.embed_query(question)
+        with timer.time('vector_search'):
+            if where:
+                # metadata pre-filter (Chroma `where`); fall back to the full index if nothing matches
+                docs = search(query_vector, k=self.k, filter=where)
+                if not docs:
+                    docs = search(query_vector, k=self.k)
+            else:
+                docs = search(query_vector, k=self.k)
+        return docs
+
+    def build_prompt(self, question, contexts):
+        return RAG_PROMPT.format(context="\n\n---\n\n".join(contexts), question=question)
+
+    def answer(self, question, question_id=None):
+        """Run the pipeline; returns answer, contexts (and their chunk-store ids), per-stage timings and tokens"""
+        question_id = question_id or question_key(question)
+        with call_context(pipeline=self.name, question_id=question_id), \
+                span('rag.answer', pipeline=self.name, question_id=question_id):
+            return self._answer(question)
+
+    def _answer(self, question):
+        timer = StageTimer()
+        start = time.perf_counter()
+        contexts = self.retrieve(question, timer)
+        with timer.time('prompt_assembly'):
+            prompt = self.build_prompt(question, contexts)
+        with timer.time('generation'):
+            response = self.llm.invoke(prompt)
+        text = message_text(response)
+        input_tokens, output_tokens = message_tokens(response, prompt, text)
+        timer.timings['total'] = time.perf_counter() - start
+        return {
+            'question': question,
+            'answer': text,
+            'contexts': contexts,
+            'context_ids': [chunk_id(text) for text in contexts],
+            'timings': timer.timings,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+        }
+
+
+# ============================================================
+# SAC-RAG (Summary-Augmented Chunking)
+# ============================================================
+class SACRAGPipeline(BaseRAGPipeline):
+    """
+    Same query path as Base RAG; the difference lives in the index, where each
+    chunk was stored with its document summary prepended (longer contexts,
+    more input tokens per query).
+    """
+
+    name = 'SAC-RAG'
+
+
+# ============================================================
+# Generic Claude (no retrieval)
+# ============================================================
+class GenericPipeline(BaseRAGPipeline):
+    """Direct LLM inference with no retrieval stage"""
+
+    name = 'Generic Claude'
+
+    def __init__(self, llm, embeddings=None, vector_store=None, k=0, filter_fn=None, retrieval_cache=None):
+        super().__init__(llm, embeddings, vector_store, k)
+
+    def retrieve(self, question, timer):
+        return []
+
+    def build_prompt(self, question, contexts):
+        return GENERIC_PROMPT.format(question=question)
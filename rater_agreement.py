@@ -0,0 +1,501 @@
+"""
+Rater Agreement: Multi-Rater Ingestion and Agreement Analytics
+Loads completed blind-evaluation scoring sheets (see blind_evaluation.py)
+into the results store and keeps inter-rater and judge-vs-human agreement
+up to date as sheets arrive.
+
+- Sheets are read and un-blinded in parallel (vectorized melt + join against
+  the answer key); database updates are applied sequentially in one
+  transaction per ingest.
+- Agreement is kept as sufficient statistics, so a new sheet only touches
+  the units (question x system) it scored:
+    * rater_coincidence: Krippendorff coincidence matrix per campaign. A
+      unit with value counts U and m ratings contributes
+      (U U^T - diag(U)) / (m - 1); a new rating adds f(U_new) - f(U_old).
+    * rater_pairs / rater_pair_confusion: per rater pair n, sums, squares,
+      cross products and the score confusion matrix (for ICC and kappa).
+- A sheet whose content changed since it was ingested is retracted
+  (old ratings subtracted) and re-applied; `rebuild` recomputes every
+  statistic from human_scores from scratch.
+
+Usage:
+    python rater_agreement.py ingest blind_campaign/
+    python rater_agreement.py report --campaign blind_campaign --judge-run rubric-judge-claude45
+    python rater_agreement.py rebuild --campaign blind_campaign
+"""
+
+import argparse
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import results_store
+
+SCALE = (1, 2, 3, 4, 5)
+
+# blind-evaluation system name -> pipeline name used in judge_scores
+SYSTEM_PIPELINES = {'SAC-RAG_Claude4.5': 'SAC-RAG', 'Generic_Claude': 'Generic Claude'}
+
+results_store.register_schema("""
+CREATE TABLE IF NOT EXISTS rater_sheets (
+    campaign TEXT NOT NULL,
+    rater INTEGER NOT NULL,
+    path TEXT,
+    sha256 TEXT,
+    rows INTEGER,
+    ingested_at TEXT,
+    PRIMARY KEY (campaign, rater)
+);
+CREATE TABLE IF NOT EXISTS human_scores (
+    campaign TEXT NOT NULL,
+    rater INTEGER NOT NULL,
+    question_id TEXT NOT NULL,
+    system TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    PRIMARY KEY (campaign, rater, question_id, system)
+);
+CREATE INDEX IF NOT EXISTS idx_human_scores_unit ON human_scores (campaign, question_id, system);
+CREATE TABLE IF NOT EXISTS rater_coincidence (
+    campaign TEXT NOT NULL,
+    c INTEGER NOT NULL,
+    k INTEGER NOT NULL,
+    weight REAL NOT NULL,
+    PRIMARY KEY (campaign, c, k)
+);
+CREATE TABLE IF NOT EXISTS rater_pairs (
+    campaign TEXT NOT NULL,
+    rater_a INTEGER NOT NULL,
+    rater_b INTEGER NOT NULL,
+    n REAL, sx REAL, sy REAL, sxx REAL, syy REAL, sxy REAL,
+    PRIMARY KEY (campaign, rater_a, rater_b)
+);
+CREATE TABLE IF NOT EXISTS rater_pair_confusion (
+    campaign TEXT NOT NULL,
+    rater_a INTEGER NOT NULL,
+    rater_b INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    count REAL NOT NULL,
+    PRIMARY KEY (campaign, rater_a, rater_b, x, y)
+);
+""")
+
+
+# ============================================================
+# Sheet Loading (parallel read + vectorized un-blinding)
+# ============================================================
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_sheet(path, long_key, rater):
+    """Un-blinded, validated (question_id, system, score) rows of one sheet"""
+    from blind_evaluation import read_table, unblind
+    scores = unblind(read_table(path, dtype={'Question_ID': str}), long_key, rater).dropna(subset=['score'])
+    valid = scores['score'].isin(SCALE)
+    if not valid.all():
+        print(f"⚠️ rater {rater}: {int((~valid).sum())} score(s) outside {SCALE[0]}-{SCALE[-1]} ignored")
+    scores = scores[valid]
+    return (scores.rename(columns={'Question_ID': 'question_id'})[['question_id', 'system', 'score']]
+            .astype({'score': int}).reset_index(drop=True))
+
+
+def pending_sheets(conn, campaign, sheets):
+    """{rater: (path, sha256)} for sheets that are new or changed since the last ingest"""
+    known = dict(conn.execute("SELECT rater, sha256 FROM rater_sheets WHERE campaign = ?", (campaign,)).fetchall())
+    pending = {}
+    for rater, path in sheets.items():
+        if not Path(path).exists():
+            continue
+        digest = file_sha256(path)
+        if known.get(rater) != digest:
+            pending[rater] = (path, digest)
+    return pending
+
+
+# ============================================================
+# Incremental Statistics
+# ============================================================
+def _counts(values, n_units, index):
+    """(n_units, len(SCALE)) value counts per unit"""
+    import numpy as np
+    counts = np.zeros((n_units, len(SCALE)))
+    np.add.at(counts, (np.asarray(index, dtype=int), np.asarray(values, dtype=int) - SCALE[0]), 1)
+    return counts
+
+
+def _coincidence(counts):
+    """Summed (U U^T - diag(U)) / (m - 1) over units with at least two ratings"""
+    import numpy as np
+    m = counts.sum(axis=1)
+    w = np.where(m > 1, 1.0 / np.maximum(m - 1, 1), 0.0)
+    return (counts * w[:, None]).T @ counts - np.diag((counts * w[:, None]).sum(axis=0))
+
+
+def _pair_stats(a, b, x, y):
+    """Group (rater_a, rater_b, score_a, score_b) rows into pair sums and confusion counts"""
+    import pandas as pd
+    df = pd.DataFrame({'rater_a': a, 'rater_b': b, 'x': x, 'y': y})
+    df = df.assign(xx=df.x * df.x, yy=df.y * df.y, xy=df.x * df.y)
+    sums = (df.groupby(['rater_a', 'rater_b'])
+            .agg(n=('x', 'size'), sx=('x', 'sum'), sy=('y', 'sum'),
+                 sxx=('xx', 'sum'), syy=('yy', 'sum'), sxy=('xy', 'sum')).reset_index())
+    confusion = df.groupby(['rater_a', 'rater_b', 'x', 'y']).size().rename('count').reset_index()
+    return sums, confusion
+
+
+def _store_deltas(conn, campaign, coincidence, sums, confusion, sign):
+    import numpy as np
+    conn.executemany("""
+        INSERT INTO rater_coincidence (campaign, c, k, weight) VALUES (?, ?, ?, ?)
+        ON CONFLICT (campaign, c, k) DO UPDATE SET weight = weight + excluded.weight""",
+        [(campaign, SCALE[c], SCALE[k], sign * float(coincidence[c, k]))
+         for c, k in zip(*np.nonzero(coincidence))])
+    conn.executemany("""
+        INSERT INTO rater_pairs (campaign, rater_a, rater_b, n, sx, sy, sxx, syy, sxy)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (campaign, rater_a, rater_b) DO UPDATE SET
+            n = n + excluded.n, sx = sx + excluded.sx, sy = sy + excluded.sy,
+            sxx = sxx + excluded.sxx, syy = syy + excluded.syy, sxy = sxy + excluded.sxy""",
+        [(campaign, int(r.rater_a), int(r.rater_b), *(sign * float(v) for v in (r.n, r.sx, r.sy, r.sxx, r.syy, r.sxy)))
+         for r in sums.itertuples()])
+    conn.executemany("""
+        INSERT INTO rater_pair_confusion (campaign, rater_a, rater_b, x, y, count) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (campaign, rater_a, rater_b, x, y) DO UPDATE SET count = count + excluded.count""",
+        [(campaign, int(r.rater_a), int(r.rater_b), int(r.x), int(r.y), sign * float(r.count))
+         for r in confusion.itertuples()])
+
+
+def _apply(conn, campaign, rater, scores, sign):
+    """
+    Add (sign=+1) or retract (sign=-1) one rater's scores. Only the units the
+    rater scored are read back: the other raters' values on them give the
+    coincidence delta and the new pair statistics.
+    """
+    import numpy as np
+    import pandas as pd
+    if scores.empty:
+        return
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _incoming (question_id TEXT, system TEXT, score INTEGER)")
+    conn.execute("DELETE FROM _incoming")
+    conn.executemany("INSERT INTO _incoming VALUES (?, ?, ?)", scores.itertuples(index=False, name=None))
+    others = pd.read_sql_query("""
+        SELECT h.rater, h.question_id, h.system, h.score AS other, i.score AS own
+        FROM _incoming i JOIN human_scores h
+          ON h.campaign = ? AND h.question_id = i.question_id AND h.system = i.system AND h.rater != ?""",
+        conn, params=(campaign, rater))
+
+    units = scores[['question_id', 'system']].reset_index(drop=True)
+    unit_index = pd.MultiIndex.from_frame(units)
+    without = _counts(others['other'], len(units),
+                      unit_index.get_indexer(pd.MultiIndex.from_frame(others[['question_id', 'system']])))
+    with_rater = without + _counts(scores['score'], len(units), np.arange(len(units)))
+    coincidence = _coincidence(with_rater) - _coincidence(without)
+
+    lower = others['rater'] < rater
+    sums, confusion = _pair_stats(np.where(lower, others['rater'], rater), np.where(lower, rater, others['rater']),
+                                  np.where(lower, others['other'], others['own']),
+                                  np.where(lower, others['own'], others['other']))
+    _store_deltas(conn, campaign, coincidence, sums, confusion, sign)
+
+    if sign > 0:
+        conn.executemany("INSERT INTO human_scores (campaign, rater, question_id, system, score) VALUES (?, ?, ?, ?, ?)",
+                         [(campaign, rater, *row) for row in scores.itertuples(index=False, name=None)])
+    else:
+        conn.execute("DELETE FROM human_scores WHERE campaign = ? AND rater = ?", (campaign, rater))
+
+
+def ingest(campaign_dir, campaign=None, db_path=None, workers=8):
+    """
+    Ingest the new or changed scoring sheets of a campaign directory.
+    Returns {rater: scores ingested}.
+    """
+    import pandas as pd
+    from blind_evaluation import load_campaign
+    campaign = campaign or Path(campaign_dir).resolve().name
+    _, long_key, sheets = load_campaign(campaign_dir)
+    conn = results_store.connect(db_path)
+    try:
+        pending = pending_sheets(conn, campaign, sheets)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending) or 1))) as pool:
+            loaded = dict(zip(pending, pool.map(lambda r: _read_sheet(pending[r][0], long_key, r), pending)))
+
+        ingested = {}
+        with conn:
+            for rater, scores in loaded.items():
+                old = pd.read_sql_query("SELECT question_id, system, score FROM human_scores "
+                                        "WHERE campaign = ? AND rater = ?", conn, params=(campaign, rater))
+                if not old.empty:
+                    print(f"🔁 rater {rater}: sheet changed, replacing {len(old)} earlier score(s)")
+                    _apply(conn, campaign, rater, old, -1)
+                _apply(conn, campaign, rater, scores, +1)
+                path, digest = pending[rater]
+                conn.execute("INSERT OR REPLACE INTO rater_sheets VALUES (?, ?, ?, ?, ?, ?)",
+                             (campaign, rater, str(path), digest, len(scores), datetime.now().isoformat()))
+                ingested[rater] = len(scores)
+        return ingested
+    finally:
+        conn.close()
+
+
+def rebuild(campaign, db_path=None):
+    """Recompute the coincidence matrix and pair statistics from human_scores"""
+    import numpy as np
+    import pandas as pd
+    conn = results_store.connect(db_path)
+    try:
+        scores = pd.read_sql_query("SELECT rater, question_id, system, score FROM human_scores WHERE campaign = ?",
+                                   conn, params=(campaign,))
+        unit = scores.groupby(['question_id', 'system']).ngroup().to_numpy()
+        coincidence = _coincidence(_counts(scores['score'], unit.max() + 1 if len(unit) else 0, unit))
+        pairs = scores.merge(scores, on=['question_id', 'system'], suffixes=('_a', '_b'))
+        pairs = pairs[pairs['rater_a'] < pairs['rater_b']]
+        sums, confusion = _pair_stats(pairs['rater_a'], pairs['rater_b'], pairs['score_a'], pairs['score_b'])
+        with conn:
+            for table in ('rater_coincidence', 'rater_pairs', 'rater_pair_confusion'):
+                conn.execute(f"DELETE FROM {table} WHERE campaign = ?", (campaign,))
+            _store_deltas(conn, campaign, coincidence, sums, confusion, +1)
+        return len(scores)
+    finally:
+        conn.close()
+
+
+# ============================================================
+# Agreement Metrics (from the stored statistics)
+# ============================================================
+def krippendorff_alpha(coincidence, level='ordinal'):
+    """Alpha from a coincidence matrix over SCALE (ordinal or interval distance)"""
+    import numpy as np
+    o = np.asarray(coincidence, dtype=float)
+    n_c = o.sum(axis=1)
+    n = n_c.sum()
+    if n <= 1:
+        return float('nan')
+    values = np.array(SCALE, dtype=float)
+    if level == 'interval':
+        delta = (values[:, None] - values[None, :]) ** 2
+    else:
+        cum = np.concatenate([[0.0], np.cumsum(n_c)])
+        lo = np.minimum.outer(np.arange(len(SCALE)), np.arange(len(SCALE)))
+        hi = np.maximum.outer(np.arange(len(SCALE)), np.arange(len(SCALE)))
+        delta = (cum[hi + 1] - cum[lo] - (n_c[lo] + n_c[hi]) / 2) ** 2
+    expected = (np.outer(n_c, n_c) * delta).sum() / (n - 1)
+    if expected == 0:
+        return float('nan')
+    return float(1 - (o * delta).sum() / expected)
+
+
+def icc_2_1(n, sx, sy, sxx, syy, sxy):
+    """ICC(2,1) (two-way random, absolute agreement, single rater) for one rater pair"""
+    if n < 2:
+        return float('nan')
+    grand = (sx + sy) / (2 * n)
+    ss_total = sxx + syy - 2 * n * grand ** 2
+    ss_rows = (sxx + syy + 2 * sxy) / 2 - 2 * n * grand ** 2
+    ss_cols = n * ((sx / n - grand) ** 2 + (sy / n - grand) ** 2)
+    ms_rows = ss_rows / (n - 1)
+    ms_error = (ss_total - ss_rows - ss_cols) / (n - 1)
+    denominator = ms_rows + ms_error + 2 * (ss_cols - ms_error) / n
+    return float((ms_rows - ms_error) / denominator) if denominator else float('nan')
+
+
+def pearson(n, sx, sy, sxx, syy, sxy):
+    var_x, var_y = sxx - sx * sx / n, syy - sy * sy / n
+    if n < 2 or var_x <= 0 or var_y <= 0:
+        return float('nan')
+    return float((sxy - sx * sy / n) / (var_x * var_y) ** 0.5)
+
+
+def weighted_kappa(confusion):
+    """Quadratic-weighted Cohen's kappa from a SCALE x SCALE confusion matrix"""
+    import numpy as np
+    observed = np.asarray(confusion, dtype=float)
+    total = observed.sum()
+    if total == 0:
+        return float('nan')
+    idx = np.arange(len(SCALE))
+    weights = (idx[:, None] - idx[None, :]) ** 2 / (len(SCALE) - 1) ** 2
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / total
+    disagreement = (weights * expected).sum()
+    return float(1 - (weights * observed).sum() / disagreement) if disagreement else float('nan')
+
+
+def _matrix(rows):
+    import numpy as np
+    m = np.zeros((len(SCALE), len(SCALE)))
+    for c, k, value in rows:
+        m[c - SCALE[0], k - SCALE[0]] = value
+    return m
+
+
+def judge_agreement(conn, campaign, judge_run, system_pipelines=None, metric='rubric'):
+    """Human unit means vs judge scores on the same (question, pipeline)"""
+    import numpy as np
+    import pandas as pd
+    system_pipelines = system_pipelines or SYSTEM_PIPELINES
+    human = pd.read_sql_query("""
+        SELECT question_id, system, AVG(score) AS human, COUNT(*) AS raters
+        FROM human_scores WHERE campaign = ? GROUP BY question_id, system""", conn, params=(campaign,))
+    judge = pd.read_sql_query("""
+        SELECT question_id, pipeline, AVG(score) AS judge FROM judge_scores
+        WHERE run_id = ? AND metric = ? AND score IS NOT NULL GROUP BY question_id, pipeline""",
+        conn, params=(judge_run, metric))
+    human['pipeline'] = human['system'].map(system_pipelines).fillna(human['system'])
+    joined = human.merge(judge, on=['question_id', 'pipeline'])
+    if joined.empty:
+        return {'units': 0}
+    x, y = joined['human'].to_numpy(), joined['judge'].to_numpy()
+    confusion = np.zeros((len(SCALE), len(SCALE)))
+    rounded = [np.clip(np.floor(v + 0.5), SCALE[0], SCALE[-1]).astype(int) - SCALE[0] for v in (x, y)]
+    np.add.at(confusion, tuple(rounded), 1)
+    n = len(joined)
+    return {'units': n, 'weighted_kappa': weighted_kappa(confusion),
+            'pearson': pearson(n, x.sum(), y.sum(), (x * x).sum(), (y * y).sum(), (x * y).sum()),
+            'mae': float(np.abs(x - y).mean()), 'human_mean': float(x.mean()), 'judge_mean': float(y.mean())}
+
+
+def agreement_report(campaign, db_path=None, judge_run=None, system_pipelines=None):
+    """Inter-rater (alpha, ICC, kappa per pair and pooled) and optional judge-vs-human agreement"""
+    conn = results_store.connect(db_path)
+    try:
+        coverage = conn.execute("""
+            SELECT COUNT(DISTINCT rater), COUNT(DISTINCT question_id || '|' || system), COUNT(*)
+            FROM human_scores WHERE campaign = ?""", (campaign,)).fetchone()
+        coincidence = _matrix(conn.execute("SELECT c, k, weight FROM rater_coincidence WHERE campaign = ?",
+                                           (campaign,)).fetchall())
+        pairs = []
+        for a, b, *stats in conn.execute("""SELECT rater_a, rater_b, n, sx, sy, sxx, syy, sxy FROM rater_pairs
+                                            WHERE campaign = ? AND n > 0 ORDER BY rater_a, rater_b""", (campaign,)):
+            confusion = _matrix(conn.execute("""SELECT x, y, count FROM rater_pair_confusion
+                                                WHERE campaign = ? AND rater_a = ? AND rater_b = ?""",
+                                             (campaign, a, b)).fetchall())
+            pairs.append({'raters': [a, b], 'n': int(round(stats[0])), 'icc_2_1': icc_2_1(*stats),
+                          'weighted_kappa': weighted_kappa(confusion), 'pearson': pearson(*stats)})
+        report = {
+            'campaign': campaign,
+            'raters': coverage[0], 'units': coverage[1], 'scores': coverage[2],
+            'alpha_ordinal': krippendorff_alpha(coincidence, 'ordinal'),
+            'alpha_interval': krippendorff_alpha(coincidence, 'interval'),
+            'icc_2_1': _pooled(pairs, 'icc_2_1'),
+            'weighted_kappa': _pooled(pairs, 'weighted_kappa'),
+            'pairs': pairs,
+        }
+        if judge_run:
+            report['judge'] = {'run_id': judge_run, **judge_agreement(conn, campaign, judge_run, system_pipelines)}
+        return report
+    finally:
+        conn.close()
+
+
+def _pooled(pairs, key):
+    """n-weighted mean of a per-pair statistic (NaN pairs skipped)"""
+    valid = [(p['n'], p[key]) for p in pairs if p[key] == p[key]]
+    total = sum(n for n, _ in valid)
+    return sum(n * v for n, v in valid) / total if total else float('nan')
+
+
+def publish_human_scores(campaign, run_id, db_path=None, system_pipelines=None):
+    """Write per-question human means to judge_scores (metric 'rubric') so charts can use them"""
+    system_pipelines = system_pipelines or SYSTEM_PIPELINES
+    conn = results_store.connect(db_path)
+    try:
+        rows = [{'run_id': run_id, 'suite': 'human', 'pipeline': system_pipelines.get(system, system),
+                 'question_id': question_id, 'metric': 'rubric', 'score': score, 'source': 'human'}
+                for question_id, system, score in conn.execute("""
+                    SELECT question_id, system, AVG(score) FROM human_scores WHERE campaign = ?
+                    GROUP BY question_id, system""", (campaign,))]
+        with conn:
+            conn.execute("DELETE FROM judge_scores WHERE run_id = ? AND source = 'human'", (run_id,))
+        results_store.insert_rows(conn, 'judge_scores', rows)
+        return len(rows)
+    finally:
+        conn.close()
+
+
+# ============================================================
+# CLI
+# ============================================================
+def print_report(report):
+    fmt = lambda v: 'n/a' if v != v else f"{v:.3f}"
+    print(f"\n📊 Agreement - campaign '{report['campaign']}': {report['raters']} raters, "
+          f"{report['units']} units, {report['scores']} scores")
+    print("="*60)
+    print(f"Krippendorff's alpha (ordinal):  {fmt(report['alpha_ordinal'])}")
+    print(f"Krippendorff's alpha (interval): {fmt(report['alpha_interval'])}")
+    print(f"ICC(2,1), pooled over pairs:     {fmt(report['icc_2_1'])}")
+    print(f"Weighted kappa, pooled:          {fmt(report['weighted_kappa'])}")
+    if report['pairs']:
+        print(f"\n{'pair':<10}{'n':>7}{'ICC':>9}{'kappa':>9}{'r':>9}")
+        for p in report['pairs']:
+            print(f"{p['raters'][0]}-{p['raters'][1]:<8}{p['n']:>7}{fmt(p['icc_2_1']):>9}"
+                  f"{fmt(p['weighted_kappa']):>9}{fmt(p['pearson']):>9}")
+    judge = report.get('judge')
+    if judge:
+        print(f"\nJudge vs human ({judge['run_id']}): {judge['units']} units")
+        if judge['units']:
+            print(f"  weighted kappa {fmt(judge['weighted_kappa'])}, Pearson {fmt(judge['pearson'])}, "
+                  f"MAE {fmt(judge['mae'])} (human {fmt(judge['human_mean'])}, judge {fmt(judge['judge_mean'])})")
+
+
+def _parse_map(pairs):
+    return dict(pair.partition('=')[::2] for pair in pairs) if pairs else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-rater score ingestion and agreement analytics")
+    parser.add_argument('--db', help="Results database (default rag_results.db)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def report_args(p):
+        p.add_argument('--judge-run', help="judge_scores run_id to compare with the human scores")
+        p.add_argument('--system-map', nargs='+', metavar='SYSTEM=PIPELINE',
+                       help="Blind-eval system -> judge pipeline (default: SAC-RAG_Claude4.5=SAC-RAG "
+                            "Generic_Claude='Generic Claude')")
+        p.add_argument('--publish', metavar='RUN_ID',
+                       help="Also write per-question human means to judge_scores, e.g. manual-blind-claude45")
+        p.add_argument('--output', help="Write the report as JSON")
+
+    p = sub.add_parser('ingest', help="Ingest new or changed scoring sheets of a campaign")
+    p.add_argument('campaign_dir')
+    p.add_argument('--campaign', help="Campaign name (default: directory name)")
+    p.add_argument('--workers', type=int, default=8, help="Sheets read in parallel")
+    report_args(p)
+
+    p = sub.add_parser('report', help="Print agreement from the stored statistics")
+    p.add_argument('--campaign', required=True)
+    report_args(p)
+
+    p = sub.add_parser('rebuild', help="Recompute all statistics of a campaign from human_scores")
+    p.add_argument('--campaign', required=True)
+    report_args(p)
+    args = parser.parse_args(argv)
+
+    if args.command == 'ingest':
+        args.campaign = args.campaign or Path(args.campaign_dir).resolve().name
+        ingested = ingest(args.campaign_dir, args.campaign, args.db, args.workers)
+        if ingested:
+            print("✅ Ingested: " + ', '.join(f"rater {r} ({n} scores)" for r, n in sorted(ingested.items())))
+        else:
+            print("No new or changed scoring sheets")
+    elif args.command == 'rebuild':
+        print(f"🔧 Rebuilt statistics from {rebuild(args.campaign, args.db)} scores")
+
+    system_pipelines = _parse_map(args.system_map)
+    report = agreement_report(args.campaign, args.db, args.judge_run, system_pipelines)
+    print_report(report)
+    if args.publish:
+        count = publish_human_scores(args.campaign, args.publish, args.db, system_pipelines)
+        print(f"\n📤 {count} human means written to judge_scores as run_id={args.publish}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
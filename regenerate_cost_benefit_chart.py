@@ -1,77 +1,21 @@
-import matplotlib.pyplot as plt
-import numpy as np
-
-# Create clearer cost-benefit visualization
-fig, ax = plt.subplots(figsize=(12, 8))
-
-# Data for systems
-systems = ['Generic\nClaude 4.5', 'SAC-RAG\nClaude 4.5', 'Base RAG\nClaude 4.5']
-performance = [9.60, 9.40, 8.57]
-setup_cost = [0, 5, 5]  # One-time setup in USD
-per_query_cost = [0, 0.012, 0.012]  # Per query in USD
-total_cost_100 = [0, 5 + (0.012 * 100), 5 + (0.012 * 100)]  # For 100 queries
-
-# Create scatter plot with size representing cost
-colors = ['#e67e22', '#9b59b6', '#3498db']
-sizes = [300, 400, 400]  # Larger for systems with costs
-
-scatter = ax.scatter(total_cost_100, performance, s=sizes, alpha=0.7, 
-                     c=colors, edgecolors='black', linewidth=2.5)
-
-# Add clear labels for each point
-for i, system in enumerate(systems):
-    offset_x = 0.3 if i == 0 else 0.5
-    offset_y = -0.15 if i == 2 else 0.15
-    
-    # System name
-    ax.annotate(system, (total_cost_100[i], performance[i]), 
-                xytext=(offset_x, offset_y), textcoords='offset points',
-                fontweight='bold', fontsize=12,
-                bbox=dict(boxstyle='round,pad=0.6', facecolor=colors[i], 
-                         alpha=0.3, edgecolor='black', linewidth=1.5))
-    
-    # Add performance and cost details
-    details = f'{performance[i]:.2f}/10\n${total_cost_100[i]:.2f}'
-    ax.text(total_cost_100[i], performance[i] - 0.05, details,
-            ha='center', va='top', fontsize=9, fontweight='bold')
-
-# Styling
-ax.set_xlabel('Total Cost for 100 Queries (USD)', fontsize=13, fontweight='bold')
-ax.set_ylabel('Performance Score (/10)', fontsize=13, fontweight='bold')
-ax.set_title('Cost-Benefit Analysis: Performance vs Total Cost (100 Queries)\nLLM-as-Judge Evaluation', 
-             fontsize=14, fontweight='bold', pad=20)
-
-# Set appropriate axis limits
-ax.set_xlim(-0.5, 7.5)
-ax.set_ylim(8.2, 9.9)
-
-# Grid
-ax.grid(True, alpha=0.3, linestyle='--')
-
-# Add reference lines
-ax.axhline(y=9.0, color='green', linestyle='--', alpha=0.4, linewidth=1.5, label='High Performance (9.0+)')
-ax.axvline(x=2.0, color='orange', linestyle='--', alpha=0.4, linewidth=1.5, label='Low Cost (<$2)')
-
-# Add insight boxes
-insight_text = (
-    'Best Value: SAC-RAG\n'
-    '• 98% of Generic Claude performance\n'
-    '• Only $6.20 for 100 queries\n'
-    '• Domain-specific knowledge'
-)
-ax.text(0.98, 0.05, insight_text, transform=ax.transAxes,
-        fontsize=10, verticalalignment='bottom', horizontalalignment='right',
-        bbox=dict(boxstyle='round,pad=0.8', facecolor='lightgreen', alpha=0.7,
-                 edgecolor='green', linewidth=2))
-
-# Legend
-ax.legend(loc='lower left', fontsize=10, framealpha=0.95)
-
-plt.tight_layout()
-plt.savefig('thesis_visualizations/07_cost_benefit.png', dpi=300, bbox_inches='tight')
-print("✓ Cost-benefit analysis chart regenerated")
-print("\nKey Insights:")
-print(f"  Generic Claude 4.5: {performance[0]:.2f}/10 @ ${total_cost_100[0]:.2f} (FREE)")
-print(f"  SAC-RAG Claude 4.5: {performance[1]:.2f}/10 @ ${total_cost_100[1]:.2f} (Best Value)")
-print(f"  Base RAG Claude 4.5: {performance[2]:.2f}/10 @ ${total_cost_100[2]:.2f}")
-print(f"\nSAC-RAG achieves 98% of Generic Claude performance for only $6.20/100 queries")
+"""
+Re-render the cost-benefit chart (07_cost_benefit.png) and print its inputs.
+Costs and latency come from Bedrock runs in rag_results.db named
+'generate-queue-*' when they have been measured; latency otherwise from an
+unscaled stub benchmark (benchmark_results.json, labelled 'stub model'), and
+failing both the $5 / $0.012 and ~3s / ~5s estimates.
+"""
+
+from chart_pipeline import load_chart_data, main, three_way_scores
+
+if __name__ == '__main__':
+    main(['--only', '07_cost_benefit', '--force'])
+    data = load_chart_data()
+    base, sac, generic = three_way_scores(data)
+    print("\nKey Insights:")
+    for name, score in (('Generic Claude', generic), ('SAC-RAG', sac), ('Base RAG', base)):
+        cost = data['costs'][name]
+        total = cost['setup_cost'] + cost['per_query_cost'] * 100
+        print(f"  {name + ' 4.5:':<20} {score:.2f}/10 @ ${total:.2f} per 100 queries, "
+              f"~{data['latency_p50'][name]:.1f}s p50 ({data['latency_source'][name]})")
+    print(f"\nSAC-RAG achieves {sac / generic:.0%} of Generic Claude performance")
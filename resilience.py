@@ -0,0 +1,418 @@
+"""
+Resilience Layer for Bedrock Calls
+Shared replacement for the per-script invoke_with_retry helpers:
+- decorrelated-jitter backoff (no synchronized retry storms, no fixed 5·2^n)
+- one circuit breaker per model endpoint, shared by every caller in the process
+- optional hedged requests: fire a backup call when the first one runs past
+  the endpoint's observed p95 latency, keep whichever finishes first
+- explicit failure markers (CallFailed / FAILED_SCORE) instead of None -> 0
+
+Usage:
+    from resilience import invoke_with_retry, is_failure
+    text = invoke_with_retry(llm, prompt)
+    if is_failure(text):
+        ...   # text.reason, text.attempts
+
+    python resilience.py            # exercise the policy against a fault-injecting stub
+"""
+
+import argparse
+import contextvars
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from cost_accounting import message_text, retry_scope
+from tracing import span
+
+# Error codes (botocore ClientError response['Error']['Code'])
+THROTTLE_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException'}
+TRANSIENT_CODES = {'ServiceUnavailableException', 'InternalServerException', 'ModelNotReadyException',
+                   'ModelTimeoutException', 'RequestTimeout'}
+FATAL_CODES = {'ValidationException', 'AccessDeniedException', 'ResourceNotFoundException',
+               'UnrecognizedClientException', 'ModelErrorException'}
+
+# Score recorded when the judge call failed: NaN is skipped by pandas means
+# instead of silently dragging averages down the way a 0 did.
+FAILED_SCORE = float('nan')
+
+
+# ============================================================
+# Failure Markers
+# ============================================================
+class CallFailed:
+    """Returned instead of text when a call gives up. Falsy, never a score."""
+
+    def __init__(self, reason, attempts=0, error=None):
+        self.reason = reason
+        self.attempts = attempts
+        self.error = error
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"CallFailed(reason={self.reason!r}, attempts={self.attempts}, error={self.error!r})"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised by ResilientLLM.invoke when the endpoint's breaker is open"""
+
+
+def is_failure(value):
+    """True for CallFailed markers, None and NaN scores"""
+    if value is None or isinstance(value, CallFailed):
+        return True
+    return isinstance(value, float) and math.isnan(value)
+
+
+def error_code(exc):
+    """botocore-style error code, or the exception class name"""
+    response = getattr(exc, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code') or type(exc).__name__
+    return type(exc).__name__
+
+
+def classify_error(exc):
+    """'throttled', 'transient' or 'fatal'"""
+    code = error_code(exc)
+    if code in THROTTLE_CODES:
+        return 'throttled'
+    if code in FATAL_CODES:
+        return 'fatal'
+    if code in TRANSIENT_CODES or isinstance(exc, (TimeoutError, ConnectionError)):
+        return 'transient'
+    # Unknown errors (e.g. read timeouts from urllib3) are retried, but counted
+    # against the breaker like any other failure.
+    return 'transient'
+
+
+# ============================================================
+# Backoff
+# ============================================================
+class RetryPolicy:
+    """
+    Decorrelated jitter (AWS Architecture Blog, "Exponential Backoff and
+    Jitter"): sleep = min(cap, uniform(base, previous_sleep * 3)).
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0, seed=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_delay(self, previous):
+        with self._lock:
+            upper = max(self.base_delay, previous * 3)
+            return min(self.max_delay, self._rng.uniform(self.base_delay, upper))
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+# ============================================================
+# Circuit Breaker
+# ============================================================
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open after `reset_timeout` seconds, letting one probe call through;
+    a successful probe closes the circuit, a failed one re-opens it. Other
+    callers are refused while the probe is in flight and can wait_for_probe().
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open' and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def probing(self):
+        """True while a half-open probe is in flight (everyone else should fail fast)"""
+        with self._lock:
+            return self.state == 'half_open' and self._probe_in_flight
+
+    def wait_for_probe(self, timeout):
+        """Block until the in-flight probe has an outcome (or `timeout` seconds pass)"""
+        with self._settled:
+            self._settled.wait_for(lambda: not (self.state == 'half_open' and self._probe_in_flight), timeout)
+
+    def release_probe(self):
+        """The probe ended without saying anything about the endpoint (e.g. a bad request); let another through"""
+        with self._settled:
+            self._probe_in_flight = False
+            self._settled.notify_all()
+
+    def retry_after(self):
+        with self._lock:
+            if self.state != 'open':
+                return 0.0
+            return max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+
+    def record_success(self):
+        with self._settled:
+            self.state = 'closed'
+            self.failures = 0
+            self._probe_in_flight = False
+            self._settled.notify_all()
+
+    def record_failure(self):
+        with self._settled:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"      🔌 Circuit open for {self.name} ({self.failures} consecutive failures)")
+                self.state = 'open'
+                self.opened_at = self.clock()
+                self._probe_in_flight = False
+                self._settled.notify_all()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def endpoint_name(llm):
+    return getattr(llm, 'model_id', None) or type(llm).__name__
+
+
+def circuit_breaker(endpoint, **kwargs):
+    """The process-wide breaker for a model endpoint (created on first use)"""
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint, **kwargs)
+        return _breakers[endpoint]
+
+
+# ============================================================
+# Hedged Requests
+# ============================================================
+class LatencyTracker:
+    """Rolling window of successful call latencies for one endpoint"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q, default=None):
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < 20:
+            return default
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+_latency = {}
+_hedge_pool = None
+
+
+def hedge_pool():
+    """Shared pool for hedged attempts (created on first hedge, not at import)"""
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _breakers_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='hedge')
+    return _hedge_pool
+
+
+def latency_tracker(endpoint):
+    with _breakers_lock:
+        return _latency.setdefault(endpoint, LatencyTracker())
+
+
+def hedged_call(fn, hedge_after, max_hedges=1):
+    """
+    Run fn(); if it hasn't returned after `hedge_after` seconds, start a backup
+    copy (up to `max_hedges`) and return the first successful result. Losing
+    calls still complete in the background (Bedrock cannot cancel them), so
+    hedging trades a few percent of extra calls for a shorter tail.
+    """
+    def submit():
+        # each attempt runs in a copy of the caller's context (usage tags, spans)
+        return hedge_pool().submit(contextvars.copy_context().run, fn)
+
+    futures = [submit()]
+    hedges = 0
+    errors = []
+    while futures:
+        timeout = hedge_after if hedges < max_hedges else None
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            hedges += 1
+            with span('retry.hedge', hedge=hedges, after_s=hedge_after):
+                futures.append(submit())
+            continue
+        for future in done:
+            futures.remove(future)
+            if future.exception() is None:
+                return future.result()
+            errors.append(future.exception())
+    raise errors[-1]
+
+
+# ============================================================
+# Invocation
+# ============================================================
+def invoke_with_retry(llm, prompt, max_retries=None, policy=None, hedge=False, hedge_quantile=0.95,
+                      breaker=None, sleep=time.sleep):
+    """
+    Invoke the LLM with jittered backoff, the endpoint's circuit breaker and
+    optional hedging. Returns the response text, or a CallFailed marker.
+    """
+    with retry_scope():
+        return _attempt(llm, prompt, max_retries, policy, hedge, hedge_quantile, breaker, sleep)
+
+
+def _attempt(llm, prompt, max_retries, policy, hedge, hedge_quantile, breaker, sleep):
+    policy = policy or DEFAULT_POLICY
+    max_attempts = max_retries or policy.max_attempts
+    endpoint = endpoint_name(llm)
+    breaker = breaker or circuit_breaker(endpoint)
+    tracker = latency_tracker(endpoint)
+    delay = policy.base_delay
+    last_error = None
+
+    for attempt in range(max_attempts):
+        if not breaker.allow():
+            if breaker.probing():
+                # another caller's probe decides whether the endpoint is back; wait for
+                # its outcome (one attempt) instead of adding load or giving up
+                if attempt == max_attempts - 1:
+                    print(f"      ❌ Circuit half-open for {endpoint} (probe in flight); giving up")
+                    return CallFailed('circuit_open', attempt, last_error)
+                with span('retry.backoff', attempt=attempt, reason='circuit_probe'):
+                    breaker.wait_for_probe(policy.max_delay)
+                continue
+            wait_s = breaker.retry_after()
+            if attempt == max_attempts - 1 or wait_s > policy.max_delay:
+                print(f"      ❌ Circuit open for {endpoint}; giving up")
+                return CallFailed('circuit_open', attempt, last_error)
+            with span('retry.backoff', attempt=attempt, wait_s=wait_s, reason='circuit_open'):
+                sleep(wait_s)
+            continue
+
+        start = time.perf_counter()
+        try:
+            hedge_after = tracker.quantile(hedge_quantile) if hedge else None
+            if hedge_after:
+                response = hedged_call(lambda: llm.invoke(prompt), hedge_after)
+            else:
+                response = llm.invoke(prompt)
+        except Exception as e:
+            last_error = f"{error_code(e)}: {str(e)[:100]}"
+            kind = classify_error(e)
+            if kind == 'fatal':
+                # a bad request says nothing about the endpoint's health
+                breaker.release_probe()
+                print(f"      ❌ Non-retryable error: {last_error}")
+                return CallFailed('fatal', attempt + 1, last_error)
+            breaker.record_failure()
+            if attempt == max_attempts - 1:
+                print(f"      ❌ Failed after {max_attempts} attempts ({last_error})")
+                return CallFailed(kind, attempt + 1, last_error)
+            delay = policy.next_delay(delay)
+            print(f"      ⚠️ {'Throttled' if kind == 'throttled' else 'Error'} "
+                  f"(attempt {attempt + 1}/{max_attempts}). Waiting {delay:.1f}s...")
+            with span('retry.backoff', attempt=attempt, wait_s=delay, reason=kind):
+                sleep(delay)
+            continue
+
+        breaker.record_success()
+        tracker.observe(time.perf_counter() - start)
+        return message_text(response)
+
+    return CallFailed('exhausted', max_attempts, last_error)
+
+
+class ResilientLLM:
+    """
+    Wraps an LLM so .invoke() goes through the resilience layer; raises
+    instead of returning CallFailed so it can sit inside LangChain chains.
+    """
+
+    def __init__(self, llm, policy=None, hedge=False):
+        self.llm = llm
+        self.policy = policy
+        self.hedge = hedge
+
+    def invoke(self, prompt):
+        result = invoke_with_retry(self.llm, prompt, policy=self.policy, hedge=self.hedge)
+        if isinstance(result, CallFailed):
+            raise CircuitOpenError(repr(result)) if result.reason == 'circuit_open' else RuntimeError(repr(result))
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+# ============================================================
+# Fault-Injection Demo
+# ============================================================
+def main(argv=None):
+    from stub_backends import FaultInjectingLLM, StubLLM
+
+    parser = argparse.ArgumentParser(description="Exercise the retry policy against a fault-injecting stub")
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--throttle-rate', type=float, default=0.2)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--slow-rate', type=float, default=0.05)
+    parser.add_argument('--hedge', action='store_true')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    llm = FaultInjectingLLM(StubLLM(time_scale=0.005, seed=args.seed, responder=lambda p: '4'),
+                            throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+                            slow_rate=args.slow_rate, slow_factor=20, seed=args.seed)
+    policy = RetryPolicy(max_attempts=5, base_delay=0.001, max_delay=0.05, seed=args.seed)
+    breaker = CircuitBreaker(llm.model_id, failure_threshold=8, reset_timeout=0.05)
+
+    latencies, failures = [], []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        def one(_):
+            start = time.perf_counter()
+            result = invoke_with_retry(llm, 'Rate this answer', policy=policy, hedge=args.hedge, breaker=breaker)
+            return time.perf_counter() - start, result
+        for elapsed, result in pool.map(one, range(args.calls)):
+            latencies.append(elapsed)
+            if is_failure(result):
+                failures.append(result)
+
+    latencies.sort()
+    print(f"\n📊 {args.calls} calls, {llm.calls} attempts, injected: {dict(llm.injected)}")
+    print(f"   Failed (explicit markers): {len(failures)}  "
+          f"{sorted({f.reason for f in failures}) if failures else ''}")
+    print(f"   Latency p50={latencies[len(latencies) // 2] * 1000:.1f}ms  "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms  (hedge={args.hedge})")
+
+
+if __name__ == '__main__':
+    main()
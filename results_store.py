@@ -0,0 +1,120 @@
+"""
+Results Store
+Single SQLite database (rag_results.db) that collects measurements from every
+script: LLM/embedding call usage, scores, and anything else that used to be
+copied between CSV files by hand. SQLite keeps it queryable with plain SQL or
+pandas.read_sql without running a server.
+"""
+
+import contextlib
+import sqlite3
+import threading
+from pathlib import Path
+
+DEFAULT_DB = 'rag_results.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    pipeline TEXT,
+    question_id TEXT,
+    stage TEXT,
+    kind TEXT NOT NULL,
+    model_id TEXT,
+    input_tokens INTEGER DEFAULT 0,
+    output_tokens INTEGER DEFAULT 0,
+    latency_s REAL,
+    retries INTEGER DEFAULT 0,
+    cost_usd REAL DEFAULT 0,
+    status TEXT DEFAULT 'ok',
+    backend TEXT DEFAULT 'bedrock',
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_run ON llm_calls (run_id, pipeline, stage);
+
+CREATE TABLE IF NOT EXISTS judge_scores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    suite TEXT,
+    pipeline TEXT,
+    question_id TEXT,
+    metric TEXT,
+    score REAL,
+    raw_response TEXT,
+    source TEXT DEFAULT 'sync',
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_judge_scores_run ON judge_scores (run_id, pipeline, metric);
+"""
+
+# Columns added after a table first shipped: (table, column, declaration, backfill SQL or None).
+# connect() adds any that an older database is missing.
+MIGRATIONS = [
+    # stub-backend usage (rag_benchmark runs, 'stub.*' models) must not count as Bedrock cost/latency
+    ('llm_calls', 'backend', "TEXT DEFAULT 'bedrock'",
+     "UPDATE llm_calls SET backend = 'stub' WHERE run_id LIKE 'benchmark-%' OR model_id LIKE 'stub%'"),
+]
+
+_write_lock = threading.Lock()
+_schemas = []
+
+
+def register_schema(sql):
+    """Let other modules add their own tables to the store"""
+    if sql not in _schemas:
+        _schemas.append(sql)
+
+
+def connect(db_path=None):
+    """Open (and initialise) the results database"""
+    db_path = Path(db_path or DEFAULT_DB)
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA)
+    for sql in _schemas:
+        conn.executescript(sql)
+    _migrate(conn)
+    return conn
+
+
+def _migrate(conn):
+    for table, column, declaration, backfill in MIGRATIONS:
+        if column in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            continue
+        try:
+            with transaction(conn):
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+                if backfill:
+                    conn.execute(backfill)
+        except sqlite3.OperationalError as e:
+            if 'duplicate column' not in str(e):                   # another process migrated first
+                raise
+
+
+@contextlib.contextmanager
+def transaction(conn):
+    """Serialise a write against this process's other writers; commits on success, rolls back on error"""
+    with _write_lock, conn:
+        yield conn
+
+
+def insert_rows(conn, table, rows):
+    """Insert a list of dicts (all with the same keys) into `table`"""
+    if not rows:
+        return
+    columns = list(rows[0])
+    placeholders = ', '.join('?' for _ in columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    with transaction(conn):
+        conn.executemany(sql, [tuple(row[c] for c in columns) for row in rows])
+
+
+def query(sql, params=(), db_path=None):
+    """Run a SELECT and return a pandas DataFrame"""
+    import pandas as pd
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
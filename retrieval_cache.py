@@ -0,0 +1,225 @@
+"""
+Persisted Retrieval-Result Cache
+Retrieval for a question against an unchanged index is deterministic, so
+generation-only reruns (another model, prompt or temperature) should not
+repeat it. Results - chunk ids, scores and texts - are stored in the results
+store keyed by (index version, query embedding model, question hash, k,
+filter hash) and read back without embedding the question or searching.
+
+The index version is a fingerprint of the index's content:
+    Chroma persist dir   sha256 of the HNSW segment files plus the row count
+                         and max seq_id of chroma.sqlite3 (opened read-only)
+    index_snapshot file  the manifest's section CRCs
+    StubVectorStore      sha256 of the vector matrix
+Re-ingesting or rebuilding an index changes its version, so stale results
+are never read (invalidation is automatic); `prune` deletes them.
+
+Usage:
+    python retrieval_cache.py version chroma_sac
+    python retrieval_cache.py stats
+    python retrieval_cache.py prune --keep chroma_base chroma_sac
+    python rag_benchmark.py --retrieval-cache --pipelines base sac
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+import results_store
+from tracing import span
+
+results_store.register_schema("""
+CREATE TABLE IF NOT EXISTS retrieval_cache (
+    index_version TEXT NOT NULL,
+    query_model TEXT NOT NULL,
+    question_hash TEXT NOT NULL,
+    k INTEGER NOT NULL,
+    filter_hash TEXT NOT NULL,
+    chunk_ids TEXT NOT NULL,
+    scores TEXT NOT NULL,
+    documents TEXT NOT NULL,
+    index_name TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    PRIMARY KEY (index_version, query_model, question_hash, k, filter_hash)
+);
+""")
+
+
+def _sha256(data):
+    return hashlib.sha256(data if isinstance(data, bytes) else data.encode('utf-8')).hexdigest()
+
+
+def question_hash(question):
+    return _sha256(question.strip())[:32]
+
+
+def filter_hash(where):
+    return _sha256(json.dumps(where, sort_keys=True, default=str))[:16] if where else '-'
+
+
+# ============================================================
+# Index Versions
+# ============================================================
+def _chroma_version(persist_dir):
+    import sqlite3
+    digest = hashlib.sha256()
+    for path in sorted(p for p in Path(persist_dir).rglob('*') if p.is_file() and p.name != 'chroma.sqlite3'):
+        digest.update(str(path.relative_to(persist_dir)).encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    sqlite_path = Path(persist_dir) / 'chroma.sqlite3'
+    if sqlite_path.exists() and sqlite_path.stat().st_size:
+        conn = sqlite3.connect(f'file:{sqlite_path}?mode=ro', uri=True)
+        try:
+            digest.update(repr(conn.execute("SELECT COUNT(*), MAX(seq_id) FROM embeddings").fetchone()).encode())
+        except sqlite3.DatabaseError:
+            pass                                                   # older layout; the segment files still count
+        finally:
+            conn.close()
+    return digest.hexdigest()[:16]
+
+
+def index_version(index):
+    """Content fingerprint of a Chroma persist dir, a snapshot file/SnapshotIndex, or a stub vector store"""
+    if isinstance(index, (str, Path)):
+        path = Path(index)
+        if path.is_dir():
+            return _chroma_version(path)
+        from index_snapshot import SnapshotIndex
+        index = SnapshotIndex(path)
+    if hasattr(index, 'manifest'):
+        crcs = {name: info['crc32'] for name, info in index.manifest['sections'].items()}
+        return _sha256(json.dumps(crcs, sort_keys=True))[:16]
+    if hasattr(index, 'matrix'):
+        import numpy as np
+        return _sha256(np.ascontiguousarray(index.matrix).tobytes())[:16]
+    raise ValueError(f"Can't fingerprint {type(index).__name__}; pass index_version explicitly")
+
+
+# ============================================================
+# Cache
+# ============================================================
+class RetrievalCache:
+    """
+    Retrieval results for one index version and query embedding model. All
+    entries for that version are read once on first use; misses are
+    written through to the results store.
+    """
+
+    def __init__(self, index_version, query_model, index_name=None, db_path=None):
+        self.index_version = index_version
+        self.query_model = query_model
+        self.index_name = index_name
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        rows = results_store.query(
+            "SELECT question_hash, k, filter_hash, chunk_ids, scores, documents FROM retrieval_cache "
+            "WHERE index_version = ? AND query_model = ?", (self.index_version, self.query_model), self.db_path)
+        return {(r.question_hash, int(r.k), r.filter_hash): {'chunk_ids': r.chunk_ids, 'scores': r.scores,
+                                                           'documents': r.documents}
+                for r in rows.itertuples(index=False)}
+
+    def get(self, question, k, where=None):
+        """[{chunk_id, score, page_content, metadata}] or None on a miss"""
+        with self._lock:
+            if self._entries is None:
+                with span('retrieval_cache.load', index_version=self.index_version):
+                    self._entries = self._load()
+            row = self._entries.get((question_hash(question), k, filter_hash(where)))
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return [{'chunk_id': chunk_id, 'score': score, **doc} for chunk_id, score, doc in
+                zip(json.loads(row['chunk_ids']), json.loads(row['scores']), json.loads(row['documents']))]
+
+    def put(self, question, k, where, results):
+        """results: [(document, score)] as returned by similarity_search_by_vector_with_relevance_scores"""
+        from chunk_store import chunk_id
+        chunk_ids = [doc.metadata.get('chunk_id') or chunk_id(doc.page_content) for doc, _ in results]
+        row = {'index_version': self.index_version, 'query_model': self.query_model,
+               'question_hash': question_hash(question), 'k': k, 'filter_hash': filter_hash(where),
+               'chunk_ids': json.dumps(chunk_ids), 'scores': json.dumps([float(s) for _, s in results]),
+               'documents': json.dumps([{'page_content': doc.page_content, 'metadata': doc.metadata}
+                                        for doc, _ in results], ensure_ascii=False, default=str),
+               'index_name': self.index_name}
+        conn = results_store.connect(self.db_path)
+        try:
+            with results_store.transaction(conn):
+                conn.execute("""
+                    INSERT OR REPLACE INTO retrieval_cache
+                    (index_version, query_model, question_hash, k, filter_hash, chunk_ids, scores, documents, index_name)
+                    VALUES (:index_version, :query_model, :question_hash, :k, :filter_hash, :chunk_ids, :scores,
+                            :documents, :index_name)""", row)
+        finally:
+            conn.close()
+        with self._lock:
+            if self._entries is not None:
+                self._entries[(row['question_hash'], k, row['filter_hash'])] = {
+                    key: row[key] for key in ('chunk_ids', 'scores', 'documents')}
+
+    @classmethod
+    def for_store(cls, vector_store, query_model, index_name=None, version=None, db_path=None):
+        """Cache for a vector store; `version` is required for stores index_version() can't fingerprint"""
+        return cls(version or index_version(vector_store), query_model, index_name, db_path)
+
+
+def cache_stats(db_path=None):
+    return results_store.query("""
+        SELECT index_name, index_version, query_model, COUNT(*) AS entries, MIN(created_at) AS first,
+               MAX(created_at) AS last
+        FROM retrieval_cache GROUP BY index_name, index_version, query_model ORDER BY last DESC""", db_path=db_path)
+
+
+def prune(keep_versions, db_path=None):
+    """Delete entries whose index version is not in keep_versions; returns the number deleted"""
+    conn = results_store.connect(db_path)
+    try:
+        with results_store.transaction(conn):
+            marks = ', '.join('?' for _ in keep_versions) or "''"
+            deleted = conn.execute(f"DELETE FROM retrieval_cache WHERE index_version NOT IN ({marks})",
+                                   tuple(keep_versions)).rowcount
+    finally:
+        conn.close()
+    return deleted
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persisted retrieval-result cache")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('version', help="Content version of Chroma persist dirs or snapshot files")
+    p.add_argument('indexes', nargs='+')
+    p = sub.add_parser('stats', help="Entries per index version")
+    p.add_argument('--db')
+    p = sub.add_parser('prune', help="Drop entries for index versions other than the current ones")
+    p.add_argument('--keep', nargs='+', default=['chroma_base', 'chroma_sac'],
+                   help="Indexes (dirs/snapshots) whose current version is kept")
+    p.add_argument('--db')
+    args = parser.parse_args(argv)
+
+    if args.command == 'version':
+        for index in args.indexes:
+            print(f"{index}: {index_version(index)}")
+        return 0
+    if args.command == 'stats':
+        stats = cache_stats(args.db)
+        print(stats.to_string(index=False) if len(stats) else "Retrieval cache is empty")
+        return 0
+    keep = [index_version(index) for index in args.keep if Path(index).exists()]
+    print(f"🧹 Deleted {prune(keep, args.db)} cached results (kept versions {', '.join(keep) or 'none'})")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
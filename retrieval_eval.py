@@ -0,0 +1,480 @@
+"""
+Offline Retrieval Evaluation
+Scores the retrieval stage on its own - no generation and no judge calls - so
+chunking, index and k changes can be compared in seconds:
+
+- recall@k             share of a question's gold chunks found in the top k
+- MRR@k                1 / rank of the first gold chunk (0 if none in the top k)
+- nDCG@k               graded gain (2^rel - 1) / log2(rank + 1) over the ideal order
+- citation hit@k       whether any section, article, Act or case the reference
+                       cites appears verbatim in the top-k chunk texts
+- citation recall@k    share of those citations that appear
+
+All questions are scored at once: one (questions x chunks) similarity matrix,
+one argpartition for the top k, and every metric as array ops over the
+(questions x k) relevance matrix. Vectors come from the embedding cache in the
+results store, so a text is only ever embedded once per model.
+
+Gold labels are two CSVs: retrieval_gold.csv (Question_ID, Question, index,
+chunk_id, relevance) and retrieval_citations.csv (Question_ID, citation).
+`label` drafts both from the golden questions and answers for review.
+
+Usage:
+    python retrieval_eval.py --index base sac label
+    python retrieval_eval.py evaluate --k 1 3 5 10 --output retrieval_per_question.csv
+    python retrieval_eval.py --backend chroma --embeddings bedrock evaluate
+"""
+
+import argparse
+import hashlib
+import re
+from datetime import datetime
+
+import results_store
+from tracing import span
+
+INDEXES = {'base': 'chroma_base', 'sac': 'chroma_sac'}
+GOLD_CSV = 'retrieval_gold.csv'
+CITATIONS_CSV = 'retrieval_citations.csv'
+EMBEDDING_MODEL_ID = 'amazon.titan-embed-text-v2:0'
+STUB_EMBEDDING_MODEL_ID = 'stub.titan-embed-text-v2'
+
+CITATION_PATTERNS = [
+    # Section 40(1), Article 27(4), Order 42 Rule 6, Schedule 2
+    r"\b(?:Section|Article|Rule|Order|Regulation|Schedule|Part)\s+[0-9]+[A-Z]?(?:\s*\([0-9a-z]{1,4}\))*",
+    # Torino Enterprises Ltd v Attorney General
+    r"\b[A-Z][\w'&.-]*(?:\s+(?:[A-Z][\w'&.-]*|of|and|&))*\s+v\.?\s+[A-Z][\w'&.-]*(?:\s+(?:[A-Z][\w'&.-]*|of|and|&))*",
+    # Land Registration Act, Employment Act 2007
+    r"\b[A-Z][\w'-]*(?:\s+(?:[A-Z][\w'-]*|of|and))*\s+Act\b(?:,?\s+\d{4})?",
+]
+
+results_store.register_schema("""
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model_id TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (model_id, text_hash)
+);
+CREATE TABLE IF NOT EXISTS retrieval_metrics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    index_name TEXT NOT NULL,
+    k INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL,
+    questions INTEGER,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_retrieval_metrics_run ON retrieval_metrics (run_id, index_name);
+""")
+
+
+def chunk_key(text):
+    """Stable content id for a chunk (used when the store has no ids of its own)"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# ============================================================
+# Embedding Cache
+# ============================================================
+class EmbeddingCache:
+    """
+    Embeds texts through `embeddings` (embed_documents) and keeps every
+    vector in the results store keyed by (model_id, sha256 of the text);
+    only texts not seen before reach the model. With embeddings=None the
+    cache is read-only and a miss raises ValueError.
+    """
+
+    def __init__(self, embeddings, model_id, db_path=None, batch_size=64):
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, texts):
+        """(len(texts), d) float32 matrix of unit vectors, in input order"""
+        import numpy as np
+        hashes = [_text_hash(t) for t in texts]
+        found = {}
+        conn = results_store.connect(self.db_path)
+        try:
+            unique = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embedding_cache WHERE model_id = ? "
+                    f"AND text_hash IN ({', '.join('?' for _ in batch)})", (self.model_id, *batch))
+                found.update((h, np.frombuffer(blob, dtype=np.float32)) for h, blob in rows)
+
+            missing = {h: t for h, t in zip(hashes, texts) if h not in found}
+            self.hits += len(unique) - len(missing)
+            self.misses += len(missing)
+            if missing and self.embeddings is None:
+                raise ValueError(f"{len(missing)} texts have no cached {self.model_id} vectors")
+            items = list(missing.items())
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start:start + self.batch_size]
+                with span('retrieval.embed', model_id=self.model_id, texts=len(batch)):
+                    vectors = np.asarray(self.embeddings.embed_documents([t for _, t in batch]), dtype=np.float32)
+                rows = []
+                for (h, _), vector in zip(batch, vectors):
+                    found[h] = vector
+                    rows.append({'model_id': self.model_id, 'text_hash': h, 'dimensions': len(vector),
+                                 'vector': vector.tobytes()})
+                with results_store.transaction(conn):
+                    conn.executemany("""
+                        INSERT OR IGNORE INTO embedding_cache (model_id, text_hash, dimensions, vector)
+                        VALUES (:model_id, :text_hash, :dimensions, :vector)""", rows)
+        finally:
+            conn.close()
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return _normalise_rows(np.vstack([found[h] for h in hashes]))
+
+
+def _normalise_rows(matrix):
+    import numpy as np
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def build_embeddings(service='local', region='us-east-1', ledger=None, onnx_model=None):
+    """(embeddings, model_id) for the query/chunk embedder: 'bedrock' (Titan), 'onnx' (local model) or the stub"""
+    if service == 'bedrock':
+        from langchain_aws import BedrockEmbeddings
+        embeddings, model_id = BedrockEmbeddings(model_id=EMBEDDING_MODEL_ID, region_name=region), EMBEDDING_MODEL_ID
+    elif service == 'onnx':
+        from onnx_embeddings import DEFAULT_ONNX_MODEL, OnnxEmbeddings
+        embeddings = OnnxEmbeddings(onnx_model or DEFAULT_ONNX_MODEL)
+        model_id = embeddings.model_id
+    else:
+        from stub_backends import StubEmbeddings
+        embeddings, model_id = StubEmbeddings(time_scale=0), STUB_EMBEDDING_MODEL_ID
+    if ledger is not None:
+        from cost_accounting import InstrumentedEmbeddings
+        embeddings = InstrumentedEmbeddings(embeddings, ledger, model_id=model_id)
+    return embeddings, model_id
+
+
+# ============================================================
+# Indexes
+# ============================================================
+class RetrievalIndex:
+    """Chunk ids, texts and a row-normalised vector matrix for one vector store"""
+
+    def __init__(self, name, ids, texts, vectors, metadatas=None):
+        import numpy as np
+        self.name = name
+        self.ids = np.asarray(ids, dtype=object)
+        self.texts = list(texts)
+        self.metadatas = list(metadatas) if metadatas is not None else [{} for _ in self.texts]
+        self.vectors = _normalise_rows(np.asarray(vectors, dtype=np.float32))
+        self.position = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, query_vectors, k, block=256):
+        """(questions, k) chunk positions, best first; queries are scored in blocks"""
+        import numpy as np
+        k = min(k, len(self))
+        top = np.empty((len(query_vectors), k), dtype=np.int64)
+        for start in range(0, len(query_vectors), block):
+            scores = query_vectors[start:start + block] @ self.vectors.T
+            part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind='stable')
+            top[start:start + block] = np.take_along_axis(part, order, axis=1)
+        return top
+
+
+def load_chroma_index(name, persist_dir=None, collection=None):
+    """Every id, document and stored embedding of a persisted Chroma collection"""
+    import chromadb
+    client = chromadb.PersistentClient(path=persist_dir or INDEXES[name])
+    if collection is None:
+        collections = client.list_collections()
+        if not collections:
+            raise ValueError(f"No collections in {persist_dir or INDEXES[name]}")
+        collection = getattr(collections[0], 'name', collections[0])
+    data = client.get_collection(collection).get(include=['embeddings', 'documents', 'metadatas'])
+    return RetrievalIndex(name, data['ids'], data['documents'], data['embeddings'],
+                          [m or {} for m in data['metadatas']])
+
+
+def load_stub_index(name, cache):
+    """
+    The rag_benchmark stub corpus for 'base' or 'sac', embedded through the
+    cache; each chunk carries its source document's doc_id and doc_type
+    """
+    from legal_chunker import classify
+    from rag_benchmark import build_stub_corpus
+    from stub_backends import chunk_text
+    documents, _, base_chunks, sac_chunks = build_stub_corpus()
+    chunks = {'base': base_chunks, 'sac': sac_chunks}[name]
+    metadatas = [{'doc_id': doc_id, 'doc_type': classify(str(doc))}
+                 for doc_id, doc in enumerate(documents) for _ in chunk_text(doc)]
+    return RetrievalIndex(name, [chunk_key(c) for c in chunks], chunks, cache.embed(chunks), metadatas)
+
+
+def load_index(name, backend='stub', cache=None, persist_dir=None):
+    with span('retrieval.load_index', index=name, backend=backend):
+        if backend == 'chroma':
+            return load_chroma_index(name, persist_dir)
+        return load_stub_index(name, cache)
+
+
+# ============================================================
+# Citations
+# ============================================================
+def normalise_citation(text):
+    text = re.sub(r'\s+', ' ', str(text)).strip().lower()
+    return re.sub(r' \(', '(', text)
+
+
+def extract_citations(text):
+    """Distinct normalised citations (sections, articles, Acts, cases) in `text`"""
+    found = []
+    for pattern in CITATION_PATTERNS:
+        found += [normalise_citation(m.group(0)) for m in re.finditer(pattern, str(text))]
+    return list(dict.fromkeys(c for c in found if len(c) > 6))
+
+
+def citation_matrix(citations, texts):
+    """(citations, chunks) bool: citation appears verbatim in the normalised chunk text"""
+    import numpy as np
+    import pandas as pd
+    normalised = pd.Series(texts, dtype=object).map(normalise_citation)
+    if not citations:
+        return np.zeros((0, len(texts)), dtype=bool)
+    return np.vstack([normalised.str.contains(c, regex=False).to_numpy() for c in citations])
+
+
+# ============================================================
+# Gold Labels
+# ============================================================
+def load_gold(gold_csv=GOLD_CSV, citations_csv=CITATIONS_CSV):
+    """(gold DataFrame, citations DataFrame); the citations file is optional"""
+    import os
+    import pandas as pd
+    gold = pd.read_csv(gold_csv, dtype={'Question_ID': str, 'chunk_id': str})
+    if 'relevance' not in gold:
+        gold['relevance'] = 1
+    citations = (pd.read_csv(citations_csv, dtype={'Question_ID': str}) if os.path.exists(citations_csv)
+                 else pd.DataFrame(columns=['Question_ID', 'citation']))
+    return gold, citations
+
+
+def draft_labels(indexes, sources=('sac_rag_golden_detailed.csv', 'base_rag_golden_detailed.csv')):
+    """
+    Draft gold labels from the golden set: citations are pulled from each
+    question and its saved answers; a chunk is gold (relevance = number of
+    distinct citations it contains) when it quotes any of them. Review
+    before trusting - answers can cite things the corpus never held.
+    """
+    import pandas as pd
+    from rag_pipelines import question_key
+    frames = [pd.read_csv(path)[['question', 'answer']] for path in sources]
+    golden = pd.concat(frames).groupby('question', sort=False)['answer'].apply(
+        lambda answers: '\n'.join(answers.dropna().astype(str)))
+
+    citation_rows, gold_rows = [], []
+    for question, answers in golden.items():
+        qid = question_key(question)
+        citations = extract_citations(question + '\n' + answers)
+        citation_rows += [{'Question_ID': qid, 'citation': c} for c in citations]
+        for index in indexes:
+            contains = citation_matrix(citations, index.texts)
+            counts = contains.sum(axis=0)
+            gold_rows += [{'Question_ID': qid, 'Question': question, 'index': index.name,
+                           'chunk_id': index.ids[i], 'relevance': int(counts[i])}
+                          for i in counts.nonzero()[0]]
+        if not any(row['Question_ID'] == qid for row in gold_rows):
+            gold_rows.append({'Question_ID': qid, 'Question': question, 'index': '', 'chunk_id': '',
+                              'relevance': 0})
+    return pd.DataFrame(gold_rows), pd.DataFrame(citation_rows, columns=['Question_ID', 'citation'])
+
+
+# ============================================================
+# Metrics (vectorized over all questions)
+# ============================================================
+def relevance_matrix(gold, index, question_ids):
+    """(questions, chunks) graded relevance for one index, plus the number of labels with unknown ids"""
+    import numpy as np
+    rows = {qid: i for i, qid in enumerate(question_ids)}
+    labels = gold[(gold['index'] == index.name) & (gold['relevance'] > 0)]
+    q = labels['Question_ID'].map(rows).to_numpy()
+    c = labels['chunk_id'].map(index.position).to_numpy()
+    known = ~(np.isnan(c.astype(float)) | np.isnan(q.astype(float)))
+    matrix = np.zeros((len(question_ids), len(index)), dtype=np.float32)
+    matrix[q[known].astype(int), c[known].astype(int)] = labels['relevance'].to_numpy()[known]
+    return matrix, int((~known).sum())
+
+
+def ranking_metrics(top, relevance, ks):
+    """{k: {metric: per-question array}} (NaN for questions without gold chunks)"""
+    import numpy as np
+    max_k = top.shape[1]
+    rel = np.take_along_axis(relevance, top, axis=1)
+    hit = rel > 0
+    n_gold = (relevance > 0).sum(axis=1)
+    labelled = n_gold > 0
+    discounts = 1 / np.log2(np.arange(2, max_k + 2))
+    gains = (2 ** rel - 1) * discounts
+    best = -np.sort(-relevance, axis=1)[:, :max_k]
+    ideal = (2 ** best - 1) * discounts
+
+    out = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for k in ks:
+            k = min(k, max_k)
+            first = hit[:, :k].argmax(axis=1)
+            found = hit[:, :k].any(axis=1)
+            out[k] = {
+                'recall': np.where(labelled, hit[:, :k].sum(axis=1) / n_gold, np.nan),
+                'mrr': np.where(labelled, np.where(found, 1 / (first + 1), 0.0), np.nan),
+                'ndcg': np.where(labelled, gains[:, :k].sum(axis=1) / ideal[:, :k].sum(axis=1), np.nan),
+            }
+    return out
+
+
+def citation_metrics(top, citations, index, question_ids, ks):
+    """{k: {citation_hit, citation_recall}} per question (NaN without citations)"""
+    import numpy as np
+    rows = {qid: i for i, qid in enumerate(question_ids)}
+    pairs = citations[citations['Question_ID'].isin(rows)]
+    distinct = list(dict.fromkeys(pairs['citation'].map(normalise_citation)))
+    contains = citation_matrix(distinct, index.texts)
+    q = pairs['Question_ID'].map(rows).to_numpy(dtype=int)
+    c = pairs['citation'].map(normalise_citation).map({cit: i for i, cit in enumerate(distinct)}).to_numpy(dtype=int)
+    n = len(question_ids)
+    cited = np.bincount(q, minlength=n)
+
+    out = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for k in ks:
+            k = min(k, top.shape[1])
+            hits = contains[c[:, None], top[q, :k]].any(axis=1) if len(q) else np.zeros(0, dtype=bool)
+            found = np.bincount(q, weights=hits, minlength=n)
+            out[k] = {
+                'citation_hit': np.where(cited > 0, (found > 0).astype(float), np.nan),
+                'citation_recall': np.where(cited > 0, found / cited, np.nan),
+            }
+    return out
+
+
+def evaluate(index, questions, query_vectors, gold, citations, ks=(1, 3, 5, 10)):
+    """
+    Per-question metrics for one index: long DataFrame (Question_ID, index,
+    k, metric, value), plus the count of gold labels whose chunk id is
+    missing from the index (stale after re-chunking).
+    """
+    import pandas as pd
+    question_ids = list(questions)
+    with span('retrieval.search', index=index.name, questions=len(question_ids), k=max(ks)):
+        top = index.search(query_vectors, max(ks))
+    relevance, stale = relevance_matrix(gold, index, question_ids)
+    per_k = ranking_metrics(top, relevance, ks)
+    for k, values in citation_metrics(top, citations, index, question_ids, ks).items():
+        per_k[k].update(values)
+    frames = [pd.DataFrame({'Question_ID': question_ids, 'index': index.name, 'k': k, 'metric': metric,
+                            'value': values})
+              for k, metrics in per_k.items() for metric, values in metrics.items()]
+    return pd.concat(frames, ignore_index=True), stale
+
+
+def summarise(per_question):
+    """Mean of each metric over the questions it applies to"""
+    return (per_question.dropna(subset=['value'])
+            .groupby(['index', 'k', 'metric'], sort=False)['value'].agg(['mean', 'count']).reset_index())
+
+
+def store_summary(summary, run_id, db_path=None):
+    rows = [{'run_id': run_id, 'index_name': r['index'], 'k': int(r['k']), 'metric': r['metric'],
+             'value': float(r['mean']), 'questions': int(r['count'])} for _, r in summary.iterrows()]
+    conn = results_store.connect(db_path)
+    try:
+        results_store.insert_rows(conn, 'retrieval_metrics', rows)
+    finally:
+        conn.close()
+
+
+# ============================================================
+# CLI
+# ============================================================
+def print_summary(summary):
+    table = summary.pivot_table(index=['index', 'k'], columns='metric', values='mean', sort=False)
+    columns = [c for c in ('recall', 'mrr', 'ndcg', 'citation_hit', 'citation_recall') if c in table]
+    print(f"\n{'index':<8}{'k':>4}" + ''.join(f"{c:>17}" for c in columns))
+    print("-" * (12 + 17 * len(columns)))
+    for (index, k), row in table[columns].iterrows():
+        print(f"{index:<8}{k:>4}" + ''.join(f"{row[c]:>17.3f}" for c in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline retrieval metrics (recall@k, MRR, nDCG, citation hits)")
+    parser.add_argument('--index', nargs='+', choices=sorted(INDEXES), default=sorted(INDEXES))
+    parser.add_argument('--backend', choices=['stub', 'chroma'], default='stub',
+                        help="Persisted Chroma stores (chroma_base/chroma_sac) or the stub corpus")
+    parser.add_argument('--embeddings', choices=['local', 'bedrock', 'onnx'], default='local',
+                        help="Query (and stub chunk) embedder; vectors are cached in the results store")
+    parser.add_argument('--onnx-model', help="Model directory for --embeddings onnx (see onnx_embeddings.py)")
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--gold', default=GOLD_CSV)
+    parser.add_argument('--citations', default=CITATIONS_CSV)
+    parser.add_argument('--db')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('label', help="Draft gold chunk ids and citations from the golden set (review before use)")
+    p = sub.add_parser('evaluate', help="Score retrieval against the gold labels")
+    p.add_argument('--k', nargs='+', type=int, default=[1, 3, 5, 10])
+    p.add_argument('--run-id')
+    p.add_argument('--output', help="Per-question metrics CSV")
+    args = parser.parse_args(argv)
+
+    embeddings, model_id = build_embeddings(args.embeddings, args.region, onnx_model=args.onnx_model)
+    cache = EmbeddingCache(embeddings, model_id, args.db)
+    indexes = [load_index(name, args.backend, cache) for name in args.index]
+
+    if args.command == 'label':
+        gold, citations = draft_labels(indexes)
+        gold.to_csv(args.gold, index=False)
+        citations.to_csv(args.citations, index=False)
+        labelled = gold[gold['relevance'] > 0].groupby('index')['Question_ID'].nunique()
+        print(f"✅ Drafted {len(gold[gold['relevance'] > 0])} gold chunk labels -> {args.gold} "
+              f"({', '.join(f'{i}: {n} questions' for i, n in labelled.items()) or 'no matches'})")
+        print(f"✅ {len(citations)} citations over {citations['Question_ID'].nunique()} questions -> {args.citations}")
+        print("Review both files before relying on them.")
+        return 0
+
+    gold, citations = load_gold(args.gold, args.citations)
+    questions = gold.drop_duplicates('Question_ID').set_index('Question_ID')['Question']
+    query_vectors = cache.embed(questions.tolist())
+    results, stale = [], {}
+    for index in indexes:
+        per_question, stale[index.name] = evaluate(index, questions.index, query_vectors, gold, citations, args.k)
+        results.append(per_question)
+
+    import pandas as pd
+    per_question = pd.concat(results, ignore_index=True)
+    summary = summarise(per_question)
+    run_id = args.run_id or datetime.now().strftime('retrieval-%Y%m%d-%H%M%S')
+    store_summary(summary, run_id, args.db)
+    if args.output:
+        per_question.to_csv(args.output, index=False)
+    print(f"\n📊 Retrieval metrics ({args.backend}, {len(questions)} questions, run_id={run_id})")
+    print_summary(summary)
+    print(f"\nEmbedding cache: {cache.hits} hits, {cache.misses} embedded")
+    for name, count in stale.items():
+        if count:
+            print(f"⚠️  {name}: {count} gold labels reference chunk ids not in the index (re-label after re-chunking)")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""
+Judge Self-Consistency Sampling
+Scores each item from several judge samples (temperature > 0) instead of a
+single verdict, aggregated by median or majority vote.
+
+- Samples are drawn in concurrent waves: `first_wave` at once, then `wave`
+  more at a time, up to `k`. An item stops early as soon as its verdicts
+  agree within `tolerance` (max - min), or - for majority vote - as soon as
+  the leading verdict can no longer be overtaken by the remaining samples.
+- Items run concurrently too; every sample goes through the shared
+  resilience layer and judge_parsing (failed/unparseable samples are
+  counted as calls but not as verdicts).
+- variance_report() measures what the extra calls bought by bootstrap:
+  each item's run is replayed from its own verdicts (same waves, same
+  stopping rule, and a fixed-k run for comparison), and the spread of the
+  replayed aggregates is compared with the spread of a single verdict.
+  The textbook 1 - mean(1/n) figure is reported next to it as a model
+  estimate only.
+
+Usage:
+    python self_consistency.py --suite rubric --k 5 --tolerance 0
+    python self_consistency.py --suite quality --k 7 --tolerance 0.25 --aggregate median \\
+        --service bedrock --temperature 0.7
+"""
+
+import argparse
+import json
+import statistics
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import results_store
+from cost_accounting import InstrumentedLLM, UsageLedger, call_context
+from judge_parsing import JudgeParser
+from resilience import invoke_with_retry, is_failure
+from tracing import span
+
+AGGREGATES = ('median', 'majority')
+
+
+class Verdict:
+    """Aggregated score of one item plus the samples behind it"""
+
+    def __init__(self, score, samples, calls, stopped_early):
+        self.score = score
+        self.samples = samples
+        self.calls = calls
+        self.stopped_early = stopped_early
+
+    def __repr__(self):
+        return (f"Verdict(score={self.score}, samples={self.samples}, calls={self.calls}, "
+                f"stopped_early={self.stopped_early})")
+
+
+def aggregate(samples, how='median'):
+    """Median, or the most common verdict (ties broken by the median of the tied values)"""
+    if not samples:
+        return float('nan')
+    if how == 'median':
+        return statistics.median(samples)
+    counts = Counter(samples).most_common()
+    tied = [value for value, n in counts if n == counts[0][1]]
+    return tied[0] if len(tied) == 1 else statistics.median(tied)
+
+
+def settled(samples, k, calls, tolerance=0.0, how='median', min_samples=2):
+    """True once more samples cannot change the verdict enough to matter"""
+    if len(samples) < min_samples:
+        return False
+    if max(samples) - min(samples) <= tolerance:
+        return True
+    if how == 'majority':
+        counts = Counter(samples).most_common(2)
+        runner_up = counts[1][1] if len(counts) > 1 else 0
+        return counts[0][1] - runner_up > k - calls
+    return False
+
+
+# ============================================================
+# Sampling
+# ============================================================
+class SelfConsistencyJudge:
+    """
+    Draws up to `k` verdicts per item from `llm` (which should sample with
+    temperature > 0) and aggregates them with early stopping.
+    """
+
+    def __init__(self, llm, scale, k=5, first_wave=2, wave=1, tolerance=0.0, how='median',
+                 judge_parser=None, max_workers=8):
+        if how not in AGGREGATES:
+            raise ValueError(f"aggregate must be one of {AGGREGATES}, got {how!r}")
+        self.llm = llm
+        self.scale = scale
+        self.k = k
+        self.first_wave = max(1, min(first_wave, k))
+        self.wave = max(1, wave)
+        self.tolerance = tolerance
+        self.how = how
+        self.judge_parser = judge_parser or JudgeParser()
+        self._samples = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_workers = max_workers
+
+    def _sample(self, prompt, template, context):
+        with call_context(**context, stage=f'{template}.sample'):
+            text = invoke_with_retry(self.llm, prompt)
+        return self.judge_parser.parse(text, self.scale, template)
+
+    def judge(self, prompt, template, **context):
+        """One item: sample in waves until the verdicts settle or k calls are spent"""
+        samples, calls = [], 0
+        with span('self_consistency.item', template=template, k=self.k, **context) as s:
+            while calls < self.k:
+                n = min(self.first_wave if calls == 0 else self.wave, self.k - calls)
+                futures = [self._samples.submit(self._sample, prompt, template, context) for _ in range(n)]
+                calls += n
+                samples += [score for score in (f.result() for f in futures) if not is_failure(score)]
+                if settled(samples, self.k, calls, self.tolerance, self.how, min(2, self.k)):
+                    break
+            verdict = Verdict(aggregate(samples, self.how), samples, calls, calls < self.k)
+            s.set_attribute('calls', calls)
+        return verdict
+
+    def judge_many(self, items):
+        """items: [(key, prompt, template, context dict)] -> {key: Verdict}, items scored concurrently"""
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers // self.first_wave)) as pool:
+            futures = {key: pool.submit(self.judge, prompt, template, **context)
+                       for key, prompt, template, context in items}
+            return {key: future.result() for key, future in futures.items()}
+
+    def close(self):
+        self._samples.shutdown(wait=True)
+
+
+# ============================================================
+# Variance Report
+# ============================================================
+def replay(samples, k, tolerance=0.0, how='median', first_wave=2, wave=1, rng=None):
+    """One run re-drawn (with replacement) from an item's verdicts under the same waves and stopping rule: (score, calls)"""
+    import random
+    rng = rng or random.Random()
+    drawn, calls = [], 0
+    while calls < k:
+        n = min(first_wave if calls == 0 else wave, k - calls)
+        drawn += rng.choices(samples, k=n)
+        calls += n
+        if settled(drawn, k, calls, tolerance, how, min(2, k)):
+            break
+    return aggregate(drawn, how), calls
+
+
+def variance_report(verdicts, k, tolerance=0.0, how='median', first_wave=2, wave=1, replays=200, seed=0):
+    """
+    Measured (bootstrap) variance of the early-stopped and fixed-k aggregates
+    against a single verdict, averaged over items. Each item is replayed
+    `replays` times from its own verdicts, so an item that stopped on
+    agreeing verdicts shows no spread in any of the three and only items
+    with spread move the ratios. The pooled sigma^2 is reported as observed
+    (early stopping on agreement pulls it down); model_* fields are the
+    sigma^2 / n estimate (mean-equivalent, ignores the stopping rule).
+    """
+    import random
+    rng = random.Random(seed)
+    verdicts = list(verdicts)
+    multi = [v.samples for v in verdicts if len(v.samples) >= 2]
+    dof = sum(len(s) - 1 for s in multi)
+    sigma2 = sum(statistics.variance(s) * (len(s) - 1) for s in multi) / dof if dof else float('nan')
+    scored = [v for v in verdicts if v.samples]
+    calls = sum(v.calls for v in verdicts) / len(verdicts) if verdicts else float('nan')
+    inv_n = sum(1 / len(v.samples) for v in scored) / len(scored) if scored else float('nan')
+
+    single = stopped = fixed = replay_calls = 0.0
+    for v in scored:
+        runs = [replay(v.samples, k, tolerance, how, first_wave, wave, rng) for _ in range(replays)]
+        single += statistics.pvariance(v.samples)
+        stopped += statistics.pvariance([score for score, _ in runs])
+        fixed += statistics.pvariance([aggregate(rng.choices(v.samples, k=k), how) for _ in range(replays)])
+        replay_calls += sum(n for _, n in runs) / replays
+    n_items = len(scored) or float('nan')
+    reduction = 1 - stopped / single if single else float('nan')
+    fixed_reduction = 1 - fixed / single if single else float('nan')
+    replay_calls /= n_items
+    return {
+        'items': len(verdicts),
+        'k': k,
+        'replays': replays,
+        'calls_per_item': calls,
+        'calls_saved_vs_k': 1 - calls / k if verdicts else float('nan'),
+        'stopped_early': sum(v.stopped_early for v in verdicts) / len(verdicts) if verdicts else float('nan'),
+        'single_call_variance': sigma2,
+        'bootstrap_single_variance': single / n_items,
+        'aggregate_variance': stopped / n_items,
+        'variance_reduction': reduction,
+        'reduction_per_extra_call': reduction / (replay_calls - 1) if replay_calls > 1 else float('nan'),
+        'fixed_k_variance': fixed / n_items,
+        'fixed_k_reduction': fixed_reduction,
+        'fixed_k_reduction_per_extra_call': fixed_reduction / (k - 1) if k > 1 else float('nan'),
+        'model_aggregate_variance': sigma2 * inv_n,
+        'model_variance_reduction': 1 - inv_n,
+        'model_fixed_k_reduction': 1 - 1 / k,
+    }
+
+
+# ============================================================
+# Run (batch_judge prompts -> judge_scores)
+# ============================================================
+def noisy_stub_judge(seed=0, noise=0.8):
+    """Stand-in sampling judge: a per-prompt 'true' verdict plus seeded noise"""
+    import random
+    from batch_judge import _stub_judge
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def respond(prompt):
+        base = float(_stub_judge(prompt))
+        with lock:
+            jitter = rng.gauss(0, noise)
+        if '1-5 scale' in prompt:
+            return str(min(5, max(1, round(base + jitter))))
+        return f"{min(1.0, max(0.0, round((base + jitter / 4) * 4) / 4)):.2f}"
+    return respond
+
+
+def build_judge_llm(service='local', model_id=None, temperature=0.7, region='us-east-1', seed=0):
+    if service == 'bedrock':
+        from langchain_aws import ChatBedrock
+        return ChatBedrock(model_id=model_id, region_name=region,
+                           model_kwargs={'temperature': temperature, 'max_tokens': 16})
+    from stub_backends import StubLLM
+    return StubLLM(responder=noisy_stub_judge(seed), model_id='stub.claude-sonnet', time_scale=0.01, seed=seed)
+
+
+def run(suite='rubric', answers='manual_evaluation_template.csv', k=5, tolerance=0.0, how='median',
+        first_wave=2, wave=1, llm=None, run_id=None, model_id=None, max_workers=8, db_path=None, replays=200):
+    """Self-consistency judge run over batch_judge's suite prompts; returns (verdict rows, report per metric)"""
+    from batch_judge import JUDGE_MODEL_ID, JUDGE_SUITES, load_answers
+    model_id = model_id or JUDGE_MODEL_ID
+    run_id = run_id or datetime.now().strftime(f'judge-sc-{suite}-%Y%m%d-%H%M%S')
+    ledger = UsageLedger(run_id=run_id, db_path=db_path, flush_every=200)
+    judge_llm = InstrumentedLLM(llm or build_judge_llm(model_id=model_id), ledger, kind='judge', model_id=model_id)
+    judge_parser = JudgeParser(run_id)
+    items = load_answers(answers)
+
+    rows, reports = [], {}
+    for metric, template, scale in JUDGE_SUITES[suite]:
+        judge = SelfConsistencyJudge(judge_llm, scale, k, first_wave, wave, tolerance, how,
+                                     judge_parser, max_workers)
+        try:
+            verdicts = judge.judge_many(
+                [((item['pipeline'], item['question_id']), template.format(**item), metric,
+                  {'pipeline': item['pipeline'], 'question_id': item['question_id']}) for item in items])
+        finally:
+            judge.close()
+        reports[metric] = variance_report(verdicts.values(), k, tolerance, how, judge.first_wave, judge.wave, replays)
+        rows += [{'run_id': run_id, 'suite': suite, 'pipeline': pipeline, 'question_id': question_id,
+                  'metric': metric, 'score': v.score, 'source': 'self-consistency',
+                  'raw_response': json.dumps({'samples': v.samples, 'calls': v.calls, 'aggregate': how})}
+                 for (pipeline, question_id), v in verdicts.items()]
+
+    ledger.flush()
+    judge_parser.flush(db_path)
+    conn = results_store.connect(db_path)
+    try:
+        results_store.insert_rows(conn, 'judge_scores', rows)
+    finally:
+        conn.close()
+    return rows, reports
+
+
+def print_report(metric, report):
+    print(f"\n{metric}: {report['items']} items, k={report['k']}")
+    print(f"   Calls per item:           {report['calls_per_item']:.2f} "
+          f"({report['calls_saved_vs_k']:.0%} fewer than k; {report['stopped_early']:.0%} stopped early)")
+    print(f"   Single-verdict variance:  {report['single_call_variance']:.4f} pooled "
+          f"(early stopping on agreement pulls this down)")
+    print(f"   Bootstrap, {report['replays']} replays per item (mean variance per item):")
+    print(f"      single verdict         {report['bootstrap_single_variance']:.4f}")
+    print(f"      early-stopped          {report['aggregate_variance']:.4f} (-{report['variance_reduction']:.0%}), "
+          f"{report['reduction_per_extra_call']:.3f} per extra call")
+    print(f"      fixed k={report['k']:<14} {report['fixed_k_variance']:.4f} (-{report['fixed_k_reduction']:.0%}), "
+          f"{report['fixed_k_reduction_per_extra_call']:.3f} per extra call")
+    print(f"   Model estimate (sigma^2/n, ignores stopping): -{report['model_variance_reduction']:.0%} "
+          f"(fixed k: -{report['model_fixed_k_reduction']:.0%})")
+
+
+def main(argv=None):
+    from batch_judge import JUDGE_MODEL_ID, JUDGE_SUITES
+    parser = argparse.ArgumentParser(description="Self-consistency judge sampling with early stopping")
+    parser.add_argument('--suite', choices=sorted(JUDGE_SUITES), default='rubric')
+    parser.add_argument('--answers', default='manual_evaluation_template.csv')
+    parser.add_argument('--k', type=int, default=5, help="Maximum verdicts per item")
+    parser.add_argument('--first-wave', type=int, default=2, help="Verdicts drawn concurrently before the first check")
+    parser.add_argument('--wave', type=int, default=1, help="Verdicts added per round after that")
+    parser.add_argument('--tolerance', type=float, default=0.0, help="Stop once max - min verdict <= this")
+    parser.add_argument('--aggregate', choices=AGGREGATES, default='median')
+    parser.add_argument('--service', choices=['local', 'bedrock'], default='local')
+    parser.add_argument('--model-id', default=JUDGE_MODEL_ID)
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--temperature', type=float, default=0.7, help="Sampling temperature (bedrock)")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--run-id')
+    parser.add_argument('--seed', type=int, default=0, help="Stub judge noise seed (local)")
+    parser.add_argument('--replays', type=int, default=200, help="Bootstrap replays per item for the variance report")
+    args = parser.parse_args(argv)
+
+    llm = build_judge_llm(args.service, args.model_id, args.temperature, args.region, args.seed)
+    rows, reports = run(args.suite, args.answers, args.k, args.tolerance, args.aggregate, args.first_wave,
+                        args.wave, llm, args.run_id, args.model_id, args.workers, replays=args.replays)
+    print(f"✅ {len(rows)} self-consistent scores written to judge_scores (run_id={rows[0]['run_id'] if rows else '-'})")
+    for metric, report in reports.items():
+        print_report(metric, report)
+
+
+if __name__ == '__main__':
+    main()
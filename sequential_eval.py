@@ -0,0 +1,271 @@
+"""
+Sequential (Adaptive) A/B Evaluation
+Scores paired items (system A vs system B on the same question) in random
+order and stops as soon as the comparison is decided, instead of judging
+the whole suite.
+
+The mean paired difference d = score_A - score_B gets an always-valid
+confidence sequence (predictable plug-in empirical Bernstein, Waudby-Smith
+& Ramdas 2023): it holds simultaneously at every sample size, so checking
+after every batch and stopping early keeps the error rate at alpha.
+
+Decisions:
+- 'A'/'B'    the interval excludes 0 (significant winner)
+- 'tie'      the interval lies inside (-margin, +margin) (provably equivalent)
+- 'undecided' the items ran out first
+
+Usage:
+    python sequential_eval.py replay --run-id llm-judge-claude45 --a SAC-RAG --b "Base RAG" \\
+        --metric average --range 0 10
+    python sequential_eval.py live --suite rubric --a SAC-RAG --b "Generic Claude" --margin 0.25
+"""
+
+import argparse
+import math
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import results_store
+from resilience import is_failure
+from tracing import span
+
+
+# ============================================================
+# Confidence Sequence
+# ============================================================
+class ConfidenceSequence:
+    """
+    Always-valid two-sided CI for the mean of observations in [low, high]
+    (PrPl-EB). Update with each observation; lo/hi only ever shrink.
+    """
+
+    def __init__(self, alpha=0.05, low=0.0, high=1.0, max_lambda=0.5):
+        self.alpha = alpha
+        self.low = low
+        self.span = high - low
+        self.max_lambda = max_lambda
+        self.n = 0
+        self._sum_x = 0.0
+        self._sum_sq = 0.0
+        self._mean_prev = 0.5           # mu_hat_{t-1}, regularised
+        self._var_prev = 0.25           # sigma_hat^2_{t-1}, regularised
+        self._sum_lambda = 0.0
+        self._sum_lambda_x = 0.0
+        self._sum_penalty = 0.0
+        self._lo, self._hi = 0.0, 1.0
+
+    def update(self, value):
+        x = (value - self.low) / self.span
+        if not 0.0 <= x <= 1.0:
+            raise ValueError(f"{value} outside [{self.low}, {self.low + self.span}]")
+        self.n += 1
+        t = self.n
+        log_term = math.log(2 / self.alpha)
+        lam = min(math.sqrt(2 * log_term / (self._var_prev * t * math.log(t + 1))), self.max_lambda)
+        self._sum_lambda += lam
+        self._sum_lambda_x += lam * x
+        self._sum_penalty += (x - self._mean_prev) ** 2 * (-math.log(1 - lam) - lam)   # v_t * psi_E(lambda_t)
+
+        self._sum_x += x
+        mean = (0.5 + self._sum_x) / (t + 1)
+        self._sum_sq += (x - mean) ** 2
+        self._var_prev = (0.25 + self._sum_sq) / (t + 1)
+        self._mean_prev = mean
+
+        center = self._sum_lambda_x / self._sum_lambda
+        width = (log_term + self._sum_penalty) / self._sum_lambda
+        self._lo = max(self._lo, center - width)
+        self._hi = min(self._hi, center + width)
+
+    @property
+    def mean(self):
+        return self.low + self.span * (self._sum_x / self.n) if self.n else float('nan')
+
+    @property
+    def interval(self):
+        return self.low + self.span * self._lo, self.low + self.span * self._hi
+
+
+def decide(interval, margin=0.0):
+    lo, hi = interval
+    if lo > 0:
+        return 'A'
+    if hi < 0:
+        return 'B'
+    if margin > 0 and -margin < lo and hi < margin:
+        return 'tie'
+    return None
+
+
+# ============================================================
+# Sequential Runner
+# ============================================================
+def run_sequential(items, score_pair, score_range, alpha=0.05, margin=0.0, batch_size=4, seed=42,
+                   max_items=None, workers=4):
+    """
+    Score `items` in seeded random order with score_pair(item) -> (a, b) and
+    stop once decide() returns a verdict. Pairs with a failed score are
+    skipped. Batches of `batch_size` items are judged concurrently.
+    """
+    low, high = score_range
+    order = list(items)
+    random.Random(seed).shuffle(order)
+    if max_items:
+        order = order[:max_items]
+    cs = ConfidenceSequence(alpha, low - high, high - low)
+    scored, decision, history = [], None, []
+    with span('sequential.run', items=len(order), alpha=alpha, margin=margin), \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            for item, (a, b) in zip(batch, pool.map(score_pair, batch)):
+                if is_failure(a) or is_failure(b):
+                    continue
+                cs.update(a - b)
+                scored.append((item, a, b))
+            if cs.n:
+                history.append((start + len(batch), cs.n, *cs.interval))
+                decision = decide(cs.interval, margin)
+            if decision:
+                break
+    lo, hi = cs.interval if cs.n else (float('nan'), float('nan'))
+    return {
+        'decision': decision or 'undecided',
+        'items_judged': start + len(batch) if order else 0,
+        'pairs_scored': cs.n,
+        'items_total': len(order),
+        'mean_diff': cs.mean,
+        'ci_low': lo,
+        'ci_high': hi,
+        'history': history,
+        'scored': scored,
+    }
+
+
+# ============================================================
+# Score Sources
+# ============================================================
+def replay_items(run_id, pipeline_a, pipeline_b, metric, db_path=None):
+    """{question_id: (score_a, score_b)} from an existing judge_scores run"""
+    df = results_store.query("""
+        SELECT question_id, pipeline, AVG(score) AS score FROM judge_scores
+        WHERE run_id = ? AND metric = ? AND pipeline IN (?, ?) AND score IS NOT NULL
+        GROUP BY question_id, pipeline""", (run_id, metric, pipeline_a, pipeline_b), db_path)
+    wide = df.pivot(index='question_id', columns='pipeline', values='score').dropna()
+    if wide.empty:
+        return {}
+    return {qid: (row[pipeline_a], row[pipeline_b]) for qid, row in wide.iterrows()}
+
+
+def live_scorer(suite, pipeline_a, pipeline_b, answers, judge_parser, judge_llm):
+    """(items, score_pair) that judge both pipelines' answers with the suite's first metric"""
+    from batch_judge import JUDGE_SUITES, load_answers
+    from cost_accounting import call_context
+    from resilience import invoke_with_retry
+    metric, template, scale = JUDGE_SUITES[suite][0]
+    by_question = {}
+    for item in load_answers(answers):
+        by_question.setdefault(item['question_id'], {})[item['pipeline']] = item
+    items = [qid for qid, pipelines in by_question.items() if pipeline_a in pipelines and pipeline_b in pipelines]
+
+    def score(question_id, pipeline):
+        with call_context(pipeline=pipeline, question_id=question_id, stage=metric):
+            text = invoke_with_retry(judge_llm, template.format(**by_question[question_id][pipeline]))
+        return judge_parser.parse(text, scale, metric)
+
+    def score_pair(question_id):
+        return score(question_id, pipeline_a), score(question_id, pipeline_b)
+    return items, score_pair, metric, (scale.low, scale.high)
+
+
+def store_scores(result, run_id, suite, metric, pipeline_a, pipeline_b, db_path=None):
+    rows = [{'run_id': run_id, 'suite': suite, 'pipeline': pipeline, 'question_id': qid, 'metric': metric,
+             'score': score, 'source': 'sequential'}
+            for qid, a, b in result['scored'] for pipeline, score in ((pipeline_a, a), (pipeline_b, b))]
+    conn = results_store.connect(db_path)
+    try:
+        results_store.insert_rows(conn, 'judge_scores', rows)
+    finally:
+        conn.close()
+
+
+# ============================================================
+# CLI
+# ============================================================
+def print_result(result, pipeline_a, pipeline_b, alpha):
+    winner = {'A': pipeline_a, 'B': pipeline_b}.get(result['decision'])
+    print(f"\n📊 Sequential comparison: {pipeline_a} (A) vs {pipeline_b} (B), alpha={alpha}")
+    print("="*60)
+    print(f"Decision:        {winner + ' wins' if winner else result['decision']}")
+    print(f"Items judged:    {result['items_judged']}/{result['items_total']} "
+          f"({1 - result['items_judged'] / max(result['items_total'], 1):.0%} of the suite skipped)")
+    print(f"Mean A - B:      {result['mean_diff']:+.3f}")
+    print(f"{1 - alpha:.0%} always-valid CI: [{result['ci_low']:+.3f}, {result['ci_high']:+.3f}]")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sequential A/B evaluation with always-valid confidence sequences")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    replay = sub.add_parser('replay', help="Replay an existing judge_scores run: how early could it have stopped?")
+    replay.add_argument('--run-id', required=True)
+    replay.add_argument('--a', required=True, help="Pipeline A")
+    replay.add_argument('--b', required=True, help="Pipeline B")
+    replay.add_argument('--metric', default='rubric')
+    replay.add_argument('--range', nargs=2, type=float, default=(1, 5), metavar=('LOW', 'HIGH'), help="Score range")
+
+    live = sub.add_parser('live', help="Judge pairs until the comparison is decided")
+    live.add_argument('--suite', default='rubric')
+    live.add_argument('--a', default='SAC-RAG')
+    live.add_argument('--b', default='Generic Claude')
+    live.add_argument('--answers', default='manual_evaluation_template.csv')
+    live.add_argument('--service', choices=['local', 'bedrock'], default='local')
+    live.add_argument('--model-id')
+    live.add_argument('--run-id')
+    live.add_argument('--workers', type=int, default=4)
+
+    for p in (replay, live):
+        p.add_argument('--alpha', type=float, default=0.05)
+        p.add_argument('--margin', type=float, default=0.0,
+                       help="Equivalence margin: stop as a tie once the CI lies within +/- margin")
+        p.add_argument('--batch-size', type=int, default=4, help="Items judged concurrently between checks")
+        p.add_argument('--seed', type=int, default=42)
+        p.add_argument('--max-items', type=int)
+        p.add_argument('--db')
+    args = parser.parse_args(argv)
+
+    if args.command == 'replay':
+        scores = replay_items(args.run_id, args.a, args.b, args.metric, args.db)
+        if not scores:
+            print(f"No paired '{args.metric}' scores for {args.a} / {args.b} in run {args.run_id}")
+            return 1
+        result = run_sequential(list(scores), scores.get, tuple(args.range), args.alpha, args.margin,
+                                args.batch_size, args.seed, args.max_items, workers=1)
+        print_result(result, args.a, args.b, args.alpha)
+        return 0
+
+    from batch_judge import JUDGE_MODEL_ID
+    from cost_accounting import InstrumentedLLM, UsageLedger
+    from judge_parsing import JudgeParser
+    from self_consistency import build_judge_llm
+    model_id = args.model_id or JUDGE_MODEL_ID
+    run_id = args.run_id or datetime.now().strftime(f'judge-seq-{args.suite}-%Y%m%d-%H%M%S')
+    ledger = UsageLedger(run_id=run_id, db_path=args.db)
+    judge_llm = InstrumentedLLM(build_judge_llm(args.service, model_id, seed=args.seed), ledger,
+                                kind='judge', model_id=model_id)
+    judge_parser = JudgeParser(run_id)
+    items, score_pair, metric, score_range = live_scorer(args.suite, args.a, args.b, args.answers,
+                                                         judge_parser, judge_llm)
+    result = run_sequential(items, score_pair, score_range, args.alpha, args.margin, args.batch_size,
+                            args.seed, args.max_items, args.workers)
+    ledger.flush()
+    judge_parser.flush(args.db)
+    store_scores(result, run_id, args.suite, metric, args.a, args.b, args.db)
+    print_result(result, args.a, args.b, args.alpha)
+    print(f"Judge calls:     {2 * result['items_judged']} (full suite: {2 * result['items_total']}); run_id={run_id}")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+"""
+Sharded Vector Index with Scatter-Gather Search
+Partitions a collection into shards, serves each shard from its own process
+(or machine), and answers a query by asking every shard for its local top k
+and merging the results.
+
+- Partitioning: by document hash (even spread) or by document type
+  (statutes / Constitution / judgments on separate shards, judgments further
+  hashed when there are more shards than types).
+- Every shard is a small TCP server (`serve`) speaking length-prefixed JSON
+  frames with raw float32 query payloads - no pickle on the wire. Locally,
+  spawn_local() starts one server process per shard on an ephemeral port;
+  across machines, run `serve` on each node and pass the addresses.
+- Each shard searches with filtered_search.FilteredSearcher, so metadata
+  `where` filters are applied inside every shard before its top k.
+- ShardedIndex.search() scatters a batch of queries to all shards in
+  parallel, waits at most `timeout` per shard, and merges the per-shard top
+  k; shards that time out or fail are reported in `missing` and the answer
+  is built from the rest.
+
+Usage:
+    python sharded_index.py bench --chunks 50000 --shards 1 2 4 --concurrency 8
+    python sharded_index.py split --index base --shards 4 --by doc_type --output-dir shards/
+    python sharded_index.py serve shards/shard_0.npz --port 7001          # on each node
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import statistics
+import struct
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+from tracing import span
+
+_FRAME = struct.Struct('!II')       # header bytes, payload bytes
+DEFAULT_TIMEOUT = 2.0
+DOC_TYPE_ORDER = ('judgment', 'statute', 'constitution')
+
+
+# ============================================================
+# Partitioning
+# ============================================================
+def _hash_shard(key, shards):
+    return int.from_bytes(hashlib.sha1(str(key).encode('utf-8')).digest()[:8], 'big') % shards
+
+
+def assign_shards(metadatas, shards, by='hash', ids=None):
+    """
+    Shard number per chunk. 'hash' spreads documents evenly (all chunks of a
+    document stay together); 'doc_type' gives each document type its own
+    shard range, split by document hash within it.
+    """
+    keys = [meta.get('doc_id', ids[i] if ids is not None else i) for i, meta in enumerate(metadatas)]
+    if by == 'hash':
+        return [_hash_shard(key, shards) for key in keys]
+    types = sorted({meta.get('doc_type', 'unknown') for meta in metadatas},
+                   key=lambda t: DOC_TYPE_ORDER.index(t) if t in DOC_TYPE_ORDER else len(DOC_TYPE_ORDER))
+    if shards < len(types):
+        raise ValueError(f"{len(types)} document types need at least {len(types)} shards (got {shards})")
+    # largest type (judgments) gets the spare shards
+    ranges, start = {}, 0
+    for i, doc_type in enumerate(types):
+        width = shards - len(types) + 1 if i == 0 else 1
+        ranges[doc_type] = (start, width)
+        start += width
+    return [ranges[meta.get('doc_type', 'unknown')][0] + _hash_shard(key, ranges[meta.get('doc_type', 'unknown')][1])
+            for meta, key in zip(metadatas, keys)]
+
+
+def shard_metadata(index):
+    """
+    Per-chunk metadata for partitioning, from the collection's own metadata:
+    doc_id falls back to the source/title (then the chunk id) and doc_type
+    to legal_chunker.classify() on the chunk text when the store lacks them
+    """
+    from legal_chunker import classify
+    metadatas = []
+    for chunk_id, text, meta in zip(index.ids, index.texts, index.metadatas):
+        meta = dict(meta or {})
+        meta.setdefault('doc_id', meta.get('source') or meta.get('title') or chunk_id)
+        meta.setdefault('doc_type', classify(str(text)))
+        metadatas.append(meta)
+    return metadatas
+
+
+def save_shard(path, ids, vectors, metadatas):
+    import numpy as np
+    np.savez(path, ids=np.asarray(ids, dtype=str), vectors=np.asarray(vectors, dtype=np.float32),
+             metadata=np.asarray(json.dumps(metadatas)))
+
+
+def load_shard(path):
+    import numpy as np
+    with np.load(path) as data:
+        return data['ids'].tolist(), data['vectors'], json.loads(str(data['metadata']))
+
+
+def split(ids, vectors, metadatas, shards, by='hash', output_dir='shards'):
+    """Write shard_<n>.npz files; returns their paths"""
+    import numpy as np
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    assignment = np.asarray(assign_shards(metadatas, shards, by, ids))
+    paths = []
+    for shard in range(shards):
+        rows = np.flatnonzero(assignment == shard)
+        path = output_dir / f'shard_{shard}.npz'
+        save_shard(path, [ids[i] for i in rows], vectors[rows], [metadatas[i] for i in rows])
+        paths.append(path)
+    return paths
+
+
+# ============================================================
+# Wire Protocol
+# ============================================================
+def send_frame(sock, header, payload=b''):
+    head = json.dumps(header).encode('utf-8')
+    sock.sendall(_FRAME.pack(len(head), len(payload)) + head + payload)
+
+
+def _recv_exact(sock, n):
+    chunks, remaining = [], n
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("shard closed the connection")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(sock):
+    head_len, payload_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = json.loads(_recv_exact(sock, head_len))
+    return header, _recv_exact(sock, payload_len) if payload_len else b''
+
+
+# ============================================================
+# Shard Server
+# ============================================================
+class ShardServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, shard_path, delay_ms=0, hnsw=False):
+        from filtered_search import FilteredSearcher, build_hnsw
+        self.ids, vectors, metadatas = load_shard(shard_path)
+        self.searcher = FilteredSearcher(vectors, metadatas, build_hnsw(vectors) if hnsw and len(vectors) else None)
+        self.delay_ms = delay_ms
+        self.shard_path = str(shard_path)
+        super().__init__(address, _ShardHandler)
+
+
+class _ShardHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        import numpy as np
+        server = self.server
+        while True:
+            try:
+                header, payload = recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            op = header.get('op')
+            if op == 'info':
+                send_frame(self.request, {'chunks': len(server.ids), 'path': server.shard_path,
+                                          'bytes': int(server.searcher.vectors.nbytes), 'pid': os.getpid()})
+            elif op == 'search':
+                if server.delay_ms:
+                    time.sleep(server.delay_ms / 1000)
+                queries = np.frombuffer(payload, dtype=np.float32).reshape(header['n'], header['dim'])
+                ids, scores = [], []
+                for query in queries:
+                    rows, row_scores = server.searcher.search(query, header['k'], header.get('where'))
+                    ids.append([server.ids[r] for r in rows])
+                    scores.append([float(s) for s in row_scores])
+                send_frame(self.request, {'ids': ids, 'scores': scores})
+            elif op == 'shutdown':
+                send_frame(self.request, {'ok': True})
+                threading.Thread(target=server.shutdown, daemon=True).start()
+                return
+            else:
+                send_frame(self.request, {'error': f"unknown op {op!r}"})
+
+
+def serve(shard_path, host='127.0.0.1', port=0, ready=None, delay_ms=0, hnsw=False):
+    """Serve one shard until shut down; `ready` (a Queue) receives the bound port"""
+    with ShardServer((host, port), shard_path, delay_ms, hnsw) as server:
+        if ready is not None:
+            ready.put(server.server_address[1])
+        server.serve_forever()
+
+
+def spawn_local(shard_paths, delays_ms=None, hnsw=False):
+    """One server process per shard on localhost; returns ([(host, port)], processes)"""
+    import multiprocessing
+    ctx = multiprocessing.get_context('spawn')
+    delays_ms = delays_ms or {}
+    processes, addresses = [], []
+    for i, path in enumerate(shard_paths):
+        ready = ctx.Queue()
+        process = ctx.Process(target=serve, args=(str(path), '127.0.0.1', 0, ready, delays_ms.get(i, 0), hnsw),
+                              daemon=True)
+        process.start()
+        processes.append((process, ready))
+    for process, ready in processes:
+        addresses.append(('127.0.0.1', ready.get(timeout=60)))
+    return addresses, [p for p, _ in processes]
+
+
+# ============================================================
+# Scatter-Gather Client
+# ============================================================
+class SearchResult:
+    """Merged top k per query plus the shards that did not answer in time"""
+
+    def __init__(self, ids, scores, missing):
+        self.ids = ids
+        self.scores = scores
+        self.missing = missing
+
+    def __repr__(self):
+        return f"SearchResult(queries={len(self.ids)}, missing={self.missing})"
+
+
+class ShardedIndex:
+    """
+    Client for a set of shard servers. Thread-safe: each calling thread keeps
+    its own connection per shard; a connection that times out is dropped
+    (its late reply would desynchronise the stream) and reopened next time.
+    """
+
+    def __init__(self, addresses, timeout=DEFAULT_TIMEOUT, max_workers=None):
+        self.addresses = [tuple(a) for a in addresses]
+        self.timeout = timeout
+        self._local = threading.local()
+        self._open = set()            # every thread's connections, so close() reaches the pool threads' too
+        self._open_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or 4 * len(self.addresses))
+
+    def _connection(self, shard):
+        connections = self._local.__dict__.setdefault('connections', {})
+        if shard not in connections:
+            conn = socket.create_connection(self.addresses[shard], timeout=self.timeout)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._open_lock:
+                self._open.add(conn)
+            connections[shard] = conn
+        return connections[shard]
+
+    def _drop(self, shard):
+        conn = getattr(self._local, 'connections', {}).pop(shard, None)
+        if conn is not None:
+            with self._open_lock:
+                self._open.discard(conn)
+            conn.close()
+
+    def _call(self, shard, header, payload=b''):
+        try:
+            conn = self._connection(shard)
+            send_frame(conn, header, payload)
+            reply, _ = recv_frame(conn)
+        except (OSError, ConnectionError):
+            self._drop(shard)
+            raise
+        if 'error' in reply:
+            raise RuntimeError(f"shard {shard}: {reply['error']}")
+        return reply
+
+    def info(self):
+        return [self._call(shard, {'op': 'info'}) for shard in range(len(self.addresses))]
+
+    def search(self, queries, k=5, where=None):
+        """queries: (n, d) or (d,) float array -> SearchResult with n merged top-k lists"""
+        import heapq
+        import numpy as np
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        header = {'op': 'search', 'k': k, 'n': len(queries), 'dim': queries.shape[1], 'where': where}
+        payload = queries.tobytes()
+        with span('shards.search', shards=len(self.addresses), queries=len(queries), k=k):
+            futures = {self._pool.submit(self._call, shard, header, payload): shard
+                       for shard in range(len(self.addresses))}
+            done, pending = wait(futures, timeout=self.timeout)
+        replies, missing = [], [futures[f] for f in pending]
+        for future in done:
+            try:
+                replies.append(future.result())
+            except (OSError, ConnectionError, RuntimeError):
+                missing.append(futures[future])
+        ids, scores = [], []
+        for q in range(len(queries)):
+            merged = heapq.nlargest(k, ((s, i) for reply in replies
+                                        for i, s in zip(reply['ids'][q], reply['scores'][q])))
+            ids.append([i for _, i in merged])
+            scores.append([s for s, _ in merged])
+        return SearchResult(ids, scores, sorted(missing))
+
+    def shutdown_shards(self):
+        for shard in range(len(self.addresses)):
+            try:
+                self._call(shard, {'op': 'shutdown'})
+            except (OSError, ConnectionError, RuntimeError):
+                pass
+            self._drop(shard)
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        with self._open_lock:
+            connections, self._open = self._open, set()
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)     # wakes a pool thread still blocked in recv
+            except OSError:
+                pass
+            conn.close()
+        self._local = threading.local()
+
+
+# ============================================================
+# Benchmark
+# ============================================================
+def benchmark(chunks, shard_counts, queries=200, k=5, concurrency=8, by='hash', dimensions=256, slow_shard_ms=0,
+              timeout=DEFAULT_TIMEOUT, workdir='shards_bench', seed=0):
+    """QPS, latency and agreement with exact single-index search per shard count"""
+    import numpy as np
+    from filtered_search import synthetic_corpus
+    vectors, metadatas = synthetic_corpus(chunks, dimensions, seed)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f'c{i}' for i in range(chunks)]
+    rng = np.random.default_rng(seed + 1)
+    qs = vectors[rng.integers(0, chunks, queries)] + 0.3 * rng.standard_normal((queries, dimensions)).astype(np.float32)
+    qs /= np.linalg.norm(qs, axis=1, keepdims=True)
+    exact = np.argsort(-(qs @ vectors.T), axis=1)[:, :k]
+
+    rows = []
+    for shards in shard_counts:
+        paths = split(ids, vectors, metadatas, shards, by, Path(workdir) / f'{shards}')
+        addresses, processes = spawn_local(paths, {0: slow_shard_ms} if slow_shard_ms else None)
+        index = ShardedIndex(addresses, timeout=timeout)
+        try:
+            index.search(qs[:1], k)                                 # open connections / warm up
+            latencies, agree, partial = [], [], 0
+
+            def one(q):
+                start = time.perf_counter()
+                result = index.search(qs[q], k)
+                return q, (time.perf_counter() - start) * 1000, result
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for q, ms, result in pool.map(one, range(queries)):
+                    latencies.append(ms)
+                    partial += bool(result.missing)
+                    agree.append(len(set(result.ids[0]) & {ids[i] for i in exact[q]}) / k)
+            elapsed = time.perf_counter() - start
+            sizes = [info['chunks'] for info in index.info()]
+            rows.append({'shards': shards, 'qps': queries / elapsed, 'p50_ms': statistics.median(latencies),
+                         'p95_ms': float(np.percentile(latencies, 95)), 'recall_vs_exact': statistics.mean(agree),
+                         'partial_answers': partial, 'chunks_per_shard': sizes})
+        finally:
+            index.shutdown_shards()
+            index.close()
+            for process in processes:
+                process.join(timeout=5)
+    return rows
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded vector index with scatter-gather search")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('split', help="Partition an index into shard files")
+    p.add_argument('--index', default='base')
+    p.add_argument('--backend', choices=['stub', 'chroma'], default='stub')
+    p.add_argument('--shards', type=int, default=4)
+    p.add_argument('--by', choices=['hash', 'doc_type'], default='hash')
+    p.add_argument('--output-dir', default='shards')
+
+    p = sub.add_parser('serve', help="Serve one shard file over TCP (one per node/process)")
+    p.add_argument('shard')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=7001)
+    p.add_argument('--hnsw', action='store_true', help="Build an HNSW graph for the shard (hnswlib)")
+
+    p = sub.add_parser('bench', help="Scatter-gather throughput vs shard count (local processes)")
+    p.add_argument('--chunks', type=int, default=50000)
+    p.add_argument('--shards', nargs='+', type=int, default=[1, 2, 4])
+    p.add_argument('--queries', type=int, default=200)
+    p.add_argument('--k', type=int, default=5)
+    p.add_argument('--concurrency', type=int, default=8)
+    p.add_argument('--by', choices=['hash', 'doc_type'], default='hash')
+    p.add_argument('--dimensions', type=int, default=256)
+    p.add_argument('--slow-shard-ms', type=int, default=0, help="Delay shard 0 to exercise the per-shard timeout")
+    p.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    p.add_argument('--workdir', default='shards_bench')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        print(f"Serving {args.shard} on {args.host}:{args.port}")
+        serve(args.shard, args.host, args.port, hnsw=args.hnsw)
+        return 0
+
+    if args.command == 'split':
+        from retrieval_eval import EmbeddingCache, build_embeddings, load_index
+        embeddings, model_id = build_embeddings()
+        index = load_index(args.index, args.backend, EmbeddingCache(embeddings, model_id))
+        metadatas = shard_metadata(index)
+        paths = split(list(index.ids), index.vectors, metadatas, args.shards, args.by, args.output_dir)
+        print(f"✅ {len(index)} chunks -> {len(paths)} shards in {args.output_dir}/")
+        for path in paths:
+            _, _, shard_meta = load_shard(path)
+            types = Counter(meta['doc_type'] for meta in shard_meta)
+            print(f"   {path.name}: {len(shard_meta)} chunks, {len({m['doc_id'] for m in shard_meta})} documents "
+                  f"({', '.join(f'{t} {n}' for t, n in sorted(types.items())) or 'empty'})")
+        return 0
+
+    rows = benchmark(args.chunks, args.shards, args.queries, args.k, args.concurrency, args.by, args.dimensions,
+                     args.slow_shard_ms, args.timeout, args.workdir)
+    print(f"\n📊 Scatter-gather: {args.chunks} chunks, {args.queries} queries, k={args.k}, "
+          f"concurrency {args.concurrency} ({os.cpu_count()} cores)")
+    print(f"{'shards':>7}{'QPS':>9}{'p50 ms':>9}{'p95 ms':>9}{'recall':>8}{'partial':>9}  chunks/shard")
+    for r in rows:
+        print(f"{r['shards']:>7}{r['qps']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['recall_vs_exact']:>8.2f}"
+              f"{r['partial_answers']:>9}  {r['chunks_per_shard']}")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
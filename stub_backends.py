@@ -0,0 +1,243 @@
+"""
+Stub Backends for Offline Runs
+Local stand-ins for AWS Bedrock (Claude), Titan embeddings and the Chroma
+vector store. They expose the same methods the pipelines call on the real
+LangChain objects (invoke, embed_query, embed_documents,
+similarity_search_by_vector) and sleep for a sampled latency so benchmarks
+and dry runs behave like the real thing without AWS credentials.
+"""
+
+import hashlib
+import random
+import threading
+import time
+
+import numpy as np
+
+from cost_accounting import estimate_tokens
+
+# ============================================================
+# Latency Profile (seconds, median / spread of a lognormal)
+# ============================================================
+# Medians are rough observations from the Bedrock us-east-1 runs; spread is
+# the lognormal sigma, which controls how heavy the tail is.
+DEFAULT_LATENCY_PROFILE = {
+    'embedding': (0.12, 0.35),
+    'vector_search': (0.008, 0.25),
+    'generation': (2.6, 0.30),
+}
+
+TITAN_DIMENSIONS = 1024
+
+
+def sample_latency(profile, key, rng, time_scale=1.0):
+    """Draw one latency (in seconds) for a stage from the profile"""
+    median, sigma = profile[key]
+    return float(rng.lognormvariate(np.log(median), sigma)) * time_scale
+
+
+class _Latency:
+    """Thread-safe latency sampler shared by the stub backends"""
+
+    def __init__(self, profile=None, time_scale=1.0, seed=None):
+        self.profile = dict(DEFAULT_LATENCY_PROFILE)
+        if profile:
+            self.profile.update(profile)
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self, key):
+        with self._lock:
+            delay = sample_latency(self.profile, key, self._rng, self.time_scale)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+# ============================================================
+# LLM Stub (mimics ChatBedrock)
+# ============================================================
+class StubMessage:
+    """Minimal AIMessage look-alike (content + usage_metadata)"""
+
+    def __init__(self, content, input_tokens=0, output_tokens=0):
+        self.content = content
+        self.usage_metadata = {
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'total_tokens': input_tokens + output_tokens,
+        }
+
+
+class StubLLM:
+    """Stand-in for ChatBedrock: sleeps, then returns a canned answer"""
+
+    def __init__(self, responder=None, model_id='stub.claude-sonnet',
+                 profile=None, time_scale=1.0, seed=None, output_tokens=350):
+        self.model_id = model_id
+        self.responder = responder
+        self.output_tokens = output_tokens
+        self._latency = _Latency(profile, time_scale, seed)
+
+    def invoke(self, prompt):
+        self._latency.sleep('generation')
+        text = prompt if isinstance(prompt, str) else str(prompt)
+        if self.responder is not None:
+            content = self.responder(text)
+        else:
+            content = "Under the laws of Kenya, " + ("the answer follows. " * (self.output_tokens // 4))
+        return StubMessage(content, estimate_tokens(text), estimate_tokens(content))
+
+
+class StubClientError(Exception):
+    """Shaped like botocore.exceptions.ClientError (response['Error']['Code'])"""
+
+    def __init__(self, code, message=''):
+        super().__init__(f"An error occurred ({code}): {message}")
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class FaultInjectingLLM:
+    """
+    Wraps an LLM and injects Bedrock-style faults: throttling, transient 5xx
+    errors and slow responses, at the given rates (seeded, reproducible).
+    """
+
+    def __init__(self, llm, throttle_rate=0.0, error_rate=0.0, slow_rate=0.0, slow_factor=10.0,
+                 seed=None, model_id=None):
+        self.llm = llm
+        self.model_id = model_id or getattr(llm, 'model_id', 'stub.faulty')
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.calls = 0
+        self.injected = {'throttled': 0, 'error': 0, 'slow': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt):
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+        if roll < self.throttle_rate:
+            self.injected['throttled'] += 1
+            raise StubClientError('ThrottlingException', 'Too many requests, please wait before trying again.')
+        if roll < self.throttle_rate + self.error_rate:
+            self.injected['error'] += 1
+            raise StubClientError('ServiceUnavailableException', 'Service unavailable')
+        if roll < self.throttle_rate + self.error_rate + self.slow_rate:
+            self.injected['slow'] += 1
+            start = time.perf_counter()
+            response = self.llm.invoke(prompt)
+            time.sleep((time.perf_counter() - start) * (self.slow_factor - 1))
+            return response
+        return self.llm.invoke(prompt)
+
+
+# ============================================================
+# Embedding Stub (mimics BedrockEmbeddings / Titan v2)
+# ============================================================
+def hashed_vector(text, dimensions=TITAN_DIMENSIONS):
+    """Deterministic unit vector derived from the text (same text -> same vector)"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vec = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class StubEmbeddings:
+    """
+    Stand-in for BedrockEmbeddings: hashed vectors after a sampled delay.
+    Titan v2 embeds one text per InvokeModel and BedrockEmbeddings loops over
+    them, so embed_documents sleeps once per text; batch_api=True models an
+    endpoint that embeds a whole list in one call instead.
+    """
+
+    def __init__(self, dimensions=TITAN_DIMENSIONS, profile=None, time_scale=1.0, seed=None, batch_api=False):
+        self.dimensions = dimensions
+        self.batch_api = batch_api
+        self._latency = _Latency(profile, time_scale, seed)
+
+    def embed_query(self, text):
+        self._latency.sleep('embedding')
+        return hashed_vector(text, self.dimensions).tolist()
+
+    def embed_documents(self, texts):
+        for _ in range(1 if self.batch_api else len(texts)):
+            self._latency.sleep('embedding')
+        return [hashed_vector(t, self.dimensions).tolist() for t in texts]
+
+
+# ============================================================
+# Vector Store Stub (mimics langchain Chroma)
+# ============================================================
+class StubDocument:
+    """Minimal langchain Document look-alike"""
+
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+class StubVectorStore:
+    """Brute-force cosine search over an in-memory matrix (optionally metadata pre-filtered)"""
+
+    def __init__(self, texts, metadatas=None, dimensions=TITAN_DIMENSIONS,
+                 profile=None, time_scale=1.0, seed=None):
+        metadatas = metadatas or [{} for _ in texts]
+        self.documents = [StubDocument(t, m) for t, m in zip(texts, metadatas)]
+        self.matrix = np.vstack([hashed_vector(t, dimensions) for t in texts]) if texts else \
+            np.zeros((0, dimensions), dtype=np.float32)
+        self._latency = _Latency(profile, time_scale, seed)
+        self._postings = None
+
+    def _candidates(self, filter):
+        """Row ids matching a Chroma-style `where` (None = every row)"""
+        if not filter:
+            return None
+        if self._postings is None:
+            from filtered_search import PostingIndex
+            self._postings = PostingIndex([doc.metadata for doc in self.documents])
+        return self._postings.rows(filter)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=5, filter=None):
+        self._latency.sleep('vector_search')
+        rows = self._candidates(filter)
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if len(matrix) == 0:
+            return []
+        scores = matrix @ np.asarray(embedding, dtype=np.float32)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = top if rows is None else rows[top]
+        return [(self.documents[i], float(s)) for i, s in zip(ids, scores[top])]
+
+    def similarity_search_by_vector(self, embedding, k=5, filter=None):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+
+    def similarity_search_by_vectors(self, embeddings, k=5, filter=None, with_scores=False):
+        """One search round-trip for a batch of query vectors, like Chroma's collection.query (micro_batching)"""
+        self._latency.sleep('vector_search')
+        rows = self._candidates(filter)
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if len(matrix) == 0:
+            return [[] for _ in embeddings]
+        scores = np.asarray(embeddings, dtype=np.float32) @ matrix.T
+        k = min(k, matrix.shape[0])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+        ids = top if rows is None else rows[top]
+        if with_scores:
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            return [[(self.documents[i], float(score)) for i, score in zip(row, row_scores)]
+                    for row, row_scores in zip(ids, top_scores)]
+        return [[self.documents[i] for i in row] for row in ids]
+
+
+def chunk_text(text, chunk_size=1000, chunk_overlap=200):
+    """Fixed-window splitter matching the 1000/200 RecursiveCharacterTextSplitter setup"""
+    text = str(text)
+    step = max(1, chunk_size - chunk_overlap)
+    return [text[i:i + chunk_size] for i in range(0, max(len(text) - chunk_overlap, 1), step)]
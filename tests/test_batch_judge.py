@@ -0,0 +1,86 @@
+"""Batch judging round trip through LocalBatchService: job file, submit, poll, ingest, re-ask"""
+
+import json
+import re
+from pathlib import Path
+
+import pytest
+
+import results_store
+from batch_judge import (BatchJobError, LocalBatchService, build_records, ids_path, ingest_results, load_answers,
+                         load_ids, output_file_uri, read_jsonl, reask_failures, submit_job, wait_for_job,
+                         write_job_file)
+from judge_parsing import JudgeParser
+from stub_backends import StubLLM
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+class ForgetfulJudge:
+    """Every third verdict has no score; a re-ask prompt gets every item back as JSON"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, prompt):
+        if 'did not state their score' in prompt:
+            return json.dumps({str(n + 1): 3 for n in range(prompt.count('Item "'))})
+        self.calls += 1
+        return 'A solid answer overall.' if self.calls % 3 == 0 else '4'
+
+
+def service(root):
+    return LocalBatchService(StubLLM(responder=ForgetfulJudge(), time_scale=0), root=root)
+
+
+def run_job(client, job_file, root, **kwargs):
+    job_arn = submit_job(client, job_file, str(root / 'input'), str(root / 'output'), **kwargs)
+    job = wait_for_job(client, job_arn, poll_seconds=0.01, timeout=30)
+    return Path(output_file_uri(job, job_file))
+
+
+def test_round_trip_with_reask(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO)
+    items = [item for item in load_answers('manual_evaluation_template.csv') if item['question_id'] in ('Q1', 'Q2')]
+    records, ids = build_records('rubric', items)
+    job_file = write_job_file(records, tmp_path / 'judge.jsonl', ids=ids)
+    assert all(re.fullmatch(r'[A-Za-z0-9]{11}', r['recordId']) for r in read_jsonl(job_file))
+    assert load_ids(ids_path(job_file)) == ids
+
+    client, db = service(tmp_path / 'jobs'), tmp_path / 'results.db'
+    output = run_job(client, job_file, tmp_path / 'jobs')
+    parser = JudgeParser('batch-test')
+    scores = ingest_results(output, 'rubric', ids, 'batch-test', db_path=db, judge_parser=parser, backend='stub')
+    assert len(scores) == len(records)
+    unparsed = int(scores['score'].isna().sum())
+    assert unparsed == len(parser.pending) > 0
+
+    fixed = reask_failures(parser, client, str(tmp_path / 'jobs' / 'input'), str(tmp_path / 'jobs' / 'output'),
+                           'batch-test', tmp_path / 'jobs', poll_seconds=0.01, db_path=db, backend='stub')
+    assert len(fixed) == unparsed and set(fixed.values()) == {3}
+    stored = results_store.query("SELECT pipeline, question_id, metric, score FROM judge_scores", db_path=db)
+    assert len(stored) == len(records) and not stored['score'].isna().any()
+    calls = results_store.query("SELECT stage, backend FROM llm_calls", db_path=db)
+    assert (calls['stage'] == 'reask').sum() == 1 and set(calls['backend']) == {'stub'}
+
+
+def test_padding_meets_the_minimum_and_is_skipped_on_ingest(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO)
+    records, ids = build_records('rubric', load_answers('manual_evaluation_template.csv')[:3])
+    job_file = write_job_file(records, tmp_path / 'small.jsonl', pad_to=10, ids=ids)
+    client = service(tmp_path / 'jobs')
+    with pytest.raises(BatchJobError):
+        run_job(client, job_file, tmp_path / 'jobs', min_records=100)
+    output = run_job(client, job_file, tmp_path / 'jobs', min_records=10)
+    assert len(read_jsonl(output)) == 10
+    scores = ingest_results(output, 'rubric', ids, 'pad-test', db_path=tmp_path / 'results.db', backend='stub')
+    assert len(scores) == 3
+
+
+def test_a_job_that_cannot_be_read_fails_instead_of_hanging(tmp_path):
+    client = service(tmp_path)
+    job_arn = client.create_model_invocation_job(
+        jobName='broken', modelId='stub', inputDataConfig={'s3InputDataConfig': {'s3Uri': str(tmp_path / 'none')}},
+        outputDataConfig={'s3OutputDataConfig': {'s3Uri': str(tmp_path / 'out')}})['jobArn']
+    with pytest.raises(BatchJobError, match='Failed'):
+        wait_for_job(client, job_arn, poll_seconds=0.01, timeout=30)
@@ -0,0 +1,24 @@
+"""Chunk store round trip and the contexts of result rows"""
+
+import pandas as pd
+import pytest
+
+from chunk_store import ChunkStore, compact, expand, row_contexts, write_store
+
+
+def test_compact_expand_round_trip(tmp_path):
+    texts = ["Section 7 of the Land Act.", "Article 40 protects property.", "Cap. 300 repealed."]
+    write_store(tmp_path / 'chunks.store', texts, codec='zlib')
+    store = ChunkStore(tmp_path / 'chunks.store')
+    df = pd.DataFrame({'question': ['q1', 'q2'], 'contexts': [repr(texts[:2]), repr(texts[2:])]})
+    compacted = compact(df, store)
+    assert 'contexts' not in compacted
+    assert row_contexts(compacted.iloc[0], store) == texts[:2]
+    assert expand(compacted, store).equals(df)
+    store.close()
+
+
+def test_rows_without_any_contexts_column_are_rejected():
+    assert row_contexts(pd.Series({'answer': 'a', 'contexts': None})) == []
+    with pytest.raises(ValueError, match='contexts'):
+        row_contexts(pd.Series({'question': 'q', 'answer': 'a'}))
@@ -0,0 +1,115 @@
+"""Queue leases: every job is claimed by one worker at a time and recorded exactly once"""
+
+import threading
+
+import results_store
+from eval_queue import AccountRateLimiter, JobQueue, Worker, judge_jobs
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def items(n):
+    return [{'pipeline': 'SAC-RAG', 'question_id': f'q{i}', 'question': f'Question {i}?',
+             'ground_truth': 'Section 7 of the Land Act.', 'answer': f'Answer {i} citing the Land Act.'}
+            for i in range(n)]
+
+
+def scores(db):
+    return results_store.query("SELECT pipeline, question_id, metric FROM judge_scores", db_path=db)
+
+
+def insert_score(job):
+    def write(conn):
+        conn.execute("INSERT INTO judge_scores (run_id, suite, pipeline, question_id, metric, score, source) "
+                     "VALUES (?, 'rubric', 'SAC-RAG', ?, 'rubric', 4, 'queue')", (job.run_id, job.job_id))
+    return write
+
+
+def test_publishing_twice_adds_nothing(tmp_path):
+    queue = JobQueue(tmp_path / 'q.db')
+    jobs = judge_jobs(items(3), ['rubric'])
+    assert queue.publish('run', 'judge', jobs) == 3
+    assert queue.publish('run', 'judge', jobs) == 0
+    assert queue.pending('run') == 3
+
+
+def test_claims_never_overlap(tmp_path):
+    queue = JobQueue(tmp_path / 'q.db')
+    queue.publish('run', 'judge', judge_jobs(items(5), ['rubric']))
+    first = queue.claim('a', n=3)
+    second = queue.claim('b', n=3)
+    assert len(first) == 3 and len(second) == 2
+    assert not {j.job_id for j in first} & {j.job_id for j in second}
+    assert queue.claim('c', n=3) == []
+
+
+def test_expired_lease_is_reclaimed_and_the_stale_worker_cannot_record(tmp_path):
+    clock = Clock()
+    db = tmp_path / 'q.db'
+    queue = JobQueue(db, lease_seconds=10, clock=clock)
+    queue.publish('run', 'judge', [('only', {'pipeline': 'SAC-RAG', 'question_id': 'q0'})])
+    [stale] = queue.claim('dead-worker')
+    clock.now += 11
+    [fresh] = queue.claim('live-worker')
+    assert fresh.job_id == stale.job_id and fresh.attempts == 2
+
+    assert not queue.complete(stale, 'dead-worker', write=insert_score(stale))
+    assert queue.complete(fresh, 'live-worker', write=insert_score(fresh))
+    assert not queue.complete(fresh, 'live-worker', write=insert_score(fresh))
+    assert len(scores(db)) == 1
+    assert queue.pending() == 0
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    clock = Clock()
+    queue = JobQueue(tmp_path / 'q.db', lease_seconds=10, clock=clock)
+    queue.publish('run', 'judge', [('only', {})])
+    [job] = queue.claim('a')
+    clock.now += 8
+    assert queue.heartbeat('a') == 1
+    clock.now += 8
+    assert queue.claim('b') == []
+    assert queue.complete(job, 'a')
+
+
+def test_retries_stop_at_max_attempts_and_release_is_free(tmp_path):
+    clock = Clock()
+    queue = JobQueue(tmp_path / 'q.db', clock=clock)
+    queue.publish('run', 'judge', [('only', {})], max_attempts=2)
+    [job] = queue.claim('a')
+    assert queue.release('a') == 1
+    [job] = queue.claim('a')
+    assert job.attempts == 1
+    assert queue.fail(job, 'a', 'throttled', retry_in=5) == 'queued'
+    assert queue.claim('a') == []
+    clock.now += 5
+    [job] = queue.claim('a')
+    assert queue.fail(job, 'a', 'throttled', retry_in=5) == 'failed'
+    assert queue.pending() == 0
+    assert queue.requeue('run') == 1
+
+
+def test_concurrent_workers_record_every_judgement_once(tmp_path):
+    db = tmp_path / 'q.db'
+    queue = JobQueue(db)
+    jobs = judge_jobs(items(12), ['rubric'])
+    queue.publish('run', 'judge', jobs)
+    workers = [Worker(JobQueue(db), [f'acct{i}@us-east-1'], AccountRateLimiter(queue, rate=1000.0, burst=50),
+                      threads=3, time_scale=0.001, name=f'w{i}') for i in range(2)]
+    threads = [threading.Thread(target=worker.run, kwargs={'until_empty': True, 'max_idle_s': 5})
+               for worker in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    recorded = scores(db)
+    assert len(recorded) == len(jobs)
+    assert not recorded.duplicated().any()
+    assert queue.pending() == 0
+    assert sum(stats['done'] for worker in workers for stats in worker.stats.values()) == len(jobs)
@@ -0,0 +1,51 @@
+"""Grid cache keys: a stage's key changes exactly when something that shapes its output does"""
+
+from pathlib import Path
+
+import rag_pipelines
+from experiment_grid import ArtifactStore, build_grid, plan
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def keys(**kwargs):
+    nodes, _, _, _ = build_grid(['claude45'], ['sac'], ['rubric'], **kwargs)
+    return {n.stage: n.key for n in nodes}
+
+
+def test_keys_are_stable(monkeypatch):
+    monkeypatch.chdir(REPO)
+    assert keys() == keys()
+
+
+def test_service_separates_stub_and_bedrock_outputs(monkeypatch):
+    monkeypatch.chdir(REPO)
+    local, bedrock = keys(), keys(service='bedrock')
+    assert [s for s in local if local[s] == bedrock[s]] == ['parse', 'chunk']   # SAC chunks embed the summaries
+
+
+def test_judge_model_only_reruns_judging(monkeypatch):
+    monkeypatch.chdir(REPO)
+    before, after = keys(), keys(judge_model='claude35')
+    assert [s for s in before if before[s] != after[s]] == ['judge', 'aggregate', 'chart']
+
+
+def test_prompt_edit_reruns_generation_but_not_retrieval(monkeypatch):
+    monkeypatch.chdir(REPO)
+    before = keys()
+    monkeypatch.setattr(rag_pipelines, 'RAG_PROMPT', rag_pipelines.RAG_PROMPT + "\nCite sections.")
+    after = keys()
+    assert before['retrieve'] == after['retrieve']
+    assert before['generate'] != after['generate'] and before['judge'] != after['judge']
+
+
+def test_plan_reruns_everything_downstream_of_a_changed_stage(monkeypatch, tmp_path):
+    monkeypatch.chdir(REPO)
+    nodes, _, _, _ = build_grid(['claude45'], ['sac'], ['rubric'])
+    store = ArtifactStore(tmp_path)
+    for n in nodes:
+        store.path(n).parent.mkdir(parents=True, exist_ok=True)
+        store.save(n, None)
+    assert set(plan(nodes, store).values()) == {'cached'}
+    status = plan(nodes, store, force={'generate'})
+    assert {n.stage for n in nodes if status[n.key] == 'run'} == {'generate', 'judge', 'aggregate', 'chart'}
@@ -0,0 +1,27 @@
+"""Posting-list `where` answers and loose Act matching agree with legal_chunker.matches()"""
+
+from filtered_search import PostingIndex, question_where, to_where
+from legal_chunker import matches
+
+METAS = [{'act': 'Law of Succession Act', 'section': '29'},
+         {'act': 'The Land Registration Act, 2012', 'section': '40'},
+         {'act': 'Land Act', 'section': '7'},
+         {'act': 'Employment Act', 'section': '45'}]
+
+
+def test_partial_act_names_expand_to_in():
+    postings = PostingIndex(METAS)
+    acts = postings.values('act')
+    assert to_where({'act': 'Succession Act'}, acts) == {'act': {'$in': ['Law of Succession Act']}}
+    assert to_where({'act': 'Succession Act'}) == {'act': 'Succession Act'}
+    for filters in ({'act': 'Succession Act'}, {'act': 'land registration act'}, {'act': 'Land Act'},
+                    {'act': 'Land Act', 'section': '7'}, {'act': 'Penal Code'}):
+        expected = [row for row, meta in enumerate(METAS) if matches(meta, filters)]
+        assert postings.rows(to_where(filters, acts)).tolist() == expected, filters
+
+
+def test_question_where():
+    acts = PostingIndex(METAS).values('act')
+    assert question_where("What is the weather like?", acts) is None
+    where = question_where("What does section 29 of the Succession Act provide?", acts)
+    assert PostingIndex(METAS).rows(where).tolist() == [0]
@@ -0,0 +1,53 @@
+"""Statute parsing: headings, section units and text coverage"""
+
+from legal_chunker import chunk_document, statute_units
+
+STATUTE = """THE EMPLOYMENT ACT, 2007
+ARRANGEMENT OF SECTIONS
+1. Short title
+2. Interpretation
+3. Application
+PART I—PRELIMINARY
+1. This Act may be cited as the Employment Act, 2007.
+2. In this Act, unless the context otherwise requires, "employee" means a person employed for wages.
+3. (1) This Act shall apply to all employees.
+Part VI of this Act shall not apply to the armed forces.
+(2) IMPORTANT: the Minister may by order exempt any category.
+PART II—GENERAL PRINCIPLES
+4. No person shall use or assist any other person in using forced labour.
+"""
+
+
+def _words(text):
+    return set(text.split())
+
+
+def test_body_reference_to_a_part_is_not_a_heading():
+    sections = {meta['section']: meta for _, _, meta in statute_units(STATUTE) if meta['unit'] == 'section'}
+    assert sections['3']['part'] == 'I'
+    assert sections['3']['part_title'] == 'PRELIMINARY'
+    assert sections['4']['part'] == 'II'
+    assert sections['4']['part_title'] == 'GENERAL PRINCIPLES'
+
+
+def test_units_cover_the_whole_text():
+    units = statute_units(STATUTE)
+    assert units[0][0] == 0
+    assert units[-1][1] == len(STATUTE)
+    for (_, end, _), (start, _, _) in zip(units, units[1:]):
+        assert end == start
+
+
+def test_chunks_keep_every_word():
+    chunks = chunk_document(STATUTE, with_breadcrumb=False)
+    assert _words(STATUTE) <= _words("\n".join(text for text, _ in chunks))
+    assert any('IMPORTANT' in text for text, meta in chunks if meta.get('section') == '3')
+
+
+def test_text_after_a_heading_past_the_last_section_is_kept():
+    text = ("1. Short title.\n2. Interpretation here.\nPART III—REPEALED PROVISIONS\n"
+            "9. Out-of-sequence section text.\n10. More text.\n")
+    units = statute_units(text)
+    assert units[-1][1] == len(text)
+    assert units[-1][2] == {'unit': 'body', 'part': 'III', 'part_title': 'REPEALED PROVISIONS'}
+    assert 'Out-of-sequence' in "".join(chunk for chunk, _ in chunk_document(text))
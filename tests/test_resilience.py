@@ -0,0 +1,189 @@
+"""Retries, circuit breaker and hedging against the fault-injecting stub"""
+
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import resilience
+from cost_accounting import InstrumentedLLM, UsageLedger
+from judge_parsing import parse_score
+from resilience import CallFailed, CircuitBreaker, RetryPolicy, invoke_with_retry, is_failure
+from stub_backends import FaultInjectingLLM, StubClientError, StubLLM
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+class CountingLLM:
+    model_id = 'test-endpoint'
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return 'ok'
+
+
+def half_open_breaker():
+    now = [0.0]
+    breaker = CircuitBreaker('test-endpoint', failure_threshold=1, reset_timeout=5, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 6.0
+    return breaker
+
+
+def test_only_one_probe_is_let_through_when_half_open():
+    breaker = half_open_breaker()
+    assert breaker.allow()
+    assert breaker.probing()
+    assert not breaker.allow()
+
+
+def test_non_probe_callers_wait_for_the_probe_instead_of_failing():
+    breaker = half_open_breaker()
+    assert breaker.allow()                                   # another caller holds the probe
+    llm, result = CountingLLM(), []
+    waiter = threading.Thread(target=lambda: result.append(
+        invoke_with_retry(llm, 'prompt', breaker=breaker, sleep=lambda s: None)))
+    waiter.start()
+    time.sleep(0.05)
+    assert llm.calls == 0                                    # held back while the probe runs
+    breaker.record_success()
+    waiter.join(5)
+    assert result == ['ok'] and llm.calls == 1
+
+
+def test_waiting_for_a_probe_uses_up_the_attempt_budget():
+    breaker = half_open_breaker()
+    assert breaker.allow()
+    result = invoke_with_retry(CountingLLM(), 'prompt', breaker=breaker, max_retries=2,
+                               policy=RetryPolicy(max_delay=0.01))
+    assert isinstance(result, CallFailed) and result.reason == 'circuit_open'
+
+
+def test_fatal_errors_do_not_count_against_the_endpoint():
+    class BadRequest:
+        model_id = 'test-endpoint'
+
+        def invoke(self, prompt):
+            raise StubClientError('ValidationException', 'prompt too long')
+
+    breaker = CircuitBreaker('test-endpoint', failure_threshold=2)
+    for _ in range(5):
+        assert invoke_with_retry(BadRequest(), 'prompt', breaker=breaker).reason == 'fatal'
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+def test_a_fatal_probe_lets_the_next_caller_probe():
+    breaker = half_open_breaker()
+
+    class BadRequest(CountingLLM):
+        def invoke(self, prompt):
+            raise StubClientError('ValidationException', 'bad prompt')
+
+    assert invoke_with_retry(BadRequest(), 'prompt', breaker=breaker).reason == 'fatal'
+    assert invoke_with_retry(CountingLLM(), 'prompt', breaker=breaker) == 'ok'
+
+
+def test_successful_probe_closes_the_circuit():
+    breaker = half_open_breaker()
+    assert invoke_with_retry(CountingLLM(), 'prompt', breaker=breaker) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_hedge_pool_is_created_on_first_hedge():
+    check = "import resilience; assert resilience._hedge_pool is None"
+    subprocess.run([sys.executable, '-c', check], cwd=REPO, check=True)
+    assert resilience.hedged_call(lambda: 1, hedge_after=1.0) == 1
+    assert resilience._hedge_pool is not None
+
+
+def stub(endpoint, seed=0, **faults):
+    """Answers '4' after a few ms, with injected faults; `endpoint` keys its breaker and latency history"""
+    return FaultInjectingLLM(StubLLM(responder=lambda p: '4', time_scale=0.002, seed=seed), seed=seed,
+                             model_id=endpoint, **faults)
+
+
+def test_throttling_is_retried_with_jittered_backoff():
+    llm, sleeps = stub('jitter', throttle_rate=0.5), []
+    policy = RetryPolicy(max_attempts=10, base_delay=0.01, max_delay=1.0, seed=0)
+    breaker = CircuitBreaker(llm.model_id, failure_threshold=100)
+    results = [invoke_with_retry(llm, 'prompt', policy=policy, breaker=breaker, sleep=sleeps.append)
+               for _ in range(20)]
+    assert results == ['4'] * 20
+    assert len(sleeps) == llm.injected['throttled'] > 0
+    assert all(0.01 <= s <= 1.0 for s in sleeps)
+    assert len(set(sleeps)) > 1                              # jittered, not a fixed ladder
+
+
+def test_exhausted_retries_give_an_explicit_failure_and_a_nan_score():
+    llm, sleeps = stub('exhausted', throttle_rate=1.0), []
+    result = invoke_with_retry(llm, 'prompt', policy=RetryPolicy(max_attempts=4, base_delay=0.01),
+                               breaker=CircuitBreaker(llm.model_id, failure_threshold=100), sleep=sleeps.append)
+    assert isinstance(result, CallFailed) and result.reason == 'throttled' and result.attempts == 4
+    assert llm.calls == 4 and len(sleeps) == 3
+    assert is_failure(result)
+    score, outcome = parse_score(result, (1, 5))
+    assert is_failure(score) and outcome == 'call_failed'
+
+
+def test_retries_are_counted_per_logical_call(tmp_path):
+    faulty = stub('ledger', throttle_rate=1.0)
+    ledger = UsageLedger('retries', db_path=tmp_path / 'results.db', flush_every=1000, backend='stub')
+    llm = InstrumentedLLM(faulty, ledger, kind='judge')
+    policy, breaker = RetryPolicy(max_attempts=3, base_delay=0.01), CircuitBreaker('ledger', failure_threshold=100)
+    assert invoke_with_retry(llm, 'prompt', policy=policy, breaker=breaker, sleep=lambda s: None).attempts == 3
+    faulty.throttle_rate = 0.0
+    assert invoke_with_retry(llm, 'prompt', policy=policy, breaker=breaker) == '4'
+    assert llm.invoke('prompt').content == '4'
+    assert [(r['status'], r['retries']) for r in ledger._rows] == [('throttled', 0)] * 3 + [('ok', 0)] * 2
+
+    faulty.throttle_rate = 0.5                               # retries land on the attempt that succeeds
+    for _ in range(10):
+        assert invoke_with_retry(llm, 'prompt', policy=RetryPolicy(max_attempts=20, base_delay=0.01),
+                                 breaker=breaker, sleep=lambda s: None) == '4'
+    later = ledger._rows[5:]
+    assert sum(r['retries'] for r in later if r['status'] == 'ok') == sum(r['status'] == 'throttled' for r in later) > 0
+
+
+def test_breaker_opens_on_errors_and_recovers_after_the_timeout():
+    now = [0.0]
+    llm = stub('recovering', error_rate=1.0)
+    breaker = CircuitBreaker(llm.model_id, failure_threshold=3, reset_timeout=30, clock=lambda: now[0])
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=1.0)
+    assert invoke_with_retry(llm, 'prompt', policy=policy, breaker=breaker, sleep=lambda s: None).reason == 'transient'
+    assert breaker.state == 'open'
+
+    calls = llm.calls
+    assert invoke_with_retry(llm, 'prompt', policy=policy, breaker=breaker).reason == 'circuit_open'
+    assert llm.calls == calls                                # open circuit: the endpoint is not called
+
+    llm.error_rate = 0.0
+    now[0] += 31
+    assert invoke_with_retry(llm, 'prompt', policy=policy, breaker=breaker) == '4'
+    assert breaker.state == 'closed'
+
+
+def slow_then_fast_seed(calls_before):
+    """A seed whose roll after `calls_before` calls is slow (< 0.5) and the next one fast"""
+    for seed in range(1000):
+        rng = random.Random(seed)
+        rolls = [rng.random() for _ in range(calls_before + 2)]
+        if rolls[-2] < 0.5 <= rolls[-1]:
+            return seed
+
+
+def test_hedging_cuts_the_tail_of_a_slow_stub():
+    llm = stub('hedged', seed=slow_then_fast_seed(20), slow_factor=200)
+    breaker = CircuitBreaker(llm.model_id)
+    for _ in range(20):                                      # latency history for the p95 trigger
+        assert invoke_with_retry(llm, 'prompt', hedge=True, breaker=breaker) == '4'
+    llm.slow_rate = 0.5                                      # the primary stalls, the hedge answers
+    start = time.perf_counter()
+    assert invoke_with_retry(llm, 'prompt', hedge=True, breaker=breaker) == '4'
+    elapsed = time.perf_counter() - start
+    assert llm.calls == 22 and llm.injected['slow'] == 1
+    assert elapsed < 0.5 * llm.slow_factor * resilience.latency_tracker(llm.model_id).quantile(0.95)
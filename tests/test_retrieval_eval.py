@@ -0,0 +1,67 @@
+"""Recall@k, MRR, nDCG, gold-label mapping and citation hits on hand-built rankings"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from retrieval_eval import (RetrievalIndex, citation_matrix, citation_metrics, extract_citations, ranking_metrics,
+                            relevance_matrix)
+
+
+def small_index():
+    texts = ["Section 40(1) of the Land Registration Act", "Article 27 (4) applies", "unrelated", "Section 3"]
+    return RetrievalIndex('base', ['c0', 'c1', 'c2', 'c3'], texts, np.eye(4, dtype=np.float32))
+
+
+def test_ranking_metrics_by_hand():
+    relevance = np.array([[0, 2, 0, 1],          # two gold chunks, graded
+                          [0, 0, 0, 0]], dtype=np.float32)   # unlabelled question
+    top = np.array([[2, 1, 3, 0],
+                    [0, 1, 2, 3]])
+    metrics = ranking_metrics(top, relevance, ks=(1, 2, 3))
+
+    assert metrics[1]['recall'][0] == 0 and metrics[1]['mrr'][0] == 0
+    assert metrics[2]['recall'][0] == 0.5
+    assert metrics[2]['mrr'][0] == 0.5
+    assert metrics[3]['recall'][0] == 1.0
+    dcg = 3 / math.log2(3) + 1 / math.log2(4)
+    ideal = 3 / math.log2(2) + 1 / math.log2(3)
+    assert math.isclose(metrics[3]['ndcg'][0], dcg / ideal, rel_tol=1e-6)
+    for k in (1, 2, 3):
+        assert all(np.isnan(metrics[k][m][1]) for m in ('recall', 'mrr', 'ndcg'))
+
+
+def test_perfect_ranking_scores_one():
+    relevance = np.array([[3, 1, 0, 0]], dtype=np.float32)
+    metrics = ranking_metrics(np.array([[0, 1, 2, 3]]), relevance, ks=(2,))
+    assert metrics[2]['recall'][0] == metrics[2]['mrr'][0] == 1.0
+    assert math.isclose(metrics[2]['ndcg'][0], 1.0)
+
+
+def test_k_beyond_the_ranking_is_clamped():
+    relevance = np.array([[1, 0]], dtype=np.float32)
+    metrics = ranking_metrics(np.array([[1, 0]]), relevance, ks=(10,))
+    assert set(metrics) == {2} and metrics[2]['recall'][0] == 1.0
+
+
+def test_relevance_matrix_counts_stale_labels():
+    gold = pd.DataFrame({'Question_ID': ['q1', 'q1', 'q2', 'q1'], 'index': ['base', 'base', 'base', 'sac'],
+                         'chunk_id': ['c1', 'gone', 'c3', 'c0'], 'relevance': [2, 1, 1, 1]})
+    matrix, unknown = relevance_matrix(gold, small_index(), ['q1', 'q2'])
+    assert unknown == 1
+    assert matrix.tolist() == [[0, 2, 0, 0], [0, 0, 0, 1]]
+
+
+def test_citation_matching_is_normalised():
+    assert 'section 40(1)' in extract_citations("See Section 40 (1) of the Act")
+    contains = citation_matrix(['article 27(4)', 'section 40(1)'], small_index().texts)
+    assert contains.tolist() == [[False, True, False, False], [True, False, False, False]]
+
+
+def test_citation_metrics():
+    citations = pd.DataFrame({'Question_ID': ['q1', 'q1'], 'citation': ['Section 40(1)', 'Article 27(4)']})
+    top = np.array([[0, 2], [3, 2]])
+    metrics = citation_metrics(top, citations, small_index(), ['q1', 'q2'], ks=(1, 2))
+    assert metrics[1]['citation_hit'][0] == 1.0 and metrics[1]['citation_recall'][0] == 0.5
+    assert np.isnan(metrics[1]['citation_hit'][1])
@@ -0,0 +1,63 @@
+"""Always-valid confidence sequence, stopping decisions and the CLI"""
+
+import random
+from pathlib import Path
+
+import pytest
+
+import sequential_eval
+from sequential_eval import ConfidenceSequence, decide, run_sequential
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def test_interval_covers_the_mean_and_only_shrinks():
+    rng = random.Random(0)
+    cs = ConfidenceSequence(alpha=0.05, low=-4, high=4)
+    widths = []
+    for _ in range(500):
+        cs.update(max(-4, min(4, rng.gauss(0.5, 1.0))))
+        lo, hi = cs.interval
+        assert lo <= 0.5 <= hi
+        widths.append(hi - lo)
+    assert all(b <= a for a, b in zip(widths, widths[1:]))
+
+
+def test_out_of_range_observation_is_rejected():
+    with pytest.raises(ValueError):
+        ConfidenceSequence(low=0, high=1).update(2)
+
+
+def test_decide():
+    assert decide((0.1, 0.4)) == 'A'
+    assert decide((-0.4, -0.1)) == 'B'
+    assert decide((-0.1, 0.1), margin=0.25) == 'tie'
+    assert decide((-0.1, 0.1)) is None
+
+
+def test_clear_winner_stops_early():
+    result = run_sequential(range(2000), lambda item: (4, 2), (1, 5), batch_size=10, workers=1)
+    assert result['decision'] == 'A'
+    assert result['items_judged'] < 2000
+
+
+def test_identical_systems_end_in_a_tie_with_a_margin():
+    rng = random.Random(1)
+    scores = {item: (rng.randint(1, 5),) * 2 for item in range(2000)}
+    result = run_sequential(list(scores), scores.get, (1, 5), margin=0.25, batch_size=10, workers=1)
+    assert result['decision'] == 'tie'
+
+
+def test_failed_pairs_are_skipped():
+    result = run_sequential(range(20), lambda item: (float('nan'), 3) if item % 2 else (3, 3), (1, 5),
+                            batch_size=20, workers=1)
+    assert result['pairs_scored'] == 10
+
+
+def test_documented_live_usage_accepts_options_after_the_command(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(REPO)
+    code = sequential_eval.main(['live', '--suite', 'rubric', '--a', 'SAC-RAG', '--b', 'Generic Claude',
+                                 '--margin', '0.25', '--max-items', '4', '--workers', '1',
+                                 '--db', str(tmp_path / 'results.db')])
+    assert code == 0
+    assert 'Sequential comparison' in capsys.readouterr().out
@@ -0,0 +1,38 @@
+"""Scatter-gather over in-process shard servers: merged top k and connection cleanup"""
+
+import threading
+
+import numpy as np
+
+from sharded_index import ShardedIndex, ShardServer, split
+
+
+def serve_shards(tmp_path, n=200, shards=2, dimensions=16):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f'c{i}' for i in range(n)]
+    servers = [ShardServer(('127.0.0.1', 0), path)
+               for path in split(ids, vectors, [{'doc': i % 7} for i in range(n)], shards, output_dir=tmp_path)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return ids, vectors, servers
+
+
+def test_merged_top_k_matches_brute_force_and_close_releases_every_socket(tmp_path):
+    ids, vectors, servers = serve_shards(tmp_path)
+    client = ShardedIndex([s.server_address for s in servers], max_workers=4)
+    try:
+        for query in vectors[:10]:
+            result = client.search(query, k=5)
+            assert result.missing == []
+            assert result.ids[0] == [ids[i] for i in np.argsort(-(vectors @ query))[:5]]
+        client.info()                                        # a connection on the calling thread too
+        sockets = set(client._open)
+        assert len(sockets) > len(servers)
+        client.close()
+        assert client._open == set() and all(s.fileno() == -1 for s in sockets)
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,451 @@
+"""
+Tracing Spans & Sampling Profiler
+OpenTelemetry-style spans around ingest, retrieval, generation, evaluation and
+retry backoff, exported as OTLP/JSON either to a local file (one export batch
+per line, readable by the collector's otlpjsonfile receiver) or to a collector
+over OTLP/HTTP. An opt-in sampling profiler records folded stacks from every
+thread and renders them as an SVG flame graph.
+
+Tracing is off unless configured, and a disabled span costs almost nothing:
+    RAG_TRACE_FILE=traces.jsonl           write spans to a file
+    RAG_TRACE_ENDPOINT=http://localhost:4318/v1/traces   send to a collector
+    RAG_PROFILE=profile                   sample stacks -> profile.folded + profile.svg
+
+Usage:
+    from tracing import span, traced
+    with span('retrieval.vector_search', k=5):
+        ...
+
+    python tracing.py flamegraph traces.jsonl -o run_flamegraph.svg
+    python tracing.py summary traces.jsonl
+"""
+
+import argparse
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from html import escape
+
+SERVICE_NAME = 'kenyan-legal-rag'
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+# ============================================================
+# Spans
+# ============================================================
+class Span:
+    """One timed operation; parent/child links follow the active context"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'status', 'error')
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = 'OK'
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def duration_s(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': 2 if self.status == 'ERROR' else 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.error:
+            span['status']['message'] = self.error
+        return span
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+def _otlp_value(value):
+    for kind in ('stringValue', 'doubleValue', 'boolValue'):
+        if kind in value:
+            return value[kind]
+    return int(value.get('intValue', 0))
+
+
+# ============================================================
+# Exporters
+# ============================================================
+def _otlp_payload(spans):
+    return {'resourceSpans': [{
+        'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+        'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': [s.to_otlp() for s in spans]}],
+    }]}
+
+
+class FileSpanExporter:
+    """Appends one OTLP/JSON export request per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        line = json.dumps(_otlp_payload(spans))
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class OTLPHttpExporter:
+    """Posts OTLP/JSON to a collector (e.g. http://localhost:4318/v1/traces)"""
+
+    def __init__(self, endpoint, timeout=5):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans):
+        import urllib.request
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(_otlp_payload(spans)).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except OSError as e:
+            print(f"      ⚠️ Trace export failed: {str(e)[:100]}")
+
+
+class Tracer:
+    """Buffers finished spans and hands them to the exporters in batches"""
+
+    def __init__(self, exporters=None, batch_size=256):
+        self.exporters = list(exporters or [])
+        self.batch_size = batch_size
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.exporters)
+
+    def finish(self, finished):
+        with self._lock:
+            self._buffer.append(finished)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            for exporter in self.exporters:
+                exporter.export(batch)
+
+
+_tracer = Tracer()
+atexit.register(lambda: _tracer.flush())
+
+
+def configure_tracing(trace_file=None, endpoint=None):
+    """Enable span export (to a file, a collector, or both)"""
+    _tracer.flush()
+    exporters = []
+    if trace_file:
+        exporters.append(FileSpanExporter(trace_file))
+    if endpoint:
+        exporters.append(OTLPHttpExporter(endpoint))
+    _tracer.exporters = exporters
+    return _tracer
+
+
+def flush():
+    _tracer.flush()
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Time the enclosed block as a child of the current span"""
+    if not _tracer.enabled:
+        yield _NOOP
+        return
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'ERROR'
+        current.error = f"{type(e).__name__}: {str(e)[:200]}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        _tracer.finish(current)
+
+
+def traced(name=None, **attributes):
+    """Decorator form of span() for ingest/evaluation functions"""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ============================================================
+# Sampling Profiler
+# ============================================================
+class SamplingProfiler:
+    """Samples the Python stacks of all threads every `interval` seconds"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self
+
+    def write(self, prefix):
+        """Write <prefix>.folded and <prefix>.svg"""
+        write_folded(self.samples, prefix + '.folded')
+        render_flamegraph(self.samples, prefix + '.svg', title='Sampling profile')
+        return prefix + '.svg'
+
+
+@contextlib.contextmanager
+def profile_run(prefix='profile', interval=0.005):
+    """Profile the enclosed block and write a flame graph when it ends"""
+    profiler = SamplingProfiler(interval).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        print(f"🔥 Flame graph written to {profiler.write(prefix)}")
+
+
+# ============================================================
+# Flame Graphs
+# ============================================================
+def write_folded(samples, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in sorted(samples.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def read_folded(path):
+    samples = Counter()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                samples[stack] += int(count)
+    return samples
+
+
+def load_spans(path):
+    """Read spans back from an OTLP/JSON lines file"""
+    spans = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            for resource in json.loads(line).get('resourceSpans', []):
+                for scope in resource.get('scopeSpans', []):
+                    for s in scope.get('spans', []):
+                        s['attributes'] = {a['key']: _otlp_value(a['value']) for a in s.get('attributes', [])}
+                        s['duration_s'] = (int(s['endTimeUnixNano']) - int(s['startTimeUnixNano'])) / 1e9
+                        spans.append(s)
+    return spans
+
+
+def spans_to_folded(spans):
+    """
+    Folded stacks weighted by self time (microseconds), so a flame graph of a
+    run shows where wall-clock time went: stage -> LLM call -> retry backoff.
+    """
+    by_id = {s['spanId']: s for s in spans}
+    child_time = defaultdict(float)
+    for s in spans:
+        if s.get('parentSpanId') in by_id:
+            child_time[s['parentSpanId']] += s['duration_s']
+    samples = Counter()
+    for s in spans:
+        path, node = [], s
+        while node is not None:
+            path.append(node['name'])
+            node = by_id.get(node.get('parentSpanId'))
+        self_us = int(max(s['duration_s'] - child_time[s['spanId']], 0) * 1e6)
+        if self_us:
+            samples[';'.join(reversed(path))] += self_us
+    return samples
+
+
+def render_flamegraph(samples, path, title='Flame graph', width=1200, row_height=17):
+    """Render folded stacks as a standalone SVG flame graph (hover for details)"""
+    root = {'children': {}, 'count': 0}
+    for stack, count in samples.items():
+        node = root
+        node['count'] += count
+        for frame in stack.split(';'):
+            node = node['children'].setdefault(frame, {'children': {}, 'count': 0})
+            node['count'] += count
+    total = root['count'] or 1
+
+    rects = []
+
+    def layout(node, name, x, depth):
+        w = node['count'] / total * width
+        if w < 0.3:
+            return
+        rects.append((name, x, depth, w, node['count']))
+        child_x = x
+        for child_name, child in sorted(node['children'].items()):
+            layout(child, child_name, child_x, depth + 1)
+            child_x += child['count'] / total * width
+
+    child_x = 0.0
+    for name, child in sorted(root['children'].items()):
+        layout(child, name, child_x, 0)
+        child_x += child['count'] / total * width
+
+    max_depth = max((r[2] for r in rects), default=0) + 1
+    height = (max_depth + 2) * row_height
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'font-family="Verdana" font-size="11">',
+             f'<text x="{width / 2}" y="13" text-anchor="middle" font-size="14">{escape(title)}</text>']
+    for name, x, depth, w, count in rects:
+        y = height - (depth + 1) * row_height
+        hue = 10 + (zlib.crc32(name.encode('utf-8')) % 40)
+        label = escape(name[:int(w / 7)]) if w > 21 else ''
+        parts.append(
+            f'<g><title>{escape(name)} ({count} samples, {count / total:.1%})</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{w:.2f}" height="{row_height - 1}" '
+            f'fill="hsl({hue},85%,60%)" rx="2"/>'
+            f'<text x="{x + 3:.2f}" y="{y + row_height - 5}">{label}</text></g>')
+    parts.append('</svg>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+    return path
+
+
+# ============================================================
+# Environment Configuration
+# ============================================================
+def configure_from_env():
+    """Honour RAG_TRACE_FILE / RAG_TRACE_ENDPOINT / RAG_PROFILE"""
+    if os.environ.get('RAG_TRACE_FILE') or os.environ.get('RAG_TRACE_ENDPOINT'):
+        configure_tracing(os.environ.get('RAG_TRACE_FILE'), os.environ.get('RAG_TRACE_ENDPOINT'))
+    prefix = os.environ.get('RAG_PROFILE')
+    if prefix:
+        profiler = SamplingProfiler(float(os.environ.get('RAG_PROFILE_INTERVAL', '0.005'))).start()
+
+        def _write():
+            profiler.stop()
+            print(f"🔥 Flame graph written to {profiler.write(prefix)}")
+        atexit.register(_write)
+
+
+configure_from_env()
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trace flame graphs and span summaries")
+    sub = parser.add_subparsers(dest='command', required=True)
+    flame = sub.add_parser('flamegraph', help="Render a trace (.jsonl) or folded stacks (.folded) as SVG")
+    flame.add_argument('input')
+    flame.add_argument('-o', '--output', default='run_flamegraph.svg')
+    summary = sub.add_parser('summary', help="Per-span latency percentiles for a trace file")
+    summary.add_argument('input')
+    args = parser.parse_args(argv)
+
+    if args.command == 'flamegraph':
+        if args.input.endswith('.folded'):
+            samples, title = read_folded(args.input), 'Sampling profile'
+        else:
+            samples, title = spans_to_folded(load_spans(args.input)), 'Span self-time (µs)'
+        render_flamegraph(samples, args.output, title=f"{title}: {os.path.basename(args.input)}")
+        print(f"🔥 Flame graph written to {args.output}")
+    else:
+        import numpy as np
+        durations = defaultdict(list)
+        for s in load_spans(args.input):
+            durations[s['name']].append(s['duration_s'])
+        print(f"{'span':<32} {'count':>6} {'p50 (s)':>9} {'p95 (s)':>9} {'total (s)':>10}")
+        for name, values in sorted(durations.items(), key=lambda kv: -sum(kv[1])):
+            values = np.array(values)
+            print(f"{name:<32} {len(values):>6} {np.percentile(values, 50):>9.3f} "
+                  f"{np.percentile(values, 95):>9.3f} {values.sum():>10.2f}")
+
+
+if __name__ == '__main__':
+    main()